@@ -0,0 +1,127 @@
+"""
+Allocations per GiB: iter_content vs the readinto receive path
+
+Serves a body of the requested size from a local HTTP server and downloads it
+to /dev/null twice - once with ``response.iter_content`` and once with
+``iter_response_chunks`` - reporting for each:
+
+- chunk buffers: distinct buffer objects handed to the write loop
+- transient MiB: bytes allocated and freed while fetching each chunk,
+  measured as the tracemalloc high-water mark above the live heap
+- CPU seconds and throughput (tracemalloc disabled)
+
+Usage:
+    python benchmarks/receive_allocations.py [--size-mib 1024] [--chunk-kib 1024]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from youtube_downloader.receive import iter_response_chunks  # noqa: E402
+
+BLOCK = os.urandom(1024 * 1024)
+
+
+def serve(size: int) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'video/mp4')
+            self.send_header('Content-Length', str(size))
+            self.end_headers()
+            remaining = size
+            while remaining:
+                block = BLOCK[:min(remaining, len(BLOCK))]
+                self.wfile.write(block)
+                remaining -= len(block)
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def chunks_of(mode: str, response, chunk_size: int):
+    if mode == 'iter_content':
+        return response.iter_content(chunk_size=chunk_size)
+    return iter_response_chunks(response, chunk_size)
+
+
+def run(mode: str, url: str, chunk_size: int, traced: bool) -> dict:
+    buffers = 0
+    previous = None
+    transient = 0
+    received = 0
+
+    with requests.Session() as session, open(os.devnull, 'wb') as sink:
+        response = session.get(url, stream=True)
+        cpu = time.process_time()
+        wall = time.perf_counter()
+        if traced:
+            tracemalloc.start()
+        iterator = iter(chunks_of(mode, response, chunk_size))
+        while True:
+            if traced:
+                live, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+            chunk = next(iterator, None)
+            if chunk is None:
+                break
+            if traced:
+                _, peak = tracemalloc.get_traced_memory()
+                transient += max(0, peak - live)
+            owner = chunk.obj if isinstance(chunk, memoryview) else chunk
+            if owner is not previous:
+                buffers += 1
+            previous = owner
+            sink.write(chunk)
+            received += len(chunk)
+        if traced:
+            tracemalloc.stop()
+        cpu = time.process_time() - cpu
+        wall = time.perf_counter() - wall
+
+    return {'bytes': received, 'buffers': buffers, 'transient': transient, 'cpu': cpu, 'wall': wall}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--size-mib', type=int, default=1024, help='Body size in MiB (default: 1024)')
+    parser.add_argument('--chunk-kib', type=int, default=1024, help='Chunk size in KiB (default: 1024)')
+    args = parser.parse_args()
+
+    size = args.size_mib * 1024 * 1024
+    chunk_size = args.chunk_kib * 1024
+    httpd = serve(size)
+    url = f'http://127.0.0.1:{httpd.server_address[1]}/video.mp4'
+    per_gib = (1024 ** 3) / size
+
+    print(f"{args.size_mib} MiB body, {args.chunk_kib} KiB chunks, figures scaled to 1 GiB\n")
+    print(f"{'path':<16}{'chunk buffers':>15}{'transient MiB':>15}{'CPU s':>9}{'MiB/s':>9}")
+    for mode in ('iter_content', 'readinto'):
+        traced = run(mode, url, chunk_size, traced=True)
+        timed = run(mode, url, chunk_size, traced=False)
+        assert traced['bytes'] == timed['bytes'] == size
+        print(f"{mode:<16}"
+              f"{traced['buffers'] * per_gib:>15.0f}"
+              f"{traced['transient'] * per_gib / 2 ** 20:>15.0f}"
+              f"{timed['cpu'] * per_gib:>9.2f}"
+              f"{size / 2 ** 20 / timed['wall']:>9.0f}")
+
+    httpd.shutdown()
+
+
+if __name__ == '__main__':
+    main()
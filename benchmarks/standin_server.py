@@ -0,0 +1,351 @@
+"""
+Local YouTube stand-in for benchmarks
+
+A threaded HTTP server emulating the parts of YouTube the downloaders talk to:
+
+- ``POST /youtubei/v1/player``: a playable response with a muxed format
+  (itag 18) and adaptive video (137) and audio (140) formats
+- ``POST /youtubei/v1/browse``: playlist pages of ``page_size`` videos linked
+  by continuation tokens, as returned to the ANDROID client
+- ``GET /videoplayback?id=&itag=``: googlevideo-style media with ``Range``
+  (and ``range=`` query) support
+
+Faults are configurable and can be changed between scenarios with
+``configure``: added latency, a per-connection bandwidth cap, bursts of 429
+responses and connections reset in the middle of a media body. Random
+choices come from a seeded generator so runs are repeatable.
+
+Point ytsnap at it with ``YTSNAP_API_BASE=<server.api_base>`` (set before
+``youtube_downloader`` is imported), or run it standalone:
+
+    python benchmarks/standin_server.py --port 8765 --latency-ms 20
+"""
+
+import os
+import json
+import time
+import random
+import socket
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse, parse_qs
+
+# Media bodies repeat this block; every byte is still fetched and written
+BLOCK = random.Random(0).getrandbits(8 * 1024 * 1024).to_bytes(1024 * 1024, 'little')
+PLAYLIST_ID = 'PLbench'
+# Bytes per write when the connection is throttled
+THROTTLE_SLICE = 64 * 1024
+
+
+def video_id(index: int) -> str:
+    """11-character video ID of playlist entry ``index``."""
+    return f"v{index:010d}"
+
+
+class StandInServer:
+    """
+    The stand-in server, running on a background thread.
+
+    Args:
+        host: Address to bind
+        port: Port to bind (0 picks a free one)
+        video_size: Bytes of the muxed format (adaptive video is twice that,
+            audio an eighth)
+        playlist_size: Videos in the playlist ``PLAYLIST_ID``
+        page_size: Videos per browse page
+        seed: Seed for fault injection
+        **faults: Initial ``configure`` settings
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, video_size: int = 4 * 1024 * 1024,
+                 playlist_size: int = 100, page_size: int = 100, seed: int = 1, **faults):
+        self.video_size = video_size
+        self.playlist_size = playlist_size
+        self.page_size = page_size
+        self.latency = 0.0
+        self.bandwidth: Optional[float] = None
+        self.burst_rate = 0.0
+        self.burst_length = 0
+        self.reset_rate = 0.0
+        self.configure(**faults)
+        self.stats: Counter = Counter()
+        self._random = random.Random(seed)
+        self._burst_remaining = 0
+        self._lock = threading.Lock()
+
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name='standin', daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_base(self) -> str:
+        """Value for ``YTSNAP_API_BASE``."""
+        return f"{self.url}/youtubei/v1"
+
+    def configure(self, latency: float = 0.0, bandwidth: Optional[float] = None, burst_rate: float = 0.0,
+                  burst_length: int = 3, reset_rate: float = 0.0):
+        """
+        Set the faults of subsequent requests.
+
+        Args:
+            latency: Seconds added before every response
+            bandwidth: Bytes per second per media connection (None: unlimited)
+            burst_rate: Chance that a request starts a burst of 429s
+            burst_length: Consecutive requests (of any kind) answered 429 per burst
+            reset_rate: Chance that a media body is cut off midway by a reset
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.burst_rate = burst_rate
+        self.burst_length = burst_length
+        self.reset_rate = reset_rate
+
+    def reset_stats(self):
+        with self._lock:
+            self.stats = Counter()
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _count(self, key: str, amount: int = 1):
+        with self._lock:
+            self.stats[key] += amount
+
+    def _rate_limited(self) -> bool:
+        """Whether this request is answered 429 (starting or continuing a burst)."""
+        with self._lock:
+            if not self._burst_remaining and self.burst_rate and self._random.random() < self.burst_rate:
+                self._burst_remaining = self.burst_length
+            if self._burst_remaining:
+                self._burst_remaining -= 1
+                self.stats['rate_limited'] += 1
+                return True
+        return False
+
+    def _reset_point(self, length: int) -> Optional[int]:
+        """Bytes to send before resetting a media body of ``length`` bytes, or None."""
+        with self._lock:
+            if length > 1 and self.reset_rate and self._random.random() < self.reset_rate:
+                return self._random.randrange(1, length)
+        return None
+
+    def format_sizes(self) -> Dict[int, int]:
+        return {18: self.video_size, 137: 2 * self.video_size, 140: max(1, self.video_size // 8)}
+
+    def player_response(self, vid: str) -> Dict:
+        sizes = self.format_sizes()
+
+        def fmt(itag, mime, **extra):
+            return {
+                'itag': itag,
+                'url': f"{self.url}/videoplayback?id={vid}&itag={itag}&expire={int(time.time()) + 21600}",
+                'mimeType': mime,
+                'contentLength': str(sizes[itag]),
+                'approxDurationMs': '60000',
+                **extra
+            }
+
+        return {
+            'playabilityStatus': {'status': 'OK'},
+            'videoDetails': {'videoId': vid, 'title': f"Video {vid}", 'lengthSeconds': '60'},
+            'streamingData': {
+                'expiresInSeconds': '21540',
+                'formats': [fmt(18, 'video/mp4; codecs="avc1.42001E, mp4a.40.2"', qualityLabel='360p',
+                                width=640, height=360, fps=30, bitrate=500000)],
+                'adaptiveFormats': [
+                    fmt(137, 'video/mp4; codecs="avc1.640028"', qualityLabel='1080p',
+                        width=1920, height=1080, fps=30, bitrate=4000000),
+                    fmt(140, 'audio/mp4; codecs="mp4a.40.2"', quality='tiny', bitrate=130000,
+                        audioSampleRate='44100', audioChannels=2),
+                ]
+            }
+        }
+
+    def browse_response(self, payload: Dict) -> Tuple[int, Dict]:
+        token = payload.get('continuation')
+        if token:
+            start = int(token)
+        elif payload.get('browseId') == f"VL{PLAYLIST_ID}":
+            start = 0
+        else:
+            return 404, {'error': {'code': 404, 'message': 'Playlist not found'}}
+
+        end = min(start + self.page_size, self.playlist_size)
+        items = [
+            {'playlistVideoRenderer': {'videoId': video_id(i), 'title': {'runs': [{'text': f"Video {i}"}]}}}
+            for i in range(start, end)
+        ]
+        if end < self.playlist_size:
+            items.append({'continuationItemRenderer': {
+                'continuationEndpoint': {'continuationCommand': {'token': str(end)}}
+            }})
+
+        if token:
+            return 200, {'onResponseReceivedActions': [
+                {'appendContinuationItemsAction': {'continuationItems': items}}
+            ]}
+        return 200, {'contents': {'twoColumnBrowseResultsRenderer': {'tabs': [{'tabRenderer': {'content': {
+            'sectionListRenderer': {'contents': [{'itemSectionRenderer': {'contents': items}}]}
+        }}}]}}}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status: int, body: Dict):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _too_many_requests(self):
+                self.send_response(429)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                path = urlparse(self.path).path
+                if server.latency:
+                    time.sleep(server.latency)
+                if path.endswith('/player'):
+                    server._count('player')
+                    if server._rate_limited():
+                        return self._too_many_requests()
+                    return self._json(200, server.player_response(payload.get('videoId', '')))
+                if path.endswith('/browse'):
+                    server._count('browse')
+                    if server._rate_limited():
+                        return self._too_many_requests()
+                    return self._json(*server.browse_response(payload))
+                self._json(404, {'error': 'not found'})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == '/generate_204':
+                    self.send_response(204)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if url.path != '/videoplayback':
+                    return self._json(404, {'error': 'not found'})
+
+                query = parse_qs(url.query)
+                size = server.format_sizes().get(int(query.get('itag', ['0'])[0]))
+                if size is None:
+                    return self._json(404, {'error': 'unknown itag'})
+                server._count('media')
+                if server.latency:
+                    time.sleep(server.latency)
+                if server._rate_limited():
+                    return self._too_many_requests()
+
+                first, last, partial = 0, size - 1, False
+                spec = self.headers.get('Range', '').replace('bytes=', '') or query.get('range', [''])[0]
+                if spec:
+                    start, _, end = spec.partition('-')
+                    first = int(start or 0)
+                    last = min(int(end), size - 1) if end else size - 1
+                    partial = True
+                if first > last:
+                    self.send_response(416)
+                    self.send_header('Content-Range', f"bytes */{size}")
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+
+                length = last - first + 1
+                self.send_response(206 if partial else 200)
+                self.send_header('Content-Type', 'video/mp4')
+                self.send_header('Content-Length', str(length))
+                if partial:
+                    self.send_header('Content-Range', f"bytes {first}-{last}/{size}")
+                self.end_headers()
+                self._send_body(first, length, server._reset_point(length))
+
+            def _send_body(self, offset: int, length: int, reset_at: Optional[int]):
+                view = memoryview(BLOCK)
+                rate = server.bandwidth
+                limit = length if reset_at is None else reset_at
+                sent, started = 0, time.monotonic()
+                try:
+                    while sent < limit:
+                        position = (offset + sent) % len(BLOCK)
+                        count = min(limit - sent, len(BLOCK) - position, THROTTLE_SLICE if rate else len(BLOCK))
+                        self.wfile.write(view[position:position + count])
+                        sent += count
+                        if rate:
+                            ahead = sent / rate - (time.monotonic() - started)
+                            if ahead > 0:
+                                time.sleep(ahead)
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+                    return
+                finally:
+                    server._count('bytes', sent)
+                if reset_at is not None:
+                    server._count('resets')
+                    self.close_connection = True
+                    try:
+                        self.connection.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+
+        Handler.request_queue_size = 256
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--video-mib', type=float, default=4, help='Muxed format size in MiB (default: 4)')
+    parser.add_argument('--playlist-size', type=int, default=100)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--bandwidth-mib', type=float, default=None, help='Per-connection cap in MiB/s')
+    parser.add_argument('--burst-rate', type=float, default=0, help='Chance a request starts a 429 burst')
+    parser.add_argument('--reset-rate', type=float, default=0, help='Chance a media body is reset midway')
+    args = parser.parse_args()
+
+    server = StandInServer(
+        port=args.port, video_size=int(args.video_mib * 1024 * 1024), playlist_size=args.playlist_size,
+        latency=args.latency_ms / 1000,
+        bandwidth=args.bandwidth_mib * 1024 * 1024 if args.bandwidth_mib else None,
+        burst_rate=args.burst_rate, reset_rate=args.reset_rate
+    )
+    print(f"Stand-in server at {server.url}")
+    print(f"  export YTSNAP_API_BASE={server.api_base}")
+    print(f"  ytsnap --playlist {PLAYLIST_ID} --output-dir /tmp/bench")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.close()
+
+
+if __name__ == '__main__':
+    main()
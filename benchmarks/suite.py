@@ -0,0 +1,250 @@
+"""
+Offline benchmark suite against the local YouTube stand-in
+
+Runs the real download paths (no mocks) against ``standin_server`` and
+records one JSON result per scenario:
+
+- single_stream: ``YouTubeDownloader.download`` of one large format
+- single_segmented: the same over 4 byte-range connections, each capped
+  at the server's per-connection bandwidth
+- playlist: ``PlaylistDownloader.download`` of a playlist of small videos
+  with added latency (player, browse continuations and media)
+- playlist_faults: the same with 429 bursts and connections reset midway
+- async_playlist: ``AsyncPlaylistDownloader.download`` (needs aiohttp)
+- proxy_selection: ``ProxyManager`` weighted selection and bookkeeping
+  over a large pool
+
+Every scenario reports a ``rate`` (higher is better). With ``--baseline``,
+rates that dropped by more than ``--tolerance`` are reported and the exit
+status is 1, so regressions are caught before a release.
+
+Usage:
+    python benchmarks/suite.py [--output results.json] [--baseline old.json]
+                               [--only playlist,proxy_selection] [--quick]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import platform
+import tempfile
+import contextlib
+from typing import Callable, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from standin_server import StandInServer, PLAYLIST_ID  # noqa: E402
+
+MIB = 1024 * 1024
+
+
+@contextlib.contextmanager
+def quiet(enabled: bool):
+    """Silence download prints and progress bars."""
+    if not enabled:
+        yield
+        return
+    with open(os.devnull, 'w') as devnull, \
+            contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+        yield
+
+
+def timed(fn: Callable) -> Dict:
+    cpu, wall = time.process_time(), time.perf_counter()
+    value = fn()
+    return {'value': value, 'wall_s': time.perf_counter() - wall, 'cpu_s': time.process_time() - cpu}
+
+
+def single_stream(server: StandInServer, args) -> Dict:
+    from youtube_downloader import YouTubeDownloader
+    server.configure()
+    size = server.format_sizes()[18]
+    with tempfile.TemporaryDirectory() as tmp:
+        run = timed(lambda: YouTubeDownloader("https://www.youtube.com/watch?v=v0000000000")
+                    .download(os.path.join(tmp, 'video.mp4'), itag=18))
+    assert run['value'].size == size
+    return {'bytes': size, 'wall_s': run['wall_s'], 'cpu_s': run['cpu_s'],
+            'rate': size / MIB / run['wall_s'], 'rate_unit': 'MiB/s'}
+
+
+def single_segmented(server: StandInServer, args) -> Dict:
+    from youtube_downloader import YouTubeDownloader
+    server.configure(bandwidth=args.connection_mib * MIB)
+    size = server.format_sizes()[18]
+    with tempfile.TemporaryDirectory() as tmp:
+        run = timed(lambda: YouTubeDownloader("https://www.youtube.com/watch?v=v0000000000")
+                    .download(os.path.join(tmp, 'video.mp4'), itag=18, segments=4))
+    assert run['value'].size == size
+    return {'bytes': size, 'segments': 4, 'connection_mib_s': args.connection_mib,
+            'wall_s': run['wall_s'], 'cpu_s': run['cpu_s'],
+            'rate': size / MIB / run['wall_s'], 'rate_unit': 'MiB/s'}
+
+
+def _playlist(server: StandInServer, args, **faults) -> Dict:
+    from youtube_downloader import PlaylistDownloader
+    server.configure(latency=args.latency_ms / 1000, **faults)
+    with tempfile.TemporaryDirectory() as tmp:
+        downloader = PlaylistDownloader(f"https://www.youtube.com/playlist?list={PLAYLIST_ID}",
+                                        concurrency=args.concurrency)
+        run = timed(lambda: downloader.download(output_dir=tmp))
+    stats = run['value']
+    return {'videos': stats['total'], 'successful': stats['successful'], 'failed': stats['failed'],
+            'concurrency': args.concurrency, 'latency_ms': args.latency_ms,
+            'wall_s': run['wall_s'], 'cpu_s': run['cpu_s'],
+            'rate': stats['successful'] / run['wall_s'], 'rate_unit': 'videos/s'}
+
+
+def playlist(server: StandInServer, args) -> Dict:
+    result = _playlist(server, args)
+    # The prefetched player response must be the one the download uses
+    assert server.stats['player'] == result['videos'], \
+        f"{server.stats['player']} player calls for {result['videos']} videos"
+    return result
+
+
+def playlist_faults(server: StandInServer, args) -> Dict:
+    return _playlist(server, args, burst_rate=0.02, burst_length=3, reset_rate=0.05)
+
+
+def async_playlist(server: StandInServer, args) -> Dict:
+    from youtube_downloader import AsyncPlaylistDownloader
+    server.configure(latency=args.latency_ms / 1000)
+
+    async def run_async(tmp):
+        async with AsyncPlaylistDownloader(f"https://www.youtube.com/playlist?list={PLAYLIST_ID}",
+                                           concurrency=args.concurrency * 4) as downloader:
+            return await downloader.download(output_dir=tmp)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        run = timed(lambda: asyncio.run(run_async(tmp)))
+    stats = run['value']
+    return {'videos': stats['total'], 'successful': stats['successful'], 'failed': stats['failed'],
+            'concurrency': args.concurrency * 4, 'latency_ms': args.latency_ms,
+            'wall_s': run['wall_s'], 'cpu_s': run['cpu_s'],
+            'rate': stats['successful'] / run['wall_s'], 'rate_unit': 'videos/s'}
+
+
+def proxy_selection(server: StandInServer, args) -> Dict:
+    from youtube_downloader import ProxyManager, ProxyConfig
+    rng = random.Random(2)
+    proxies = [ProxyConfig(host=f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}", port=8080)
+               for i in range(args.proxies)]
+    manager = ProxyManager(proxies=proxies, enable_health_check=False, rotation_interval=0)
+    for proxy in proxies:
+        manager.record_timing(proxy, rng.uniform(0.02, 0.5))
+        manager.record_throughput(proxy, MIB, rng.uniform(0.01, 2.0))
+
+    def select():
+        for _ in range(args.selections):
+            proxy = manager.get_proxy()
+            manager.record_success(proxy)
+            manager.record_timing(proxy, rng.uniform(0.02, 0.5))
+        return args.selections
+
+    run = timed(select)
+    return {'proxies': args.proxies, 'selections': args.selections,
+            'wall_s': run['wall_s'], 'cpu_s': run['cpu_s'],
+            'rate': args.selections / run['wall_s'], 'rate_unit': 'selections/s'}
+
+
+SCENARIOS = {
+    'single_stream': single_stream,
+    'single_segmented': single_segmented,
+    'playlist': playlist,
+    'playlist_faults': playlist_faults,
+    'async_playlist': async_playlist,
+    'proxy_selection': proxy_selection,
+}
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """Scenarios whose rate fell more than ``tolerance`` below the baseline."""
+    regressions = []
+    for name, result in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous or 'rate' not in result or 'rate' not in previous:
+            continue
+        if result['rate'] < previous['rate'] * (1 - tolerance):
+            regressions.append(f"{name}: {result['rate']:.1f} {result['rate_unit']} "
+                               f"(baseline {previous['rate']:.1f}, -{1 - result['rate'] / previous['rate']:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--output', help='Write results as JSON to this file')
+    parser.add_argument('--baseline', help='Earlier results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed rate drop (default: 0.15)')
+    parser.add_argument('--only', help='Comma-separated scenarios to run')
+    parser.add_argument('--quick', action='store_true', help='Small sizes, for a smoke test')
+    parser.add_argument('--video-mib', type=int, default=256, help='Single-download size in MiB (default: 256)')
+    parser.add_argument('--connection-mib', type=float, default=64, help='Per-connection cap in segmented (MiB/s)')
+    parser.add_argument('--playlist-size', type=int, default=300)
+    parser.add_argument('--playlist-video-kib', type=int, default=256)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--proxies', type=int, default=5000)
+    parser.add_argument('--selections', type=int, default=2000)
+    parser.add_argument('--verbose', action='store_true', help='Show download output')
+    args = parser.parse_args()
+
+    if args.quick:
+        args.video_mib, args.playlist_size, args.proxies, args.selections = 16, 40, 500, 200
+        args.connection_mib = 16
+
+    names = args.only.split(',') if args.only else list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    server = StandInServer(playlist_size=args.playlist_size)
+    # Read by youtube_downloader when it is first imported, in the scenarios
+    os.environ['YTSNAP_API_BASE'] = server.api_base
+
+    results = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scenarios': {},
+    }
+    try:
+        for name in names:
+            if name == 'async_playlist':
+                try:
+                    import aiohttp  # noqa: F401
+                except ImportError:
+                    print(f"{name:<18} skipped (aiohttp not installed)")
+                    continue
+            server.video_size = args.video_mib * MIB if name.startswith('single') else args.playlist_video_kib * 1024
+            server.reset_stats()
+            with quiet(not args.verbose):
+                result = SCENARIOS[name](server, args)
+            result['server'] = dict(server.stats)
+            results['scenarios'][name] = result
+            print(f"{name:<18} {result['rate']:>10.1f} {result['rate_unit']:<13} "
+                  f"wall {result['wall_s']:.2f}s  cpu {result['cpu_s']:.2f}s")
+    finally:
+        server.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}")
+
+
+if __name__ == '__main__':
+    main()
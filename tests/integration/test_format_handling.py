@@ -88,7 +88,7 @@ class TestFormatHandling:
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.headers = {'content-length': '1000000'}
-        mock_response.iter_content.return_value = [b'data']
+        mock_response.iter_content.return_value = [b'\0' * 1000000]
         mock_get.return_value = mock_response
 
         mock_bar = MagicMock()
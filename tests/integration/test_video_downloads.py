@@ -26,7 +26,7 @@ class TestVideoDownloads:
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.headers = {'content-length': '1000000'}
-        mock_response.iter_content.return_value = [b'data_chunk_1', b'data_chunk_2']
+        mock_response.iter_content.return_value = [b'\0' * 500000, b'\0' * 500000]
         mock_get.return_value = mock_response
 
         mock_bar = MagicMock()
@@ -65,7 +65,7 @@ class TestVideoDownloads:
         mock_response_ok = MagicMock()
         mock_response_ok.status_code = 200
         mock_response_ok.headers = {'content-length': '1000'}
-        mock_response_ok.iter_content.return_value = [b'data']
+        mock_response_ok.iter_content.return_value = [b'\0' * 1000]
 
         mock_get.side_effect = [mock_response_429, mock_response_ok]
 
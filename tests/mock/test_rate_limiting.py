@@ -29,7 +29,7 @@ class TestRateLimiting:
         mock_response_ok = MagicMock()
         mock_response_ok.status_code = 200
         mock_response_ok.headers = {'content-length': '1000'}
-        mock_response_ok.iter_content.return_value = [b'data']
+        mock_response_ok.iter_content.return_value = [b'\0' * 1000]
 
         mock_get.side_effect = [mock_response_429, mock_response_ok]
 
@@ -109,7 +109,7 @@ class TestRateLimiting:
         mock_response_ok = MagicMock()
         mock_response_ok.status_code = 200
         mock_response_ok.headers = {'content-length': '1000'}
-        mock_response_ok.iter_content.return_value = [b'data']
+        mock_response_ok.iter_content.return_value = [b'\0' * 1000]
 
         mock_get.side_effect = [mock_response_429, mock_response_429, mock_response_ok]
 
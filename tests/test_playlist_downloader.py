@@ -1,5 +1,6 @@
 """Tests for PlaylistDownloader functionality"""
 
+import threading
 import unittest
 from unittest.mock import Mock, patch, MagicMock
 from youtube_downloader.downloader import PlaylistDownloader
@@ -72,7 +73,99 @@ class TestPlaylistDownloader(unittest.TestCase):
                             self.assertEqual(stats['failed'], 0)
                             self.assertEqual(len(stats['failed_videos']), 0)
 
+    def test_get_videos_follows_continuations(self):
+        """Test that get_videos keeps requesting pages until no token is left"""
+        def video(video_id):
+            return {'playlistVideoRenderer': {'videoId': video_id, 'title': {'runs': [{'text': video_id}]}}}
+
+        def continuation(token):
+            return {'continuationItemRenderer': {
+                'continuationEndpoint': {'continuationCommand': {'token': token}}
+            }}
+
+        first_page = {'contents': {'twoColumnBrowseResultsRenderer': {'tabs': [{'tabRenderer': {'content': {
+            'sectionListRenderer': {'contents': [{'itemSectionRenderer': {'contents': [
+                video('vid1'), video('vid2'), continuation('token-2')
+            ]}}]}
+        }}}]}}}
+        second_page = {'onResponseReceivedActions': [{'appendContinuationItemsAction': {
+            'continuationItems': [video('vid3'), continuation('token-3')]
+        }}]}
+        third_page = {'onResponseReceivedActions': [{'appendContinuationItemsAction': {
+            'continuationItems': [video('vid4')]
+        }}]}
+
+        downloader = PlaylistDownloader("https://www.youtube.com/playlist?list=PLxxx")
+        pages = {'token-2': second_page, 'token-3': third_page}
+
+        with patch.object(downloader, '_get_playlist_info', return_value=first_page):
+            with patch.object(downloader, '_get_playlist_continuation', side_effect=lambda token: pages[token]) as mock_continuation:
+                lazy = downloader.get_videos(lazy=True)
+                self.assertEqual(next(lazy)['video_id'], 'vid1')
+                # Later pages are only fetched once the first is consumed
+                mock_continuation.assert_not_called()
+
+                ids = ['vid1'] + [v['video_id'] for v in lazy]
+                self.assertEqual(ids, ['vid1', 'vid2', 'vid3', 'vid4'])
+                self.assertEqual(mock_continuation.call_count, 2)
+
+    def test_download_starts_before_enumeration_finishes(self):
+        """Test that downloads are submitted while later pages are still pending"""
+        downloader = PlaylistDownloader("https://www.youtube.com/playlist?list=PLxxx", concurrency=1)
+        events = []
+
+        def videos():
+            for i in range(10):
+                events.append(f'page{i}')
+                yield {'video_id': f'vid{i}', 'title': f'Video {i}', 'url': f'https://www.youtube.com/watch?v=vid{i}'}
+
+        def fake_download(video, *args):
+            events.append(f"download:{video['video_id']}")
+            return True
+
+        with patch.object(downloader, 'get_videos', return_value=videos()), \
+                patch.object(downloader, '_prefetch_metadata'):
+            with patch.object(downloader, '_download_single_video', side_effect=fake_download):
+                with patch('youtube_downloader.downloader.os.makedirs'):
+                    stats = downloader.download(output_dir="./test")
+
+        self.assertEqual(stats['total'], 10)
+        self.assertEqual(stats['successful'], 10)
+        self.assertLess(events.index('download:vid0'), events.index('page9'))
+
+    def test_prefetch_runs_ahead_of_media_workers(self):
+        """Test that metadata for upcoming videos is fetched before their downloads start"""
+        downloader = PlaylistDownloader("https://www.youtube.com/playlist?list=PLxxx", concurrency=1, prefetch=3)
+        videos = [
+            {'video_id': f'vid{i}', 'title': f'Video {i}', 'url': f'https://www.youtube.com/watch?v=vid{i}'}
+            for i in range(5)
+        ]
+        events = []
+        vid3_prefetched = threading.Event()
+        waited = []
+
+        def fake_prefetch(video, output_dir):
+            events.append(f"prefetch:{video['video_id']}")
+            if video['video_id'] == 'vid3':
+                vid3_prefetched.set()
+
+        def fake_download(video, *args):
+            if video['video_id'] == 'vid0':
+                # Metadata three videos ahead arrives while the first download is still running
+                waited.append(vid3_prefetched.wait(timeout=5))
+            events.append(f"download:{video['video_id']}")
+            return True
+
+        with patch.object(downloader, 'get_videos', return_value=iter(videos)), \
+                patch.object(downloader, '_prefetch_metadata', side_effect=fake_prefetch), \
+                patch.object(downloader, '_download_single_video', side_effect=fake_download), \
+                patch('youtube_downloader.downloader.os.makedirs'):
+            stats = downloader.download(output_dir="./test")
+
+        self.assertEqual(stats['successful'], 5)
+        self.assertEqual(waited, [True])
+        for i in range(5):
+            self.assertLess(events.index(f'prefetch:vid{i}'), events.index(f'download:vid{i}'))
 
 if __name__ == '__main__':
     unittest.main()
-
@@ -0,0 +1,47 @@
+"""Shared fixtures for the unit tests: playlist videos, formats and mocked media responses"""
+
+import pytest
+from unittest.mock import MagicMock
+
+
+@pytest.fixture
+def make_video():
+    """Build the video dict PlaylistDownloader works with."""
+    def make(video_id, title='Video'):
+        return {'video_id': video_id, 'title': title, 'url': f'https://www.youtube.com/watch?v={video_id}'}
+    return make
+
+
+@pytest.fixture
+def make_formats():
+    """Build a ``get_formats`` result holding one muxed format of ``filesize`` bytes."""
+    def make(filesize, itag=22, quality='720p'):
+        return [{
+            'itag': itag,
+            'quality': quality,
+            'has_video': True,
+            'has_audio': True,
+            'url': 'http://example.com/video.mp4',
+            'filesize': str(filesize)
+        }]
+    return make
+
+
+@pytest.fixture
+def make_response():
+    """
+    Build a mocked streaming media response.
+
+    ``body`` is served in ``chunk_size`` pieces unless ``chunks`` gives them
+    (e.g. a generator that sleeps between chunks); ``headers`` defaults to
+    the content length of ``body``.
+    """
+    def make(body, status_code=200, headers=None, chunks=None, chunk_size=1000):
+        response = MagicMock()
+        response.status_code = status_code
+        response.headers = headers if headers is not None else {'content-length': str(len(body))}
+        if chunks is None:
+            chunks = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+        response.iter_content.return_value = chunks
+        return response
+    return make
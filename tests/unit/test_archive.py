@@ -0,0 +1,85 @@
+"""Unit tests for the download archive"""
+
+import os
+from unittest.mock import patch
+
+from youtube_downloader.archive import DownloadArchive
+from youtube_downloader.integrity import DownloadResult
+from youtube_downloader.downloader import PlaylistDownloader, YouTubeDownloader, playlist_output_path
+
+
+class TestDownloadArchive:
+    """Storing and looking up finished downloads"""
+
+    def test_add_and_get(self, tmp_path):
+        with DownloadArchive(str(tmp_path / 'archive.db')) as archive:
+            archive.add('dQw4w9WgXcQ', '/videos/a.mp4', itag=22, size=1234, checksum='sha256:abc')
+
+            assert 'dQw4w9WgXcQ' in archive
+            assert 'missing0000' not in archive
+            entry = archive.get('dQw4w9WgXcQ')
+            assert (entry.itag, entry.size, entry.path, entry.checksum) == ('22', 1234, '/videos/a.mp4', 'sha256:abc')
+            assert archive.get('missing0000') is None
+
+    def test_persists_across_runs(self, tmp_path):
+        path = str(tmp_path / 'archive.db')
+        with DownloadArchive(path) as archive:
+            archive.add('aaaaaaaaaaa', '/videos/a.mp4')
+            archive.add('bbbbbbbbbbb', '/videos/b.mp4')
+            archive.remove('bbbbbbbbbbb')
+
+        with DownloadArchive(path) as archive:
+            assert len(archive) == 1
+            assert 'aaaaaaaaaaa' in archive
+            assert 'bbbbbbbbbbb' not in archive
+
+
+class TestPlaylistArchive:
+    """Playlist downloads consult and fill the archive"""
+
+    def test_archived_video_skipped_without_network(self, tmp_path, make_video):
+        archive = DownloadArchive(str(tmp_path / 'archive.db'))
+        archive.add('aaaaaaaaaaa', '/library/old_title.mp4')
+        playlist = PlaylistDownloader("PLxxx", archive=archive)
+        completed = []
+
+        with patch.object(YouTubeDownloader, 'get_formats') as mock_formats, \
+                patch('youtube_downloader.downloader.os.path.exists') as mock_exists:
+            result = playlist._download_single_video(
+                make_video('aaaaaaaaaaa', 'New Title'), str(tmp_path), None, None, None,
+                lambda video, path: completed.append(path)
+            )
+            playlist._prefetch_metadata(make_video('aaaaaaaaaaa', 'New Title'), str(tmp_path))
+
+        assert result is True
+        assert completed == ['/library/old_title.mp4']
+        mock_formats.assert_not_called()
+        mock_exists.assert_not_called()
+
+    def test_existing_file_is_archived(self, tmp_path, make_video):
+        archive = DownloadArchive(str(tmp_path / 'archive.db'))
+        playlist = PlaylistDownloader("PLxxx", archive=archive)
+        video = make_video('aaaaaaaaaaa')
+        output_file = playlist_output_path(str(tmp_path), video)
+        with open(output_file, 'wb') as f:
+            f.write(b'x' * 10)
+
+        assert playlist._existing_download(video, str(tmp_path)) == output_file
+        assert archive.get('aaaaaaaaaaa').size == 10
+
+    def test_download_is_recorded(self, tmp_path, make_video):
+        archive = DownloadArchive(str(tmp_path / 'archive.db'))
+        playlist = PlaylistDownloader("PLxxx", archive=archive)
+
+        def fake_download(self, output_file, **kwargs):
+            self.selected_formats = [{'itag': 137}, {'itag': 140}]
+            with open(output_file, 'wb') as f:
+                f.write(b'x' * 42)
+            return DownloadResult(output_file, itag='137+140', size=42, checksum='sha256:abc')
+
+        with patch.object(YouTubeDownloader, 'download', fake_download):
+            playlist._download_single_video(make_video('aaaaaaaaaaa'), str(tmp_path), None, None, None, None)
+
+        entry = archive.get('aaaaaaaaaaa')
+        assert (entry.itag, entry.size, entry.checksum) == ('137+140', 42, 'sha256:abc')
+        assert os.path.basename(entry.path) == 'Video_aaaaaaaaaaa.mp4'
@@ -0,0 +1,292 @@
+"""Unit tests for the asyncio download engine"""
+
+import asyncio
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+
+aiohttp = pytest.importorskip("aiohttp")
+from aiohttp import web
+
+from youtube_downloader.async_downloader import AsyncYouTubeDownloader, AsyncPlaylistDownloader
+from youtube_downloader.proxy_manager import ProxyConfig
+from youtube_downloader.resume import PartFile
+from youtube_downloader.integrity import StreamDigest
+from youtube_downloader.cache import PlayerResponseCache
+
+PAYLOAD = bytes(range(256)) * 64
+
+
+async def _start_server(player_statuses=None):
+    """Serve a player endpoint and a range-capable media endpoint on localhost."""
+    statuses = list(player_statuses or [])
+    calls = {'player': 0, 'media': 0}
+
+    async def player(request):
+        calls['player'] += 1
+        if statuses:
+            status = statuses.pop(0)
+            if status != 200:
+                return web.Response(status=status)
+        body = await request.json()
+        base = f"http://127.0.0.1:{request.url.port}"
+        return web.json_response({
+            'playabilityStatus': {'status': 'OK'},
+            'streamingData': {
+                'formats': [{
+                    'itag': 18,
+                    'qualityLabel': '360p',
+                    'mimeType': 'video/mp4; codecs="avc1.42001E, mp4a.40.2"',
+                    'url': f"{base}/media/{body['videoId']}?expire={int(time.time()) + 3600}",
+                    'contentLength': str(len(PAYLOAD))
+                }],
+                'adaptiveFormats': []
+            }
+        })
+
+    async def media(request):
+        calls['media'] += 1
+        start = int(request.headers.get('Range', 'bytes=0-').split('=')[1].split('-')[0])
+        if start >= len(PAYLOAD):
+            return web.Response(status=416, headers={'Content-Range': f'bytes */{len(PAYLOAD)}'})
+        return web.Response(status=206 if start else 200, body=PAYLOAD[start:])
+
+    async def gone(request):
+        # A stream URL signed for another client IP
+        return web.Response(status=403)
+
+    app = web.Application()
+    app.router.add_post('/player', player)
+    app.router.add_get('/media/{video_id}', media)
+    app.router.add_get('/gone/{video_id}', gone)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", calls
+
+
+class TestAsyncYouTubeDownloader:
+    """Test cases for AsyncYouTubeDownloader"""
+
+    def test_download_writes_file(self, tmp_path):
+        """Test a full player call and media download on the event loop"""
+        async def scenario():
+            runner, base, calls = await _start_server()
+            try:
+                with patch('youtube_downloader.async_downloader.PLAYER_API_URL', f"{base}/player"):
+                    async with AsyncYouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ") as downloader:
+                        await downloader.download(str(tmp_path / 'video.mp4'))
+                        # The second call is served from the player cache
+                        await downloader.get_formats()
+            finally:
+                await runner.cleanup()
+            return calls
+
+        calls = asyncio.run(scenario())
+        assert (tmp_path / 'video.mp4').read_bytes() == PAYLOAD
+        assert calls['player'] == 1
+
+    def test_resume_hashes_the_prefix_off_the_loop(self, tmp_path):
+        """Test that a .part file is continued and the checksum covers the whole file"""
+        output = str(tmp_path / 'video.mp4')
+        half = len(PAYLOAD) // 2
+        part = PartFile(output, 18, len(PAYLOAD))
+        with open(part.path, 'wb') as f:
+            f.write(PAYLOAD[:half])
+        part.save(committed=half)
+
+        async def scenario():
+            runner, base, calls = await _start_server()
+            try:
+                with patch('youtube_downloader.async_downloader.PLAYER_API_URL', f"{base}/player"):
+                    async with AsyncYouTubeDownloader("dQw4w9WgXcQ") as downloader:
+                        return await downloader.download(output)
+            finally:
+                await runner.cleanup()
+
+        result = asyncio.run(scenario())
+        expected = StreamDigest('sha256')
+        expected.update(PAYLOAD)
+        assert (tmp_path / 'video.mp4').read_bytes() == PAYLOAD
+        assert result.checksum == expected.checksum
+
+    @pytest.mark.parametrize('content_length, requests', [(len(PAYLOAD), 0), (0, 1)])
+    def test_complete_part_file_is_finalized(self, tmp_path, content_length, requests):
+        """Test that a .part file holding every byte is finalized, at most after a 416"""
+        output = str(tmp_path / 'video.mp4')
+        part = PartFile(output, 18, content_length)
+        with open(part.path, 'wb') as f:
+            f.write(PAYLOAD)
+        part.save(committed=len(PAYLOAD))
+
+        async def scenario():
+            runner, base, calls = await _start_server()
+            try:
+                with patch('youtube_downloader.async_downloader.PLAYER_API_URL', f"{base}/player"):
+                    async with AsyncYouTubeDownloader("dQw4w9WgXcQ") as downloader:
+                        # A format of unknown length resumes with a request past the end
+                        with patch('youtube_downloader.async_downloader.PartFile',
+                                   lambda path, itag, length: PartFile(path, itag, content_length)):
+                            return await downloader.download(output), calls
+            finally:
+                await runner.cleanup()
+
+        result, calls = asyncio.run(scenario())
+        assert calls['media'] == requests
+        assert (tmp_path / 'video.mp4').read_bytes() == PAYLOAD
+        assert result.size == len(PAYLOAD)
+
+    def test_rejected_url_refreshes_the_cached_response(self, tmp_path):
+        """Test that a 403 on a cached URL drops the entry and fetches the player again"""
+        async def scenario():
+            runner, base, calls = await _start_server()
+            cache = PlayerResponseCache()
+            cache.put('dQw4w9WgXcQ', 'ANDROID', {
+                'playabilityStatus': {'status': 'OK'},
+                'streamingData': {'formats': [{
+                    'itag': 18,
+                    'qualityLabel': '360p',
+                    'mimeType': 'video/mp4; codecs="avc1.42001E, mp4a.40.2"',
+                    'url': f"{base}/gone/dQw4w9WgXcQ?expire={int(time.time()) + 3600}",
+                    'contentLength': str(len(PAYLOAD))
+                }], 'adaptiveFormats': []}
+            })
+            try:
+                with patch('youtube_downloader.async_downloader.PLAYER_API_URL', f"{base}/player"):
+                    async with AsyncYouTubeDownloader("dQw4w9WgXcQ", cache=cache) as downloader:
+                        await downloader.download(str(tmp_path / 'video.mp4'))
+            finally:
+                await runner.cleanup()
+            return calls
+
+        calls = asyncio.run(scenario())
+        assert calls == {'player': 1, 'media': 1}
+        assert (tmp_path / 'video.mp4').read_bytes() == PAYLOAD
+
+    def test_rate_limit_rotates_proxy(self):
+        """Test that a 429 records a failure and retries with the next proxy"""
+        async def scenario(proxy_manager):
+            runner, base, calls = await _start_server(player_statuses=[429])
+            try:
+                with patch('youtube_downloader.async_downloader.PLAYER_API_URL', f"{base}/player"), \
+                        patch('youtube_downloader.async_downloader._proxy_url', return_value=None):
+                    async with AsyncYouTubeDownloader("dQw4w9WgXcQ", proxy_manager=proxy_manager) as downloader:
+                        return await downloader.get_formats()
+            finally:
+                await runner.cleanup()
+
+        proxy_manager = MagicMock()
+        proxies = [ProxyConfig(host='10.0.0.1', port=8080), ProxyConfig(host='10.0.0.2', port=8080)]
+        proxy_manager.get_proxy.side_effect = [proxies[0], proxies[1], proxies[1]]
+
+        formats = asyncio.run(scenario(proxy_manager))
+
+        assert formats[0]['itag'] == 18
+        proxy_manager.record_failure.assert_called_once()
+        assert proxy_manager.record_failure.call_args.args[0] is proxies[0]
+        proxy_manager.record_success.assert_called_once_with(proxies[1])
+
+    def test_socks_proxy_rejected(self):
+        """Test that SOCKS proxies fail loudly instead of bypassing the proxy"""
+        from youtube_downloader.async_downloader import _proxy_url
+        with pytest.raises(ValueError, match="SOCKS"):
+            _proxy_url(ProxyConfig(host='127.0.0.1', port=1080, scheme='socks5'))
+
+
+class TestAsyncPlaylistDownloader:
+    """Test cases for AsyncPlaylistDownloader"""
+
+    def test_browse_rate_limit_rotates_proxy(self):
+        """Test that a 429 while listing retries with the next proxy instead of giving up"""
+        statuses = [429]
+        clients = []
+
+        async def browse(request):
+            clients.append((await request.json())['context']['client']['clientName'])
+            if statuses:
+                return web.Response(status=statuses.pop(0))
+            return web.json_response({'page': 1})
+
+        async def scenario(proxy_manager):
+            app = web.Application()
+            app.router.add_post('/browse', browse)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            site = web.TCPSite(runner, '127.0.0.1', 0)
+            await site.start()
+            port = site._server.sockets[0].getsockname()[1]
+            try:
+                with patch('youtube_downloader.async_downloader.BROWSE_API_URL', f"http://127.0.0.1:{port}/browse"), \
+                        patch('youtube_downloader.async_downloader._proxy_url', return_value=None):
+                    async with AsyncPlaylistDownloader("PLxxx", proxy_manager=proxy_manager) as playlist:
+                        return await playlist._get_playlist_info()
+            finally:
+                await runner.cleanup()
+
+        proxy_manager = MagicMock()
+        proxies = [ProxyConfig(host='10.0.0.1', port=8080), ProxyConfig(host='10.0.0.2', port=8080)]
+        proxy_manager.get_proxy.side_effect = proxies
+
+        assert asyncio.run(scenario(proxy_manager)) == {'page': 1}
+        assert clients == ['ANDROID', 'ANDROID']
+        assert proxy_manager.record_failure.call_args.args[0] is proxies[0]
+        proxy_manager.record_success.assert_called_once_with(proxies[1])
+
+    def test_download_statistics(self, tmp_path):
+        """Test that playlist downloads run concurrently and report statistics"""
+        videos = [
+            {'video_id': f'video{i:06d}', 'title': f'Video {i}', 'url': f'https://www.youtube.com/watch?v=video{i:06d}'}
+            for i in range(5)
+        ]
+
+        async def listing():
+            for video in videos:
+                yield video
+
+        async def scenario():
+            runner, base, calls = await _start_server()
+            try:
+                with patch('youtube_downloader.async_downloader.PLAYER_API_URL', f"{base}/player"):
+                    async with AsyncPlaylistDownloader("PLxxx", concurrency=3) as playlist:
+                        with patch.object(playlist, 'iter_videos', listing):
+                            return await playlist.download(output_dir=str(tmp_path))
+            finally:
+                await runner.cleanup()
+
+        stats = asyncio.run(scenario())
+        assert stats['total'] == 5
+        assert stats['successful'] == 5
+        assert len(list(tmp_path.glob('*.mp4'))) == 5
+
+    def test_downloads_start_before_the_playlist_is_listed(self, tmp_path):
+        """Test that later pages are fetched while the first videos download"""
+        videos = [
+            {'video_id': f'video{i:06d}', 'title': f'Video {i}', 'url': f'https://www.youtube.com/watch?v=video{i:06d}'}
+            for i in range(3)
+        ]
+
+        async def scenario():
+            first_done = asyncio.Event()
+
+            async def listing():
+                yield videos[0]
+                # The next page is only requested once the first video is through
+                await asyncio.wait_for(first_done.wait(), 5)
+                for video in videos[1:]:
+                    yield video
+
+            runner, base, calls = await _start_server()
+            try:
+                with patch('youtube_downloader.async_downloader.PLAYER_API_URL', f"{base}/player"):
+                    async with AsyncPlaylistDownloader("PLxxx", concurrency=2) as playlist:
+                        with patch.object(playlist, 'iter_videos', listing):
+                            return await playlist.download(output_dir=str(tmp_path),
+                                                           on_video_complete=lambda *args: first_done.set())
+            finally:
+                await runner.cleanup()
+
+        stats = asyncio.run(scenario())
+        assert stats['total'] == 3
+        assert stats['successful'] == 3
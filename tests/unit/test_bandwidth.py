@@ -0,0 +1,113 @@
+"""Unit tests for the global bandwidth scheduler"""
+
+import time
+import asyncio
+import threading
+import pytest
+from unittest.mock import patch
+from youtube_downloader.bandwidth import BandwidthScheduler, parse_rate
+from youtube_downloader.downloader import YouTubeDownloader
+
+
+def _saturate(shares, duration, chunk=16384):
+    """Push chunks through every share from its own thread for ``duration`` seconds."""
+    def run(share):
+        end = time.monotonic() + duration
+        while time.monotonic() < end:
+            share.consume(chunk)
+
+    threads = [threading.Thread(target=run, args=(share,)) for share in shares]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+class TestBandwidthScheduler:
+    """Test cases for BandwidthScheduler"""
+
+    def test_unlimited_only_counts(self):
+        """Test that without a rate nothing waits"""
+        scheduler = BandwidthScheduler()
+        share = scheduler.register()
+
+        assert share.consume(10 * 1024 * 1024) < 0.05
+        assert scheduler.total_bytes == 10 * 1024 * 1024
+
+    def test_global_rate_is_enforced(self):
+        """Test that the aggregate rate stays near the cap"""
+        scheduler = BandwidthScheduler(rate=1024 * 1024, burst=16384)
+        shares = [scheduler.register() for _ in range(3)]
+
+        start = time.monotonic()
+        _saturate(shares, 0.5)
+        elapsed = time.monotonic() - start
+
+        assert scheduler.total_bytes / elapsed < 1.3 * 1024 * 1024
+
+    def test_priority_weights_the_share(self):
+        """Test that a priority 2 download gets about twice the bytes"""
+        scheduler = BandwidthScheduler(rate=2 * 1024 * 1024, burst=16384)
+        low, high = scheduler.register(1), scheduler.register(2)
+
+        _saturate([low, high], 0.6)
+
+        assert high.bytes / low.bytes == pytest.approx(2, rel=0.25)
+
+    def test_reservations_keep_the_cap_and_the_weights(self):
+        """Test that coroutines sleeping off their reservations share the rate by priority"""
+        scheduler = BandwidthScheduler(rate=2 * 1024 * 1024, burst=16384)
+        low, high = scheduler.register(1), scheduler.register(2)
+
+        async def run(share, duration=0.6):
+            end = time.monotonic() + duration
+            while time.monotonic() < end:
+                await asyncio.sleep(share.reserve(16384))
+
+        async def saturate():
+            await asyncio.gather(run(low), run(high))
+
+        start = time.monotonic()
+        asyncio.run(saturate())
+        elapsed = time.monotonic() - start
+
+        assert scheduler.total_bytes / elapsed < 1.3 * 2 * 1024 * 1024
+        assert high.bytes / low.bytes == pytest.approx(2, rel=0.25)
+
+    def test_set_rate_at_runtime(self):
+        """Test that raising the rate takes effect for blocked downloads"""
+        scheduler = BandwidthScheduler(rate=1024, burst=1024)
+        share = scheduler.register()
+        share.consume(1024)
+        share.consume(1024 * 1024)  # deep in debt at 1 KiB/s
+
+        timer = threading.Timer(0.05, scheduler.set_rate, args=(None,))
+        timer.start()
+        waited = share.consume(1024)
+
+        assert waited < 1.0
+
+    def test_parse_rate(self):
+        """Test parsing of --max-rate values"""
+        assert parse_rate('200M') == 200 * 1024 * 1024
+        assert parse_rate('512k') == 512 * 1024
+        assert parse_rate('1.5GiB/s') == 1.5 * 1024 ** 3
+        assert parse_rate('1000') == 1000
+        with pytest.raises(ValueError):
+            parse_rate('fast')
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_download_chunks_pass_through_scheduler(self, mock_get, mock_tqdm, mock_get_formats, tmp_path,
+                                                    make_formats, make_response):
+        """Test that every chunk read is accounted and the share is released"""
+        mock_get_formats.return_value = make_formats(3000, itag=18, quality='360p')
+        mock_get.return_value = make_response(b'\0' * 3000)
+        scheduler = BandwidthScheduler()
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ", bandwidth=scheduler)
+        downloader.download(output_file=str(tmp_path / 'video.mp4'))
+
+        assert scheduler.total_bytes == 3000
+        assert scheduler.active == 0
@@ -0,0 +1,87 @@
+"""Unit tests for batch downloads"""
+
+import io
+from unittest.mock import patch
+
+import pytest
+
+from youtube_downloader.batch import BatchDownloader, parse_batch_line, read_batch
+from youtube_downloader.downloader import PlaylistDownloader
+from youtube_downloader.transport import HttpTransport
+
+
+class TestParseBatchLine:
+    """Normalizing batch lines to video and playlist IDs"""
+
+    @pytest.mark.parametrize('line, expected', [
+        ('https://www.youtube.com/watch?v=dQw4w9WgXcQ', ('video', 'dQw4w9WgXcQ')),
+        ('https://youtu.be/dQw4w9WgXcQ\n', ('video', 'dQw4w9WgXcQ')),
+        ('  dQw4w9WgXcQ  ', ('video', 'dQw4w9WgXcQ')),
+        ('https://www.youtube.com/playlist?list=PLabc123', ('playlist', 'PLabc123')),
+        ('https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PLabc123', ('playlist', 'PLabc123')),
+        ('PLabc123', ('playlist', 'PLabc123')),
+        ('', None),
+        ('# comment', None),
+    ])
+    def test_lines(self, line, expected):
+        assert parse_batch_line(line) == expected
+
+    def test_invalid_line(self):
+        with pytest.raises(ValueError):
+            parse_batch_line('https://example.com/nothing')
+
+    def test_read_batch_dedups_and_skips_invalid(self):
+        lines = io.StringIO(
+            "dQw4w9WgXcQ\n"
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ\n"
+            "https://example.com/nothing\n"
+            "PLabc123\n"
+            "https://www.youtube.com/playlist?list=PLabc123\n"
+        )
+        assert list(read_batch(lines)) == [('video', 'dQw4w9WgXcQ'), ('playlist', 'PLabc123')]
+
+
+class TestBatchDownloader:
+    """Running a batch through the playlist scheduler"""
+
+    def test_videos_and_playlists_are_merged_without_duplicates(self, make_video):
+        batch = BatchDownloader(["aaaaaaaaaaa\n", "PLone\n", "bbbbbbbbbbb\n"])
+        playlist = [make_video(video_id, video_id) for video_id in ('ccccccccccc', 'aaaaaaaaaaa', 'bbbbbbbbbbb')]
+
+        with patch.object(PlaylistDownloader, 'iter_videos', return_value=iter(playlist)):
+            ids = [video['video_id'] for video in batch.iter_videos()]
+
+        assert ids == ['aaaaaaaaaaa', 'ccccccccccc', 'bbbbbbbbbbb']
+
+    def test_unavailable_playlist_is_skipped(self):
+        batch = BatchDownloader(["PLgone\n", "aaaaaaaaaaa\n"])
+
+        with patch.object(PlaylistDownloader, 'iter_videos', side_effect=Exception("private")):
+            ids = [video['video_id'] for video in batch.iter_videos()]
+
+        assert ids == ['aaaaaaaaaaa']
+
+    def test_playlists_share_transport_and_proxies(self):
+        transport = HttpTransport()
+        batch = BatchDownloader([], transport=transport, concurrency=4)
+
+        playlist = batch._playlist('PLone')
+
+        assert playlist.transport is transport
+        assert playlist.cache is batch.cache
+        assert playlist.playlist_id == 'PLone'
+
+    def test_download_runs_every_video(self, tmp_path):
+        batch = BatchDownloader(io.StringIO("aaaaaaaaaaa\nbbbbbbbbbbb\naaaaaaaaaaa\n"), concurrency=2)
+        downloaded = []
+
+        def fake_download(video, *args):
+            downloaded.append(video['video_id'])
+            return True
+
+        with patch.object(batch, '_download_single_video', side_effect=fake_download):
+            stats = batch.download(output_dir=str(tmp_path))
+
+        assert sorted(downloaded) == ['aaaaaaaaaaa', 'bbbbbbbbbbb']
+        assert stats['total'] == 2
+        assert stats['successful'] == 2
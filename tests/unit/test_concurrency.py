@@ -0,0 +1,119 @@
+"""Unit tests for the adaptive (AIMD) concurrency controller"""
+
+import time
+import threading
+import pytest
+from unittest.mock import patch, MagicMock
+from youtube_downloader.concurrency import AIMDController
+from youtube_downloader.downloader import PlaylistDownloader
+
+
+class FakeClock:
+    """Stand-in for the time module with a manually advanced monotonic clock."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    fake = FakeClock()
+    with patch('youtube_downloader.concurrency.time', fake):
+        yield fake
+
+
+def _window(controller, clock, nbytes, rate_limited=0, failed=0, succeeded=0):
+    """Feed one window of samples and return the resulting limit."""
+    controller.record_bytes(nbytes)
+    for _ in range(rate_limited):
+        controller.record_rate_limit()
+    for _ in range(failed):
+        controller.record_result(False)
+    for _ in range(succeeded):
+        controller.record_result(True)
+    clock.now += controller.window
+    return controller.limit
+
+
+class TestAIMDController:
+    """Test cases for AIMDController"""
+
+    def test_slow_start_doubles_while_throughput_improves(self, clock):
+        """Test that the limit doubles per improving window up to the maximum"""
+        controller = AIMDController(max_limit=10, initial=1, window=1)
+
+        limits = [_window(controller, clock, n) for n in (100, 200, 400, 800, 1600)]
+
+        assert limits == [2, 4, 8, 10, 10]
+
+    def test_plateau_stops_growth(self, clock):
+        """Test that the limit holds once throughput stops improving"""
+        controller = AIMDController(max_limit=32, initial=2, window=1)
+        _window(controller, clock, 1000)
+
+        assert _window(controller, clock, 1010) == 4
+        # Growth is additive after the plateau
+        assert _window(controller, clock, 2000) == 5
+
+    def test_rate_limits_halve_the_limit(self, clock):
+        """Test multiplicative decrease on 429s, bounded by min_limit"""
+        controller = AIMDController(max_limit=16, initial=8, window=1)
+
+        assert _window(controller, clock, 1000, rate_limited=1) == 4
+        assert _window(controller, clock, 1000, rate_limited=3) == 2
+        assert _window(controller, clock, 1000, rate_limited=1) == 1
+        assert _window(controller, clock, 1000, rate_limited=1) == 1
+        assert controller.rate_limit_hits == 6
+
+    def test_errors_above_threshold_decrease(self, clock):
+        """Test that a high failure ratio counts as congestion"""
+        controller = AIMDController(max_limit=16, initial=8, window=1, error_threshold=0.2)
+
+        assert _window(controller, clock, 1000, failed=1, succeeded=9) == 16
+        assert _window(controller, clock, 5000, failed=3, succeeded=7) == 8
+
+    def test_recovers_after_decrease(self, clock):
+        """Test that probing resumes additively after a decrease"""
+        controller = AIMDController(max_limit=16, initial=8, window=1)
+        _window(controller, clock, 1000, rate_limited=1)
+
+        assert _window(controller, clock, 500) == 5
+
+    def test_invalid_bounds_rejected(self):
+        """Test that min_limit above max_limit raises ValueError"""
+        with pytest.raises(ValueError):
+            AIMDController(max_limit=2, min_limit=3)
+
+
+class TestAdaptivePlaylistDownload:
+    """Test cases for PlaylistDownloader in adaptive mode"""
+
+    def test_in_flight_downloads_follow_the_limit(self, tmp_path):
+        """Test that the dispatch loop never exceeds the controller's limit"""
+        downloader = PlaylistDownloader("https://www.youtube.com/playlist?list=PLtest", concurrency=8,
+                                        prefetch=0, adaptive=True)
+        downloader.controller = MagicMock(window=0.01, limit=2, rate_limit_hits=0)
+        lock = threading.Lock()
+        active = {'now': 0, 'peak': 0}
+
+        def fake_download(video, *args):
+            with lock:
+                active['now'] += 1
+                active['peak'] = max(active['peak'], active['now'])
+            time.sleep(0.02)
+            with lock:
+                active['now'] -= 1
+            return True
+
+        videos = [{'video_id': f'vid{i}', 'title': f'Video {i}', 'url': f'https://youtu.be/vid{i}'} for i in range(8)]
+        with patch.object(PlaylistDownloader, 'get_videos', return_value=iter(videos)), \
+                patch.object(PlaylistDownloader, '_download_single_video', side_effect=fake_download), \
+                patch('youtube_downloader.downloader.tqdm'):
+            stats = downloader.download(output_dir=str(tmp_path))
+
+        assert stats['successful'] == 8
+        assert active['peak'] <= 2
+        assert downloader.controller.record_result.call_count == 8
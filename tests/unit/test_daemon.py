@@ -0,0 +1,293 @@
+"""Unit tests for daemon mode and its job API"""
+
+import os
+import json
+import socket
+import threading
+import time
+import http.client
+import pytest
+from unittest.mock import patch, MagicMock
+from youtube_downloader.downloader import YouTubeDownloader, PlaylistDownloader
+from youtube_downloader.integrity import DownloadResult
+from youtube_downloader.daemon import DownloadDaemon, DaemonClient, DaemonError, parse_job, is_loopback
+
+VIDEO_URL = "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+PLAYLIST_URL = "https://www.youtube.com/playlist?list=PLxxx"
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    with DownloadDaemon(output_dir=str(tmp_path), workers=2) as daemon:
+        yield daemon
+
+
+@pytest.fixture
+def client(daemon):
+    return DaemonClient(f"http://127.0.0.1:{daemon.listen(port=0)}")
+
+
+def fake_download(self, output_file, **kwargs):
+    self.progress.advance(self.video_id, 10)
+    return DownloadResult(output_file, itag=22, size=10, expected_size=10, checksum='sha256:abc')
+
+
+class TestParseJob:
+    """Validating submitted jobs"""
+
+    def test_kinds(self):
+        assert parse_job({'url': VIDEO_URL})[0] == 'video'
+        assert parse_job({'url': PLAYLIST_URL})[0] == 'playlist'
+        assert parse_job({'url': 'PLxxx', 'playlist': True}) == ('playlist', 'PLxxx', {})
+
+    @pytest.mark.parametrize('options', [
+        {},
+        {'url': 'not a video'},
+        {'url': VIDEO_URL, 'colour': 'blue'},
+        {'url': VIDEO_URL, 'itag': True},
+        {'url': VIDEO_URL, 'segments': 0},
+        {'url': VIDEO_URL, 'format': 'best['},
+        {'url': VIDEO_URL, 'checksum': 'crc-nonsense'},
+    ])
+    def test_invalid(self, options):
+        with pytest.raises(ValueError):
+            parse_job(options)
+
+
+class TestJobs:
+    """Running jobs on the daemon's shared resources"""
+
+    def test_video_job(self, daemon, client, tmp_path):
+        used = []
+
+        def download(self, output_file, **kwargs):
+            used.append((self.transport, self.cache))
+            return fake_download(self, output_file, **kwargs)
+
+        with patch.object(YouTubeDownloader, 'download', download):
+            job = client.submit(VIDEO_URL, quality='720p')
+            finished = client.wait(job['id'])
+
+        assert finished['status'] == 'done'
+        assert finished['result']['path'] == os.path.join(str(tmp_path), 'dQw4w9WgXcQ.mp4')
+        assert finished['result']['checksum'] == 'sha256:abc'
+        assert finished['progress']['bytes'] == 10
+        # Warm resources are shared, not created per job
+        assert used == [(daemon.transport, daemon.cache)]
+
+    def test_playlist_job(self, daemon, client):
+        calls = []
+
+        def download(self, output_dir, **kwargs):
+            calls.append((self.concurrency, self.transport, kwargs['segments']))
+            return {'total': 2, 'successful': 1, 'failed': 1, 'failed_videos': [{'video_id': 'bbbbbbbbbbb'}]}
+
+        with patch.object(PlaylistDownloader, 'download', download):
+            job = client.submit(PLAYLIST_URL, concurrency=5)
+            finished = client.wait(job['id'])
+
+        assert finished['kind'] == 'playlist'
+        assert finished['result'] == {'total': 2, 'successful': 1, 'failed': 1, 'failed_videos': ['bbbbbbbbbbb']}
+        assert calls == [(5, daemon.transport, 1)]
+
+    def test_failed_job(self, client):
+        with patch.object(YouTubeDownloader, 'download', side_effect=Exception("No downloadable formats found")):
+            job = client.submit(VIDEO_URL)
+            finished = client.wait(job['id'])
+
+        assert finished['status'] == 'failed'
+        assert 'No downloadable formats found' in finished['error']
+
+    def test_events_end_with_the_job(self, client):
+        with patch.object(YouTubeDownloader, 'download', fake_download):
+            job = client.submit(VIDEO_URL)
+            events = list(client.events(job['id']))
+
+        assert events[-1]['event'] == 'job'
+        assert events[-1]['status'] == 'done'
+        # Events before the subscription are not replayed, the final job always comes
+        assert set(event['event'] for event in events) <= {'start', 'progress', 'done', 'job'}
+
+    def test_invalid_job_is_rejected(self, client):
+        with pytest.raises(DaemonError) as error:
+            client.submit(VIDEO_URL, itag='22')
+        assert error.value.status == 400
+
+    def test_unknown_job(self, client):
+        with pytest.raises(DaemonError) as error:
+            client.job('missing')
+        assert error.value.status == 404
+
+    def test_cancel_queued_job(self, tmp_path):
+        release = threading.Event()
+
+        def blocking(self, output_file, **kwargs):
+            release.wait(5)
+            return fake_download(self, output_file, **kwargs)
+
+        with DownloadDaemon(output_dir=str(tmp_path), workers=1) as daemon, \
+                patch.object(YouTubeDownloader, 'download', blocking):
+            client = DaemonClient(f"http://127.0.0.1:{daemon.listen(port=0)}")
+            running = client.submit(VIDEO_URL)
+            queued = client.submit(VIDEO_URL)
+
+            assert client.cancel(queued['id'])['status'] == 'cancelled'
+            release.set()
+            assert client.wait(running['id'])['status'] == 'done'
+            with pytest.raises(DaemonError) as error:
+                client.cancel(running['id'])
+            assert error.value.status == 409
+
+    def test_close_cancels_queued_jobs(self, tmp_path):
+        release = threading.Event()
+
+        def blocking(self, output_file, **kwargs):
+            release.wait(5)
+            return fake_download(self, output_file, **kwargs)
+
+        daemon = DownloadDaemon(output_dir=str(tmp_path), workers=1)
+        with patch.object(YouTubeDownloader, 'download', blocking):
+            running = daemon.submit({'url': VIDEO_URL})
+            queued = daemon.submit({'url': VIDEO_URL})
+            threading.Timer(0.1, release.set).start()
+            daemon.close()
+
+        assert (running.status, queued.status) == ('done', 'cancelled')
+        with pytest.raises(RuntimeError):
+            daemon.submit({'url': VIDEO_URL})
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_close_stops_running_jobs_at_a_checkpoint(self, mock_get, mock_get_formats, tmp_path):
+        payload = bytes(1000) * 1000
+        mock_get_formats.return_value = [{'itag': 22, 'quality': '720p', 'has_video': True, 'has_audio': True,
+                                          'url': 'http://example.com/video.mp4', 'filesize': str(len(payload))}]
+        transferring = threading.Event()
+
+        def slow_chunks():
+            for i in range(0, len(payload), 1000):
+                yield payload[i:i + 1000]
+                transferring.set()
+                time.sleep(0.01)
+
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {'content-length': str(len(payload))}
+        response.iter_content.return_value = slow_chunks()
+        mock_get.return_value = response
+
+        daemon = DownloadDaemon(output_dir=str(tmp_path), workers=1)
+        job = daemon.submit({'url': VIDEO_URL})
+        assert transferring.wait(5)
+        started = time.monotonic()
+        daemon.close()
+
+        # Far sooner than the 10s the whole transfer would take
+        assert time.monotonic() - started < 5
+        assert job.status == 'cancelled' and 'Interrupted' in job.error
+        assert os.path.exists(str(tmp_path / 'dQw4w9WgXcQ.mp4.part.json'))
+
+    def test_health(self, client):
+        health = client.health()
+
+        assert health['status'] == 'ok'
+        assert health['jobs']['running'] == 0
+
+
+class TestUnixSocket:
+    """The same API on a Unix socket"""
+
+    def test_roundtrip(self, daemon, tmp_path):
+        path = str(tmp_path / 'ytsnap.sock')
+        daemon.listen_unix(path)
+        client = DaemonClient(path)
+
+        with patch.object(YouTubeDownloader, 'download', fake_download):
+            finished = client.wait(client.submit(VIDEO_URL)['id'])
+
+        assert finished['status'] == 'done'
+        assert os.stat(path).st_mode & 0o777 == 0o600
+
+    def test_stale_socket_is_replaced(self, daemon, tmp_path):
+        path = str(tmp_path / 'ytsnap.sock')
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(path)
+        stale.close()
+
+        daemon.listen_unix(path)
+
+        assert DaemonClient(path).health()['status'] == 'ok'
+
+    def test_refuses_a_live_socket(self, daemon, tmp_path):
+        path = str(tmp_path / 'ytsnap.sock')
+        daemon.listen_unix(path)
+
+        with DownloadDaemon() as other:
+            with pytest.raises(OSError, match='already serving'):
+                other.listen_unix(path)
+
+
+def _post(port, body, headers):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    try:
+        connection.request('POST', '/jobs', body=body, headers=headers)
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+class TestAccess:
+    """Cross-site requests, paths and remote access"""
+
+    def test_cross_site_simple_request_is_refused(self, daemon):
+        port = daemon.listen(port=0)
+        body = json.dumps({'url': VIDEO_URL})
+
+        assert _post(port, body, {'Content-Type': 'text/plain'}) == 415
+        assert _post(port, body, {'Content-Type': 'application/x-www-form-urlencoded'}) == 415
+        assert daemon.jobs() == []
+
+    def test_foreign_host_header_is_refused(self, daemon):
+        port = daemon.listen(port=0)
+
+        status = _post(port, json.dumps({'url': VIDEO_URL}),
+                       {'Content-Type': 'application/json', 'Host': f'attacker.example:{port}'})
+
+        assert status == 403
+        assert daemon.jobs() == []
+
+    @pytest.mark.parametrize('options', [
+        {'output': '/etc/passwd'},
+        {'output': '../outside.mp4'},
+        {'output_dir': '/tmp'},
+        # The output directory itself: its .part files would land beside it
+        {'output': ''},
+        {'output': '.'},
+        {'output': 'sub/..'},
+    ])
+    def test_paths_outside_the_output_dir_are_refused(self, client, options):
+        with pytest.raises(DaemonError) as error:
+            client.submit(VIDEO_URL, **options)
+        assert error.value.status == 400
+
+    def test_symlink_out_of_the_output_dir_is_refused(self, daemon, tmp_path):
+        os.symlink('/', str(tmp_path / 'escape'))
+
+        with pytest.raises(ValueError):
+            daemon.submit({'url': VIDEO_URL, 'output': 'escape/etc/passwd'})
+
+    def test_non_loopback_host_needs_a_token(self, tmp_path):
+        assert is_loopback('127.0.0.1') and is_loopback('localhost') and is_loopback('::1')
+        assert not is_loopback('0.0.0.0')
+        with DownloadDaemon(output_dir=str(tmp_path)) as daemon:
+            with pytest.raises(ValueError, match='token'):
+                daemon.listen('0.0.0.0', 0)
+
+    def test_token(self, tmp_path):
+        with DownloadDaemon(output_dir=str(tmp_path), token='s3cret') as daemon:
+            address = f"http://127.0.0.1:{daemon.listen(port=0)}"
+
+            with pytest.raises(DaemonError) as error:
+                DaemonClient(address).health()
+            assert error.value.status == 401
+            assert DaemonClient(address, token='s3cret').health()['status'] == 'ok'
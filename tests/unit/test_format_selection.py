@@ -78,7 +78,7 @@ class TestFormatSelection:
 
         mock_response = MagicMock()
         mock_response.headers = {'content-length': '1000000'}
-        mock_response.iter_content.return_value = [b'dummy data']
+        mock_response.iter_content.return_value = [b'\0' * 1000000]
         mock_get.return_value = mock_response
 
         downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
@@ -113,7 +113,7 @@ class TestFormatSelection:
 
         mock_response = MagicMock()
         mock_response.headers = {'content-length': '1000000'}
-        mock_response.iter_content.return_value = [b'dummy data']
+        mock_response.iter_content.return_value = [b'\0' * 1000000]
         mock_get.return_value = mock_response
 
         downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
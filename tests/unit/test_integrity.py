@@ -0,0 +1,183 @@
+"""Unit tests for download verification"""
+
+import json
+import hashlib
+import pytest
+from unittest.mock import patch
+from youtube_downloader.downloader import YouTubeDownloader, PlaylistDownloader, MIN_SEGMENT_SIZE
+from youtube_downloader.integrity import (
+    StreamDigest, DownloadResult, available_algorithms, content_range, validate_algorithm
+)
+from youtube_downloader.resume import IncompleteDownloadError
+
+PAYLOAD = bytes(range(256)) * 40
+
+
+def _sha256(data):
+    return 'sha256:' + hashlib.sha256(data).hexdigest()
+
+
+class TestStreamDigest:
+    """Incremental digests"""
+
+    def test_chunks_match_whole(self):
+        digest = StreamDigest()
+        for i in range(0, len(PAYLOAD), 333):
+            digest.update(memoryview(PAYLOAD)[i:i + 333])
+
+        assert digest.checksum == _sha256(PAYLOAD)
+        assert digest.nbytes == len(PAYLOAD)
+
+    def test_update_from_file(self, tmp_path):
+        path = tmp_path / 'data'
+        path.write_bytes(PAYLOAD)
+        digest = StreamDigest('md5')
+        digest.update_from_file(str(path), 100, 200)
+
+        assert digest.hexdigest() == hashlib.md5(PAYLOAD[100:200]).hexdigest()
+
+    def test_unknown_algorithm(self):
+        with pytest.raises(ValueError):
+            StreamDigest('crc-nonsense')
+
+    def test_xxhash_needs_package(self):
+        with patch('youtube_downloader.integrity.xxhash', None):
+            with pytest.raises(ValueError, match='xxhash'):
+                StreamDigest('xxh64')
+
+    @pytest.mark.parametrize('algorithm', available_algorithms())
+    def test_every_available_algorithm_gives_a_checksum(self, algorithm):
+        validate_algorithm(algorithm)
+        digest = StreamDigest(algorithm)
+        digest.update(PAYLOAD)
+
+        assert digest.checksum.startswith(f"{algorithm}:")
+
+    def test_validate_algorithm_rejects_what_stream_digest_rejects(self):
+        with pytest.raises(ValueError, match='Unknown'):
+            validate_algorithm('crc-nonsense')
+        with pytest.raises(ValueError, match='fixed digest length'):
+            validate_algorithm('shake_256')
+        with patch('youtube_downloader.integrity.xxhash', None):
+            with pytest.raises(ValueError, match='xxhash'):
+                validate_algorithm('xxh64')
+
+    @pytest.mark.parametrize('header, expected', [
+        ('bytes 100-199/1000', (100, 199, 1000)),
+        ('bytes 0-9/*', (0, 9, None)),
+        ('garbage', None),
+    ])
+    def test_content_range(self, header, expected):
+        assert content_range({'content-range': header}) == expected
+
+
+class TestVerifiedDownload:
+    """Digests and length checks computed while downloading"""
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_result_carries_checksum(self, mock_get, mock_tqdm, mock_get_formats, tmp_path, make_formats,
+                                     make_response):
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        mock_get.return_value = make_response(PAYLOAD)
+        output = str(tmp_path / 'video.mp4')
+
+        result = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ").download(output_file=output)
+
+        assert result == output
+        assert isinstance(result, DownloadResult)
+        assert (result.itag, result.size, result.expected_size) == ('22', len(PAYLOAD), len(PAYLOAD))
+        assert result.verified
+        assert result.checksum == _sha256(PAYLOAD)
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_resumed_prefix_is_hashed(self, mock_get, mock_tqdm, mock_get_formats, tmp_path, make_formats,
+                                      make_response):
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        (tmp_path / 'video.mp4.part').write_bytes(PAYLOAD[:4000])
+        (tmp_path / 'video.mp4.part.json').write_text(json.dumps({
+            'itag': 22, 'content_length': len(PAYLOAD), 'committed': 4000
+        }))
+        mock_get.return_value = make_response(PAYLOAD[4000:], status_code=206)
+
+        result = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ").download(
+            output_file=str(tmp_path / 'video.mp4'))
+
+        assert result.checksum == _sha256(PAYLOAD)
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_misplaced_range_is_rejected(self, mock_get, mock_tqdm, mock_get_formats, tmp_path, make_formats,
+                                         make_response):
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        (tmp_path / 'video.mp4.part').write_bytes(PAYLOAD[:4000])
+        (tmp_path / 'video.mp4.part.json').write_text(json.dumps({
+            'itag': 22, 'content_length': len(PAYLOAD), 'committed': 4000
+        }))
+        mock_get.return_value = make_response(PAYLOAD, status_code=206, headers={
+            'content-length': str(len(PAYLOAD)),
+            'content-range': f'bytes 0-{len(PAYLOAD) - 1}/{len(PAYLOAD)}'
+        })
+
+        with pytest.raises(Exception, match='requested 4000'):
+            YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ").download(
+                output_file=str(tmp_path / 'video.mp4'))
+        assert not (tmp_path / 'video.mp4').exists()
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_checksum_disabled(self, mock_get, mock_tqdm, mock_get_formats, tmp_path, make_formats,
+                               make_response):
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        mock_get.return_value = make_response(PAYLOAD)
+
+        result = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ", checksum=None).download(
+            output_file=str(tmp_path / 'video.mp4'))
+
+        assert result.checksum is None
+        assert result.size == len(PAYLOAD)
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_segment_checksums(self, mock_get, mock_tqdm, mock_get_formats, tmp_path, make_formats,
+                               make_response):
+        payload = bytes(range(256)) * (2 * MIN_SEGMENT_SIZE // 256 + 3)
+        mock_get_formats.return_value = make_formats(len(payload))
+
+        def respond(url, headers, **kwargs):
+            start, end = (int(n) for n in headers['Range'].split('=')[1].split('-'))
+            return make_response(payload[start:end + 1], status_code=206)
+        mock_get.side_effect = respond
+
+        result = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ").download(
+            output_file=str(tmp_path / 'video.mp4'), segments=2)
+
+        assert result.checksum is None
+        assert [(start, end) for start, end, _ in result.segment_checksums] == \
+            [(0, MIN_SEGMENT_SIZE + 383), (MIN_SEGMENT_SIZE + 384, len(payload) - 1)]
+        for start, end, checksum in result.segment_checksums:
+            assert checksum == _sha256(payload[start:end + 1])
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_truncated_video_counts_as_failure(self, mock_get, mock_tqdm, mock_get_formats, tmp_path,
+                                               make_formats, make_response):
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        mock_get.return_value = make_response(PAYLOAD[:1000], headers={'content-length': str(len(PAYLOAD))})
+        playlist = PlaylistDownloader("PLxxx")
+        video = {'video_id': 'dQw4w9WgXcQ', 'title': 'Video', 'url': 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'}
+        completed = []
+
+        with patch.object(playlist, 'iter_videos', return_value=iter([video])):
+            stats = playlist.download(output_dir=str(tmp_path),
+                                      on_video_complete=lambda video, result: completed.append(result))
+
+        assert (stats['successful'], stats['failed']) == (0, 1)
+        assert completed == []
@@ -0,0 +1,242 @@
+"""Unit tests for the persistent job queue and resumable playlist runs"""
+
+import os
+import time
+import threading
+import pytest
+from unittest.mock import patch
+from youtube_downloader.downloader import YouTubeDownloader, PlaylistDownloader
+from youtube_downloader.jobqueue import JobQueue, PENDING, IN_FLIGHT, DONE, FAILED
+from youtube_downloader.progress import Progress
+from youtube_downloader.resume import DownloadInterrupted
+
+PAYLOAD = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def queue(tmp_path):
+    with JobQueue(str(tmp_path / 'queue.db')) as queue:
+        yield queue
+
+
+class TestJobQueue:
+    """Item states, attempts and recovery"""
+
+    def test_add_keeps_order_and_ignores_known_videos(self, queue, make_video):
+        run = queue.run('PLxxx', '/videos')
+
+        assert run.add(make_video('a')) and run.add(make_video('b'))
+        assert not run.add(make_video('a', 'Renamed'))
+        assert [video['video_id'] for video in run.resumable()] == ['a', 'b']
+        assert run.resumable()[0]['title'] == 'Video'
+
+    def test_runs_are_keyed_by_source_and_output_dir(self, queue, make_video):
+        queue.run('PLxxx', '/videos').add(make_video('a'))
+
+        assert queue.run('PLxxx', '/videos').counts()[PENDING] == 1
+        assert queue.run('PLxxx', '/elsewhere').counts()[PENDING] == 0
+        assert queue.run('PLyyy', '/videos').counts()[PENDING] == 0
+
+    def test_in_flight_items_recover_after_a_crash(self, tmp_path, make_video):
+        path = str(tmp_path / 'queue.db')
+        queue = JobQueue(path)
+        run = queue.run('PLxxx', '/videos')
+        run.add(make_video('a'))
+        run.start('a')
+        run.failed('a', None)
+        run.add(make_video('b'))
+        run.start('b')
+        # The process dies without closing anything
+        del queue, run
+
+        with JobQueue(path) as queue:
+            run = queue.run('PLxxx', '/videos')
+            assert run.recovered == 1
+            item = run.get('b')
+            assert (item.state, item.attempts) == (PENDING, 1)
+            assert [video['video_id'] for video in run.resumable()] == ['a', 'b']
+
+    def test_failed_items_are_retried_up_to_max_attempts(self, tmp_path, make_video):
+        with JobQueue(str(tmp_path / 'queue.db'), max_attempts=2) as queue:
+            run = queue.run('PLxxx', '/videos')
+            run.add(make_video('a'))
+            for attempt in range(2):
+                assert run.resumable()
+                run.start('a')
+                run.failed('a', 'Exception: gone', byte_offset=100 * attempt)
+
+            assert run.resumable() == []
+            item = run.get('a')
+            assert (item.state, item.attempts, item.byte_offset, item.error) == (FAILED, 2, 100, 'Exception: gone')
+
+    def test_release_does_not_use_an_attempt(self, queue, make_video):
+        run = queue.run('PLxxx', '/videos')
+        run.add(make_video('a'))
+        run.start('a')
+        run.release('a', byte_offset=4096)
+
+        item = run.get('a')
+        assert (item.state, item.attempts, item.byte_offset) == (PENDING, 0, 4096)
+
+    def test_release_leaves_videos_that_never_started(self, queue, make_video):
+        run = queue.run('PLxxx', '/videos')
+        run.add(make_video('a'))
+        run.start('a')
+        run.failed('a', 'Exception: gone', byte_offset=100)
+        run.release('a', byte_offset=200)
+
+        item = run.get('a')
+        assert (item.state, item.attempts, item.byte_offset) == (FAILED, 1, 100)
+
+    def test_done(self, queue, make_video):
+        run = queue.run('PLxxx', '/videos')
+        run.add(make_video('a'))
+        run.start('a')
+        run.done('a', '/videos/a.mp4', 1000)
+
+        assert run.items(DONE)[0].path == '/videos/a.mp4'
+        assert run.counts() == {PENDING: 0, IN_FLIGHT: 0, DONE: 1, FAILED: 0}
+
+
+class TestQueuedPlaylist:
+    """PlaylistDownloader runs that resume from the queue"""
+
+    def test_second_run_resumes_without_listing_or_checking(self, queue, tmp_path, make_video):
+        videos = [make_video('aaaaaaaaaaa'), make_video('bbbbbbbbbbb'), make_video('ccccccccccc')]
+        calls = []
+
+        def flaky(self, video, *args, **kwargs):
+            calls.append(video['video_id'])
+            if video['video_id'] == 'bbbbbbbbbbb' and calls.count('bbbbbbbbbbb') == 1:
+                raise Exception("Connection reset")
+            self._queue_run.done(video['video_id'])
+            return True
+
+        with patch.object(PlaylistDownloader, '_download_single_video', flaky):
+            with patch.object(PlaylistDownloader, 'get_videos', return_value=iter(videos)):
+                first = PlaylistDownloader("PLxxx", queue=queue, progress=Progress(), prefetch=0)
+                assert first.download(output_dir=str(tmp_path))['failed'] == 1
+
+            with patch.object(PlaylistDownloader, 'get_videos') as get_videos:
+                second = PlaylistDownloader("PLxxx", queue=queue, progress=Progress(), prefetch=0)
+                stats = second.download(output_dir=str(tmp_path))
+
+        get_videos.assert_not_called()
+        assert stats['total'] == 1 and stats['successful'] == 1
+        assert sorted(calls) == ['aaaaaaaaaaa', 'bbbbbbbbbbb', 'bbbbbbbbbbb', 'ccccccccccc']
+        run = queue.run('PLxxx', os.path.abspath(str(tmp_path)))
+        assert run.counts()[DONE] == 3
+
+    def test_partially_listed_playlist_is_listed_again(self, queue, tmp_path, make_video):
+        def crashing_listing():
+            yield make_video('aaaaaaaaaaa')
+            raise Exception("Browse failed")
+
+        downloaded = []
+
+        def record(self, video, *args, **kwargs):
+            downloaded.append(video['video_id'])
+            return True
+
+        with patch.object(PlaylistDownloader, '_download_single_video', record):
+            with patch.object(PlaylistDownloader, 'get_videos', return_value=crashing_listing()):
+                with pytest.raises(Exception, match='Browse failed'):
+                    PlaylistDownloader("PLxxx", queue=queue, progress=Progress(), prefetch=0).download(
+                        output_dir=str(tmp_path))
+
+            videos = [make_video('aaaaaaaaaaa'), make_video('bbbbbbbbbbb')]
+            with patch.object(PlaylistDownloader, 'get_videos', return_value=iter(videos)):
+                PlaylistDownloader("PLxxx", queue=queue, progress=Progress(), prefetch=0).download(
+                    output_dir=str(tmp_path))
+
+        # a was still pending (the fake never marks it done) and is not yielded twice
+        assert downloaded == ['aaaaaaaaaaa', 'aaaaaaaaaaa', 'bbbbbbbbbbb']
+        assert queue.run('PLxxx', os.path.abspath(str(tmp_path))).enumerated
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_ctrl_c_checkpoints_videos_in_flight(self, mock_get, mock_tqdm, mock_get_formats, queue, tmp_path,
+                                                 make_video, make_formats, make_response):
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        transferring = threading.Event()
+
+        def slow_chunks():
+            for i in range(0, len(PAYLOAD), 1000):
+                yield PAYLOAD[i:i + 1000]
+                transferring.set()
+                time.sleep(0.01)
+
+        mock_get.side_effect = lambda *args, **kwargs: make_response(PAYLOAD, chunks=slow_chunks())
+
+        def interrupted_listing():
+            yield make_video('aaaaaaaaaaa', 'First')
+            transferring.wait(5)
+            raise KeyboardInterrupt
+
+        playlist = PlaylistDownloader("PLxxx", queue=queue, progress=Progress(), prefetch=0)
+        with patch.object(PlaylistDownloader, 'get_videos', return_value=interrupted_listing()):
+            with pytest.raises(KeyboardInterrupt):
+                playlist.download(output_dir=str(tmp_path))
+
+        item = queue.run('PLxxx', os.path.abspath(str(tmp_path))).get('aaaaaaaaaaa')
+        assert (item.state, item.attempts) == (PENDING, 0)
+        assert 0 < item.byte_offset < len(PAYLOAD)
+        assert os.path.exists(str(tmp_path / 'First_aaaaaaaaaaa.mp4.part.json'))
+
+        # The next run picks the video up again
+        mock_get.side_effect = lambda *args, **kwargs: make_response(PAYLOAD, chunks=list(slow_chunks()))
+        again = iter([make_video('aaaaaaaaaaa', 'First')])
+        with patch.object(PlaylistDownloader, 'get_videos', return_value=again):
+            stats = PlaylistDownloader("PLxxx", queue=queue, progress=Progress(), prefetch=0).download(
+                output_dir=str(tmp_path))
+
+        assert stats['successful'] == 1
+        assert os.path.getsize(str(tmp_path / 'First_aaaaaaaaaaa.mp4')) == len(PAYLOAD)
+
+    def test_stop_event_ends_the_run(self, queue, tmp_path, make_video):
+        stop = threading.Event()
+        started = threading.Event()
+
+        def until_stopped(self, output_file, **kwargs):
+            started.set()
+            while not self.stop.is_set():
+                time.sleep(0.01)
+            raise DownloadInterrupted("stopped")
+
+        def listing():
+            yield make_video('aaaaaaaaaaa')
+            started.wait(5)
+            stop.set()
+            yield make_video('bbbbbbbbbbb')
+
+        playlist = PlaylistDownloader("PLxxx", queue=queue, progress=Progress(), prefetch=0, stop=stop)
+        with patch.object(YouTubeDownloader, 'download', until_stopped), \
+                patch.object(PlaylistDownloader, 'get_videos', return_value=listing()):
+            with pytest.raises(DownloadInterrupted):
+                playlist.download(output_dir=str(tmp_path))
+
+        run = queue.run('PLxxx', os.path.abspath(str(tmp_path)))
+        assert [(item.state, item.attempts) for item in run.items()] == [(PENDING, 0), (PENDING, 0)]
+        assert not run.enumerated
+
+    def test_stop_before_a_retried_video_starts_keeps_its_attempts(self, queue, tmp_path, make_video):
+        stop = threading.Event()
+        run = queue.run('PLxxx', os.path.abspath(str(tmp_path)))
+        run.add(make_video('aaaaaaaaaaa'))
+        run.start('aaaaaaaaaaa')
+        run.failed('aaaaaaaaaaa', 'Exception: gone')
+        run.mark_enumerated()
+        dispatch = PlaylistDownloader._download_after_prefetch
+
+        def stopped_once_dispatched(self, *args):
+            stop.set()
+            return dispatch(self, *args)
+
+        playlist = PlaylistDownloader("PLxxx", queue=queue, progress=Progress(), prefetch=0, stop=stop)
+        with patch.object(PlaylistDownloader, '_download_after_prefetch', stopped_once_dispatched):
+            with pytest.raises(DownloadInterrupted):
+                playlist.download(output_dir=str(tmp_path))
+
+        item = run.get('aaaaaaaaaaa')
+        assert (item.state, item.attempts) == (FAILED, 1)
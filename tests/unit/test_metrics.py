@@ -0,0 +1,101 @@
+"""Unit tests for the metrics registry"""
+
+import urllib.request
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from youtube_downloader.downloader import YouTubeDownloader
+from youtube_downloader.metrics import (
+    MetricsRegistry, MetricsServer, REGISTRY, RATE_LIMITED, PLAYER_SECONDS, PROXY_REQUESTS, dump
+)
+from youtube_downloader.proxy_manager import ProxyManager, ProxyConfig
+
+
+class TestMetricsRegistry:
+    """Recording and rendering metrics"""
+
+    def test_counter_and_gauge(self):
+        registry = MetricsRegistry()
+        requests_total = registry.counter('requests_total', 'Requests', ('endpoint',))
+        queue = registry.gauge('queue_depth', 'Items queued')
+
+        requests_total.inc(endpoint='player')
+        requests_total.inc(2, endpoint='player')
+        queue.set(7)
+
+        assert requests_total.value(endpoint='player') == 3
+        text = registry.render()
+        assert '# TYPE requests_total counter' in text
+        assert 'requests_total{endpoint="player"} 3' in text
+        assert 'queue_depth 7' in text
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = MetricsRegistry()
+        latency = registry.histogram('latency_seconds', 'Latency', buckets=(0.1, 1.0))
+
+        for value in (0.05, 0.5, 0.7, 5.0):
+            latency.observe(value)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 1' in text
+        assert 'latency_seconds_bucket{le="1"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert 'latency_seconds_count 4' in text
+        assert latency.value() == 4
+
+    def test_labels_must_match(self):
+        counter = MetricsRegistry().counter('c_total', 'C', ('proxy',))
+        with pytest.raises(ValueError):
+            counter.inc(endpoint='player')
+
+    def test_same_name_returns_same_metric(self):
+        registry = MetricsRegistry()
+        assert registry.counter('c_total', 'C') is registry.counter('c_total', 'C')
+        with pytest.raises(ValueError):
+            registry.gauge('c_total', 'C')
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter('c_total', 'C', ('reason',)).inc(reason='say "hi"\n')
+        assert 'c_total{reason="say \\"hi\\"\\n"} 1' in registry.render()
+
+    def test_server_and_dump(self, tmp_path):
+        registry = MetricsRegistry()
+        registry.counter('c_total', 'C').inc()
+
+        with MetricsServer(registry, port=0) as server:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.port}/metrics") as response:
+                body = response.read().decode()
+        dump(str(tmp_path / 'metrics.prom'), registry)
+
+        assert 'c_total 1' in body
+        assert (tmp_path / 'metrics.prom').read_text() == registry.render()
+
+
+class TestInstrumentation:
+    """Request sites record into the global registry"""
+
+    @patch('youtube_downloader.downloader.requests.Session.post')
+    def test_player_rate_limit_is_counted(self, mock_post):
+        mock_post.return_value = MagicMock(status_code=429)
+        rate_limited = RATE_LIMITED.value(endpoint='player', proxy='direct')
+        player_calls = PLAYER_SECONDS.value(proxy='direct', client='ANDROID')
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        with pytest.raises(Exception, match='429'):
+            downloader._get_video_info()
+
+        assert RATE_LIMITED.value(endpoint='player', proxy='direct') == rate_limited + 1
+        assert PLAYER_SECONDS.value(proxy='direct', client='ANDROID') == player_calls + 1
+
+    def test_proxy_outcomes_are_counted(self):
+        proxy = ProxyConfig(host='10.0.0.9', port=3128)
+        manager = ProxyManager(proxies=[proxy], enable_health_check=False, max_failures=1)
+
+        manager.record_success(proxy)
+        manager.record_failure(proxy)
+
+        assert PROXY_REQUESTS.value(proxy='10.0.0.9:3128', outcome='success') >= 1
+        assert PROXY_REQUESTS.value(proxy='10.0.0.9:3128', outcome='failure') >= 1
+        assert 'ytsnap_proxy_healthy{proxy="10.0.0.9:3128"} 0' in REGISTRY.render()
@@ -0,0 +1,198 @@
+"""Unit tests for the fragmented MP4 muxer"""
+
+import os
+import struct
+import hashlib
+import tempfile
+from unittest.mock import patch
+
+import pytest
+
+from youtube_downloader.downloader import YouTubeDownloader
+from youtube_downloader.mux import Box, MuxError, iter_boxes, mux
+
+
+def box(box_type, *parts):
+    body = b''.join(parts)
+    return struct.pack('>I4s', 8 + len(body), box_type.encode()) + body
+
+
+def full_box(box_type, version, flags, *parts):
+    return box(box_type, struct.pack('>I', (version << 24) | flags), *parts)
+
+
+def init_segment(handler, track_id, timescale):
+    mvhd = full_box('mvhd', 0, 0, struct.pack('>IIII', 0, 0, 1000, 0), bytes(76), struct.pack('>I', track_id + 1))
+    tkhd = full_box('tkhd', 0, 3, struct.pack('>III', 0, 0, track_id), bytes(68))
+    mdhd = full_box('mdhd', 0, 0, struct.pack('>IIII', 0, 0, timescale, 0), bytes(4))
+    hdlr = full_box('hdlr', 0, 0, bytes(4), handler.encode(), bytes(13))
+    stbl = box('stbl', full_box('stsd', 0, 0, struct.pack('>I', 0)))
+    trak = box('trak', tkhd, box('mdia', mdhd, hdlr, box('minf', stbl)))
+    trex = full_box('trex', 0, 0, struct.pack('>IIIII', track_id, 1, 0, 0, 0))
+    return box('ftyp', b'dash', bytes(4)) + box('moov', mvhd, trak, box('mvex', trex))
+
+
+def fragment(sequence, track_id, decode_time, payload, base_offset=None):
+    """A moof + mdat pair with one sample of ``payload`` lasting 1000 ticks."""
+    tfhd_flags = 0x020000 if base_offset is None else 0x000001
+    tfhd_extra = b'' if base_offset is None else struct.pack('>Q', 0)
+    trun_size = 8 + 4 + 4 + 4 + 8  # header, version/flags, count, data offset, one sample
+    tfhd = full_box('tfhd', 0, tfhd_flags, struct.pack('>I', track_id), tfhd_extra)
+    tfdt = full_box('tfdt', 1, 0, struct.pack('>Q', decode_time))
+    moof_size = 8 + 16 + 8 + len(tfhd) + len(tfdt) + trun_size
+    # Without a base offset, data offsets count from the start of the moof
+    data_offset = moof_size + 8 if base_offset is None else 8
+    trun = full_box('trun', 0, 0x000301, struct.pack('>Ii', 1, data_offset), struct.pack('>II', 1000, len(payload)))
+    moof = box('moof', full_box('mfhd', 0, 0, struct.pack('>I', sequence)), box('traf', tfhd, tfdt, trun))
+    assert len(moof) == moof_size
+    return moof, box('mdat', payload)
+
+
+def write_stream(path, handler, track_id, timescale, samples, absolute=False):
+    with open(path, 'wb') as f:
+        f.write(init_segment(handler, track_id, timescale))
+        for sequence, (decode_time, payload) in enumerate(samples, 1):
+            moof, mdat = fragment(sequence, track_id, decode_time, payload, base_offset=0 if absolute else None)
+            if absolute:
+                moof_offset = f.tell()
+                moof = bytearray(moof)
+                # tfhd base_data_offset is the absolute position of the moof
+                index = moof.find(b'tfhd') + 12
+                struct.pack_into('>Q', moof, index, moof_offset + len(moof))
+                moof = bytes(moof)
+            f.write(moof + mdat)
+
+
+def read_samples(path):
+    """Return the moov box and ``(track_id, sequence, payload)`` per fragment, following data offsets."""
+    samples = []
+    with open(path, 'rb') as f:
+        data = f.read()
+        moov = None
+        for box_type, offset, header, size in iter_boxes(f):
+            parsed = Box.parse(box_type, data[offset + header:offset + size])
+            if box_type == 'moov':
+                moov = parsed
+            if box_type != 'moof':
+                continue
+            sequence = struct.unpack_from('>I', parsed.find('mfhd').payload, 4)[0]
+            traf = parsed.find('traf')
+            tfhd, trun = traf.find('tfhd'), traf.find('trun')
+            track_id = struct.unpack_from('>I', tfhd.payload, 4)[0]
+            base = struct.unpack_from('>Q', tfhd.payload, 8)[0] if tfhd.flags & 1 else offset
+            data_offset, = struct.unpack_from('>i', trun.payload, 8)
+            sample_size, = struct.unpack_from('>I', trun.payload, 16)
+            start = base + data_offset
+            samples.append((track_id, sequence, data[start:start + sample_size]))
+    return moov, samples
+
+
+class TestMux:
+    """Merging a video-only and an audio-only fragmented MP4"""
+
+    def setup_method(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.video = os.path.join(self.tmp.name, 'video.mp4')
+        self.audio = os.path.join(self.tmp.name, 'audio.m4a')
+        self.output = os.path.join(self.tmp.name, 'out.mp4')
+
+    def teardown_method(self):
+        self.tmp.cleanup()
+
+    def test_tracks_are_renumbered_and_combined(self):
+        write_stream(self.video, 'vide', 1, 90000, [(0, b'v0'), (90000, b'v1')])
+        write_stream(self.audio, 'soun', 1, 48000, [(0, b'a0')])
+
+        mux(self.video, self.audio, self.output)
+
+        moov, _ = read_samples(self.output)
+        traks = moov.find_all('trak')
+        assert [struct.unpack_from('>I', t.find('tkhd').payload, 12)[0] for t in traks] == [1, 2]
+        assert [t.path('mdia', 'hdlr').payload[8:12] for t in traks] == [b'vide', b'soun']
+        assert [struct.unpack_from('>I', t.payload, 4)[0] for t in moov.find('mvex').find_all('trex')] == [1, 2]
+        mvhd = moov.find('mvhd')
+        assert struct.unpack_from('>I', mvhd.payload, len(mvhd.payload) - 4)[0] == 3
+        assert not os.path.exists(self.output + '.tmp')
+
+    def test_fragments_interleaved_by_decode_time(self):
+        # Video: 0s, 1s, 2s. Audio: 0.5s, 1.5s
+        write_stream(self.video, 'vide', 1, 1000, [(0, b'v0'), (1000, b'v1'), (2000, b'v2')])
+        write_stream(self.audio, 'soun', 1, 48000, [(24000, b'a0'), (72000, b'a1')])
+
+        mux(self.video, self.audio, self.output)
+
+        _, samples = read_samples(self.output)
+        assert samples == [
+            (1, 1, b'v0'), (2, 2, b'a0'), (1, 3, b'v1'), (2, 4, b'a1'), (1, 5, b'v2')
+        ]
+
+    def test_absolute_base_data_offsets_are_moved(self):
+        write_stream(self.video, 'vide', 1, 1000, [(0, b'video-0'), (1000, b'video-1')], absolute=True)
+        write_stream(self.audio, 'soun', 1, 1000, [(500, b'audio-0')], absolute=True)
+
+        mux(self.video, self.audio, self.output)
+
+        _, samples = read_samples(self.output)
+        assert [payload for _, _, payload in samples] == [b'video-0', b'audio-0', b'video-1']
+
+    def test_rejects_unfragmented_input(self):
+        with open(self.video, 'wb') as f:
+            f.write(box('ftyp', b'isom', bytes(4)) + box('moov', box('mvhd', bytes(100))) + box('mdat', b'x'))
+        write_stream(self.audio, 'soun', 1, 1000, [(0, b'a0')])
+
+        with pytest.raises(MuxError):
+            mux(self.video, self.audio, self.output)
+        assert not os.path.exists(self.output)
+
+
+class TestMergedDownload:
+    """download() with a video+audio selector"""
+
+    FORMATS = [
+        {'itag': 18, 'quality': '360p', 'mime': 'video/mp4', 'has_video': True, 'has_audio': True,
+         'url': 'http://example.com/18', 'filesize': '100'},
+        {'itag': 137, 'quality': '1080p', 'mime': 'video/mp4', 'has_video': True, 'has_audio': False,
+         'url': 'http://example.com/137', 'filesize': '1000'},
+        {'itag': 140, 'quality': 'tiny', 'mime': 'audio/mp4', 'has_video': False, 'has_audio': True,
+         'url': 'http://example.com/140', 'filesize': '100'},
+    ]
+
+    def test_downloads_both_streams_and_muxes(self, tmp_path):
+        output = str(tmp_path / 'out.mp4')
+        downloaded = []
+
+        def fake_download(selected, path, segments):
+            downloaded.append(selected['itag'])
+            handler = 'vide' if selected['has_video'] else 'soun'
+            write_stream(path, handler, 1, 1000, [(0, f"{selected['itag']}".encode())])
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        with patch.object(YouTubeDownloader, 'get_formats', return_value=self.FORMATS), \
+                patch.object(downloader, '_download_format', side_effect=fake_download):
+            result = downloader.download(output, format_spec='best-video[ext=mp4]+best-audio[ext=m4a]')
+
+        assert sorted(downloaded) == [137, 140]
+        with open(output, 'rb') as f:
+            data = f.read()
+        assert (result.itag, result.size) == ('137+140', len(data))
+        assert result.checksum == 'sha256:' + hashlib.sha256(data).hexdigest()
+        _, samples = read_samples(output)
+        assert sorted(payload for _, _, payload in samples) == [b'137', b'140']
+        assert sorted(os.listdir(tmp_path)) == ['out.mp4']
+
+    def test_webm_streams_fail_before_downloading(self, tmp_path):
+        formats = self.FORMATS + [
+            {'itag': 248, 'quality': '1080p', 'mime': 'video/webm', 'has_video': True, 'has_audio': False,
+             'url': 'http://example.com/248', 'filesize': '2000'},
+            {'itag': 251, 'quality': 'tiny', 'mime': 'audio/webm', 'has_video': False, 'has_audio': True,
+             'url': 'http://example.com/251', 'filesize': '200'},
+        ]
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        with patch.object(YouTubeDownloader, 'get_formats', return_value=formats), \
+                patch.object(downloader, '_download_format') as download_format:
+            with pytest.raises(MuxError, match='248'):
+                downloader.download(str(tmp_path / 'out.mp4'), format_spec='best-video[ext=webm]+best-audio')
+
+        download_format.assert_not_called()
+        assert os.listdir(tmp_path) == []
@@ -0,0 +1,108 @@
+"""Unit tests for the player response cache"""
+
+import time
+from unittest.mock import patch, MagicMock
+from youtube_downloader.cache import PlayerResponseCache, url_expiry
+from youtube_downloader.downloader import YouTubeDownloader
+
+
+def _player_response(expire, host='rr1'):
+    return {
+        'playabilityStatus': {'status': 'OK'},
+        'streamingData': {
+            'formats': [{
+                'itag': 18,
+                'mimeType': 'video/mp4; codecs="avc1.42001E, mp4a.40.2"',
+                'url': f'https://{host}.googlevideo.com/videoplayback?itag=18&expire={int(expire)}'
+            }],
+            'adaptiveFormats': [{
+                'itag': 140,
+                'mimeType': 'audio/mp4; codecs="mp4a.40.2"',
+                'url': f'https://{host}.googlevideo.com/videoplayback?itag=140&expire={int(expire) + 100}'
+            }]
+        }
+    }
+
+
+class TestPlayerResponseCache:
+    """Test cases for PlayerResponseCache"""
+
+    def test_url_expiry_uses_earliest_url(self):
+        """Test that the TTL comes from the earliest expiring URL"""
+        assert url_expiry(_player_response(2000000000)) == 2000000000
+
+    def test_response_without_expire_is_not_cached(self):
+        """Test that responses without signed URLs are never cached"""
+        cache = PlayerResponseCache()
+        assert cache.put('dQw4w9WgXcQ', 'ANDROID', {'streamingData': {'formats': []}}) is False
+        assert cache.get('dQw4w9WgXcQ', 'ANDROID') is None
+
+    def test_expired_entry_is_dropped(self):
+        """Test that entries are not served once their URLs are about to expire"""
+        cache = PlayerResponseCache(safety_margin=60)
+        assert cache.put('dQw4w9WgXcQ', 'ANDROID', _player_response(time.time() + 30)) is False
+
+        data = _player_response(time.time() + 3600)
+        cache.put('dQw4w9WgXcQ', 'ANDROID', data)
+        with patch('youtube_downloader.cache.time.time', return_value=time.time() + 3600):
+            assert cache.get('dQw4w9WgXcQ', 'ANDROID') is None
+
+    def test_lru_eviction(self):
+        """Test that the in-memory tier is bounded"""
+        cache = PlayerResponseCache(max_entries=2)
+        data = _player_response(time.time() + 3600)
+        for video_id in ('aaaaaaaaaaa', 'bbbbbbbbbbb', 'ccccccccccc'):
+            cache.put(video_id, 'ANDROID', data)
+
+        assert cache.get('aaaaaaaaaaa', 'ANDROID') is None
+        assert cache.get('ccccccccccc', 'ANDROID') == data
+
+    def test_disk_tier_survives_new_instance(self, tmp_path):
+        """Test that the on-disk tier is shared between cache instances"""
+        data = _player_response(time.time() + 3600)
+        PlayerResponseCache(cache_dir=str(tmp_path)).put('dQw4w9WgXcQ', 'ANDROID', data)
+
+        assert PlayerResponseCache(cache_dir=str(tmp_path)).get('dQw4w9WgXcQ', 'ANDROID') == data
+
+    @patch('youtube_downloader.downloader.requests.Session.post')
+    def test_get_formats_twice_hits_player_once(self, mock_post):
+        """Test that a second get_formats call is served from the cache"""
+        mock_post.return_value = MagicMock(
+            status_code=200,
+            json=MagicMock(return_value=_player_response(time.time() + 3600))
+        )
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        first = downloader.get_formats()
+        second = downloader.get_formats()
+
+        assert first == second
+        assert mock_post.call_count == 1
+
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    @patch('youtube_downloader.downloader.requests.Session.post')
+    def test_rejected_url_refreshes_the_cached_response(self, mock_post, mock_get, mock_tqdm, tmp_path):
+        """Test that a 403 on a cached URL drops the entry and fetches the player again"""
+        cache = PlayerResponseCache(cache_dir=str(tmp_path / 'cache'))
+        cache.put('dQw4w9WgXcQ', 'ANDROID', _player_response(time.time() + 3600, host='stale'))
+        fresh = _player_response(time.time() + 3600, host='fresh')
+        mock_post.return_value = MagicMock(status_code=200, json=MagicMock(return_value=fresh))
+
+        def media(url, **kwargs):
+            if 'stale' in url:
+                return MagicMock(status_code=403, headers={})
+            return MagicMock(status_code=200, headers={'content-length': '4'},
+                             iter_content=MagicMock(return_value=[b'data']))
+
+        mock_get.side_effect = media
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ", cache=cache)
+        downloader.download(output_file=str(tmp_path / 'video.mp4'))
+
+        assert (tmp_path / 'video.mp4').read_bytes() == b'data'
+        assert mock_post.call_count == 1
+        assert [call.args[0].split('/')[2] for call in mock_get.call_args_list] == [
+            'stale.googlevideo.com', 'fresh.googlevideo.com'
+        ]
+        assert PlayerResponseCache(cache_dir=str(tmp_path / 'cache')).get('dQw4w9WgXcQ', 'ANDROID') == fresh
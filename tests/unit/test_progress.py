@@ -0,0 +1,213 @@
+"""Unit tests for aggregated progress reporting"""
+
+import io
+import sys
+import json
+import threading
+import pytest
+from unittest.mock import patch
+from youtube_downloader.downloader import YouTubeDownloader, PlaylistDownloader
+from youtube_downloader.progress import (
+    Progress, Reporter, TerminalReporter, JsonLinesReporter, CallbackReporter, format_bytes, format_duration
+)
+
+PAYLOAD = bytes(range(256)) * 40
+
+
+def _collect(**kwargs):
+    events = []
+    return Progress([CallbackReporter(events.append)], **kwargs), events
+
+
+class TestProgress:
+    """Aggregated byte counts and the events they produce"""
+
+    def test_eta_counts_unsized_videos_at_average_size(self, make_video):
+        progress = Progress()
+        for video_id in ('a', 'b', 'c'):
+            progress.queued(make_video(video_id))
+        progress.start(make_video('a'))
+        progress.expect('a', 1000)
+        progress.advance('a', 400)
+
+        snapshot = progress.snapshot()
+        # 600 left of a, b and c at a's size
+        assert snapshot['bytes'] == 400
+        assert snapshot['total_bytes'] == 400 + 600 + 2 * 1000
+        assert (snapshot['videos'], snapshot['done'], snapshot['active']) == (3, 0, 1)
+
+    def test_failed_video_leaves_the_estimate(self, make_video):
+        progress = Progress()
+        progress.queued(make_video('a'))
+        progress.queued(make_video('b'))
+        progress.start(make_video('a'))
+        progress.expect('a', 1000)
+        progress.advance('a', 100)
+        progress.failed(make_video('a'), Exception('gone'))
+
+        snapshot = progress.snapshot()
+        assert snapshot['failed'] == 1
+        # Nothing is known about b's size any more
+        assert snapshot['total_bytes'] == 100
+
+    def test_resumed_bytes_count_but_not_for_the_rate(self):
+        progress = Progress()
+        progress.expect('a', 1000, received=900)
+
+        snapshot = progress.snapshot()
+        assert snapshot['bytes'] == 900
+        assert snapshot['rate'] == 0
+        assert snapshot['eta'] is None
+
+    def test_progress_events_are_rate_capped(self, make_video):
+        progress, events = _collect(interval=3600)
+        progress.start(make_video('a'))
+        for _ in range(1000):
+            progress.advance('a', 1024)
+
+        assert [event['event'] for event in events] == ['start', 'progress']
+        assert progress.bytes == 1000 * 1024
+
+    def test_state_changes_are_not_capped(self, make_video):
+        progress, events = _collect(interval=3600)
+        progress.queued(make_video('a'))
+        progress.start(make_video('a'))
+        progress.message('careful', level='warning')
+        progress.done(make_video('a'), '/videos/a.mp4')
+
+        assert [event['event'] for event in events] == ['queued', 'start', 'message', 'done']
+        assert events[-1]['path'] == '/videos/a.mp4'
+        assert events[-1]['skipped'] is False
+
+    def test_quiet_without_reporters(self, make_video):
+        progress = Progress()
+        progress.start(make_video('a'))
+        progress.advance('a', 10)
+
+        assert progress.quiet
+        assert progress.bytes == 10
+
+    def test_event_iterator(self, make_video):
+        progress = Progress()
+        events = progress.events()
+        received = []
+        reader = threading.Thread(target=lambda: received.extend(events))
+        reader.start()
+        progress.queued(make_video('a'))
+        progress.message('hello')
+        progress.close()
+        reader.join(timeout=5)
+
+        assert [event['event'] for event in received] == ['queued', 'message']
+
+
+class TestReporters:
+    """Rendering events"""
+
+    def test_json_lines(self, make_video):
+        stream = io.StringIO()
+        progress = Progress([JsonLinesReporter(stream)])
+        progress.queued(make_video('a', 'First'))
+        progress.summary({'total': 1, 'successful': 0, 'failed': 1, 'failed_videos': [make_video('a', 'First')]})
+
+        lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+        assert lines[0]['event'] == 'queued' and lines[0]['title'] == 'First'
+        assert lines[1]['event'] == 'summary' and lines[1]['failed_videos'] == ['First']
+
+    @patch.object(YouTubeDownloader, 'get_formats', side_effect=Exception("Video unavailable"))
+    def test_cli_reports_a_failed_run_as_an_event(self, mock_get_formats, capsys, tmp_path):
+        from youtube_downloader.cli import main
+        argv = ['ytsnap', 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', '--progress', 'json',
+                '--output', str(tmp_path / 'video.mp4')]
+        with patch.object(sys, 'argv', argv), pytest.raises(SystemExit) as exit_info:
+            main()
+
+        captured = capsys.readouterr()
+        events = [json.loads(line) for line in captured.out.splitlines()]
+        assert exit_info.value.code == 1
+        assert events[-1]['event'] == 'error' and events[-1]['error'] == 'Exception: Video unavailable'
+        assert 'Traceback' not in captured.err
+
+    @pytest.mark.parametrize('mode', ['json', 'none'])
+    @patch.object(YouTubeDownloader, 'get_formats', side_effect=KeyboardInterrupt)
+    def test_cli_interrupt_keeps_stdout_clean(self, mock_get_formats, mode, capsys, tmp_path):
+        from youtube_downloader.cli import main
+        argv = ['ytsnap', 'https://www.youtube.com/watch?v=dQw4w9WgXcQ', '--progress', mode,
+                '--output', str(tmp_path / 'video.mp4')]
+        with patch.object(sys, 'argv', argv), pytest.raises(SystemExit) as exit_info:
+            main()
+
+        captured = capsys.readouterr()
+        assert exit_info.value.code == 130
+        if mode == 'json':
+            events = [json.loads(line) for line in captured.out.splitlines()]
+            assert events[-1]['event'] == 'error' and events[-1]['error'] == 'KeyboardInterrupt: Interrupted'
+        else:
+            assert captured.out == ''
+            assert 'Interrupted' in captured.err
+
+    def test_reporter_must_implement_handle(self):
+        class Incomplete(Reporter):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+    def test_terminal_logs_status_sparingly_when_not_a_tty(self, make_video):
+        stream = io.StringIO()
+        progress = Progress([TerminalReporter(stream, log_interval=3600)], interval=0)
+        progress.start(make_video('a'))
+        for _ in range(100):
+            progress.advance('a', 1024)
+        progress.done(make_video('a', 'First'))
+
+        lines = stream.getvalue().splitlines()
+        assert len(lines) == 2
+        assert lines[0].startswith('[0/0 videos]')
+        assert lines[1] == '✔ First'
+
+    def test_format_helpers(self):
+        assert format_bytes(512) == '512 B'
+        assert format_bytes(1536) == '1.5 KiB'
+        assert format_duration(3725) == '1:02:05'
+        assert format_duration(None) == '?'
+
+
+class TestDownloadProgress:
+    """Downloads report into a shared Progress instead of their own bars"""
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_no_bar_with_aggregated_progress(self, mock_get, mock_tqdm, mock_get_formats, tmp_path,
+                                             make_formats, make_response):
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        mock_get.return_value = make_response(PAYLOAD)
+        progress = Progress()
+
+        YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ", progress=progress).download(
+            output_file=str(tmp_path / 'video.mp4'))
+
+        mock_tqdm.assert_not_called()
+        assert progress.bytes == len(PAYLOAD)
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_playlist_reports_lifecycle(self, mock_get, mock_tqdm, mock_get_formats, tmp_path, make_video,
+                                        make_formats, make_response):
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        mock_get.side_effect = lambda *args, **kwargs: make_response(PAYLOAD)
+        progress, events = _collect()
+        playlist = PlaylistDownloader("PLxxx", progress=progress)
+        videos = [make_video('aaaaaaaaaaa', 'First'), make_video('bbbbbbbbbbb', 'Second')]
+
+        with patch.object(PlaylistDownloader, 'get_videos', return_value=iter(videos)):
+            stats = playlist.download(output_dir=str(tmp_path))
+
+        mock_tqdm.assert_not_called()
+        assert stats['successful'] == 2
+        kinds = [event['event'] for event in events]
+        assert kinds.count('queued') == 2 and kinds.count('start') == 2 and kinds.count('done') == 2
+        assert kinds[-1] == 'summary'
+        assert events[-1]['bytes'] == 2 * len(PAYLOAD)
@@ -27,7 +27,7 @@ class TestProgressCalculation:
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.headers = {'content-length': '3000'}
-        mock_response.iter_content.return_value = [b'chunk1', b'chunk2', b'chunk3']
+        mock_response.iter_content.return_value = [b'\0' * 1000] * 3
         mock_get.return_value = mock_response
 
         # Mock tqdm
@@ -50,9 +50,7 @@ class TestProgressCalculation:
 
         # Check that bar.update was called for each chunk
         assert mock_bar.update.call_count == 3
-        mock_bar.update.assert_any_call(6)  # len(b'chunk1') = 6
-        mock_bar.update.assert_any_call(6)
-        mock_bar.update.assert_any_call(6)
+        mock_bar.update.assert_any_call(1000)
 
     @patch.object(YouTubeDownloader, 'get_formats')
     @patch('youtube_downloader.downloader.tqdm')
@@ -74,7 +72,7 @@ class TestProgressCalculation:
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.headers = {}  # No content-length
-        mock_response.iter_content.return_value = [b'data']
+        mock_response.iter_content.return_value = [b'\0' * 5000]
         mock_get.return_value = mock_response
 
         # Mock tqdm
@@ -0,0 +1,164 @@
+"""Unit tests for ProxyManager health checking"""
+
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from youtube_downloader.proxy_manager import ProxyManager, ProxyConfig
+
+
+def _proxies(count):
+    return [ProxyConfig(host=f'10.0.0.{i}', port=8080) for i in range(count)]
+
+
+def _slow_get(delay, healthy_hosts=None):
+    """A requests.get stand-in that takes ``delay`` seconds per proxy."""
+    def fake_get(url, proxies=None, timeout=None):
+        time.sleep(delay)
+        host = proxies['http'].split('//')[1].split(':')[0]
+        ok = healthy_hosts is None or host in healthy_hosts
+        return MagicMock(status_code=200 if ok else 503)
+    return fake_get
+
+
+class TestProxyHealthCheck:
+    """Test cases for parallel proxy health checks"""
+
+    @patch('youtube_downloader.proxy_manager.requests.get')
+    def test_checks_run_in_parallel(self, mock_get):
+        """Test that 40 slow checks take about one check's time, not forty"""
+        mock_get.side_effect = _slow_get(0.1)
+
+        start = time.time()
+        manager = ProxyManager(proxies=_proxies(40), health_check_workers=40)
+        elapsed = time.time() - start
+
+        assert elapsed < 1.0
+        assert manager.get_stats()['healthy'] == 40
+
+    @patch('youtube_downloader.proxy_manager.requests.get')
+    def test_unhealthy_proxies_are_marked(self, mock_get):
+        """Test that failed checks mark the proxy unhealthy"""
+        mock_get.side_effect = _slow_get(0, healthy_hosts={'10.0.0.0', '10.0.0.2'})
+
+        manager = ProxyManager(proxies=_proxies(4))
+
+        assert manager.get_stats()['healthy'] == 2
+
+    @patch('youtube_downloader.proxy_manager.requests.get')
+    def test_deadline_bounds_startup(self, mock_get):
+        """Test that the overall deadline caps how long construction blocks"""
+        mock_get.side_effect = _slow_get(2)
+
+        start = time.time()
+        ProxyManager(proxies=_proxies(8), health_check_workers=2, health_check_deadline=0.2)
+
+        assert time.time() - start < 1.0
+
+    @patch('youtube_downloader.proxy_manager.requests.get')
+    def test_min_healthy_returns_early(self, mock_get):
+        """Test that checking stops once enough healthy proxies are found"""
+        mock_get.side_effect = _slow_get(0.05)
+
+        manager = ProxyManager(proxies=_proxies(100), health_check_workers=2, min_healthy=4)
+
+        assert mock_get.call_count < 100
+        assert manager.get_stats()['healthy'] >= 4
+
+
+class TestProxyScoring:
+    """Test cases for latency- and throughput-weighted proxy selection"""
+
+    def _manager(self, count, **kwargs):
+        kwargs.setdefault('rotation_interval', 0)
+        kwargs.setdefault('exploration', 0)
+        return ProxyManager(proxies=_proxies(count), enable_health_check=False, **kwargs)
+
+    def test_faster_proxy_is_preferred(self):
+        """Test that higher throughput earns a larger share of selections"""
+        manager = self._manager(2)
+        fast, slow = manager.proxies
+        manager.record_throughput(fast, 50 * 1024 * 1024, 1.0)
+        manager.record_throughput(slow, 1 * 1024 * 1024, 1.0)
+
+        picks = [manager.get_proxy() for _ in range(500)]
+
+        assert picks.count(fast) > 400
+        assert picks.count(slow) > 0
+
+    def test_errors_and_latency_lower_the_score(self):
+        """Test that failures and slow first bytes reduce a proxy's score"""
+        manager = self._manager(2)
+        good, bad = manager.proxies
+        for proxy in (good, bad):
+            manager.record_throughput(proxy, 8 * 1024 * 1024, 1.0)
+        manager.record_timing(good, 0.05)
+        manager.record_timing(bad, 2.0)
+        manager.record_failure(bad)
+
+        assert manager.score(good) > manager.score(bad)
+
+        manager.record_timing(bad, 0.05)
+        for _ in range(20):
+            manager.record_timing(bad, 0.05)
+            manager.record_success(bad)
+
+        assert manager.score(bad) == pytest.approx(manager.score(good), rel=0.05)
+
+    def test_unmeasured_proxy_is_scored_optimistically(self):
+        """Test that a proxy without samples is not starved"""
+        manager = self._manager(2)
+        measured, fresh = manager.proxies
+        manager.record_throughput(measured, 10 * 1024 * 1024, 1.0)
+        manager.record_timing(measured, 0.1)
+
+        assert manager.score(fresh) == pytest.approx(manager.score(measured))
+
+    def test_selection_is_sticky_within_rotation_interval(self):
+        """Test that the chosen proxy is kept until the interval elapses"""
+        manager = self._manager(5, rotation_interval=60)
+
+        first = manager.get_proxy()
+
+        assert all(manager.get_proxy() is first for _ in range(20))
+
+    def test_round_robin_strategy(self):
+        """Test that the round-robin strategy cycles through proxies in order"""
+        manager = self._manager(3, strategy='round_robin')
+
+        picks = [manager.get_proxy() for _ in range(6)]
+
+        assert picks == manager.proxies[1:] + manager.proxies + manager.proxies[:1]
+
+    def test_unknown_strategy_rejected(self):
+        """Test that an unknown strategy name raises ValueError"""
+        with pytest.raises(ValueError):
+            self._manager(1, strategy='fastest')
+
+    @patch('youtube_downloader.downloader.YouTubeDownloader.get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_downloads_feed_the_scores(self, mock_get, mock_tqdm, mock_get_formats, tmp_path):
+        """Test that a media download records TTFB and throughput for its proxy"""
+        from youtube_downloader.downloader import YouTubeDownloader
+        mock_get_formats.return_value = [{
+            'itag': 22,
+            'quality': '720p',
+            'has_video': True,
+            'has_audio': True,
+            'url': 'http://example.com/video.mp4',
+            'filesize': '3000'
+        }]
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {'content-length': '3000'}
+        response.iter_content.return_value = [b'\0' * 1000] * 3
+        mock_get.return_value = response
+
+        manager = self._manager(1)
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ", proxy_manager=manager)
+        downloader.download(output_file=str(tmp_path / 'video.mp4'))
+
+        proxy = manager.proxies[0]
+        assert proxy.ttfb is not None
+        assert proxy.throughput > 0
+        assert proxy.error_rate == 0.0
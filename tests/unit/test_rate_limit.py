@@ -0,0 +1,102 @@
+"""Unit tests for token-bucket request pacing"""
+
+import time
+import pytest
+from unittest.mock import patch, MagicMock
+from youtube_downloader.rate_limit import TokenBucket, RequestPacer, parse_rates
+from youtube_downloader.proxy_manager import ProxyConfig
+
+
+class TestTokenBucket:
+    """Test cases for TokenBucket"""
+
+    def test_burst_is_free_then_paced(self):
+        """Test that the burst is served at once and later tokens are spaced by 1/rate"""
+        bucket = TokenBucket(rate=10, burst=3)
+
+        delays = [bucket.reserve() for _ in range(5)]
+
+        assert delays[:3] == [0.0, 0.0, 0.0]
+        assert delays[3] == pytest.approx(0.1, abs=0.02)
+        assert delays[4] == pytest.approx(0.2, abs=0.02)
+
+    def test_refills_over_time(self):
+        """Test that tokens come back at the configured rate"""
+        bucket = TokenBucket(rate=100, burst=1)
+        assert bucket.try_acquire()
+        assert not bucket.try_acquire()
+
+        time.sleep(0.02)
+
+        assert bucket.try_acquire()
+
+    def test_rejects_non_positive_rate(self):
+        """Test that a zero rate raises ValueError"""
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0)
+
+
+class TestRequestPacer:
+    """Test cases for RequestPacer"""
+
+    def test_unconfigured_kind_is_not_paced(self):
+        """Test that kinds without a rate never wait"""
+        pacer = RequestPacer(rates={'player': 1})
+
+        assert all(pacer.reserve('media') == 0.0 for _ in range(100))
+
+    def test_per_proxy_buckets_are_independent(self):
+        """Test that one busy proxy does not slow down another"""
+        pacer = RequestPacer(per_proxy_rates={'media': 1}, burst=1)
+        first = ProxyConfig(host='10.0.0.1', port=8080)
+        second = ProxyConfig(host='10.0.0.2', port=8080)
+
+        assert pacer.reserve('media', first) == 0.0
+        assert pacer.reserve('media', first) > 0.5
+        assert pacer.reserve('media', second) == 0.0
+
+    def test_global_limit_applies_across_proxies(self):
+        """Test that the process-wide bucket is shared by every proxy"""
+        pacer = RequestPacer(rates={'player': 1}, per_proxy_rates={'player': 100}, burst=1)
+
+        assert pacer.reserve('player', ProxyConfig(host='10.0.0.1', port=8080)) == 0.0
+        assert pacer.reserve('player', ProxyConfig(host='10.0.0.2', port=8080)) > 0.5
+
+    def test_unknown_kind_rejected(self):
+        """Test that misspelled kinds raise ValueError"""
+        with pytest.raises(ValueError):
+            RequestPacer(rates={'video': 1})
+
+    def test_parse_rates(self):
+        """Test parsing of the CLI rate specification"""
+        assert parse_rates('player=5, browse=0.5,media=20') == {'player': 5.0, 'browse': 0.5, 'media': 20.0}
+        with pytest.raises(ValueError):
+            parse_rates('player=-1')
+        with pytest.raises(ValueError):
+            parse_rates('download=1')
+
+    @patch('youtube_downloader.downloader.YouTubeDownloader.get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_downloader_paces_media_requests(self, mock_get, mock_tqdm, mock_get_formats, tmp_path):
+        """Test that YouTubeDownloader waits on the pacer before each media request"""
+        from youtube_downloader.downloader import YouTubeDownloader
+        mock_get_formats.return_value = [{
+            'itag': 18,
+            'quality': '360p',
+            'has_video': True,
+            'has_audio': True,
+            'url': 'http://example.com/video.mp4',
+            'filesize': '4'
+        }]
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {'content-length': '4'}
+        response.iter_content.return_value = [b'data']
+        mock_get.return_value = response
+        pacer = MagicMock(spec=RequestPacer)
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ", pacer=pacer)
+        downloader.download(output_file=str(tmp_path / 'video.mp4'))
+
+        pacer.wait.assert_called_once_with('media', None)
@@ -0,0 +1,101 @@
+"""Unit tests for the readinto receive path"""
+
+import gzip
+import threading
+import pytest
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+from youtube_downloader.receive import iter_response_chunks
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MiB
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_GET(self):
+        body = gzip.compress(PAYLOAD) if self.path == '/gzip' else PAYLOAD
+        self.send_response(200)
+        if self.path == '/short':
+            # Advertise more than is sent, then hang up
+            self.send_header('Content-Length', str(2 * len(body)))
+            self.close_connection = True
+        else:
+            self.send_header('Content-Length', str(len(body)))
+        if self.path == '/gzip':
+            self.send_header('Content-Encoding', 'gzip')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    _Handler.connections = 0
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+class TestReceivePath:
+    """Test cases for iter_response_chunks"""
+
+    def test_plain_body_is_read_into_one_buffer(self, server):
+        """Test that chunks are views of a single reused buffer"""
+        buffer = bytearray(64 * 1024)
+        with requests.Session() as session:
+            response = session.get(f'{server}/plain', stream=True)
+            received = bytearray()
+            owners = set()
+            for chunk in iter_response_chunks(response, 64 * 1024, buffer=buffer):
+                assert isinstance(chunk, memoryview)
+                owners.add(id(chunk.obj))
+                received += chunk
+
+        assert bytes(received) == PAYLOAD
+        assert owners == {id(buffer)}
+
+    def test_connection_is_reused(self, server):
+        """Test that a fully read body releases its connection to the pool"""
+        with requests.Session() as session:
+            for _ in range(3):
+                response = session.get(f'{server}/plain', stream=True)
+                assert sum(len(chunk) for chunk in iter_response_chunks(response, 256 * 1024)) == len(PAYLOAD)
+
+        assert _Handler.connections == 1
+
+    def test_truncated_body_raises_request_exception(self, server):
+        """Test that a short body surfaces as a retryable requests error"""
+        with requests.Session() as session:
+            response = session.get(f'{server}/short', stream=True)
+            with pytest.raises(requests.exceptions.RequestException):
+                for _ in iter_response_chunks(response, 256 * 1024):
+                    pass
+
+    def test_encoded_body_falls_back_to_iter_content(self, server):
+        """Test that compressed bodies are still decoded by urllib3"""
+        with requests.Session() as session:
+            response = session.get(f'{server}/gzip', stream=True)
+            chunks = list(iter_response_chunks(response, 256 * 1024))
+
+        assert all(isinstance(chunk, bytes) for chunk in chunks)
+        assert b''.join(chunks) == PAYLOAD
+
+    def test_non_urllib3_response_falls_back(self):
+        """Test that mocked or adapter-less responses use iter_content"""
+        response = MagicMock()
+        response.iter_content.return_value = [b'data']
+
+        assert list(iter_response_chunks(response, 1024)) == [b'data']
+        response.iter_content.assert_called_once_with(chunk_size=1024)
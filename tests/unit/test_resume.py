@@ -0,0 +1,170 @@
+"""Unit tests for crash-safe resumable downloads"""
+
+import json
+import threading
+import pytest
+from unittest.mock import patch
+from youtube_downloader.downloader import YouTubeDownloader
+from youtube_downloader.resume import PartFile, IncompleteDownloadError, DownloadInterrupted
+
+PAYLOAD = bytes(range(256)) * 40
+
+
+class TestPartFile:
+    """Test cases for the .part file and its sidecar"""
+
+    def test_sidecar_round_trip(self, tmp_path):
+        """Test that committed bytes survive a reload"""
+        output = str(tmp_path / 'video.mp4')
+        part = PartFile(output, 22, 100)
+        with part.open() as f:
+            f.write(b'x' * 40)
+        part.save(committed=40)
+
+        assert PartFile(output, 22, 100).resume_offset() == 40
+
+    def test_sidecar_for_other_itag_is_ignored(self, tmp_path):
+        """Test that a .part file for a different format is not resumed"""
+        output = str(tmp_path / 'video.mp4')
+        part = PartFile(output, 22, 100)
+        with part.open() as f:
+            f.write(b'x' * 40)
+        part.save(committed=40)
+
+        assert PartFile(output, 18, 100).resume_offset() == 0
+
+    def test_offset_capped_by_file_size(self, tmp_path):
+        """Test that the sidecar is never trusted beyond the bytes on disk"""
+        output = str(tmp_path / 'video.mp4')
+        part = PartFile(output, 22, 100)
+        with part.open() as f:
+            f.write(b'x' * 10)
+        part.save(committed=40)
+
+        assert part.resume_offset() == 10
+
+    def test_finalize_rejects_short_file(self, tmp_path):
+        """Test that a short download is kept as .part instead of renamed"""
+        output = tmp_path / 'video.mp4'
+        part = PartFile(str(output), 22, 100)
+        with part.open() as f:
+            f.write(b'x' * 10)
+
+        with pytest.raises(IncompleteDownloadError):
+            part.finalize(10)
+        assert not output.exists()
+        assert (tmp_path / 'video.mp4.part').exists()
+
+
+class TestResumedDownload:
+    """Test cases for continuing interrupted downloads"""
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_resume_requests_remaining_range(self, mock_get, mock_tqdm, mock_get_formats, tmp_path,
+                                             make_formats, make_response):
+        """Test that a .part file is continued with a Range request"""
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        output = tmp_path / 'video.mp4'
+        (tmp_path / 'video.mp4.part').write_bytes(PAYLOAD[:4000])
+        (tmp_path / 'video.mp4.part.json').write_text(json.dumps({
+            'itag': 22, 'content_length': len(PAYLOAD), 'committed': 4000
+        }))
+        mock_get.return_value = make_response(PAYLOAD[4000:], status_code=206)
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        downloader.download(output_file=str(output))
+
+        assert mock_get.call_args.kwargs['headers']['Range'] == 'bytes=4000-'
+        assert output.read_bytes() == PAYLOAD
+        assert not (tmp_path / 'video.mp4.part').exists()
+        assert not (tmp_path / 'video.mp4.part.json').exists()
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_ignored_range_restarts_from_zero(self, mock_get, mock_tqdm, mock_get_formats, tmp_path,
+                                              make_formats, make_response):
+        """Test that a full 200 response replaces the stale partial data"""
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        output = tmp_path / 'video.mp4'
+        (tmp_path / 'video.mp4.part').write_bytes(b'\xff' * 4000)
+        (tmp_path / 'video.mp4.part.json').write_text(json.dumps({
+            'itag': 22, 'content_length': len(PAYLOAD), 'committed': 4000
+        }))
+        mock_get.return_value = make_response(PAYLOAD, status_code=200)
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        downloader.download(output_file=str(output))
+
+        assert output.read_bytes() == PAYLOAD
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_truncated_stream_keeps_part_file(self, mock_get, mock_tqdm, mock_get_formats, tmp_path,
+                                              make_formats, make_response):
+        """Test that a short stream is recorded for resume, not renamed"""
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        output = tmp_path / 'video.mp4'
+        truncated = make_response(PAYLOAD[:1000], status_code=200)
+        truncated.headers = {'content-length': str(len(PAYLOAD))}
+        mock_get.return_value = truncated
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        with pytest.raises(IncompleteDownloadError):
+            downloader.download(output_file=str(output))
+
+        assert not output.exists()
+        state = json.loads((tmp_path / 'video.mp4.part.json').read_text())
+        assert state['committed'] == 1000
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_stop_on_last_chunk_finishes_without_a_request(self, mock_get, mock_tqdm, mock_get_formats,
+                                                          tmp_path, make_formats, make_response):
+        """Test that a .part file holding every byte is finalized on the next run"""
+        mock_get_formats.return_value = make_formats(len(PAYLOAD))
+        output = tmp_path / 'video.mp4'
+        # One chunk, so the stop is noticed after the last byte has arrived
+        mock_get.return_value = make_response(PAYLOAD, chunks=[PAYLOAD])
+        stop = threading.Event()
+        stop.set()
+
+        stopped = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ", stop=stop)
+        with pytest.raises(DownloadInterrupted):
+            stopped.download(output_file=str(output))
+        state = json.loads((tmp_path / 'video.mp4.part.json').read_text())
+        assert state['committed'] == len(PAYLOAD)
+
+        result = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ").download(output_file=str(output))
+
+        assert mock_get.call_count == 1
+        assert output.read_bytes() == PAYLOAD
+        assert result.size == len(PAYLOAD) and result.checksum
+        assert not (tmp_path / 'video.mp4.part.json').exists()
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_unsatisfiable_range_means_complete(self, mock_get, mock_tqdm, mock_get_formats, tmp_path,
+                                                make_formats, make_response):
+        """Test that a 416 for a resumed range finalizes the .part file"""
+        mock_get_formats.return_value = make_formats(0)
+        output = tmp_path / 'video.mp4'
+        (tmp_path / 'video.mp4.part').write_bytes(PAYLOAD)
+        (tmp_path / 'video.mp4.part.json').write_text(json.dumps({
+            'itag': 22, 'content_length': 0, 'committed': len(PAYLOAD)
+        }))
+        unsatisfiable = make_response(b'', status_code=416)
+        unsatisfiable.headers = {'content-range': f'bytes */{len(PAYLOAD)}'}
+        mock_get.return_value = unsatisfiable
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        result = downloader.download(output_file=str(output))
+
+        assert mock_get.call_args.kwargs['headers']['Range'] == f'bytes={len(PAYLOAD)}-'
+        assert output.read_bytes() == PAYLOAD
+        assert result.expected_size == len(PAYLOAD)
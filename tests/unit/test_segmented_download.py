@@ -0,0 +1,131 @@
+"""Unit tests for segmented (multi-connection) downloads"""
+
+import pytest
+from unittest.mock import patch, MagicMock
+from youtube_downloader.downloader import YouTubeDownloader, MIN_SEGMENT_SIZE
+
+
+def _range_response(payload, range_header, chunk_size=65536):
+    """Build a mock 206 response for a 'bytes=start-end' Range header."""
+    start, end = range_header.split('=')[1].split('-')
+    body = payload[int(start):int(end) + 1]
+    response = MagicMock()
+    response.status_code = 206
+    response.headers = {'content-length': str(len(body))}
+    response.iter_content.return_value = [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    return response
+
+
+class TestSegmentedDownload:
+    """Test cases for segmented downloads"""
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_segments_reassemble_file(self, mock_get, mock_tqdm, mock_get_formats, tmp_path):
+        """Test that parallel ranges are written at their offsets"""
+        payload = bytes(range(256)) * (3 * MIN_SEGMENT_SIZE // 256 + 7)
+        mock_get_formats.return_value = [{
+            'itag': 22,
+            'quality': '720p',
+            'has_video': True,
+            'has_audio': True,
+            'url': 'http://example.com/video.mp4',
+            'filesize': str(len(payload))
+        }]
+        mock_get.side_effect = lambda url, headers, **kwargs: _range_response(payload, headers['Range'])
+
+        output = tmp_path / 'video.mp4'
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        downloader.download(output_file=str(output), segments=3)
+
+        assert mock_get.call_count == 3
+        ranges = sorted(call.kwargs['headers']['Range'] for call in mock_get.call_args_list)
+        assert ranges[0].startswith('bytes=0-')
+        assert output.read_bytes() == payload
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_small_file_uses_single_stream(self, mock_get, mock_tqdm, mock_get_formats, tmp_path):
+        """Test that files too small to split fall back to one connection"""
+        mock_get_formats.return_value = [{
+            'itag': 22,
+            'quality': '720p',
+            'has_video': True,
+            'has_audio': True,
+            'url': 'http://example.com/video.mp4',
+            'filesize': '4'
+        }]
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {'content-length': '4'}
+        response.iter_content.return_value = [b'data']
+        mock_get.return_value = response
+
+        output = tmp_path / 'video.mp4'
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        downloader.download(output_file=str(output), segments=8)
+
+        mock_get.assert_called_once()
+        assert mock_get.call_args.kwargs['headers']['Range'] == 'bytes=0-'
+        assert output.read_bytes() == b'data'
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_segment_rejects_ignored_range(self, mock_get, mock_tqdm, mock_get_formats, tmp_path):
+        """Test that a 200 response to a range request is treated as an error"""
+        mock_get_formats.return_value = [{
+            'itag': 22,
+            'quality': '720p',
+            'has_video': True,
+            'has_audio': True,
+            'url': 'http://example.com/video.mp4',
+            'filesize': str(4 * MIN_SEGMENT_SIZE)
+        }]
+        response = MagicMock()
+        response.status_code = 200
+        response.headers = {}
+        mock_get.return_value = response
+
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+
+        with pytest.raises(Exception, match="ignored range request"):
+            downloader.download(output_file=str(tmp_path / 'video.mp4'), segments=2)
+
+    @patch.object(YouTubeDownloader, 'get_formats')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_resume_fetches_only_missing_tails(self, mock_get, mock_tqdm, mock_get_formats, tmp_path):
+        """Test that saved segment progress is continued, not restarted"""
+        import json
+        payload = bytes(range(256)) * (2 * MIN_SEGMENT_SIZE // 256)
+        half = len(payload) // 2
+        mock_get_formats.return_value = [{
+            'itag': 22,
+            'quality': '720p',
+            'has_video': True,
+            'has_audio': True,
+            'url': 'http://example.com/video.mp4',
+            'filesize': str(len(payload))
+        }]
+        mock_get.side_effect = lambda url, headers, **kwargs: _range_response(payload, headers['Range'])
+
+        # First segment finished, second one a quarter of the way in
+        partial = bytearray(len(payload))
+        partial[:half + half // 4] = payload[:half + half // 4]
+        (tmp_path / 'video.mp4.part').write_bytes(bytes(partial))
+        (tmp_path / 'video.mp4.part.json').write_text(json.dumps({
+            'itag': 22,
+            'content_length': len(payload),
+            'segments': [[0, half - 1, half], [half, len(payload) - 1, half + half // 4]]
+        }))
+
+        output = tmp_path / 'video.mp4'
+        downloader = YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ")
+        downloader.download(output_file=str(output), segments=2)
+
+        mock_get.assert_called_once()
+        assert mock_get.call_args.kwargs['headers']['Range'] == f'bytes={half + half // 4}-{len(payload) - 1}'
+        assert output.read_bytes() == payload
@@ -0,0 +1,146 @@
+"""Unit tests for format selector expressions"""
+
+import pytest
+
+from youtube_downloader.downloader import parse_formats, select_format
+from youtube_downloader.selector import FormatSelector, FormatTable, compile_selector, mime_details
+
+
+def _player_format(itag, mime, url=None, **fields):
+    fmt = {'itag': itag, 'mimeType': mime, 'url': url or f'http://example.com/{itag}'}
+    fmt.update(fields)
+    return fmt
+
+
+PLAYER_RESPONSE = {
+    'playabilityStatus': {'status': 'OK'},
+    'streamingData': {
+        'formats': [
+            _player_format(18, 'video/mp4; codecs="avc1.42001E, mp4a.40.2"', qualityLabel='360p',
+                           width=640, height=360, fps=30, bitrate=500000, contentLength='20000000',
+                           approxDurationMs='300000'),
+            _player_format(22, 'video/mp4; codecs="avc1.64001F, mp4a.40.2"', qualityLabel='720p',
+                           width=1280, height=720, fps=30, bitrate=1500000, approxDurationMs='300000'),
+        ],
+        'adaptiveFormats': [
+            _player_format(136, 'video/mp4; codecs="avc1.4d401f"', qualityLabel='720p',
+                           width=1280, height=720, fps=30, bitrate=2000000, contentLength='80000000'),
+            _player_format(247, 'video/webm; codecs="vp9"', qualityLabel='720p',
+                           width=1280, height=720, fps=30, bitrate=1000000, contentLength='40000000'),
+            _player_format(137, 'video/mp4; codecs="avc1.640028"', qualityLabel='1080p',
+                           width=1920, height=1080, fps=30, bitrate=4000000, contentLength='400000000'),
+            _player_format(140, 'audio/mp4; codecs="mp4a.40.2"', quality='tiny',
+                           bitrate=130000, audioSampleRate='44100', audioChannels=2, contentLength='5000000'),
+            _player_format(251, 'audio/webm; codecs="opus"', quality='tiny',
+                           bitrate=160000, audioSampleRate='48000', audioChannels=2, contentLength='4500000'),
+        ],
+    },
+}
+
+
+@pytest.fixture
+def formats():
+    return parse_formats(PLAYER_RESPONSE)
+
+
+def _select(formats, spec):
+    return FormatSelector(spec).select(formats)['itag']
+
+
+class TestFormatTable:
+    """Typed columns and indexes built from player formats"""
+
+    def test_parse_formats_returns_table_with_typed_fields(self, formats):
+        assert isinstance(formats, FormatTable)
+        fmt = formats.by_itag[247].fmt
+        assert fmt['height'] == 720
+        assert fmt['ext'] == 'webm'
+        assert fmt['vcodec'] == 'vp9'
+        assert fmt['acodec'] is None
+        # Raw value is kept for existing callers
+        assert fmt['filesize'] == '40000000'
+        assert formats.by_itag[18].fmt['duration'] == 300.0
+
+    def test_kind_index(self, formats):
+        assert [r.itag for r in formats.by_kind['muxed']] == [18, 22]
+        assert [r.itag for r in formats.by_kind['video']] == [136, 247, 137]
+        assert [r.itag for r in formats.by_kind['audio']] == [140, 251]
+        assert len(formats.by_kind['any']) == len(formats)
+
+    def test_rows_from_plain_dicts(self):
+        table = FormatTable([{'itag': 22, 'quality': '720p60', 'has_video': True, 'has_audio': True,
+                              'mime': 'video/mp4', 'filesize': '1000'}])
+        row = table.rows[0]
+        assert (row.height, row.fps, row.filesize, row.ext) == (720, 60, 1000, 'mp4')
+
+    def test_mime_details(self):
+        assert mime_details('audio/mp4; codecs="mp4a.40.2"') == {
+            'ext': 'm4a', 'codecs': 'mp4a.40.2', 'vcodec': None, 'acodec': 'mp4a.40.2'
+        }
+        assert mime_details('')['ext'] is None
+
+
+class TestFormatSelector:
+    """Ranking, filters and fallbacks"""
+
+    def test_best_prefers_more_pixels_per_byte_at_equal_quality(self, formats):
+        assert _select(formats, 'best-video[height<=720]') == 247
+
+    def test_best_picks_highest_resolution(self, formats):
+        assert _select(formats, 'best-video') == 137
+        assert _select(formats, 'best') == 22
+
+    def test_size_filter_and_fallback(self, formats):
+        assert _select(formats, 'best-video[filesize<50M]') == 247
+        assert _select(formats, 'best-video[filesize<1M]/smallest-audio') == 251
+
+    def test_unknown_values_fail_unless_optional(self, formats):
+        # itag 22 has no contentLength
+        assert _select(formats, 'best[filesize<100M]') == 18
+        assert _select(formats, 'best[filesize<?100M]') == 22
+
+    def test_worst_smallest_efficient(self, formats):
+        assert _select(formats, 'worst-video') == 247
+        assert _select(formats, 'smallest-any') == 251
+        assert _select(formats, 'efficient-video') == 247
+
+    def test_best_audio_by_bitrate(self, formats):
+        assert _select(formats, 'best-audio') == 251
+        assert _select(formats, 'best-audio[ext=m4a]') == 140
+
+    def test_string_operators(self, formats):
+        assert _select(formats, 'best-video[vcodec^=avc1]') == 137
+        assert _select(formats, 'best-any[codecs*=opus]') == 251
+        assert _select(formats, 'best-video[ext!=mp4]') == 247
+
+    def test_no_match_raises(self, formats):
+        with pytest.raises(Exception, match='No format matches'):
+            FormatSelector('best[height>2000]').select(formats)
+
+    @pytest.mark.parametrize('spec', [
+        '', 'greatest', 'best-subtitles', 'best[height<<720]', 'best[colour=red]',
+        'best[ext<mp4]', 'best[height<=abc]', 'best/',
+    ])
+    def test_malformed_expressions(self, spec):
+        with pytest.raises(ValueError):
+            FormatSelector(spec)
+
+    def test_compile_selector_is_cached(self):
+        assert compile_selector('best/worst') is compile_selector('best/worst')
+
+    def test_select_format_uses_expression(self, formats):
+        assert select_format(formats, itag=18, format_spec='best-audio')['itag'] == 251
+        assert select_format(list(formats), quality='720p')['itag'] == 22
+
+    def test_merge_alternative_selects_both(self, formats):
+        selector = FormatSelector('best-video[ext=mp4]+best-audio[ext=m4a]/best')
+        assert selector.merges
+        assert [f['itag'] for f in selector.select_all(formats)] == [137, 140]
+        with pytest.raises(ValueError):
+            selector.select(formats)
+
+    def test_merge_falls_back_when_a_part_is_missing(self, formats):
+        selector = FormatSelector('best-video[height>2000]+best-audio/best')
+        assert [f['itag'] for f in selector.select_all(formats)] == [22]
+        with pytest.raises(ValueError):
+            FormatSelector('best-video+best-audio+best-audio')
@@ -0,0 +1,114 @@
+"""Unit tests for tracing spans"""
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch, MagicMock
+
+import pytest
+
+from youtube_downloader import tracing
+from youtube_downloader.downloader import YouTubeDownloader
+from youtube_downloader.tracing import InMemoryExporter, JsonFileExporter, NOOP_SPAN, Tracer, propagate, span
+
+PAYLOAD = bytes(range(256)) * 40
+
+
+@pytest.fixture
+def exporter():
+    exporter = InMemoryExporter()
+    tracing.set_exporter(exporter)
+    yield exporter
+    tracing.set_exporter(None)
+
+
+class TestSpans:
+    """Creating, nesting and exporting spans"""
+
+    def test_disabled_tracer_returns_noop(self):
+        assert Tracer().span('anything', video_id='x') is NOOP_SPAN
+        assert span('anything') is NOOP_SPAN
+
+    def test_nesting_and_attributes(self, exporter):
+        with span('download', video_id='abc') as outer:
+            with span('transfer', itag=22) as inner:
+                inner.set_attribute('bytes', 10)
+
+        transfer, download = exporter.spans
+        assert transfer.parent_id == download.span_id
+        assert transfer.trace_id == download.trace_id
+        assert transfer.attributes == {'itag': 22, 'bytes': 10}
+        assert download.parent_id is None
+        assert download.end_ns >= transfer.end_ns
+
+    def test_error_is_recorded(self, exporter):
+        with pytest.raises(ValueError):
+            with span('player_request'):
+                raise ValueError("boom")
+
+        assert exporter.spans[0].to_otlp()['status'] == {'code': 2, 'message': 'ValueError: boom'}
+
+    def test_propagate_to_worker_thread(self, exporter):
+        def work():
+            with span('segment'):
+                pass
+
+        with span('download') as parent:
+            with ThreadPoolExecutor(max_workers=1) as executor:
+                executor.submit(propagate(work)).result()
+
+        segment = exporter.spans[0]
+        assert segment.parent_id == parent.span_id
+
+    def test_json_file_exporter(self, tmp_path):
+        path = tmp_path / 'trace.jsonl'
+        tracer = Tracer(JsonFileExporter(str(path), batch_size=2))
+        for attempt in (1, 2, 3):
+            with tracer.span('media_request', attempt=attempt, proxy='direct'):
+                pass
+        tracer.shutdown()
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert len(lines) == 2
+        spans = [s for line in lines for s in line['resourceSpans'][0]['scopeSpans'][0]['spans']]
+        assert [s['name'] for s in spans] == ['media_request'] * 3
+        assert spans[0]['attributes'] == [
+            {'key': 'attempt', 'value': {'intValue': '1'}},
+            {'key': 'proxy', 'value': {'stringValue': 'direct'}},
+        ]
+        assert int(spans[0]['endTimeUnixNano']) >= int(spans[0]['startTimeUnixNano'])
+
+    def test_exporter_must_implement_export(self):
+        class Incomplete(tracing.SpanExporter):
+            pass
+
+        with pytest.raises(TypeError):
+            Incomplete()
+
+
+class TestDownloadSpans:
+    """Phases of a download are traced"""
+
+    @patch.object(YouTubeDownloader, '_get_video_info')
+    @patch('youtube_downloader.downloader.tqdm')
+    @patch('youtube_downloader.downloader.requests.Session.get')
+    def test_download_phases(self, mock_get, mock_tqdm, mock_info, exporter, tmp_path):
+        mock_info.return_value = {
+            'playabilityStatus': {'status': 'OK'},
+            'streamingData': {'formats': [{
+                'itag': 18, 'url': 'http://example.com/video.mp4', 'mimeType': 'video/mp4; codecs="avc1, mp4a"',
+                'qualityLabel': '360p', 'contentLength': str(len(PAYLOAD))
+            }]}
+        }
+        response = MagicMock(status_code=200, headers={'content-length': str(len(PAYLOAD))})
+        response.iter_content.return_value = [PAYLOAD]
+        mock_get.return_value = response
+
+        YouTubeDownloader("https://www.youtube.com/watch?v=dQw4w9WgXcQ").download(str(tmp_path / 'video.mp4'))
+
+        spans = {s.name: s for s in exporter.spans}
+        assert {'download', 'get_formats', 'video_info', 'select_format', 'media_request',
+                'transfer', 'disk_flush'} <= set(spans)
+        assert spans['transfer'].parent_id == spans['download'].span_id
+        assert spans['transfer'].attributes['bytes'] == len(PAYLOAD)
+        assert spans['download'].attributes['video_id'] == 'dQw4w9WgXcQ'
+        assert spans['media_request'].attributes['attempt'] == 1
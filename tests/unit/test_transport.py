@@ -0,0 +1,70 @@
+"""Unit tests for the shared HTTP transport"""
+
+from unittest.mock import patch, MagicMock
+from youtube_downloader.downloader import YouTubeDownloader, PlaylistDownloader
+from youtube_downloader.proxy_manager import ProxyConfig
+from youtube_downloader.transport import HttpTransport
+
+
+class TestHttpTransport:
+    """Test cases for HttpTransport"""
+
+    def test_pool_size_follows_workers(self):
+        """Test that adapters are sized for the number of workers"""
+        transport = HttpTransport(pool_size=12)
+        adapter = transport.session.get_adapter('https://www.youtube.com')
+        assert adapter._pool_maxsize == 12
+
+        transport.resize(24)
+        assert transport.session.get_adapter('https://rr1.googlevideo.com')._pool_maxsize == 24
+
+        # Never shrinks
+        transport.resize(4)
+        assert transport.pool_size == 24
+
+    def test_downloaders_share_session(self):
+        """Test that downloaders built on one transport reuse its session"""
+        transport = HttpTransport()
+        first = YouTubeDownloader("dQw4w9WgXcQ", transport=transport)
+        second = YouTubeDownloader("9bZkp7q19f0", transport=transport)
+
+        assert first.session is second.session is transport.session
+
+    def test_shared_transport_not_closed_by_downloader(self):
+        """Test that only the creator of a transport closes it"""
+        transport = HttpTransport()
+        with patch.object(transport, 'close') as mock_close:
+            with YouTubeDownloader("dQw4w9WgXcQ", transport=transport):
+                pass
+            mock_close.assert_not_called()
+
+        downloader = YouTubeDownloader("dQw4w9WgXcQ")
+        with patch.object(downloader.transport, 'close') as mock_close:
+            downloader.close()
+            mock_close.assert_called_once()
+
+    def test_proxy_is_per_request(self):
+        """Test that proxies are passed per request instead of set on the shared session"""
+        transport = HttpTransport()
+        proxy_manager = MagicMock()
+        proxy = ProxyConfig(host='10.0.0.1', port=8080)
+        proxy_manager.get_proxy.return_value = proxy
+
+        downloader = YouTubeDownloader("dQw4w9WgXcQ", proxy_manager=proxy_manager, transport=transport)
+
+        assert transport.session.proxies == {}
+        assert downloader._proxies == proxy.to_dict()
+
+    def test_playlist_closes_owned_transport(self):
+        """Test that a playlist run closes the pool it created"""
+        playlist = PlaylistDownloader("PLxxx", concurrency=4)
+        videos = [{'video_id': 'vid1', 'title': 'Video 1', 'url': 'https://www.youtube.com/watch?v=vid1'}]
+
+        with patch.object(playlist, 'get_videos', return_value=videos), \
+                patch.object(playlist, '_download_single_video', return_value=True), \
+                patch('youtube_downloader.downloader.os.makedirs'), \
+                patch.object(playlist.transport, 'close') as mock_close:
+            playlist.download(output_dir="./test", segments=2)
+
+        mock_close.assert_called_once()
+        assert playlist.transport.pool_size == 8
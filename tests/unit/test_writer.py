@@ -0,0 +1,123 @@
+"""Unit tests for the disk writer stage"""
+
+import os
+import pytest
+from unittest.mock import patch
+from youtube_downloader.writer import DiskWriter, BufferPool
+
+BLOCK = 64 * 1024
+
+
+def _payload(size):
+    return bytes(range(256)) * (size // 256) + bytes(range(size % 256))
+
+
+class TestDiskWriter:
+    """Test cases for DiskWriter"""
+
+    def test_small_writes_are_coalesced_into_aligned_blocks(self, tmp_path):
+        """Test that 4 KiB chunks reach the disk as block-aligned 64 KiB writes"""
+        payload = _payload(4 * BLOCK + 1000)
+        path = tmp_path / 'out.part'
+        calls = []
+        real_pwrite = os.pwrite
+
+        def recording_pwrite(fd, data, offset):
+            calls.append((offset, len(data)))
+            return real_pwrite(fd, data, offset)
+
+        with patch('youtube_downloader.writer.os.pwrite', side_effect=recording_pwrite), \
+                open(path, 'wb', buffering=0) as f:
+            with DiskWriter(f, block_size=BLOCK) as writer:
+                stream = writer.stream(0)
+                for i in range(0, len(payload), 4096):
+                    stream.write(payload[i:i + 4096])
+
+        assert path.read_bytes() == payload
+        assert calls[:4] == [(i * BLOCK, BLOCK) for i in range(4)]
+        assert calls[4] == (4 * BLOCK, 1000)
+
+    def test_unaligned_start_realigns_after_first_block(self, tmp_path):
+        """Test that a stream resuming mid-block writes up to the boundary first"""
+        path = tmp_path / 'out.part'
+        path.write_bytes(b'x' * 100)
+        calls = []
+        real_pwrite = os.pwrite
+
+        def recording_pwrite(fd, data, offset):
+            calls.append((offset, len(data)))
+            return real_pwrite(fd, data, offset)
+
+        with patch('youtube_downloader.writer.os.pwrite', side_effect=recording_pwrite), \
+                open(path, 'r+b', buffering=0) as f:
+            with DiskWriter(f, block_size=BLOCK) as writer:
+                writer.stream(100).write(b'\0' * (2 * BLOCK))
+
+        assert calls[0] == (100, BLOCK - 100)
+        assert calls[1] == (BLOCK, BLOCK)
+        assert os.path.getsize(path) == 2 * BLOCK + 100
+
+    def test_preallocates_known_size(self, tmp_path):
+        """Test that the file is reserved at its final size up front"""
+        path = tmp_path / 'out.part'
+        with open(path, 'wb', buffering=0) as f:
+            writer = DiskWriter(f, size=10 * BLOCK, block_size=BLOCK)
+            assert os.path.getsize(path) == 10 * BLOCK
+            writer.stream(0).write(b'abc')
+            writer.close()
+
+        assert path.read_bytes()[:3] == b'abc'
+
+    def test_barrier_runs_after_earlier_writes(self, tmp_path):
+        """Test that a barrier callback sees everything written before it"""
+        path = tmp_path / 'out.part'
+        seen = []
+        with open(path, 'wb', buffering=0) as f:
+            with DiskWriter(f, block_size=BLOCK) as writer:
+                stream = writer.stream(0)
+                stream.write(b'\1' * 5000)
+                stream.barrier(lambda: seen.append((stream.written, os.path.getsize(path))))
+                stream.write(b'\2' * 5000)
+
+        assert seen == [(5000, 5000)]
+
+    @pytest.mark.parametrize('policy,expected', [('always', 4), ('checkpoint', 2), ('close', 1), ('never', 0)])
+    def test_fsync_policy(self, tmp_path, policy, expected):
+        """Test how often each policy fsyncs for three block writes, a barrier and close"""
+        with patch('youtube_downloader.writer.os.fsync') as mock_fsync, \
+                open(tmp_path / 'out.part', 'wb', buffering=0) as f:
+            with DiskWriter(f, fsync=policy, block_size=BLOCK) as writer:
+                stream = writer.stream(0)
+                stream.write(b'\0' * BLOCK)
+                stream.barrier(lambda: None)
+                stream.write(b'\0' * (BLOCK + 1))
+
+        assert mock_fsync.call_count == expected
+
+    def test_write_errors_surface_in_the_reader(self, tmp_path):
+        """Test that a failed disk write is raised to the caller"""
+        with patch('youtube_downloader.writer.os.pwrite', side_effect=OSError(28, 'No space left on device')), \
+                open(tmp_path / 'out.part', 'wb', buffering=0) as f:
+            writer = DiskWriter(f, block_size=BLOCK, queue_blocks=1)
+            stream = writer.stream(0)
+            with pytest.raises(OSError):
+                for _ in range(50):
+                    stream.write(b'\0' * BLOCK)
+                writer.close()
+
+    def test_unknown_policy_rejected(self, tmp_path):
+        """Test that a misspelled fsync policy raises ValueError"""
+        with open(tmp_path / 'out.part', 'wb') as f, pytest.raises(ValueError):
+            DiskWriter(f, fsync='sometimes')
+
+
+class TestBufferPool:
+    """Test cases for BufferPool"""
+
+    def test_blocks_are_reused(self):
+        """Test that released blocks are handed out again instead of new ones"""
+        pool = BufferPool(block_size=16, capacity=1)
+        block = pool.acquire()
+        pool.release(block)
+
+        assert pool.acquire() is block
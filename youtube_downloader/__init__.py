@@ -1,5 +1,11 @@
 from .downloader import YouTubeDownloader, PlaylistDownloader
+from .batch import BatchDownloader
+from .async_downloader import AsyncYouTubeDownloader, AsyncPlaylistDownloader
 from .proxy_manager import ProxyManager, ProxyConfig
 
 __version__ = "0.1.0"
-__all__ = ["YouTubeDownloader", "PlaylistDownloader", "ProxyManager", "ProxyConfig"]
+__all__ = [
+    "YouTubeDownloader", "PlaylistDownloader", "BatchDownloader",
+    "AsyncYouTubeDownloader", "AsyncPlaylistDownloader",
+    "ProxyManager", "ProxyConfig"
+]
@@ -0,0 +1,120 @@
+"""
+Download archive for YouTube Downloader
+
+A SQLite table of finished downloads keyed by video ID (itag, size, path,
+checksum, time). The IDs are loaded into memory when the archive is opened,
+so deciding whether a video is already in the library is a set lookup: no
+file-system stat, no player API call, and unaffected by title changes that
+would alter the output file name.
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS downloads (
+    video_id TEXT PRIMARY KEY,
+    itag TEXT,
+    size INTEGER,
+    path TEXT NOT NULL,
+    checksum TEXT,
+    downloaded_at REAL NOT NULL
+)
+"""
+
+
+@dataclass
+class ArchiveEntry:
+    """One archived download."""
+    video_id: str
+    itag: Optional[str]
+    size: Optional[int]
+    path: str
+    checksum: Optional[str]
+    downloaded_at: float
+
+
+class DownloadArchive:
+    """
+    Persistent record of downloaded videos, safe to share between threads.
+
+    Every ``add`` is committed immediately, so an interrupted run keeps
+    everything it finished.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize DownloadArchive.
+
+        Args:
+            path: SQLite database file (created if missing)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+        self._ids: Set[str] = {row[0] for row in self._db.execute("SELECT video_id FROM downloads")}
+        logger.debug(f"Loaded {len(self._ids)} archived videos from {path}")
+
+    def __contains__(self, video_id: str) -> bool:
+        return video_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, video_id: str) -> Optional[ArchiveEntry]:
+        """Return the archived download of ``video_id``, or None."""
+        if video_id not in self._ids:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT video_id, itag, size, path, checksum, downloaded_at FROM downloads WHERE video_id = ?",
+                (video_id,)
+            ).fetchone()
+        return ArchiveEntry(*row) if row else None
+
+    def add(self, video_id: str, path: str, itag=None, size: Optional[int] = None,
+            checksum: Optional[str] = None):
+        """
+        Record a finished download, replacing any earlier entry for the video.
+
+        Args:
+            video_id: YouTube video ID
+            path: Where the file was saved
+            itag: Format downloaded (``'137+140'`` for merged formats)
+            size: File size in bytes
+            checksum: Digest of the file, e.g. ``'sha256:...'``
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO downloads (video_id, itag, size, path, checksum, downloaded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (video_id, str(itag) if itag is not None else None, size, path, checksum, time.time())
+            )
+            self._db.commit()
+            self._ids.add(video_id)
+
+    def remove(self, video_id: str):
+        """Forget ``video_id`` so it is downloaded again."""
+        with self._lock:
+            self._db.execute("DELETE FROM downloads WHERE video_id = ?", (video_id,))
+            self._db.commit()
+            self._ids.discard(video_id)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,587 @@
+"""
+Asyncio download engine for YouTube Downloader
+
+AsyncYouTubeDownloader and AsyncPlaylistDownloader mirror the threaded
+classes - same format selection, proxy rotation and .part resume - but run
+every player call and media stream on a single event loop, so hundreds of
+concurrent requests do not need hundreds of OS threads. Nothing that can
+block runs on the loop: chunks are copied and hashed on the loop's default
+executor and written (and fsynced) by a DiskWriter thread per file.
+
+Requires the optional aiohttp dependency (``pip install ytsnap[async]``).
+SOCKS proxies are not supported by this engine.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Optional, List, Dict, Callable, AsyncIterator
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+from .downloader import (
+    ANDROID_CLIENT, WEB_CLIENT, CHUNK_SIZE, API_BASE_URL,
+    extract_video_id, extract_playlist_id, extract_playlist_videos, extract_playlist_continuation,
+    parse_formats, select_format, media_headers, playlist_output_path
+)
+from .proxy_manager import ProxyManager, ProxyConfig
+from .resume import PartFile
+from .writer import DiskWriter, WriterStream
+from .integrity import DEFAULT_ALGORITHM, StreamDigest, DownloadResult, unsatisfied_length, validate_algorithm
+from .cache import PlayerResponseCache, StaleStreamURL, STALE_URL_STATUSES
+from .transport import BROWSER_HEADERS
+from .rate_limit import RequestPacer
+from .bandwidth import BandwidthScheduler
+from .progress import Progress
+
+logger = logging.getLogger(__name__)
+
+PLAYER_API_URL = f"{API_BASE_URL}/player"
+BROWSE_API_URL = f"{API_BASE_URL}/browse"
+
+
+def _require_aiohttp():
+    if aiohttp is None:
+        raise ImportError("The asyncio engine requires aiohttp: pip install ytsnap[async]")
+
+
+def _proxy_url(proxy: Optional[ProxyConfig]) -> Optional[str]:
+    """Per-request proxy URL for aiohttp (credentials included)."""
+    if proxy is None:
+        return None
+    if proxy.scheme in ('socks4', 'socks5'):
+        raise ValueError(f"SOCKS proxy {proxy} is not supported by the asyncio engine")
+    return proxy.to_dict()['http']
+
+
+def _network_errors():
+    return (aiohttp.ClientError, asyncio.TimeoutError)
+
+
+def _consume(stream: WriterStream, digest: Optional[StreamDigest], chunk: bytes):
+    """Hand a chunk to the disk writer and the digest (on an executor thread)."""
+    stream.write(chunk)
+    if digest:
+        digest.update(chunk)
+
+
+class AsyncYouTubeDownloader:
+    """Asyncio counterpart of YouTubeDownloader."""
+
+    def __init__(self, url: str, proxy_manager: Optional[ProxyManager] = None,
+                 cache: Optional[PlayerResponseCache] = None, session=None,
+                 pacer: Optional[RequestPacer] = None, bandwidth: Optional[BandwidthScheduler] = None,
+                 priority: float = 1.0, checksum: Optional[str] = DEFAULT_ALGORITHM,
+                 progress: Optional[Progress] = None):
+        """
+        Initialize AsyncYouTubeDownloader.
+
+        Args:
+            url: Video URL or ID
+            proxy_manager: Optional ProxyManager for proxy support
+            cache: Player response cache (default: in-memory)
+            session: Shared aiohttp.ClientSession. A private one is created
+                (and closed by ``close``) when omitted.
+            pacer: Token buckets shared with other downloaders (no pacing if None)
+            bandwidth: Process-wide byte-rate cap. Waiting for it happens on the
+                loop's default executor so the event loop is never blocked.
+            priority: This download's weight within ``bandwidth``
+            checksum: Digest computed on the chunks as they arrive (None disables hashing)
+            progress: Aggregated progress this download's bytes are counted in
+        """
+        _require_aiohttp()
+        if checksum:
+            validate_algorithm(checksum)
+        self.url = url
+        self.video_id = extract_video_id(url)
+        self.proxy_manager = proxy_manager
+        self.cache = cache if cache is not None else PlayerResponseCache()
+        self.session = session
+        self._owns_session = session is None
+        self._active_proxy = None  # type: Optional[ProxyConfig]
+        self.pacer = pacer
+        self.bandwidth = bandwidth
+        self.priority = priority
+        self.checksum = checksum
+        self.progress = progress
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self):
+        if self.session is None:
+            self.session = aiohttp.ClientSession(headers=BROWSER_HEADERS)
+        return self.session
+
+    async def close(self):
+        """Close the session if this downloader created it."""
+        if self._owns_session and self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    def _current_proxy(self) -> Optional[ProxyConfig]:
+        """Refresh the active proxy in case the manager rotated by time."""
+        if self.proxy_manager:
+            maybe = self.proxy_manager.get_proxy()
+            if maybe:
+                self._active_proxy = maybe
+        return self._active_proxy
+
+    async def _pace(self, kind: str, proxy: Optional[ProxyConfig]):
+        if self.pacer:
+            delay = self.pacer.reserve(kind, proxy)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    def _rotate_proxy(self):
+        if self.proxy_manager:
+            proxy = self.proxy_manager.get_proxy()
+            if proxy:
+                self._active_proxy = proxy
+
+    async def _get_video_info(self, retries: int = 3) -> Dict:
+        payload = {
+            "context": {"client": dict(ANDROID_CLIENT)},
+            "videoId": self.video_id
+        }
+
+        client = ANDROID_CLIENT["clientName"]
+        cached = self.cache.get(self.video_id, client)
+        if cached is not None:
+            return cached
+
+        session = self._get_session()
+        for attempt in range(retries):
+            current_proxy = self._current_proxy()
+            await self._pace('player', current_proxy)
+            started = time.monotonic()
+            try:
+                async with session.post(PLAYER_API_URL, json=payload, proxy=_proxy_url(current_proxy),
+                                        timeout=aiohttp.ClientTimeout(total=30)) as response:
+                    if response.status == 429:
+                        if self.proxy_manager:
+                            logger.warning("Rate limited (429). Rotating proxy...")
+                            if current_proxy:
+                                self.proxy_manager.record_failure(
+                                    current_proxy,
+                                    Exception("429 Too Many Requests")
+                                )
+                            self._rotate_proxy()
+                            if attempt < retries - 1:
+                                continue
+                        raise Exception("Rate limited by YouTube (429 Too Many Requests)")
+
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+
+                if self.proxy_manager and current_proxy:
+                    self.proxy_manager.record_success(current_proxy)
+                    self.proxy_manager.record_timing(current_proxy, time.monotonic() - started)
+
+                if isinstance(data, dict) and data.get('playabilityStatus', {}).get('status') == 'OK':
+                    self.cache.put(self.video_id, client, data)
+                return data
+
+            except _network_errors() as e:
+                if self.proxy_manager and attempt < retries - 1:
+                    logger.warning(f"Request failed. Rotating proxy... ({attempt + 1}/{retries})")
+                    if current_proxy:
+                        self.proxy_manager.record_failure(current_proxy, e)
+                    self._rotate_proxy()
+                else:
+                    raise
+
+        raise Exception("Failed to fetch video info after multiple attempts")
+
+    async def get_formats(self) -> List[Dict]:
+        return parse_formats(await self._get_video_info())
+
+    async def _request_media(self, url: str, headers: Dict[str, str], retries: int = 3,
+                             accept_unsatisfiable: bool = False):
+        """Open a media response, rotating proxies on 429s and network errors.
+
+        With ``accept_unsatisfiable``, a 416 is returned instead of raised (a
+        resumed range that starts at the end of the stream). The caller must
+        ``release()`` the returned response.
+        """
+        session = self._get_session()
+        for attempt in range(retries):
+            current_proxy = self._current_proxy()
+            await self._pace('media', current_proxy)
+            try:
+                started = time.monotonic()
+                response = await session.get(url, headers=headers, proxy=_proxy_url(current_proxy),
+                                             timeout=aiohttp.ClientTimeout(total=None, sock_read=60))
+                ttfb = time.monotonic() - started
+                if response.status == 429 and self.proxy_manager and attempt < retries - 1:
+                    response.release()
+                    logger.warning("Rate limited during download. Rotating proxy...")
+                    if current_proxy:
+                        self.proxy_manager.record_failure(current_proxy, Exception("429 Too Many Requests"))
+                    self._rotate_proxy()
+                    continue
+                if response.status in STALE_URL_STATUSES:
+                    # Bound to the IP the player response was fetched from; no proxy helps
+                    response.release()
+                    raise StaleStreamURL(f"Stream URL rejected ({response.status})")
+                if response.status >= 400 and not (accept_unsatisfiable and response.status == 416):
+                    response.release()
+                    response.raise_for_status()
+
+                if self.proxy_manager and current_proxy:
+                    self.proxy_manager.record_success(current_proxy)
+                    self.proxy_manager.record_timing(current_proxy, ttfb)
+                return response
+
+            except _network_errors() as e:
+                if self.proxy_manager and attempt < retries - 1:
+                    logger.warning(f"Download failed ({e.__class__.__name__}). Retrying with new proxy...")
+                    if current_proxy:
+                        self.proxy_manager.record_failure(current_proxy, e)
+                    self._rotate_proxy()
+                else:
+                    raise
+
+        raise Exception("Failed to get a successful response after all retries.")
+
+    async def download(self, output_file: str = 'video.mp4', itag=None, quality=None,
+                       on_progress: Optional[Callable[[int, int], None]] = None,
+                       format_spec: Optional[str] = None) -> DownloadResult:
+        """
+        Download a single format to ``output_file``.
+
+        Args:
+            output_file: Destination path
+            itag: Specific itag to use
+            quality: Quality preference (e.g., '720p')
+            on_progress: Optional callback ``(bytes_done, total_bytes)`` per chunk
+            format_spec: Format selector expression; overrides itag and quality
+
+        Returns:
+            DownloadResult: the output path with its size and checksum
+        """
+        try:
+            return await self._download_selected(output_file, itag, quality, on_progress, format_spec)
+        except StaleStreamURL as e:
+            # A cached response fetched through another proxy (or revoked): fetch it
+            # again, continuing from the .part file
+            logger.warning(f"{e}; fetching a fresh player response...")
+            self.cache.invalidate(self.video_id, ANDROID_CLIENT["clientName"])
+            return await self._download_selected(output_file, itag, quality, on_progress, format_spec)
+
+    async def _download_selected(self, output_file: str, itag, quality,
+                                 on_progress: Optional[Callable[[int, int], None]],
+                                 format_spec: Optional[str]) -> DownloadResult:
+        """Select a format from the player response and download it."""
+        formats = await self.get_formats()
+
+        if not formats:
+            raise Exception("No downloadable formats found")
+
+        selected = select_format(formats, itag=itag, quality=quality, format_spec=format_spec)
+        part = PartFile(output_file, selected.get('itag'), int(selected.get('filesize') or 0))
+        offset = part.resume_offset()
+
+        loop = asyncio.get_running_loop()
+        if part.content_length and offset >= part.content_length:
+            # Killed between the last checkpoint and the rename: nothing to fetch
+            return await self._finish_part(part, selected, output_file, offset)
+        response = await self._request_media(selected['url'], media_headers(f'bytes={offset}-'),
+                                             accept_unsatisfiable=bool(offset))
+        if response.status == 416:
+            # The server has nothing past the offset: the .part file is the whole stream
+            response.release()
+            if not part.content_length:
+                part.content_length = unsatisfied_length(response.headers) or 0
+            return await self._finish_part(part, selected, output_file, offset)
+        proxy = self._active_proxy
+        started, start_offset = time.monotonic(), offset
+        share = self.bandwidth.register(self.priority) if self.bandwidth else None
+        try:
+            if offset and response.status != 206:
+                # Server ignored the range, start over
+                offset = start_offset = 0
+
+            remaining = int(response.headers.get('Content-Length', 0))
+            if remaining and not part.content_length:
+                part.content_length = offset + remaining
+            total_size = part.content_length or offset + remaining
+            digest = StreamDigest(self.checksum) if self.checksum else None
+            if digest and offset:
+                # Reads back the resumed prefix, possibly gigabytes
+                await loop.run_in_executor(None, digest.update_from_file, part.path, 0, offset)
+            if self.progress:
+                self.progress.expect(self.video_id, total_size, received=offset)
+
+            f = await loop.run_in_executor(None, part.open, offset)
+            writer = DiskWriter(f, size=part.content_length)
+            stream = writer.stream(offset)
+            try:
+                async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                    # Copying into the writer's blocks may wait for the disk; hashing takes CPU
+                    await loop.run_in_executor(None, _consume, stream, digest, chunk)
+                    offset += len(chunk)
+                    if part.checkpoint_due(len(chunk)):
+                        stream.barrier(lambda: part.save(committed=stream.written))
+                    if share:
+                        # Slept on the loop: no executor thread is held while throttled
+                        delay = share.reserve(len(chunk))
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    if self.progress:
+                        self.progress.advance(self.video_id, len(chunk))
+                    if on_progress:
+                        on_progress(offset, total_size)
+            finally:
+                try:
+                    await loop.run_in_executor(None, writer.close)
+                finally:
+                    f.close()
+                    offset = stream.written
+        finally:
+            if share:
+                share.close()
+            response.release()
+            await loop.run_in_executor(None, part.save, offset)
+            if self.proxy_manager and proxy:
+                self.proxy_manager.record_throughput(proxy, offset - start_offset, time.monotonic() - started)
+
+        part.finalize(offset)
+        return DownloadResult(output_file, itag=selected.get('itag'), size=offset,
+                              expected_size=part.content_length or None,
+                              checksum=digest.checksum if digest else None)
+
+
+    async def _finish_part(self, part: PartFile, selected: Dict, output_file: str, size: int) -> DownloadResult:
+        """Finalize a .part file that already holds every byte, hashing it from disk."""
+        loop = asyncio.get_running_loop()
+        digest = StreamDigest(self.checksum) if self.checksum else None
+        if digest:
+            await loop.run_in_executor(None, digest.update_from_file, part.path, 0, size)
+        if self.progress:
+            self.progress.expect(self.video_id, size, received=size)
+        part.finalize(size)
+        return DownloadResult(output_file, itag=selected.get('itag'), size=size,
+                              expected_size=part.content_length or None,
+                              checksum=digest.checksum if digest else None)
+
+
+class AsyncPlaylistDownloader:
+    """Asyncio counterpart of PlaylistDownloader."""
+
+    def __init__(self, playlist_url: str, proxy_manager: Optional[ProxyManager] = None, concurrency: int = 3,
+                 cache: Optional[PlayerResponseCache] = None, connection_limit: int = 100,
+                 pacer: Optional[RequestPacer] = None, bandwidth: Optional[BandwidthScheduler] = None,
+                 checksum: Optional[str] = DEFAULT_ALGORITHM, progress: Optional[Progress] = None):
+        """
+        Initialize AsyncPlaylistDownloader.
+
+        Args:
+            playlist_url: URL of the YouTube playlist
+            proxy_manager: Optional ProxyManager for proxy support
+            concurrency: Number of videos downloaded at once (default: 3)
+            cache: Player response cache shared by all videos (default: in-memory)
+            connection_limit: Size of the shared connection pool
+            pacer: Token buckets every browse, player and media request goes through
+            bandwidth: Byte-rate cap shared fairly by the videos in flight
+            checksum: Digest algorithm for every video (None disables hashing)
+            progress: Where the run reports its aggregated progress (default: quiet)
+        """
+        _require_aiohttp()
+        self.playlist_url = playlist_url
+        self.playlist_id = extract_playlist_id(playlist_url)
+        self.proxy_manager = proxy_manager
+        self.concurrency = concurrency
+        self.cache = cache if cache is not None else PlayerResponseCache()
+        self.connection_limit = connection_limit
+        self.pacer = pacer
+        self.bandwidth = bandwidth
+        self.checksum = checksum
+        self.progress = progress if progress is not None else Progress()
+        self.session = None
+        self.videos = []
+        self._browse_client = ANDROID_CLIENT
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _get_session(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit)
+            self.session = aiohttp.ClientSession(headers=BROWSER_HEADERS, connector=connector)
+        return self.session
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _browse(self, client: Dict, retries: int = 3, **target) -> Dict:
+        """POST a browse request, rotating proxies on 429s and network errors."""
+        payload = {"context": {"client": client}}
+        payload.update(target)
+        for attempt in range(retries):
+            proxy = self.proxy_manager.get_proxy() if self.proxy_manager else None
+            if self.pacer:
+                delay = self.pacer.reserve('browse', proxy)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            try:
+                async with self._get_session().post(BROWSE_API_URL, json=payload, proxy=_proxy_url(proxy),
+                                                    timeout=aiohttp.ClientTimeout(total=30)) as response:
+                    if response.status == 429 and self.proxy_manager and attempt < retries - 1:
+                        logger.warning("Rate limited while listing the playlist. Rotating proxy...")
+                        if proxy:
+                            self.proxy_manager.record_failure(proxy, Exception("429 Too Many Requests"))
+                        continue
+                    response.raise_for_status()
+                    data = await response.json(content_type=None)
+                if self.proxy_manager and proxy:
+                    self.proxy_manager.record_success(proxy)
+                return data
+            except _network_errors() as e:
+                if self.proxy_manager and attempt < retries - 1:
+                    logger.warning(f"Playlist request failed ({e.__class__.__name__}). Retrying with new proxy...")
+                    if proxy:
+                        self.proxy_manager.record_failure(proxy, e)
+                else:
+                    raise
+        raise Exception("Failed to fetch playlist page after all retries.")
+
+    async def _get_playlist_info(self) -> Dict:
+        """Fetch playlist metadata, falling back to the WEB client like PlaylistDownloader."""
+        browse_id = f"VL{self.playlist_id}"
+        try:
+            data = await self._browse(dict(ANDROID_CLIENT), browseId=browse_id)
+            self._browse_client = ANDROID_CLIENT
+            return data
+        except _network_errors():
+            try:
+                data = await self._browse(dict(WEB_CLIENT), browseId=browse_id)
+                self._browse_client = WEB_CLIENT
+                return data
+            except Exception as e:
+                raise Exception(f"Failed to fetch playlist info: {e}")
+
+    async def iter_videos(self) -> AsyncIterator[Dict]:
+        """Lazily yield the videos of the playlist, following continuation pages."""
+        data = await self._get_playlist_info()
+        videos = extract_playlist_videos(data)
+        token = extract_playlist_continuation(data)
+
+        if not videos and not token:
+            raise Exception("No videos found in playlist or playlist is private/unavailable")
+
+        while True:
+            for video in videos:
+                yield video
+            if not token:
+                break
+            try:
+                data = await self._browse(dict(self._browse_client), continuation=token)
+            except Exception as e:
+                raise Exception(f"Failed to fetch playlist continuation: {e}")
+            videos = extract_playlist_videos(data)
+            token = extract_playlist_continuation(data)
+
+    async def get_videos(self) -> List[Dict]:
+        """Fetch all videos from the playlist."""
+        if not self.videos:
+            self.videos = [video async for video in self.iter_videos()]
+        return self.videos
+
+    async def _iter_videos(self) -> AsyncIterator[Dict]:
+        """The videos already fetched by ``get_videos``, or else the playlist page by page."""
+        if self.videos:
+            for video in self.videos:
+                yield video
+        else:
+            async for video in self.iter_videos():
+                yield video
+
+    async def download(self, output_dir: str = "./downloads", quality: Optional[str] = None,
+                       itag: Optional[int] = None, on_video_start: Optional[Callable] = None,
+                       on_video_complete: Optional[Callable] = None,
+                       on_error: Optional[Callable] = None,
+                       format_spec: Optional[str] = None) -> Dict:
+        """
+        Download all videos from the playlist on the running event loop.
+
+        Takes the same arguments and returns the same statistics dict as
+        PlaylistDownloader.download. Like there, continuation pages are
+        fetched as the videos before them are taken by the ``concurrency``
+        workers, so memory does not grow with the playlist.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+
+        stats = {
+            'total': 0,
+            'successful': 0,
+            'failed': 0,
+            'failed_videos': []
+        }
+        # Enumeration runs at most one page ahead of the workers
+        pending: 'asyncio.Queue[Optional[Dict]]' = asyncio.Queue(maxsize=self.concurrency)
+
+        async def enumerate_videos():
+            try:
+                async for video in self._iter_videos():
+                    stats['total'] += 1
+                    self.progress.queued(video)
+                    await pending.put(video)
+            finally:
+                for _ in range(self.concurrency):
+                    await pending.put(None)
+
+        async def download_video(video: Dict):
+            if on_video_start:
+                on_video_start(video)
+            self.progress.start(video)
+            result = playlist_output_path(output_dir, video)
+            skipped = os.path.exists(result)
+            if not skipped:
+                downloader = AsyncYouTubeDownloader(video['url'], proxy_manager=self.proxy_manager,
+                                                    cache=self.cache, session=self._get_session(),
+                                                    pacer=self.pacer, bandwidth=self.bandwidth,
+                                                    checksum=self.checksum, progress=self.progress)
+                result = await downloader.download(result, quality=quality, itag=itag,
+                                                   format_spec=format_spec)
+            self.progress.done(video, result, skipped=skipped)
+            if on_video_complete:
+                on_video_complete(video, result)
+
+        async def worker():
+            while True:
+                video = await pending.get()
+                if video is None:
+                    return
+                try:
+                    await download_video(video)
+                except Exception as e:
+                    stats['failed'] += 1
+                    stats['failed_videos'].append(video)
+                    self.progress.failed(video, e)
+                    if on_error:
+                        on_error(video, e)
+                else:
+                    stats['successful'] += 1
+
+        results = await asyncio.gather(enumerate_videos(), *(worker() for _ in range(self.concurrency)),
+                                       return_exceptions=True)
+        for result in results:
+            # A playlist that cannot be listed fails the run, as in PlaylistDownloader
+            if isinstance(result, BaseException):
+                raise result
+
+        self.progress.summary(stats, output_dir=output_dir)
+        return stats
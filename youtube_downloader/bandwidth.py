@@ -0,0 +1,205 @@
+"""
+Bandwidth scheduling for YouTube Downloader
+
+A process-wide byte-rate cap that every media chunk passes through. Active
+downloads share the rate by weight (weighted fair queuing): whenever the
+cap is the bottleneck, the waiting download that has received the least
+data relative to its priority is served next, so a single download can
+still use the whole rate when it is the only one running.
+"""
+
+import re
+import time
+import threading
+from typing import Optional, List
+
+_RATE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+def parse_rate(spec: str) -> float:
+    """
+    Parse a byte rate such as ``'200M'``, ``'512K'`` or ``'1.5G'`` (per second).
+
+    Suffixes are binary (K = 1024 bytes); a trailing ``B`` or ``/s`` is accepted.
+
+    Raises:
+        ValueError: If the rate is malformed or not positive
+    """
+    match = re.fullmatch(r'\s*([0-9]*\.?[0-9]+)\s*([KMG]?)i?B?(?:/s)?\s*', spec, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid rate: {spec}")
+    rate = float(match.group(1)) * _RATE_UNITS[match.group(2).upper()]
+    if rate <= 0:
+        raise ValueError("Rate must be positive")
+    return rate
+
+
+class BandwidthShare:
+    """One download's slot in a BandwidthScheduler."""
+
+    def __init__(self, scheduler: 'BandwidthScheduler', priority: float):
+        self.scheduler = scheduler
+        self.priority = priority
+        self.bytes = 0
+        # Bytes served divided by priority; the lowest waiter goes first
+        self.virtual_time = 0.0
+
+    def consume(self, nbytes: int) -> float:
+        """Block until ``nbytes`` fit under the cap. Returns seconds waited."""
+        return self.scheduler.consume(self, nbytes)
+
+    def reserve(self, nbytes: int) -> float:
+        """Account ``nbytes`` now and return the seconds to wait (see ``BandwidthScheduler.reserve``)."""
+        return self.scheduler.reserve(self, nbytes)
+
+    def close(self):
+        """Leave the scheduler."""
+        self.scheduler.unregister(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BandwidthScheduler:
+    """
+    Global byte-rate cap shared fairly between downloads.
+
+    ``rate`` of None means unlimited; bytes are then only counted. The
+    limit can be changed at any time with ``set_rate``.
+    """
+
+    def __init__(self, rate: Optional[float] = None, burst: Optional[float] = None):
+        """
+        Initialize BandwidthScheduler.
+
+        Args:
+            rate: Bytes per second for the whole process (None for no cap)
+            burst: Bytes that may be sent at once after an idle period
+                (default: a quarter of a second worth of the rate)
+        """
+        self._cond = threading.Condition()
+        self._shares: List[BandwidthShare] = []
+        self._waiting: List[BandwidthShare] = []
+        self._burst = burst
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        self.rate = None  # type: Optional[float]
+        self.total_bytes = 0
+        self.set_rate(rate)
+        self._tokens = self.burst
+
+    @property
+    def burst(self) -> float:
+        if self._burst is not None:
+            return self._burst
+        return self.rate / 4 if self.rate else 0.0
+
+    def set_rate(self, rate: Optional[float]):
+        """Change the cap (bytes per second, None or 0 to remove it)."""
+        with self._cond:
+            if self.rate:
+                self._refill(time.monotonic())
+            self.rate = rate or None
+            if self.rate:
+                self._tokens = min(self._tokens, self.burst)
+                self._updated = time.monotonic()
+            self._cond.notify_all()
+
+    def register(self, priority: float = 1.0) -> BandwidthShare:
+        """
+        Add a download.
+
+        Args:
+            priority: Relative weight; a priority 2 download gets twice the
+                bytes of a priority 1 download while both are waiting
+        """
+        if priority <= 0:
+            raise ValueError("Priority must be positive")
+        share = BandwidthShare(self, priority)
+        with self._cond:
+            # Start level with the others instead of claiming their backlog
+            share.virtual_time = min((s.virtual_time for s in self._shares), default=0.0)
+            self._shares.append(share)
+        return share
+
+    def unregister(self, share: BandwidthShare):
+        with self._cond:
+            if share in self._shares:
+                self._shares.remove(share)
+            self._cond.notify_all()
+
+    @property
+    def active(self) -> int:
+        """Downloads currently registered."""
+        with self._cond:
+            return len(self._shares)
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, share: BandwidthShare, nbytes: int) -> float:
+        """
+        Account ``nbytes`` for ``share`` without blocking.
+
+        For callers that sleep themselves, e.g. with ``asyncio.sleep``. The
+        bytes are taken from the bucket at once (going into debt), and the
+        share waits off the debt scaled by its weight: the average priority of
+        the registered shares over its own. Downloads that keep reserving
+        thus settle at rates proportional to their priorities, together at
+        the cap.
+
+        Returns:
+            Seconds to wait before receiving the next chunk
+        """
+        with self._cond:
+            delay = 0.0
+            if self.rate:
+                self._refill(time.monotonic())
+                self._tokens -= nbytes
+                if self._tokens < 0:
+                    shares = self._shares or [share]
+                    average = sum(s.priority for s in shares) / len(shares)
+                    delay = -self._tokens / self.rate * average / share.priority
+            share.bytes += nbytes
+            share.virtual_time += nbytes / share.priority
+            self.total_bytes += nbytes
+        return delay
+
+    def consume(self, share: BandwidthShare, nbytes: int) -> float:
+        """
+        Account ``nbytes`` for ``share``, blocking while the cap is exhausted.
+
+        The bucket may go into debt by one chunk, so chunks larger than the
+        burst still pass; the debt is paid off before the next chunk.
+
+        Returns:
+            Seconds spent waiting
+        """
+        started = time.monotonic()
+        with self._cond:
+            if self._waiting and self.rate:
+                # A download that was idle may catch up by at most a second of
+                # the rate instead of replaying all the time it missed
+                floor = min(s.virtual_time for s in self._waiting) - self.rate
+                share.virtual_time = max(share.virtual_time, floor)
+            self._waiting.append(share)
+            try:
+                while self.rate:
+                    self._refill(time.monotonic())
+                    head = min(self._waiting, key=lambda s: s.virtual_time)
+                    if head is share and self._tokens > 0:
+                        self._tokens -= nbytes
+                        break
+                    timeout = -self._tokens / self.rate if self._tokens <= 0 else None
+                    self._cond.wait(timeout)
+            finally:
+                self._waiting.remove(share)
+            share.bytes += nbytes
+            share.virtual_time += nbytes / share.priority
+            self.total_bytes += nbytes
+            self._cond.notify_all()
+        return time.monotonic() - started
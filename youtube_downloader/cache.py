@@ -0,0 +1,155 @@
+"""
+Player response cache for YouTube Downloader
+
+Keeps ``/youtubei/v1/player`` responses in an in-process LRU and, optionally,
+on disk. Entries live only as long as the signed googlevideo URLs inside
+them: the TTL is taken from the ``expire`` query parameter of those URLs, so
+a cached response never hands out a URL that has already expired.
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple
+from urllib.parse import urlparse, parse_qs
+
+logger = logging.getLogger(__name__)
+
+# Media statuses meaning the signed URL itself is no good (bound to another IP, or revoked)
+STALE_URL_STATUSES = (403, 410)
+
+
+class StaleStreamURL(Exception):
+    """Raised when a media request rejects its stream URL; a fresh player response is needed."""
+
+
+def url_expiry(data: Dict) -> Optional[float]:
+    """
+    Earliest ``expire`` timestamp among the stream URLs of a player response.
+
+    Returns None when no URL carries one (nothing in the response is safe to cache).
+    """
+    streaming_data = data.get('streamingData', {})
+    expiries = []
+    for fmt in streaming_data.get('formats', []) + streaming_data.get('adaptiveFormats', []):
+        url = fmt.get('url')
+        if not url:
+            continue
+        expire = parse_qs(urlparse(url).query).get('expire')
+        if expire:
+            try:
+                expiries.append(float(expire[0]))
+            except ValueError:
+                continue
+    return min(expiries) if expiries else None
+
+
+class PlayerResponseCache:
+    """
+    Two-tier cache of player responses keyed by ``(video_id, client)``.
+
+    The in-process tier is an LRU bounded by ``max_entries``. The on-disk tier
+    is enabled by ``cache_dir`` and is shared between runs.
+    """
+
+    def __init__(self, max_entries: int = 256, cache_dir: Optional[str] = None, safety_margin: int = 60):
+        """
+        Initialize PlayerResponseCache.
+
+        Args:
+            max_entries: Maximum responses kept in memory
+            cache_dir: Directory for the on-disk tier (disabled if None)
+            safety_margin: Seconds before URL expiry at which an entry is dropped
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.safety_margin = safety_margin
+        self._entries: 'OrderedDict[Tuple[str, str], Tuple[float, Dict]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _path(self, video_id: str, client: str) -> str:
+        return os.path.join(self.cache_dir, f"{video_id}.{client}.json")
+
+    def get(self, video_id: str, client: str) -> Optional[Dict]:
+        """Return a cached response whose URLs are still valid, or None."""
+        key = (video_id, client)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry:
+                expires_at, data = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    return data
+                del self._entries[key]
+
+        if not self.cache_dir:
+            return None
+
+        path = self._path(video_id, client)
+        try:
+            with open(path, 'r') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if stored.get('expires_at', 0) <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        self._remember(key, stored['expires_at'], stored['data'])
+        return stored['data']
+
+    def put(self, video_id: str, client: str, data: Dict) -> bool:
+        """
+        Cache a player response until shortly before its URLs expire.
+
+        Returns:
+            True if the response was cached, False if it had no expiring URLs
+        """
+        expiry = url_expiry(data)
+        if expiry is None:
+            return False
+        expires_at = expiry - self.safety_margin
+        if expires_at <= time.time():
+            return False
+
+        self._remember((video_id, client), expires_at, data)
+
+        if self.cache_dir:
+            path = self._path(video_id, client)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'w') as f:
+                    json.dump({'expires_at': expires_at, 'data': data}, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not write player cache entry {path}: {e}")
+        return True
+
+    def _remember(self, key: Tuple[str, str], expires_at: float, data: Dict):
+        with self._lock:
+            self._entries[key] = (expires_at, data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, video_id: str, client: str):
+        """Drop an entry from both tiers, e.g. after its URLs were rejected."""
+        with self._lock:
+            self._entries.pop((video_id, client), None)
+        if self.cache_dir:
+            try:
+                os.remove(self._path(video_id, client))
+            except OSError:
+                pass
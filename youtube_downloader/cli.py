@@ -1,22 +1,72 @@
 import sys
 from typing import Optional
 from .downloader import YouTubeDownloader, PlaylistDownloader
+from .batch import BatchDownloader
 from .proxy_manager import ProxyManager, ProxyConfig
+from .cache import PlayerResponseCache
+from .transport import HttpTransport
+from .rate_limit import RequestPacer, parse_rates
+from .bandwidth import BandwidthScheduler, parse_rate
+from .writer import FSYNC_POLICIES
+from .selector import compile_selector
+from .mux import MERGE_FORMAT
+from .archive import DownloadArchive
+from .jobqueue import JobQueue
+from .integrity import DEFAULT_ALGORITHM, validate_algorithm
+from .metrics import MetricsServer, dump as dump_metrics
+from .tracing import JsonFileExporter, set_exporter, TRACER
+from .progress import Progress, JsonLinesReporter
+from .daemon import DownloadDaemon, DEFAULT_PORT as DAEMON_PORT, is_loopback
+
+PROGRESS_MODES = ('bar', 'json', 'none')
 
 
 def print_usage():
     """Print usage information."""
     print("Usage: ytsnap <youtube_url> [output_file] [options]")
+    print("       ytsnap --batch-file <file|-> [options]")
+    print("       ytsnap serve [options]")
     print("\nOptions:")
     print("  --quality <quality>    Select specific quality (e.g., 720p, 1080p)")
     print("  --itag <itag>          Select format by itag number")
+    print("  --format <expr>        Select format by expression, e.g. 'best[height<=720][filesize<300M]/smallest'")
+    print("  --merge                Download best video and audio in parallel and merge them into one MP4")
+    print("  --segments <num>       Parallel connections per video (default: 1)")
     print("  --proxy-file <file>    Load proxies from file")
     print("  --proxy <proxy_url>    Use single proxy (e.g., http://host:port)")
     print("  --no-health-check      Disable proxy health checking")
+    print("  --health-check-deadline <sec>  Stop waiting for proxy health checks after this long")
+    print("  --min-healthy <num>    Start once this many proxies pass the health check")
+    print("  --proxy-strategy <s>   weighted (favor fast proxies, default) or round_robin")
+    print("  --cache-dir <dir>      Cache video metadata on disk until its URLs expire")
+    print("  --rate-limit <spec>    Requests/second for the whole run, e.g. player=5,browse=2,media=20")
+    print("  --proxy-rate-limit <spec>  Requests/second through each proxy, same format")
+    print("  --max-rate <rate>      Total download bandwidth cap in bytes/second (e.g., 512K, 200M)")
+    print("  --fsync <policy>       When to fsync downloads: always, checkpoint (default), close, never")
+    print("  --checksum <algo>      Digest computed while downloading: sha256 (default), xxh64 (needs xxhash), none")
+    print("  --metrics-port <port>  Serve Prometheus metrics at http://127.0.0.1:<port>/metrics during the run")
+    print("  --metrics-file <file>  Write Prometheus metrics to file when the run ends")
+    print("  --trace-file <file>    Append per-phase tracing spans to file as OpenTelemetry JSON lines")
+    print("  --progress <mode>      bar (default), json (one event per line on stdout) or none")
+    print("  --quiet                Print nothing but errors (same as --progress none)")
     print("\nPlaylist Options:")
     print("  --playlist             Download entire playlist")
     print("  --output-dir <dir>     Output directory for playlist downloads (default: ./downloads)")
     print("  --concurrency <num>    Number of parallel downloads (default: 3)")
+    print("  --prefetch <num>       Videos ahead to prefetch metadata for (default: 2x concurrency)")
+    print("  --adaptive             Tune parallel downloads to throughput and 429s (--concurrency is the maximum)")
+    print("  --archive <file>       Record downloads in a SQLite archive and skip archived videos without any API call")
+    print("  --queue <file>         Keep the run's state in a SQLite queue; running again (after a crash or Ctrl+C)")
+    print("                         resumes where it stopped")
+    print("\nBatch Options:")
+    print("  --batch-file <file>    Download every video/playlist URL or ID in file, one per line ('-' for stdin)")
+    print("                         Playlist options apply; duplicates are downloaded once")
+    print("\nDaemon Options (ytsnap serve; the options above are defaults for its jobs):")
+    print("  --host <host>          Address to serve the job API on (default: 127.0.0.1; others need --token)")
+    print(f"  --port <port>          Port to serve the job API on (default: {DAEMON_PORT})")
+    print("  --socket <path>        Serve the job API on a Unix socket instead")
+    print("  --workers <num>        Jobs run at once (default: 4)")
+    print("  --token <secret>       Require 'Authorization: Bearer <secret>' on every request")
     print("\nProxy file format:")
     print("  http://host:port")
     print("  https://host:port")
@@ -28,8 +78,20 @@ def print_usage():
     print("  ytsnap https://www.youtube.com/watch?v=VIDEO_ID")
     print("  # Download playlist")
     print("  ytsnap --playlist https://www.youtube.com/playlist?list=PLxxx --output-dir ./my_playlist")
+    print("  # Download a list of URLs and IDs with one shared proxy pool and connection pool")
+    print("  ytsnap --batch-file urls.txt --output-dir ./videos --concurrency 8")
+    print("  # Re-sync a playlist; videos already in the archive cost no API calls")
+    print("  ytsnap --playlist https://www.youtube.com/playlist?list=PLxxx --output-dir ./videos --archive ./videos/archive.db")
+    print("  # A long playlist that survives crashes and Ctrl+C; re-run the same command to resume")
+    print("  ytsnap --playlist https://www.youtube.com/playlist?list=PLxxx --output-dir ./videos --queue ./videos/queue.db")
     print("  # Download playlist with custom quality")
     print("  ytsnap --playlist https://www.youtube.com/playlist?list=PLxxx --output-dir ./videos --quality 720p")
+    print("  # Smallest file that is still 720p, or the smallest audio-only format")
+    print("  ytsnap https://www.youtube.com/watch?v=VIDEO_ID --format 'best[height<=720]/smallest-audio'")
+    print("  # 1080p+ with audio, no ffmpeg needed")
+    print("  ytsnap https://www.youtube.com/watch?v=VIDEO_ID video.mp4 --merge")
+    print("  # Keep proxies, connections and caches warm for jobs posted to /jobs")
+    print("  ytsnap serve --socket /tmp/ytsnap.sock --proxy-file proxies.txt --workers 8")
 
 
 def parse_proxy_url(proxy_url: str) -> Optional[ProxyConfig]:
@@ -50,16 +112,51 @@ def main():
     output = "video.mp4"
     itag = None
     quality = None
+    format_spec = None
+    merge = False
     proxy_manager = None
     proxy_file = None
     proxy_url = None
     enable_health_check = True
+    health_check_deadline = None
+    min_healthy = None
+    proxy_strategy = 'weighted'
     is_playlist = False
     output_dir = "./downloads"
     concurrency = 3
+    segments = 1
+    cache_dir = None
+    prefetch = None
+    rates = None
+    adaptive = False
+    max_rate = None
+    fsync = 'checkpoint'
+    checksum = DEFAULT_ALGORITHM
+    proxy_rates = None
+    
+    batch_file = None
+    archive_path = None
+    queue_path = None
+    metrics_port = None
+    metrics_file = None
+    trace_file = None
+    progress_mode = 'bar'
+    serve = False
+    serve_host = '127.0.0.1'
+    serve_port = DAEMON_PORT
+    socket_path = None
+    token = None
+    workers = 4
     
     # Parse arguments
     i = 2
+    if url == 'serve':
+        serve = True
+        url = None
+    elif url.startswith('--'):
+        # Options only, e.g. ytsnap --batch-file urls.txt
+        url = None
+        i = 1
     while i < len(sys.argv):
         if sys.argv[i] == '--itag' and i + 1 < len(sys.argv):
             itag = int(sys.argv[i + 1])
@@ -67,15 +164,149 @@ def main():
         elif sys.argv[i] == '--quality' and i + 1 < len(sys.argv):
             quality = sys.argv[i + 1]
             i += 2
+        elif sys.argv[i] == '--format' and i + 1 < len(sys.argv):
+            format_spec = sys.argv[i + 1]
+            try:
+                compile_selector(format_spec)
+            except ValueError as e:
+                print(f"Error: --format: {e}")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--merge':
+            merge = True
+            i += 1
         elif sys.argv[i] == '--proxy-file' and i + 1 < len(sys.argv):
             proxy_file = sys.argv[i + 1]
             i += 2
         elif sys.argv[i] == '--proxy' and i + 1 < len(sys.argv):
             proxy_url = sys.argv[i + 1]
             i += 2
+        elif sys.argv[i] == '--cache-dir' and i + 1 < len(sys.argv):
+            cache_dir = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] in ('--rate-limit', '--proxy-rate-limit') and i + 1 < len(sys.argv):
+            try:
+                parsed = parse_rates(sys.argv[i + 1])
+            except ValueError as e:
+                print(f"Error: {sys.argv[i]}: {e}")
+                sys.exit(1)
+            if sys.argv[i] == '--rate-limit':
+                rates = parsed
+            else:
+                proxy_rates = parsed
+            i += 2
+        elif sys.argv[i] == '--max-rate' and i + 1 < len(sys.argv):
+            try:
+                max_rate = parse_rate(sys.argv[i + 1])
+            except ValueError as e:
+                print(f"Error: --max-rate: {e}")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--fsync' and i + 1 < len(sys.argv):
+            fsync = sys.argv[i + 1]
+            if fsync not in FSYNC_POLICIES:
+                print(f"Error: --fsync must be one of: {', '.join(FSYNC_POLICIES)}")
+                sys.exit(1)
+            i += 2
         elif sys.argv[i] == '--no-health-check':
             enable_health_check = False
             i += 1
+        elif sys.argv[i] == '--health-check-deadline' and i + 1 < len(sys.argv):
+            try:
+                health_check_deadline = float(sys.argv[i + 1])
+                if health_check_deadline <= 0:
+                    raise ValueError
+            except ValueError:
+                print("Error: --health-check-deadline must be a positive number of seconds")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--min-healthy' and i + 1 < len(sys.argv):
+            try:
+                min_healthy = int(sys.argv[i + 1])
+                if min_healthy < 1:
+                    raise ValueError
+            except ValueError:
+                print("Error: --min-healthy must be a positive integer")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--proxy-strategy' and i + 1 < len(sys.argv):
+            proxy_strategy = sys.argv[i + 1]
+            if proxy_strategy not in ('weighted', 'round_robin'):
+                print("Error: --proxy-strategy must be 'weighted' or 'round_robin'")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--adaptive':
+            adaptive = True
+            i += 1
+        elif sys.argv[i] == '--checksum' and i + 1 < len(sys.argv):
+            checksum = None if sys.argv[i + 1] == 'none' else sys.argv[i + 1]
+            if checksum:
+                try:
+                    validate_algorithm(checksum)
+                except ValueError as e:
+                    print(f"Error: --checksum: {e}")
+                    sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--metrics-port' and i + 1 < len(sys.argv):
+            try:
+                metrics_port = int(sys.argv[i + 1])
+                if not 0 <= metrics_port <= 65535:
+                    raise ValueError
+            except ValueError:
+                print("Error: --metrics-port must be a port number (0-65535)")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--metrics-file' and i + 1 < len(sys.argv):
+            metrics_file = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--trace-file' and i + 1 < len(sys.argv):
+            trace_file = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--progress' and i + 1 < len(sys.argv):
+            progress_mode = sys.argv[i + 1]
+            if progress_mode not in PROGRESS_MODES:
+                print(f"Error: --progress must be one of: {', '.join(PROGRESS_MODES)}")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--quiet':
+            progress_mode = 'none'
+            i += 1
+        elif sys.argv[i] == '--host' and i + 1 < len(sys.argv):
+            serve_host = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--port' and i + 1 < len(sys.argv):
+            try:
+                serve_port = int(sys.argv[i + 1])
+                if not 0 <= serve_port <= 65535:
+                    raise ValueError
+            except ValueError:
+                print("Error: --port must be a port number (0-65535)")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--socket' and i + 1 < len(sys.argv):
+            socket_path = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--token' and i + 1 < len(sys.argv):
+            token = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--workers' and i + 1 < len(sys.argv):
+            try:
+                workers = int(sys.argv[i + 1])
+                if workers < 1:
+                    raise ValueError
+            except ValueError:
+                print("Error: --workers must be a positive integer")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--archive' and i + 1 < len(sys.argv):
+            archive_path = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--queue' and i + 1 < len(sys.argv):
+            queue_path = sys.argv[i + 1]
+            i += 2
+        elif sys.argv[i] == '--batch-file' and i + 1 < len(sys.argv):
+            batch_file = sys.argv[i + 1]
+            i += 2
         elif sys.argv[i] == '--playlist':
             is_playlist = True
             i += 1
@@ -91,6 +322,24 @@ def main():
                 print("Error: --concurrency must be a positive integer")
                 sys.exit(1)
             i += 2
+        elif sys.argv[i] == '--prefetch' and i + 1 < len(sys.argv):
+            try:
+                prefetch = int(sys.argv[i + 1])
+                if prefetch < 0:
+                    raise ValueError
+            except ValueError:
+                print("Error: --prefetch must be a non-negative integer")
+                sys.exit(1)
+            i += 2
+        elif sys.argv[i] == '--segments' and i + 1 < len(sys.argv):
+            try:
+                segments = int(sys.argv[i + 1])
+                if segments < 1:
+                    raise ValueError
+            except ValueError:
+                print("Error: --segments must be a positive integer")
+                sys.exit(1)
+            i += 2
         elif sys.argv[i] == '--help' or sys.argv[i] == '-h':
             print_usage()
             sys.exit(0)
@@ -100,15 +349,45 @@ def main():
         else:
             i += 1
     
+    if url is None and batch_file is None and not serve:
+        print_usage()
+        sys.exit(1)
+    
+    if serve and not socket_path and not token and not is_loopback(serve_host):
+        print(f"Error: serving on {serve_host} lets other machines submit jobs; set --token to allow it")
+        sys.exit(1)
+    
+    if merge and not format_spec:
+        format_spec = MERGE_FORMAT
+    
+    # None: playlists draw one status line, a single video its own bar
+    progress = None
+    if progress_mode == 'json':
+        progress = Progress([JsonLinesReporter()])
+    elif progress_mode == 'none':
+        progress = Progress()
+    # Informational output; stdout carries only events in json mode, nothing when quiet
+    info = print if progress_mode == 'bar' else (lambda *args, **kwargs: None)
+    
+    # Started first so proxy health checks are counted too
+    metrics_server = MetricsServer(port=metrics_port) if metrics_port is not None else None
+    if metrics_server:
+        info(f"✓ Metrics at http://127.0.0.1:{metrics_server.port}/metrics\n")
+    if trace_file:
+        set_exporter(JsonFileExporter(trace_file))
+    
     # Setup proxy manager
     if proxy_file:
         try:
             proxy_manager = ProxyManager.from_file(
                 proxy_file,
-                enable_health_check=enable_health_check
+                enable_health_check=enable_health_check,
+                health_check_deadline=health_check_deadline,
+                min_healthy=min_healthy,
+                strategy=proxy_strategy
             )
             stats = proxy_manager.get_stats()
-            print(f"✓ Loaded {stats['healthy']}/{stats['total']} healthy proxies from {proxy_file}\n")
+            info(f"✓ Loaded {stats['healthy']}/{stats['total']} healthy proxies from {proxy_file}\n")
         except Exception as e:
             print(f"Error loading proxy file: {e}")
             sys.exit(1)
@@ -119,61 +398,191 @@ def main():
                 proxies=[proxy_config],
                 enable_health_check=enable_health_check
             )
-            print(f"✓ Using proxy: {proxy_config}\n")
+            info(f"✓ Using proxy: {proxy_config}\n")
         else:
             sys.exit(1)
     
+    cache = PlayerResponseCache(cache_dir=cache_dir)
+    # One connection pool for every request this run makes (every job's, when serving)
+    transport = HttpTransport(pool_size=concurrency * segments * (workers if serve else 1))
+    pacer = RequestPacer(rates, proxy_rates) if rates or proxy_rates else None
+    bandwidth = BandwidthScheduler(max_rate) if max_rate else None
+    archive = DownloadArchive(archive_path) if archive_path else None
+    queue = JobQueue(queue_path) if queue_path else None
+    
     try:
+        # Serve jobs until interrupted
+        if serve:
+            daemon = DownloadDaemon(
+                proxy_manager=proxy_manager,
+                cache=cache,
+                transport=transport,
+                pacer=pacer,
+                bandwidth=bandwidth,
+                archive=archive,
+                workers=workers,
+                concurrency=concurrency,
+                segments=segments,
+                prefetch=prefetch,
+                adaptive=adaptive,
+                fsync=fsync,
+                checksum=checksum,
+                output_dir=output_dir,
+                token=token
+            )
+            if socket_path:
+                daemon.listen_unix(socket_path)
+                info(f"✓ Serving jobs on {socket_path}")
+            else:
+                port = daemon.listen(serve_host, serve_port)
+                info(f"✓ Serving jobs at http://{serve_host}:{port}")
+            info("Press Ctrl+C to stop\n")
+            daemon.serve_forever()
+        
+        # Handle batch downloads
+        elif batch_file:
+            info("=" * 60)
+            info("Batch Download Mode")
+            info("=" * 60)
+            
+            source = sys.stdin if batch_file == '-' else open(batch_file, encoding='utf-8')
+            try:
+                batch_downloader = BatchDownloader(
+                    source,
+                    proxy_manager=proxy_manager,
+                    concurrency=concurrency,
+                    cache=cache,
+                    transport=transport,
+                    prefetch=prefetch,
+                    pacer=pacer,
+                    adaptive=adaptive,
+                    bandwidth=bandwidth,
+                    fsync=fsync,
+                    archive=archive,
+                    checksum=checksum,
+                    progress=progress,
+                    queue=queue
+                )
+                batch_downloader.download(
+                    output_dir=output_dir,
+                    quality=quality,
+                    itag=itag,
+                    segments=segments,
+                    format_spec=format_spec
+                )
+            finally:
+                if source is not sys.stdin:
+                    source.close()
+        
         # Handle playlist downloads
-        if is_playlist or 'playlist?list=' in url or 'list=' in url:
-            print("=" * 60)
-            print("Playlist Download Mode")
-            print("=" * 60)
+        elif is_playlist or 'playlist?list=' in url or 'list=' in url:
+            info("=" * 60)
+            info("Playlist Download Mode")
+            info("=" * 60)
             
             playlist_downloader = PlaylistDownloader(
                 url, 
                 proxy_manager=proxy_manager, 
-                concurrency=concurrency
+                concurrency=concurrency,
+                cache=cache,
+                transport=transport,
+                prefetch=prefetch,
+                pacer=pacer,
+                adaptive=adaptive,
+                bandwidth=bandwidth,
+                fsync=fsync,
+                archive=archive,
+                checksum=checksum,
+                progress=progress,
+                queue=queue
             )
             
             if proxy_manager:
                 stats = proxy_manager.get_stats()
-                print(f"Proxies: {stats['healthy']}/{stats['total']} healthy")
+                info(f"Proxies: {stats['healthy']}/{stats['total']} healthy")
             
             playlist_downloader.download(
                 output_dir=output_dir,
                 quality=quality,
-                itag=itag
+                itag=itag,
+                segments=segments,
+                format_spec=format_spec
             )
         
         # Handle single video downloads
         else:
-            downloader = YouTubeDownloader(url, proxy_manager=proxy_manager)
+            downloader = YouTubeDownloader(url, proxy_manager=proxy_manager, cache=cache, transport=transport,
+                                           pacer=pacer, bandwidth=bandwidth, fsync=fsync, checksum=checksum,
+                                           progress=progress)
             
-            print(f"Video ID: {downloader.video_id}")
+            info(f"Video ID: {downloader.video_id}")
             if proxy_manager:
                 stats = proxy_manager.get_stats()
-                print(f"Proxies: {stats['healthy']}/{stats['total']} healthy")
-            print("Fetching video info...\n")
+                info(f"Proxies: {stats['healthy']}/{stats['total']} healthy")
+            info("Fetching video info...\n")
             
             formats = downloader.get_formats()
             
-            print("Available formats:")
+            info("Available formats:")
             for i, fmt in enumerate(formats[:20]):
                 av = []
                 if fmt['has_video']: av.append('V')
                 if fmt['has_audio']: av.append('A')
                 size = f"{int(fmt['filesize'])/(1024*1024):.1f}MB" if fmt['filesize'] else "?"
-                print(f"{i+1}. itag={fmt['itag']:3} [{'+'.join(av)}] {str(fmt['quality']):6} {fmt['mime']:20} {size}")
+                info(f"{i+1}. itag={fmt['itag']:3} [{'+'.join(av)}] {str(fmt['quality']):6} {fmt['mime']:20} {size}")
             
-            print()
-            downloader.download(output, itag=itag, quality=quality)
+            info()
+            video = {'video_id': downloader.video_id, 'url': url}
+            if progress:
+                progress.queued(video)
+                progress.start(video)
+            try:
+                result = downloader.download(output, itag=itag, quality=quality, segments=segments,
+                                             format_spec=format_spec)
+            except Exception as e:
+                if progress:
+                    progress.failed(video, e)
+                raise
+            if progress:
+                progress.done(video, result)
+            if result.checksum:
+                info(f"  {result.checksum}")
+            for start, end, segment_checksum in result.segment_checksums:
+                info(f"  bytes {start}-{end}: {segment_checksum}")
         
+    except KeyboardInterrupt:
+        message = "Interrupted" + ("; run the same command again to resume" if queue else "")
+        # Keep stdout to events in json mode and silent in quiet mode
+        if progress_mode == 'json':
+            progress.error(KeyboardInterrupt(message))
+        elif progress_mode == 'none':
+            print(message, file=sys.stderr)
+        else:
+            print("\n" + message)
+        sys.exit(130)
     except Exception as e:
-        print(f"Error: {e}")
-        import traceback
-        traceback.print_exc()
+        # In json mode stdout carries only events, so the failure is one too
+        if progress_mode == 'json':
+            progress.error(e)
+        else:
+            print(f"Error: {e}", file=sys.stderr)
+            if progress_mode == 'bar':
+                import traceback
+                traceback.print_exc()
         sys.exit(1)
+    finally:
+        transport.close()
+        if archive:
+            archive.close()
+        if queue:
+            queue.close()
+        if metrics_file:
+            dump_metrics(metrics_file)
+        if metrics_server:
+            metrics_server.close()
+        TRACER.shutdown()
+        if progress:
+            progress.close()
 
 if __name__ == "__main__":
     main()
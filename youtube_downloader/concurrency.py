@@ -0,0 +1,123 @@
+"""
+Adaptive concurrency for YouTube Downloader
+
+An AIMD (additive increase, multiplicative decrease) controller that decides
+how many videos a PlaylistDownloader keeps in flight. Downloads report the
+bytes they receive, the 429s they hit and whether they failed; once per
+window the controller grows the limit while aggregate throughput keeps
+improving and halves it as soon as rate limiting or errors show up.
+"""
+
+import time
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class AIMDController:
+    """
+    Concurrency limit driven by throughput, 429s and errors.
+
+    The limit starts low and doubles each window while throughput improves
+    (slow start). After the first congestion signal or plateau it grows by
+    ``increase`` per improving window instead. Any 429, or an error ratio
+    above ``error_threshold``, multiplies it by ``decrease``, after which the
+    next window with any throughput counts as an improvement.
+    """
+
+    def __init__(self, max_limit: int, min_limit: int = 1, initial: Optional[int] = None,
+                 increase: int = 1, decrease: float = 0.5, window: float = 5.0,
+                 gain_threshold: float = 0.05, error_threshold: float = 0.1):
+        """
+        Initialize AIMDController.
+
+        Args:
+            max_limit: Upper bound for the limit (e.g. ``--concurrency``)
+            min_limit: Lower bound for the limit
+            initial: Starting limit (default: ``min_limit``)
+            increase: Added to the limit per improving window after slow start
+            decrease: Factor applied to the limit on 429s or errors
+            window: Seconds of samples behind each adjustment
+            gain_threshold: Relative throughput gain needed to keep growing
+            error_threshold: Failed-download ratio that counts as congestion
+        """
+        if max_limit < 1 or min_limit < 1 or min_limit > max_limit:
+            raise ValueError("Concurrency limits must satisfy 1 <= min_limit <= max_limit")
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.window = window
+        self.gain_threshold = gain_threshold
+        self.error_threshold = error_threshold
+
+        self._limit = max(min_limit, min(initial or min_limit, max_limit))
+        self._slow_start = True
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._bytes = 0
+        self._rate_limited = 0
+        self._completed = 0
+        self._failed = 0
+        self._last_throughput = 0.0
+        self.rate_limit_hits = 0
+
+    @property
+    def limit(self) -> int:
+        """Downloads allowed in flight right now."""
+        with self._lock:
+            self._maybe_adjust(time.monotonic())
+            return self._limit
+
+    def record_bytes(self, count: int):
+        """Count bytes received by any download."""
+        with self._lock:
+            self._bytes += count
+
+    def record_rate_limit(self):
+        """Count a 429 response."""
+        with self._lock:
+            self._rate_limited += 1
+            self.rate_limit_hits += 1
+
+    def record_result(self, success: bool):
+        """Count a finished download."""
+        with self._lock:
+            self._completed += 1
+            if not success:
+                self._failed += 1
+
+    def _maybe_adjust(self, now: float):
+        elapsed = now - self._window_start
+        if elapsed < self.window:
+            return
+
+        throughput = self._bytes / elapsed
+        error_ratio = self._failed / self._completed if self._completed else 0.0
+        previous = self._limit
+        baseline = throughput
+
+        if self._rate_limited or error_ratio > self.error_threshold:
+            self._limit = max(self.min_limit, int(self._limit * self.decrease))
+            self._slow_start = False
+            # Probe upwards again from the reduced limit
+            baseline = 0.0
+        elif throughput > self._last_throughput * (1 + self.gain_threshold):
+            step = self._limit if self._slow_start else self.increase
+            self._limit = min(self.max_limit, self._limit + step)
+        else:
+            # Plateau: more parallelism is not buying throughput
+            self._slow_start = False
+
+        if self._limit != previous:
+            logger.info(
+                f"Concurrency {previous} -> {self._limit} "
+                f"({throughput / (1024 * 1024):.1f} MiB/s, {self._rate_limited} rate limited, "
+                f"{self._failed}/{self._completed} failed)"
+            )
+
+        self._last_throughput = baseline
+        self._window_start = now
+        self._bytes = self._rate_limited = self._completed = self._failed = 0
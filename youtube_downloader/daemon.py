@@ -0,0 +1,762 @@
+"""
+Daemon mode for YouTube Downloader
+
+``ytsnap serve`` keeps one process resident with everything a run warms up
+- the proxy pool (loaded and health-checked once), the pooled HTTP
+transport with its TLS connections, the player response cache, the pacer
+and the archive - and runs jobs submitted over a local HTTP API, on a
+loopback TCP port or a Unix socket. A job is one video or one playlist
+with its options; its progress is the aggregated ``Progress`` of the run,
+readable as a snapshot or as a stream of JSON lines.
+
+API (JSON requests and responses):
+
+    POST   /jobs              {"url": ..., ...}: queue a job (202, the job)
+    GET    /jobs              every job still held
+    GET    /jobs/<id>         one job, with a progress snapshot
+    GET    /jobs/<id>/events  the job's progress events as JSON lines, then the job
+    DELETE /jobs/<id>         cancel a job that has not started
+    GET    /health            job counts and proxy pool stats
+    GET    /metrics           Prometheus metrics
+
+Job options: ``url`` (required), ``playlist`` (URLs with ``list=`` are
+playlists anyway), ``output`` (path of a single video), ``output_dir``,
+``quality``, ``itag``, ``format``, ``merge``, ``segments``, ``concurrency``
+(videos of a playlist in parallel) and ``checksum``. Relative paths are
+relative to the daemon's output directory, and paths that resolve outside
+it are refused.
+
+Any web page can make a browser send requests to localhost, so POST bodies
+must be ``application/json`` (a cross-site form or ``text/plain`` request
+gets 415) and, on TCP, the Host header must name the loopback address
+(against DNS rebinding). With a ``token``, every request must carry
+``Authorization: Bearer <token>`` instead; serving on anything but a
+loopback address requires one.
+"""
+
+import os
+import hmac
+import json
+import stat
+import time
+import uuid
+import socket
+import signal
+import logging
+import threading
+import ipaddress
+import http.client
+import socketserver
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .downloader import YouTubeDownloader, PlaylistDownloader, extract_video_id, extract_playlist_id
+from .proxy_manager import ProxyManager
+from .cache import PlayerResponseCache
+from .transport import HttpTransport
+from .rate_limit import RequestPacer
+from .bandwidth import BandwidthScheduler
+from .archive import DownloadArchive
+from .integrity import DEFAULT_ALGORITHM, validate_algorithm
+from .resume import DownloadInterrupted
+from .selector import compile_selector
+from .mux import MERGE_FORMAT
+from .progress import Progress, EventIterator
+from .metrics import REGISTRY, CONTENT_TYPE, JOBS, JOB_SECONDS
+from .tracing import span
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 9465
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# Host header names accepted on a loopback port without a token
+_LOOPBACK_NAMES = ('localhost', '127.0.0.1', '::1')
+
+# Job option -> accepted type
+_OPTIONS = {
+    'url': str, 'playlist': bool, 'output': str, 'output_dir': str, 'quality': str, 'itag': int,
+    'format': str, 'merge': bool, 'segments': int, 'concurrency': int, 'checksum': (str, type(None)),
+}
+
+
+def is_loopback(host: str) -> bool:
+    """Whether ``host`` (a name or an address) only accepts local connections."""
+    if host.strip('[]').lower() == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host.strip('[]')).is_loopback
+    except ValueError:
+        return False
+
+
+class DaemonError(Exception):
+    """An error response from the daemon."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+def parse_job(options: Dict) -> Tuple[str, str, Dict]:
+    """
+    Validate the options of a submitted job.
+
+    Returns:
+        ``(kind, url, options)`` with kind ``'video'`` or ``'playlist'`` and
+        the remaining options
+
+    Raises:
+        ValueError: If an option is unknown, has the wrong type or value, or
+            the URL is neither a video nor a playlist
+    """
+    if not isinstance(options, dict):
+        raise ValueError("A job is a JSON object")
+    for name, value in options.items():
+        expected = _OPTIONS.get(name)
+        if expected is None:
+            raise ValueError(f"Unknown option: {name}")
+        # JSON true/false must not pass as an itag or a count
+        if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+            raise ValueError(f"Invalid value for {name}: {value!r}")
+    options = dict(options)
+    url = options.pop('url', None)
+    if not url:
+        raise ValueError("Missing url")
+    for name in ('segments', 'concurrency'):
+        if options.get(name, 1) < 1:
+            raise ValueError(f"{name} must be a positive integer")
+    if options.get('format'):
+        compile_selector(options['format'])
+    if options.get('checksum'):
+        validate_algorithm(options['checksum'])
+
+    if options.pop('playlist', False) or 'list=' in url:
+        extract_playlist_id(url)
+        return 'playlist', url, options
+    extract_video_id(url)
+    return 'video', url, options
+
+
+@dataclass
+class Job:
+    """A submitted video or playlist download."""
+    id: str
+    kind: str
+    url: str
+    options: Dict
+    status: str = QUEUED
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[Dict] = None
+    error: Optional[str] = None
+    progress: Progress = field(default_factory=Progress, repr=False)
+    done: threading.Event = field(default_factory=threading.Event, repr=False)
+    # Set on shutdown: the job's downloads checkpoint at their next chunk and stop
+    stop: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> Dict:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'url': self.url,
+            'options': self.options,
+            'status': self.status,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+            'result': self.result,
+            'error': self.error,
+            'progress': self.progress.snapshot(),
+        }
+
+
+class DownloadDaemon:
+    """
+    Runs submitted jobs on shared, warm resources.
+
+    Every job uses the same proxy manager, transport, cache, pacer,
+    bandwidth cap and archive; up to ``workers`` jobs run at once and the
+    rest wait in submission order. Finished jobs are kept (for status
+    queries) up to ``max_finished``, oldest dropped first.
+    """
+
+    def __init__(self, proxy_manager: Optional[ProxyManager] = None, cache: Optional[PlayerResponseCache] = None,
+                 transport: Optional[HttpTransport] = None, pacer: Optional[RequestPacer] = None,
+                 bandwidth: Optional[BandwidthScheduler] = None, archive: Optional[DownloadArchive] = None,
+                 workers: int = 4, concurrency: int = 3, segments: int = 1, prefetch: Optional[int] = None,
+                 adaptive: bool = False, fsync: str = 'checkpoint', checksum: Optional[str] = DEFAULT_ALGORITHM,
+                 output_dir: str = './downloads', max_finished: int = 1000, token: Optional[str] = None):
+        """
+        Initialize DownloadDaemon.
+
+        Args:
+            proxy_manager: Proxy pool shared by every job
+            cache: Player response cache shared by every job (default: in-memory)
+            transport: Connection pool shared by every job. When omitted, one
+                sized for ``workers x concurrency x segments`` is created and
+                closed by ``close``.
+            pacer: Token buckets every request of every job goes through
+            bandwidth: Byte-rate cap shared by every job
+            archive: Record of finished downloads, consulted by playlist jobs
+            workers: Jobs run at once
+            concurrency, segments, prefetch, adaptive, fsync, checksum,
+                output_dir: Defaults for jobs (see PlaylistDownloader)
+            max_finished: Finished jobs kept for status queries
+            token: Secret every request must present as
+                ``Authorization: Bearer <token>`` (required to serve on a
+                non-loopback address)
+        """
+        self.proxy_manager = proxy_manager
+        self.cache = cache if cache is not None else PlayerResponseCache()
+        self._owns_transport = transport is None
+        self.transport = transport if transport is not None else HttpTransport(
+            pool_size=workers * concurrency * segments)
+        self.pacer = pacer
+        self.bandwidth = bandwidth
+        self.archive = archive
+        self.workers = workers
+        self.concurrency = concurrency
+        self.segments = segments
+        self.prefetch = prefetch
+        self.adaptive = adaptive
+        self.fsync = fsync
+        self.checksum = checksum
+        self.output_dir = output_dir
+        self.max_finished = max_finished
+        self.token = token
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._jobs: 'OrderedDict[str, Job]' = OrderedDict()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='job')
+        self._servers: List[Tuple[socketserver.BaseServer, threading.Thread]] = []
+        self._stop = threading.Event()
+        self._closed = False
+
+    # Jobs
+
+    def submit(self, options: Dict) -> Job:
+        """
+        Queue a job.
+
+        Raises:
+            ValueError: If the options are invalid (see ``parse_job``), or a
+                path is outside the output directory
+            RuntimeError: If the daemon is shutting down
+        """
+        kind, url, options = parse_job(options)
+        if 'output' in options:
+            options['output'] = self._resolve_path(options['output'], directory=False)
+        if 'output_dir' in options:
+            options['output_dir'] = self._resolve_path(options['output_dir'])
+        job = Job(id=uuid.uuid4().hex[:16], kind=kind, url=url, options=options)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The daemon is shutting down")
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job)
+        logger.info(f"Job {job.id} queued: {kind} {url}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a job that has not started; returns whether it was cancelled."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return False
+            self._set_finished(job, CANCELLED)
+        self._notify(job)
+        return True
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """Block until a job has finished (or ``timeout``); returns it, or None if unknown."""
+        job = self.get(job_id)
+        if job is not None:
+            job.done.wait(timeout)
+        return job
+
+    def subscribe(self, job: Job) -> Optional[EventIterator]:
+        """
+        Iterate over a job's progress events until it finishes.
+
+        Returns:
+            The iterator (unsubscribe with ``job.progress.remove_reporter``),
+            or None if the job has already finished
+        """
+        with self._lock:
+            if job.status in FINISHED:
+                return None
+            return job.progress.events()
+
+    def health(self) -> Dict:
+        with self._lock:
+            counts = Counter(job.status for job in self._jobs.values())
+        health = {
+            'status': 'stopping' if self._closed else 'ok',
+            'uptime': time.time() - self.started,
+            'workers': self.workers,
+            'jobs': {status: counts.get(status, 0) for status in (QUEUED, RUNNING) + FINISHED},
+        }
+        if self.proxy_manager:
+            health['proxies'] = self.proxy_manager.get_stats()
+        return health
+
+    def _resolve_path(self, path: str, directory: bool = True) -> str:
+        """
+        ``path`` relative to the output directory, with symlinks resolved.
+
+        Args:
+            path: Requested path
+            directory: Whether the output directory itself is acceptable. A
+                file may not resolve to it: its ``.part`` files would be
+                written next to the output directory, outside it.
+
+        Raises:
+            ValueError: If it is outside the output directory
+        """
+        root = os.path.realpath(self.output_dir)
+        resolved = os.path.realpath(os.path.join(root, path))
+        if os.path.commonpath([root, resolved]) != root or (resolved == root and not directory):
+            raise ValueError(f"{path!r} is outside the output directory")
+        return resolved
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in FINISHED]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+    def _set_finished(self, job: Job, status: str, result: Optional[Dict] = None, error: Optional[str] = None):
+        # Called with the lock held, so a subscriber never misses the end of a job
+        job.status, job.result, job.error = status, result, error
+        job.finished = time.time()
+
+    def _notify(self, job: Job):
+        job.progress.close()
+        job.done.set()
+        JOBS.inc(kind=job.kind, status=job.status)
+        JOB_SECONDS.observe(job.finished - job.created, kind=job.kind)
+
+    def _run(self, job: Job):
+        with self._lock:
+            if job.status != QUEUED:
+                return
+            job.status, job.started = RUNNING, time.time()
+        try:
+            with span('job', job_id=job.id, kind=job.kind, url=job.url):
+                if job.kind == 'playlist':
+                    result = self._download_playlist(job)
+                else:
+                    result = self._download_video(job)
+            status, error = DONE, None
+            logger.info(f"Job {job.id} done")
+        except DownloadInterrupted as e:
+            # Shutting down; the .part files are kept for resubmitting the job
+            result, status, error = None, CANCELLED, f"Interrupted: {e}"
+            logger.info(f"Job {job.id} interrupted")
+        except Exception as e:
+            result, status, error = None, FAILED, f"{e.__class__.__name__}: {e}"
+            logger.warning(f"Job {job.id} failed: {error}")
+        with self._lock:
+            self._set_finished(job, status, result, error)
+        self._notify(job)
+
+    def _format_spec(self, options: Dict) -> Optional[str]:
+        return options.get('format') or (MERGE_FORMAT if options.get('merge') else None)
+
+    def _download_video(self, job: Job) -> Dict:
+        options = job.options
+        downloader = YouTubeDownloader(job.url, proxy_manager=self.proxy_manager, cache=self.cache,
+                                       transport=self.transport, pacer=self.pacer, bandwidth=self.bandwidth,
+                                       fsync=self.fsync, checksum=options.get('checksum', self.checksum),
+                                       progress=job.progress, stop=job.stop)
+        output = options.get('output') or os.path.join(options.get('output_dir', self.output_dir),
+                                                       f"{downloader.video_id}.mp4")
+        if os.path.dirname(output):
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+        video = {'video_id': downloader.video_id, 'url': job.url}
+        job.progress.queued(video)
+        job.progress.start(video)
+        try:
+            result = downloader.download(output, itag=options.get('itag'), quality=options.get('quality'),
+                                         segments=options.get('segments', self.segments),
+                                         format_spec=self._format_spec(options))
+        except Exception as e:
+            job.progress.failed(video, e)
+            raise
+        job.progress.done(video, result)
+        return {
+            'path': result.path,
+            'itag': result.itag,
+            'size': result.size,
+            'expected_size': result.expected_size,
+            'checksum': result.checksum,
+            'segment_checksums': [list(segment) for segment in result.segment_checksums],
+        }
+
+    def _download_playlist(self, job: Job) -> Dict:
+        options = job.options
+        playlist = PlaylistDownloader(job.url, proxy_manager=self.proxy_manager,
+                                      concurrency=options.get('concurrency', self.concurrency),
+                                      cache=self.cache, transport=self.transport, prefetch=self.prefetch,
+                                      pacer=self.pacer, adaptive=self.adaptive, bandwidth=self.bandwidth,
+                                      fsync=self.fsync, archive=self.archive,
+                                      checksum=options.get('checksum', self.checksum), progress=job.progress,
+                                      stop=job.stop)
+        stats = playlist.download(output_dir=options.get('output_dir', self.output_dir),
+                                  quality=options.get('quality'), itag=options.get('itag'),
+                                  segments=options.get('segments', self.segments),
+                                  format_spec=self._format_spec(options))
+        return {
+            'total': stats['total'],
+            'successful': stats['successful'],
+            'failed': stats['failed'],
+            'failed_videos': [video['video_id'] for video in stats['failed_videos']],
+        }
+
+    # Serving
+
+    def listen(self, host: str = '127.0.0.1', port: int = DEFAULT_PORT) -> int:
+        """
+        Serve the API on ``host:port`` (localhost by default; ``port=0``
+        picks a free port).
+
+        Returns:
+            The port
+
+        Raises:
+            ValueError: If ``host`` is not a loopback address and the daemon
+                has no token
+        """
+        if not is_loopback(host) and not self.token:
+            raise ValueError(f"Serving on {host} lets other machines submit jobs; set a token to allow it")
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.allowed_hosts = _LOOPBACK_NAMES
+        self._start(server)
+        logger.info(f"Serving jobs at http://{host}:{server.server_address[1]}")
+        return server.server_address[1]
+
+    def listen_unix(self, path: str):
+        """
+        Serve the API on a Unix socket at ``path``, readable and writable by
+        this user only.
+
+        Raises:
+            OSError: If another daemon is serving on ``path``, or it is not a socket
+        """
+        if os.path.exists(path):
+            if not stat.S_ISSOCK(os.stat(path).st_mode):
+                raise OSError(f"{path} exists and is not a socket")
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(path)
+                raise OSError(f"A daemon is already serving on {path}")
+            except ConnectionRefusedError:
+                # Left behind by a daemon that did not shut down cleanly
+                os.unlink(path)
+            finally:
+                probe.close()
+        server = _UnixHTTPServer(path, _Handler)
+        # Only this user can connect, and browsers cannot reach a Unix socket
+        server.allowed_hosts = None
+        os.chmod(path, 0o600)
+        self._start(server)
+        logger.info(f"Serving jobs on {path}")
+
+    def _start(self, server: socketserver.BaseServer):
+        server.daemon_threads = True
+        server.owner = self
+        thread = threading.Thread(target=server.serve_forever, name='daemon-api', daemon=True)
+        thread.start()
+        self._servers.append((server, thread))
+
+    def serve_forever(self):
+        """Block until SIGINT or SIGTERM (or ``stop``), then ``close``."""
+        if threading.current_thread() is threading.main_thread():
+            for signum in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signum, lambda *args: self._stop.set())
+        try:
+            while not self._stop.wait(0.5):
+                pass
+        finally:
+            self.close()
+
+    def stop(self):
+        self._stop.set()
+
+    def close(self, timeout: float = 30):
+        """
+        Stop accepting jobs, cancel queued ones and stop running ones.
+
+        Running downloads stop at their next chunk with their .part files
+        checkpointed (resubmitting a job continues them); jobs still running
+        after ``timeout`` seconds are left to finish in the background.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            cancelled = [job for job in self._jobs.values() if job.status == QUEUED]
+            for job in cancelled:
+                self._set_finished(job, CANCELLED)
+            running = [job for job in self._jobs.values() if job.status == RUNNING]
+            for job in running:
+                job.stop.set()
+        for job in cancelled:
+            self._notify(job)
+        for server, thread in self._servers:
+            server.shutdown()
+            server.server_close()
+            thread.join()
+            if isinstance(server, _UnixHTTPServer) and os.path.exists(server.server_address):
+                os.unlink(server.server_address)
+        deadline = time.monotonic() + timeout
+        for job in running:
+            if not job.done.wait(max(0.0, deadline - time.monotonic())):
+                logger.warning(f"Job {job.id} did not stop within {timeout}s")
+        self._executor.shutdown(wait=False)
+        if self._owns_transport:
+            self.transport.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """The HTTP API on a Unix socket."""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = 'ytsnap'
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _parts(self) -> List[str]:
+        return [part for part in urlparse(self.path).path.split('/') if part]
+
+    def _send(self, status: int, body: bytes, content_type: str = 'application/json'):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, data: Dict):
+        self._send(status, json.dumps(data).encode('utf-8'))
+
+    def _error(self, status: int, message: str):
+        self._send_json(status, {'error': message})
+
+    def _authorized(self) -> bool:
+        """Check the token, or else the Host header; answers the request if refused."""
+        token = self.server.owner.token
+        if token:
+            supplied = self.headers.get('Authorization', '')
+            if hmac.compare_digest(supplied.encode('utf-8'), f"Bearer {token}".encode('utf-8')):
+                return True
+            self._error(401, "Missing or wrong token")
+            return False
+        allowed = self.server.allowed_hosts
+        if allowed is not None:
+            host = urlparse(f"//{self.headers.get('Host', '')}").hostname or ''
+            if host not in allowed:
+                self._error(403, f"Host {self.headers.get('Host')!r} not allowed")
+                return False
+        return True
+
+    def _job(self, parts: List[str]) -> Optional[Job]:
+        job = self.server.owner.get(parts[1])
+        if job is None:
+            self._error(404, f"No job {parts[1]}")
+        return job
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        daemon = self.server.owner
+        parts = self._parts()
+        if parts == ['health']:
+            self._send_json(200, daemon.health())
+        elif parts == ['metrics']:
+            self._send(200, REGISTRY.render().encode('utf-8'), CONTENT_TYPE)
+        elif parts == ['jobs']:
+            self._send_json(200, {'jobs': [job.to_dict() for job in daemon.jobs()]})
+        elif len(parts) == 2 and parts[0] == 'jobs':
+            job = self._job(parts)
+            if job:
+                self._send_json(200, job.to_dict())
+        elif len(parts) == 3 and parts[0] == 'jobs' and parts[2] == 'events':
+            job = self._job(parts)
+            if job:
+                self._stream_events(daemon, job)
+        else:
+            self._error(404, "Not found")
+
+    def do_POST(self):
+        if not self._authorized():
+            return
+        if self._parts() != ['jobs']:
+            self._error(404, "Not found")
+            return
+        content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type != 'application/json':
+            self._error(415, "Jobs must be posted as application/json")
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            job = self.server.owner.submit(json.loads(self.rfile.read(length) or b'{}'))
+        except ValueError as e:
+            self._error(400, str(e))
+            return
+        except RuntimeError as e:
+            self._error(503, str(e))
+            return
+        self._send_json(202, job.to_dict())
+
+    def do_DELETE(self):
+        if not self._authorized():
+            return
+        parts = self._parts()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            self._error(404, "Not found")
+            return
+        job = self._job(parts)
+        if job is None:
+            return
+        if self.server.owner.cancel(job.id):
+            self._send_json(200, job.to_dict())
+        else:
+            self._error(409, f"Job {job.id} is {job.status}")
+
+    def _write_line(self, data: Dict):
+        self.wfile.write(json.dumps(data, default=str).encode('utf-8') + b'\n')
+
+    def _stream_events(self, daemon: DownloadDaemon, job: Job):
+        # HTTP/1.0: the body ends when the connection is closed
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        events = daemon.subscribe(job)
+        try:
+            if events is not None:
+                for event in events:
+                    self._write_line(event)
+            self._write_line({'event': 'job', **job.to_dict()})
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            if events is not None:
+                job.progress.remove_reporter(events)
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        super().__init__('localhost', timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class DaemonClient:
+    """
+    Submits jobs to a running daemon and follows them.
+
+    ``address`` is the daemon's URL (``http://127.0.0.1:9465``) or the path
+    of its Unix socket; ``token`` is the daemon's token, if it has one.
+    """
+
+    def __init__(self, address: str = f"http://127.0.0.1:{DEFAULT_PORT}", timeout: float = 30,
+                 token: Optional[str] = None):
+        self.address = address
+        self.timeout = timeout
+        self.token = token
+
+    def _connection(self, timeout: Optional[float]) -> http.client.HTTPConnection:
+        if self.address.startswith('http://'):
+            parsed = urlparse(self.address)
+            return http.client.HTTPConnection(parsed.hostname, parsed.port or DEFAULT_PORT, timeout=timeout)
+        return _UnixHTTPConnection(self.address, timeout=timeout)
+
+    def _open(self, method: str, path: str, body: Optional[Dict] = None, timeout: Optional[float] = None):
+        connection = self._connection(timeout)
+        data = json.dumps(body).encode('utf-8') if body is not None else None
+        headers = {'Content-Type': 'application/json'} if data is not None else {}
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        connection.request(method, path, body=data, headers=headers)
+        response = connection.getresponse()
+        if response.status >= 400:
+            try:
+                message = json.loads(response.read()).get('error', response.reason)
+            except ValueError:
+                message = response.reason
+            connection.close()
+            raise DaemonError(response.status, message)
+        return connection, response
+
+    def _request(self, method: str, path: str, body: Optional[Dict] = None) -> Dict:
+        connection, response = self._open(method, path, body, self.timeout)
+        try:
+            return json.loads(response.read())
+        finally:
+            connection.close()
+
+    def submit(self, url: str, **options) -> Dict:
+        """Queue a job; returns it (its ``id`` identifies it from then on)."""
+        return self._request('POST', '/jobs', {'url': url, **options})
+
+    def job(self, job_id: str) -> Dict:
+        return self._request('GET', f'/jobs/{job_id}')
+
+    def jobs(self) -> List[Dict]:
+        return self._request('GET', '/jobs')['jobs']
+
+    def cancel(self, job_id: str) -> Dict:
+        return self._request('DELETE', f'/jobs/{job_id}')
+
+    def health(self) -> Dict:
+        return self._request('GET', '/health')
+
+    def events(self, job_id: str) -> Iterator[Dict]:
+        """Yield a job's progress events as they happen; the last one (``'job'``) is the finished job."""
+        connection, response = self._open('GET', f'/jobs/{job_id}/events')
+        try:
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            connection.close()
+
+    def wait(self, job_id: str) -> Dict:
+        """Block until a job has finished; returns it."""
+        job = None
+        for event in self.events(job_id):
+            if event['event'] == 'job':
+                job = {key: value for key, value in event.items() if key != 'event'}
+        return job
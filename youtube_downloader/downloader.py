@@ -1,31 +1,347 @@
 import re
 import json
 import os
+import time
+import threading
+from collections import deque
 import requests
-from typing import Optional, List, Dict, Callable
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Optional, List, Dict, Callable, Iterator, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from .proxy_manager import ProxyManager, ProxyConfig
+from .resume import PartFile, IncompleteDownloadError, DownloadInterrupted
+from .cache import PlayerResponseCache, StaleStreamURL, STALE_URL_STATUSES
+from .transport import HttpTransport
+from .rate_limit import RequestPacer
+from .concurrency import AIMDController
+from .bandwidth import BandwidthScheduler
+from .receive import iter_response_chunks
+from .writer import DiskWriter, WriterStream
+from .selector import FormatTable, compile_selector, mime_details
+from .mux import mux, check_mergeable
+from .archive import DownloadArchive
+from .jobqueue import JobQueue, QueueRun
+from .integrity import (
+    DEFAULT_ALGORITHM, StreamDigest, DownloadResult, content_range, unsatisfied_length, validate_algorithm
+)
+from .metrics import (
+    PLAYER_SECONDS, BROWSE_SECONDS, MEDIA_TTFB_SECONDS, TRANSFER_RATE, MEDIA_BYTES,
+    RATE_LIMITED, RETRIES, proxy_label
+)
+from .tracing import span, current_span, propagate
+from .progress import Progress, TerminalReporter
 from tqdm import tqdm
 
+CHUNK_SIZE = 1024 * 1024
+# Innertube API; YTSNAP_API_BASE points the downloaders at a stand-in server (see benchmarks/)
+API_BASE_URL = os.environ.get('YTSNAP_API_BASE', 'https://www.youtube.com/youtubei/v1').rstrip('/')
+PLAYER_API_URL = f"{API_BASE_URL}/player"
+BROWSE_API_URL = f"{API_BASE_URL}/browse"
+# Smallest byte range worth its own connection in segmented downloads
+MIN_SEGMENT_SIZE = 1024 * 1024
+
+ANDROID_CLIENT = {
+    "clientName": "ANDROID",
+    "clientVersion": "19.09.37",
+    "androidSdkVersion": 30,
+    "hl": "en",
+    "gl": "US"
+}
+
+
+def extract_video_id(url: str) -> str:
+    """Extract the 11-character video ID from a URL or bare ID."""
+    patterns = [
+        r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
+        r'(?:embed\/)([0-9A-Za-z_-]{11})',
+        r'^([0-9A-Za-z_-]{11})$'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    raise ValueError("Invalid YouTube URL")
+
+
+def extract_playlist_id(url: str) -> str:
+    """Extract playlist ID from URL."""
+    patterns = [
+        r'list=([a-zA-Z0-9_-]+)',
+        r'/playlist\?list=([a-zA-Z0-9_-]+)',
+        r'^([a-zA-Z0-9_-]+)$'  # Direct ID
+    ]
+    
+    for pattern in patterns:
+        match = re.search(pattern, url)
+        if match:
+            return match.group(1)
+    
+    raise ValueError("Invalid YouTube playlist URL")
+
+
+def parse_formats(data: Dict) -> List[Dict]:
+    """Turn a player response into the list of downloadable format dicts."""
+    if 'playabilityStatus' in data:
+        status = data['playabilityStatus'].get('status')
+        if status != 'OK':
+            reason = data['playabilityStatus'].get('reason', 'Unknown error')
+            raise Exception(f"Video not available: {reason}")
+    
+    formats = data.get('streamingData', {}).get('formats', []) + \
+              data.get('streamingData', {}).get('adaptiveFormats', [])
+    
+    video_formats = []
+    for fmt in formats:
+        if 'url' in fmt:
+            details = mime_details(fmt.get('mimeType', ''))
+            duration = fmt.get('approxDurationMs')
+            video_formats.append({
+                'itag': fmt.get('itag'),
+                'quality': fmt.get('qualityLabel', fmt.get('quality')),
+                'mime': fmt.get('mimeType', '').split(';')[0],
+                'url': fmt['url'],
+                'has_video': 'video' in fmt.get('mimeType', ''),
+                # Muxed formats are video/* with an audio codec listed second
+                'has_audio': 'audio' in fmt.get('mimeType', '') or details['acodec'] is not None,
+                'filesize': fmt.get('contentLength', 0),
+                'width': fmt.get('width'),
+                'height': fmt.get('height'),
+                'fps': fmt.get('fps'),
+                'bitrate': fmt.get('averageBitrate', fmt.get('bitrate')),
+                'audio_sample_rate': fmt.get('audioSampleRate'),
+                'audio_channels': fmt.get('audioChannels'),
+                'duration': int(duration) / 1000 if duration else None,
+                **details
+            })
+    
+    return FormatTable(video_formats)
+
+
+def select_format(formats: List[Dict], itag=None, quality=None, format_spec: Optional[str] = None) -> Dict:
+    """Pick a format by selector expression, itag, quality label, or the first muxed format."""
+    if format_spec:
+        selected = compile_selector(format_spec).select(formats)
+    elif itag:
+        selected = next((f for f in formats if f['itag'] == itag), None)
+        if not selected:
+            raise Exception(f"Format with itag {itag} not found")
+    elif quality:
+        selected = next((f for f in formats if f['quality'] == quality and f['has_video'] and f['has_audio']), None)
+        if not selected:
+            selected = next((f for f in formats if quality in str(f['quality'])), None)
+        if not selected:
+            raise Exception(f"Quality {quality} not found")
+    else:
+        with_both = [f for f in formats if f['has_video'] and f['has_audio']]
+        selected = with_both[0] if with_both else formats[0]
+    return selected
+
+
+def media_headers(byte_range: str = 'bytes=0-') -> Dict[str, str]:
+    """Headers for a googlevideo media request."""
+    return {
+        'User-Agent': 'com.google.android.youtube/19.09.37 (Linux; U; Android 11)',
+        'Accept': '*/*',
+        'Accept-Encoding': 'gzip, deflate',
+        'Range': byte_range
+    }
+
+
+def playlist_output_path(output_dir: str, video: Dict) -> str:
+    """Output path for a playlist entry: safe title plus video_id to prevent collisions."""
+    safe_title = "".join(c for c in video.get('title', 'video') if c.isalnum() or c in (' ', '-', '_')).strip()
+    safe_title = safe_title.replace(' ', '_')[:80]  # Leave room for video_id
+    video_id = video.get('video_id', 'unknown')
+    return os.path.join(output_dir, f"{safe_title}_{video_id}.mp4")
+
+
+WEB_CLIENT = {
+    "clientName": "WEB",
+    "clientVersion": "2.0",
+    "hl": "en",
+    "gl": "US"
+}
+
+
+def _playlist_items(data: Dict) -> List[Dict]:
+    """
+    Flatten the item renderers of a browse response.
+    
+    Handles the first page (tabs -> sections -> item sections, optionally
+    wrapped in a playlistVideoListRenderer) and continuation pages
+    (appendContinuationItemsAction or playlistVideoListContinuation).
+    """
+    items = []
+    
+    # Navigate through the response structure
+    contents = data.get('contents', {})
+    two_column_browser_renderer = contents.get('twoColumnBrowseResultsRenderer', {})
+    tabs = two_column_browser_renderer.get('tabs', [])
+    
+    for tab in tabs:
+        tab_renderer = tab.get('tabRenderer', {})
+        content = tab_renderer.get('content', {})
+        section_list_renderer = content.get('sectionListRenderer', {})
+        for section in section_list_renderer.get('contents', []):
+            item_section = section.get('itemSectionRenderer', {})
+            items.extend(item_section.get('contents', []))
+    
+    for action in data.get('onResponseReceivedActions', []):
+        append_action = action.get('appendContinuationItemsAction', {})
+        items.extend(append_action.get('continuationItems', []))
+    
+    continuation_contents = data.get('continuationContents', {})
+    items.append({'playlistVideoListRenderer': continuation_contents.get('playlistVideoListContinuation', {})})
+    
+    # WEB responses wrap the videos in a playlistVideoListRenderer
+    flattened = []
+    for item in items:
+        video_list = item.get('playlistVideoListRenderer')
+        if video_list is not None:
+            flattened.extend(video_list.get('contents', []))
+            for continuation in video_list.get('continuations', []):
+                flattened.append({'nextContinuationData': continuation.get('nextContinuationData', {})})
+        else:
+            flattened.append(item)
+    return flattened
+
+
+def extract_playlist_videos(data: Dict) -> List[Dict]:
+    """Extract video list from a playlist browse response (first or continuation page)."""
+    videos = []
+    
+    for item in _playlist_items(data):
+        renderer = item.get('playlistVideoRenderer')
+        if renderer:
+            video_id = renderer.get('videoId')
+            title_data = renderer.get('title', {})
+            title = title_data.get('runs', [{}])[0].get('text', title_data.get('simpleText', 'Unknown'))
+            
+            if video_id:
+                videos.append({
+                    'video_id': video_id,
+                    'title': title,
+                    'url': f"https://www.youtube.com/watch?v={video_id}"
+                })
+    
+    return videos
+
+
+def extract_playlist_continuation(data: Dict) -> Optional[str]:
+    """Token for the next page of a playlist browse response, or None on the last page."""
+    for item in _playlist_items(data):
+        renderer = item.get('continuationItemRenderer')
+        if renderer:
+            token = (renderer.get('continuationEndpoint', {})
+                     .get('continuationCommand', {})
+                     .get('token'))
+            if token:
+                return token
+        token = item.get('nextContinuationData', {}).get('continuation')
+        if token:
+            return token
+    return None
+
+
+def proxy_request_settings(proxy: ProxyConfig):
+    """Per-request ``(proxies, auth)`` for a proxy configuration."""
+    proxy_dict = proxy.to_dict()
+    auth = None
+    
+    # Handle SOCKS proxies using requests[socks]
+    if proxy.scheme in ('socks4', 'socks5'):
+        # Convert to proper SOCKS URL format
+        socks_version = 'socks4' if proxy.scheme == 'socks4' else 'socks5'
+        credentials = (
+            f"{proxy.username}:{proxy.password}@"
+            if (proxy.username and proxy.password)
+            else (f"{proxy.username}@" if proxy.username else "")
+        )
+        proxy_url = f"{socks_version}://{credentials}{proxy.host}:{proxy.port}"
+        proxy_dict = {
+            'http': proxy_url,
+            'https': proxy_url
+        }
+    elif proxy.username and proxy.password:
+        # For authenticated HTTP proxies, set up authentication
+        from requests.auth import HTTPProxyAuth
+        auth = HTTPProxyAuth(proxy.username, proxy.password)
+    
+    return proxy_dict, auth
+
+
+class _NullBar:
+    """Takes the place of a tqdm bar when progress is reported elsewhere."""
+    
+    def update(self, n: int = 1):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        pass
+
+
 class YouTubeDownloader:
-    def __init__(self, url, proxy_manager: Optional[ProxyManager] = None):
+    def __init__(self, url, proxy_manager: Optional[ProxyManager] = None,
+                 cache: Optional[PlayerResponseCache] = None, transport: Optional[HttpTransport] = None,
+                 pacer: Optional[RequestPacer] = None, controller: Optional[AIMDController] = None,
+                 bandwidth: Optional[BandwidthScheduler] = None, priority: float = 1.0,
+                 fsync: str = 'checkpoint', checksum: Optional[str] = DEFAULT_ALGORITHM,
+                 progress: Optional[Progress] = None, stop: Optional[threading.Event] = None):
         self.url = url
         self.video_id = self._extract_video_id(url)
         self.proxy_manager = proxy_manager
+        # Player responses are reused until their stream URLs expire
+        self.cache = cache if cache is not None else PlayerResponseCache()
         self._active_proxy = None  # type: Optional[ProxyConfig]
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': '*/*',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Origin': 'https://www.youtube.com',
-            'Referer': 'https://www.youtube.com/'
-        })
+        self._proxies = None
+        self._proxy_auth = None
+        # A shared transport is owned (and closed) by whoever created it
+        self._owns_transport = transport is None
+        self.transport = transport if transport is not None else HttpTransport()
+        self.session = self.transport.session
+        # Token buckets shared with other downloaders (no pacing if None)
+        self.pacer = pacer
+        # Adaptive concurrency controller fed with bytes and 429s (playlist downloads)
+        self.controller = controller
+        # Process-wide byte-rate cap; this download's share is weighted by priority
+        self.bandwidth = bandwidth
+        self.priority = priority
+        self._bandwidth_share = None
+        # When the disk writer fsyncs: always, checkpoint, close or never
+        self.fsync = fsync
+        # Digest computed on the bytes as they arrive (None disables hashing)
+        if checksum:
+            validate_algorithm(checksum)
+        self.checksum = checksum
+        # Aggregated progress shared with other downloads (no tqdm bar, no prints);
+        # None draws this download's own bar
+        self.progress = progress
+        # Once set, the transfer stops at the next chunk with DownloadInterrupted,
+        # leaving a checkpointed .part file
+        self.stop = stop
+        self.rate_limit_hits = 0
+        self.bytes_downloaded = 0
+        # Formats chosen by the last download() (two for merged downloads)
+        self.selected_formats: List[Dict] = []
+        self._counter_lock = threading.Lock()
         
         # Configure proxy for session if proxy manager is provided
         if self.proxy_manager:
             self._setup_proxy()
         
+    def close(self):
+        """Close the connection pool unless it is shared."""
+        if self._owns_transport:
+            self.transport.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.close()
+    
     def _setup_proxy(self):
         """Setup proxy for the session."""
         if not self.proxy_manager:
@@ -36,68 +352,84 @@ class YouTubeDownloader:
             self._apply_proxy(proxy)
     
     def _apply_proxy(self, proxy: ProxyConfig):
-        """Apply a proxy configuration to the session."""
+        """Use a proxy for this downloader's requests (the session may be shared)."""
         self._active_proxy = proxy
-        proxy_dict = proxy.to_dict()
-        
-        # Handle SOCKS proxies using requests[socks]
-        if proxy.scheme in ('socks4', 'socks5'):
-            # Convert to proper SOCKS URL format
-            socks_version = 'socks4' if proxy.scheme == 'socks4' else 'socks5'
-            auth = (
-                f"{proxy.username}:{proxy.password}@"
-                if (proxy.username and proxy.password)
-                else (f"{proxy.username}@" if proxy.username else "")
-            )
-            proxy_url = f"{socks_version}://{auth}{proxy.host}:{proxy.port}"
-            proxy_dict = {
-                'http': proxy_url,
-                'https': proxy_url
-            }
-        elif proxy.username and proxy.password:
-            # For authenticated HTTP proxies, set up authentication
-            from requests.auth import HTTPProxyAuth
-            self.session.auth = HTTPProxyAuth(proxy.username, proxy.password)
-        
-        self.session.proxies = proxy_dict
+        self._proxies, self._proxy_auth = proxy_request_settings(proxy)
     
     def _rotate_proxy(self):
         """Rotate to a new proxy."""
         if not self.proxy_manager:
             return
         
-        proxy = self.proxy_manager.get_proxy()
-        if proxy:
-            self._apply_proxy(proxy)
+        with span('rotate_proxy', previous=proxy_label(self._active_proxy)) as rotate_span:
+            proxy = self.proxy_manager.get_proxy()
+            if proxy:
+                self._apply_proxy(proxy)
+                rotate_span.set_attribute('proxy', proxy_label(proxy))
+    
+    def _pace(self, kind: str):
+        """Wait for the request pacer before a ``kind`` request through the active proxy."""
+        if self.pacer:
+            self.pacer.wait(kind, self._active_proxy)
+    
+    def _count_rate_limit(self, endpoint: str, proxy: Optional[ProxyConfig]):
+        """Count a 429 response."""
+        RATE_LIMITED.inc(endpoint=endpoint, proxy=proxy_label(proxy))
+        with self._counter_lock:
+            self.rate_limit_hits += 1
+        if self.controller:
+            self.controller.record_rate_limit()
+    
+    def _count_bytes(self, count: int):
+        """Count media bytes received, then wait for room under the bandwidth cap."""
+        with self._counter_lock:
+            self.bytes_downloaded += count
+        if self.controller:
+            self.controller.record_bytes(count)
+        if self.progress:
+            self.progress.advance(self.video_id, count)
+        if self._bandwidth_share:
+            self._bandwidth_share.consume(count)
+        if self.stop is not None and self.stop.is_set():
+            raise DownloadInterrupted(f"Download of {self.video_id} interrupted")
+    
+    def _warn(self, text: str, newline: bool = False):
+        """Report a warning to the aggregated progress, or print it (after the bar's line)."""
+        if self.progress:
+            self.progress.message(text, level='warning')
+        else:
+            print(("\n" if newline else "") + f"⚠ {text}")
+    
+    def _bar(self, desc: str, total: int):
+        """This download's own tqdm bar, or a stand-in when progress is aggregated."""
+        if self.progress:
+            return _NullBar()
+        return tqdm(
+            desc=desc,
+            total=total,
+            unit='B',
+            unit_scale=True,
+            unit_divisor=1024,
+            bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{rate_fmt}, {elapsed}<{remaining}]'
+        )
     
     def _extract_video_id(self, url):
-        patterns = [
-            r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
-            r'(?:embed\/)([0-9A-Za-z_-]{11})',
-            r'^([0-9A-Za-z_-]{11})$'
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        raise ValueError("Invalid YouTube URL")
+        return extract_video_id(url)
     
     def _get_video_info(self, retries: int = 3):
-        api_url = "https://www.youtube.com/youtubei/v1/player"
+        api_url = PLAYER_API_URL
         
         payload = {
-            "context": {
-                "client": {
-                    "clientName": "ANDROID",
-                    "clientVersion": "19.09.37",
-                    "androidSdkVersion": 30,
-                    "hl": "en",
-                    "gl": "US"
-                }
-            },
+            "context": {"client": dict(ANDROID_CLIENT)},
             "videoId": self.video_id
         }
         
+        client = ANDROID_CLIENT["clientName"]
+        cached = self.cache.get(self.video_id, client)
+        current_span().set_attribute('cached', cached is not None)
+        if cached is not None:
+            return cached
+        
         for attempt in range(retries):
             try:
                 # Refresh session proxy if manager rotated by time
@@ -108,12 +440,21 @@ class YouTubeDownloader:
                 # Record against the actual active proxy
                 current_proxy = self._active_proxy
                 
-                response = self.session.post(api_url, json=payload, timeout=30)
+                self._pace('player')
+                started = time.monotonic()
+                with span('player_request', video_id=self.video_id, client=client, attempt=attempt + 1,
+                          proxy=proxy_label(current_proxy)) as request_span:
+                    response = self.session.post(api_url, json=payload, timeout=30,
+                                                 proxies=self._proxies, auth=self._proxy_auth)
+                    request_span.set_attribute('http.status_code', response.status_code)
+                elapsed = time.monotonic() - started
+                PLAYER_SECONDS.observe(elapsed, proxy=proxy_label(current_proxy), client=client)
                 
                 # Handle rate limiting
                 if response.status_code == 429:
+                    self._count_rate_limit('player', current_proxy)
                     if self.proxy_manager:
-                        print("⚠ Rate limited (429). Rotating proxy...")
+                        self._warn("Rate limited (429). Rotating proxy...")
                         if current_proxy:
                             self.proxy_manager.record_failure(
                                 current_proxy,
@@ -121,6 +462,7 @@ class YouTubeDownloader:
                             )
                         self._rotate_proxy()
                         if attempt < retries - 1:
+                            RETRIES.inc(endpoint='player', proxy=proxy_label(current_proxy), reason='429')
                             continue
                     raise Exception("Rate limited by YouTube (429 Too Many Requests)")
                 
@@ -129,12 +471,17 @@ class YouTubeDownloader:
                 # Record success if using proxies
                 if self.proxy_manager and current_proxy:
                     self.proxy_manager.record_success(current_proxy)
+                    self.proxy_manager.record_timing(current_proxy, elapsed)
                 
-                return response.json()
+                data = response.json()
+                if isinstance(data, dict) and data.get('playabilityStatus', {}).get('status') == 'OK':
+                    self.cache.put(self.video_id, client, data)
+                return data
                 
             except requests.exceptions.RequestException as e:
                 if self.proxy_manager and attempt < retries - 1:
-                    print(f"⚠ Request failed. Rotating proxy... ({attempt + 1}/{retries})")
+                    self._warn(f"Request failed. Rotating proxy... ({attempt + 1}/{retries})")
+                    RETRIES.inc(endpoint='player', proxy=proxy_label(current_proxy), reason=e.__class__.__name__)
                     if current_proxy:
                         self.proxy_manager.record_failure(current_proxy, e)
                     self._rotate_proxy()
@@ -144,60 +491,28 @@ class YouTubeDownloader:
         raise Exception("Failed to fetch video info after multiple attempts")
     
     def get_formats(self):
-        data = self._get_video_info()
-        
-        if 'playabilityStatus' in data:
-            status = data['playabilityStatus'].get('status')
-            if status != 'OK':
-                reason = data['playabilityStatus'].get('reason', 'Unknown error')
-                raise Exception(f"Video not available: {reason}")
-        
-        formats = data.get('streamingData', {}).get('formats', []) + \
-                  data.get('streamingData', {}).get('adaptiveFormats', [])
-        
-        video_formats = []
-        for fmt in formats:
-            if 'url' in fmt:
-                video_formats.append({
-                    'itag': fmt.get('itag'),
-                    'quality': fmt.get('qualityLabel', fmt.get('quality')),
-                    'mime': fmt.get('mimeType', '').split(';')[0],
-                    'url': fmt['url'],
-                    'has_video': 'video' in fmt.get('mimeType', ''),
-                    'has_audio': 'audio' in fmt.get('mimeType', ''),
-                    'filesize': fmt.get('contentLength', 0)
-                })
-        
-        return video_formats
+        with span('get_formats', video_id=self.video_id) as formats_span:
+            with span('video_info', video_id=self.video_id):
+                data = self._get_video_info()
+            formats = parse_formats(data)
+            formats_span.set_attribute('formats', len(formats))
+        return formats
     
-    def download(self, output_file='video.mp4', itag=None, quality=None):
-        formats = self.get_formats()
-        
-        if not formats:
-            raise Exception("No downloadable formats found")
+    def _select_format(self, formats: List[Dict], itag=None, quality=None,
+                       format_spec: Optional[str] = None) -> Dict:
+        return select_format(formats, itag=itag, quality=quality, format_spec=format_spec)
+
+    def _media_headers(self, byte_range: str = 'bytes=0-') -> Dict[str, str]:
+        return media_headers(byte_range)
+
+    def _request_media(self, url: str, headers: Dict[str, str], retries: int = 3,
+                       accept_unsatisfiable: bool = False):
+        """
+        Open a streaming media response, rotating proxies on 429s and network errors.
         
-        if itag:
-            selected = next((f for f in formats if f['itag'] == itag), None)
-            if not selected:
-                raise Exception(f"Format with itag {itag} not found")
-        elif quality:
-            selected = next((f for f in formats if f['quality'] == quality and f['has_video'] and f['has_audio']), None)
-            if not selected:
-                selected = next((f for f in formats if quality in str(f['quality'])), None)
-            if not selected:
-                raise Exception(f"Quality {quality} not found")
-        else:
-            with_both = [f for f in formats if f['has_video'] and f['has_audio']]
-            selected = with_both[0] if with_both else formats[0]
-
-        headers = {
-            'User-Agent': 'com.google.android.youtube/19.09.37 (Linux; U; Android 11)',
-            'Accept': '*/*',
-            'Accept-Encoding': 'gzip, deflate',
-            'Range': 'bytes=0-'
-        }
-        # Handle rate limiting during download
-        retries = 3
+        With ``accept_unsatisfiable``, a 416 is returned instead of raised (a
+        resumed range that starts at the end of the stream).
+        """
         response = None
         
         for attempt in range(retries):
@@ -208,11 +523,22 @@ class YouTubeDownloader:
                         self._apply_proxy(maybe)
                 current_proxy = self._active_proxy
                 
-                response = self.session.get(selected['url'], headers=headers, stream=True, timeout=60)
+                self._pace('media')
+                started = time.monotonic()
+                with span('media_request', attempt=attempt + 1, proxy=proxy_label(current_proxy),
+                          range=headers.get('Range')) as request_span:
+                    response = self.session.get(url, headers=headers, stream=True, timeout=60,
+                                                proxies=self._proxies, auth=self._proxy_auth)
+                    request_span.set_attribute('http.status_code', response.status_code)
+                # stream=True returns once the headers are in
+                ttfb = time.monotonic() - started
+                MEDIA_TTFB_SECONDS.observe(ttfb, proxy=proxy_label(current_proxy))
                
                 if response.status_code == 429:
+                    self._count_rate_limit('media', current_proxy)
                     if self.proxy_manager and attempt < retries - 1:
-                        print("\nâš  Rate limited during download. Rotating proxy...")
+                        self._warn("Rate limited during download. Rotating proxy...", newline=True)
+                        RETRIES.inc(endpoint='media', proxy=proxy_label(current_proxy), reason='429')
                         if current_proxy:
                             self.proxy_manager.record_failure(
                                 current_proxy,
@@ -222,16 +548,23 @@ class YouTubeDownloader:
                         continue
                     response.raise_for_status()
                 
-                response.raise_for_status()
+                if response.status_code in STALE_URL_STATUSES:
+                    # Bound to the IP the player response was fetched from; no proxy helps
+                    response.close()
+                    raise StaleStreamURL(f"Stream URL rejected ({response.status_code})")
+                if not (accept_unsatisfiable and response.status_code == 416):
+                    response.raise_for_status()
                 
                 if self.proxy_manager and current_proxy:
                     self.proxy_manager.record_success(current_proxy)
+                    self.proxy_manager.record_timing(current_proxy, ttfb)
                 
                 break
                 
             except requests.exceptions.RequestException as e:
                 if self.proxy_manager and attempt < retries - 1:
-                    print(f"\nâš  Download failed ({e.__class__.__name__}). Retrying with new proxy...")
+                    self._warn(f"Download failed ({e.__class__.__name__}). Retrying with new proxy...", newline=True)
+                    RETRIES.inc(endpoint='media', proxy=proxy_label(current_proxy), reason=e.__class__.__name__)
                     if current_proxy:
                         self.proxy_manager.record_failure(current_proxy, e)
                     self._rotate_proxy()
@@ -240,31 +573,367 @@ class YouTubeDownloader:
         
         if response is None:
             raise Exception("Failed to get a successful response after all retries.")
+        
+        return response
+
+    def _record_transfer(self, proxy: Optional[ProxyConfig], nbytes: int, started: float):
+        """Report the throughput of a media transfer to the metrics and the proxy manager."""
+        seconds = time.monotonic() - started
+        if nbytes > 0:
+            MEDIA_BYTES.inc(nbytes, proxy=proxy_label(proxy))
+            if seconds > 0:
+                TRANSFER_RATE.observe(nbytes / seconds, proxy=proxy_label(proxy))
+        if self.proxy_manager and proxy:
+            self.proxy_manager.record_throughput(proxy, nbytes, seconds)
+
+    def _new_digest(self) -> Optional[StreamDigest]:
+        return StreamDigest(self.checksum) if self.checksum else None
+
+    def download(self, output_file='video.mp4', itag=None, quality=None, segments: int = 1,
+                 format_spec: Optional[str] = None) -> DownloadResult:
+        """
+        Download a single format to ``output_file``.
+        
+        Args:
+            output_file: Destination path
+            itag: Specific itag to use
+            quality: Quality preference (e.g., '720p')
+            segments: Number of parallel byte-range connections. Only used
+                when the format advertises its ``contentLength``.
+            format_spec: Format selector expression (see ``selector``), e.g.
+                ``'best[height<=720][filesize<300M]/smallest-audio'``;
+                takes precedence over ``itag`` and ``quality``. An
+                expression selecting ``video+audio`` (such as
+                ``mux.MERGE_FORMAT``) downloads both in parallel and merges
+                them into one MP4.
+        
+        Returns:
+            DownloadResult: ``output_file`` with its size, expected size and
+            checksums, all computed while downloading
+        
+        Raises:
+            IncompleteDownloadError: If fewer or more bytes arrived than
+                YouTube announced (the .part file is kept for resuming)
+        """
+        with span('download', video_id=self.video_id, output=output_file) as download_span:
+            try:
+                result = self._download_selected(output_file, itag, quality, segments, format_spec)
+            except StaleStreamURL as e:
+                # A cached response fetched through another proxy (or revoked): fetch it
+                # again, continuing from the .part files
+                self._warn(f"{e}; fetching a fresh player response...", newline=True)
+                self.cache.invalidate(self.video_id, ANDROID_CLIENT["clientName"])
+                result = self._download_selected(output_file, itag, quality, segments, format_spec)
+            download_span.set_attribute('itag', result.itag)
+            download_span.set_attribute('bytes', result.size)
+        
+        if not self.progress:
+            print(f"✔ Downloaded to {output_file}")
+        return result
+
+    def _download_selected(self, output_file: str, itag, quality, segments: int,
+                           format_spec: Optional[str]) -> DownloadResult:
+        """Select the format(s) from the player response and download them."""
+        formats = self.get_formats()
+        
+        if not formats:
+            raise Exception("No downloadable formats found")
+        
+        with span('select_format', format_spec=format_spec, quality=quality) as select_span:
+            if format_spec and compile_selector(format_spec).merges:
+                selected = compile_selector(format_spec).select_all(formats)
+            else:
+                selected = [self._select_format(formats, itag=itag, quality=quality, format_spec=format_spec)]
+            select_span.set_attribute('itag', '+'.join(str(fmt.get('itag')) for fmt in selected))
+        self.selected_formats = selected
+        
+        if self.bandwidth:
+            self._bandwidth_share = self.bandwidth.register(self.priority)
+        try:
+            if len(selected) == 2:
+                return self._download_merged(selected[0], selected[1], output_file, segments)
+            return self._download_format(selected[0], output_file, segments)
+        finally:
+            if self._bandwidth_share:
+                self._bandwidth_share.close()
+                self._bandwidth_share = None
 
-        total_size = int(response.headers.get('content-length', 0))
+    def _download_format(self, selected: Dict, output_file: str, segments: int) -> DownloadResult:
+        """Download one format, over parallel ranges when it is large enough."""
+        total_size = int(selected.get('filesize') or 0)
+        if segments > 1 and total_size >= 2 * MIN_SEGMENT_SIZE:
+            return self._download_segmented(selected, output_file, total_size, segments)
+        return self._download_stream(selected, output_file)
+
+    def _download_merged(self, video: Dict, audio: Dict, output_file: str, segments: int) -> DownloadResult:
+        """
+        Download a video-only and an audio-only format in parallel, then mux them.
+        
+        Each stream goes to ``<output_file>.f<itag>`` (resumable like any
+        single format; a finished one is not fetched again) and is removed
+        once merged into ``output_file``. The checksum is taken on the merged
+        bytes as the muxer writes them.
+        """
+        # Fail before fetching anything the muxer would reject
+        check_mergeable(video, audio)
+        paths = [f"{output_file}.f{fmt.get('itag')}" for fmt in (video, audio)]
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = [
+                executor.submit(propagate(self._download_format), fmt, path, segments)
+                for fmt, path in zip((video, audio), paths)
+                if not os.path.exists(path)
+            ]
+            parts = [future.result() for future in futures]
+        
+        digest = self._new_digest()
+        with span('mux', output=output_file) as mux_span:
+            size = mux(paths[0], paths[1], output_file, digest=digest)
+            mux_span.set_attribute('bytes', size)
+        for path in paths:
+            os.remove(path)
+        return DownloadResult(output_file, itag=f"{video.get('itag')}+{audio.get('itag')}", size=size,
+                              checksum=digest.checksum if digest else None, parts=parts)
+
+    def _download_stream(self, selected: Dict, output_file: str) -> DownloadResult:
+        """
+        Download a format over a single connection.
+        
+        Bytes go to ``<output_file>.part``; a matching .part file from an
+        interrupted run is continued with a ``Range`` request (its prefix is
+        read back once to seed the checksum).
+        """
+        part = PartFile(output_file, selected.get('itag'), int(selected.get('filesize') or 0))
+        offset = part.resume_offset()
+        if part.content_length and offset >= part.content_length:
+            # Stopped on the last chunk, or killed before the rename: nothing to fetch
+            return self._finish_part(part, selected, output_file, offset)
+        
+        response = self._request_media(selected['url'], self._media_headers(f'bytes={offset}-'),
+                                       accept_unsatisfiable=bool(offset))
+        if response.status_code == 416:
+            # The server has nothing past the offset: the .part file is the whole stream
+            response.close()
+            if not part.content_length:
+                part.content_length = unsatisfied_length(response.headers) or 0
+            return self._finish_part(part, selected, output_file, offset)
+        if offset and response.status_code != 206:
+            # Server ignored the range, start over
+            offset = 0
+        received = content_range(response.headers) if response.status_code == 206 else None
+        if received:
+            first, _, total = received
+            if first != offset:
+                raise Exception(f"Server returned bytes from {first}, requested {offset}")
+            if total and part.content_length and total != part.content_length:
+                raise IncompleteDownloadError(
+                    f"Server reports {total} bytes, expected {part.content_length}"
+                )
+            if total and not part.content_length:
+                part.content_length = total
+
+        remaining = int(response.headers.get('content-length', 0))
+        if remaining and not part.content_length:
+            part.content_length = offset + remaining
+        digest = self._new_digest()
+        if digest and offset:
+            digest.update_from_file(part.path, 0, offset)
+        total_size = offset + remaining
         if total_size == 0: #
             total_size = int(selected.get('filesize', 0))
+        if self.progress:
+            self.progress.expect(self.video_id, total_size, received=offset)
 
         file_desc = f"{output_file} [{selected.get('quality', 'unknown')}]"
+        proxy = self._active_proxy
+        started, start_offset = time.monotonic(), offset
+        stream = None
 
-        with open(output_file, 'wb') as f, tqdm(
-            desc=file_desc,
-            total=total_size,
-            unit='B',
-            unit_scale=True,
-            unit_divisor=1024,
-            bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{rate_fmt}, {elapsed}<{remaining}]'
-        ) as bar:
-            for chunk in response.iter_content(chunk_size=1024*1024):
-                if chunk:
-                    f.write(chunk)
-                    bar.update(len(chunk))
-        print(f"✔ Downloaded to {output_file}")
-        return output_file
+        with span('transfer', itag=selected.get('itag'), offset=offset,
+                  proxy=proxy_label(proxy)) as transfer_span:
+            try:
+                with part.open(offset) as f, self._bar(file_desc, total_size) as bar:
+                    if offset:
+                        bar.update(offset)
+                    # Disk writes happen on the writer's thread; the sidecar is only
+                    # saved from there, once the bytes it claims have been written
+                    writer = DiskWriter(f, size=part.content_length, fsync=self.fsync)
+                    stream = writer.stream(offset)
+                    try:
+                        for chunk in iter_response_chunks(response, CHUNK_SIZE):
+                            if chunk:
+                                stream.write(chunk)
+                                if digest:
+                                    # Hashed while still in memory, never read back
+                                    digest.update(chunk)
+                                offset += len(chunk)
+                                if part.checkpoint_due(len(chunk)):
+                                    stream.barrier(lambda: part.save(committed=stream.written))
+                                bar.update(len(chunk))
+                                self._count_bytes(len(chunk))
+                    finally:
+                        with span('disk_flush'):
+                            writer.close()
+            finally:
+                part.save(committed=stream.written if stream else offset)
+                self._record_transfer(proxy, offset - start_offset, started)
+                transfer_span.set_attribute('bytes', offset - start_offset)
+        
+        part.finalize(offset)
+        return DownloadResult(output_file, itag=selected.get('itag'), size=offset,
+                              expected_size=part.content_length or None,
+                              checksum=digest.checksum if digest else None)
+
+    def _finish_part(self, part: PartFile, selected: Dict, output_file: str, size: int) -> DownloadResult:
+        """Finalize a .part file that already holds every byte, hashing it from disk."""
+        digest = self._new_digest()
+        if digest:
+            digest.update_from_file(part.path, 0, size)
+        if self.progress:
+            self.progress.expect(self.video_id, size, received=size)
+        part.finalize(size)
+        return DownloadResult(output_file, itag=selected.get('itag'), size=size,
+                              expected_size=part.content_length or None,
+                              checksum=digest.checksum if digest else None)
+
+    def _download_segmented(self, selected: Dict, output_file: str, total_size: int,
+                            segments: int) -> DownloadResult:
+        """
+        Download a format as parallel byte ranges written into a preallocated file.
+        
+        Each segment is fetched on its own connection and written at its own
+        offset, so segments can complete in any order. Per-segment progress is
+        kept in the .part sidecar, so an interrupted run only refetches the
+        missing tail of each segment. Each segment gets its own checksum,
+        since the bytes of the file do not arrive in order.
+        """
+        part = PartFile(output_file, selected.get('itag'), total_size)
+        progress = part.resume_segments()
+        
+        if progress is None:
+            segments = max(1, min(segments, total_size // MIN_SEGMENT_SIZE))
+            segment_size = -(-total_size // segments)
+            # [start, end, next_offset] per segment
+            progress = [
+                [start, min(start + segment_size, total_size) - 1, start]
+                for start in range(0, total_size, segment_size)
+            ]
+            # Preallocate so every segment can seek straight to its offset
+            part.preallocate(total_size)
+            part.save(segments=progress)
+        
+        file_desc = f"{output_file} [{selected.get('quality', 'unknown')}]"
+        progress_lock = threading.Lock()
+        
+        def written() -> int:
+            return sum(next_offset - start for start, _, next_offset in progress)
+        
+        digests = [self._new_digest() for _ in progress]
+        for digest, (start, _, next_offset) in zip(digests, progress):
+            if digest and next_offset > start:
+                digest.update_from_file(part.path, start, next_offset)
+        
+        if self.progress:
+            self.progress.expect(self.video_id, total_size, received=written())
+        
+        with open(part.path, 'r+b', buffering=0) as f, self._bar(file_desc, total_size) as bar:
+            if written():
+                bar.update(written())
+            
+            writer = DiskWriter(f, fsync=self.fsync)
+            streams = [writer.stream(next_offset) for _, _, next_offset in progress]
+            
+            def durable() -> List[List[int]]:
+                # Progress as far as the writer has actually written it
+                return [[start, end, stream.written] for (start, end, _), stream in zip(progress, streams)]
+            
+            def on_bytes(index: int, next_offset: int, count: int):
+                with progress_lock:
+                    progress[index][2] = next_offset
+                    bar.update(count)
+                if part.checkpoint_due(count):
+                    streams[index].barrier(lambda: part.save(segments=durable()))
+                self._count_bytes(count)
+            
+            try:
+                try:
+                    with ThreadPoolExecutor(max_workers=len(progress)) as executor:
+                        futures = [
+                            executor.submit(propagate(self._download_range), selected['url'], streams[index],
+                                            index, start, end, next_offset, on_bytes, digest=digests[index])
+                            for index, (start, end, next_offset) in enumerate(progress)
+                            if next_offset <= end
+                        ]
+                        for future in as_completed(futures):
+                            future.result()
+                finally:
+                    with span('disk_flush'):
+                        writer.close()
+            finally:
+                part.save(segments=durable())
+        
+        size = written()
+        part.finalize(size)
+        segment_checksums = [
+            (start, end, digest.checksum) for (start, end, _), digest in zip(progress, digests) if digest
+        ]
+        return DownloadResult(output_file, itag=selected.get('itag'), size=size, expected_size=total_size,
+                              segment_checksums=segment_checksums)
+
+    def _download_range(self, url: str, stream: WriterStream, index: int, start: int, end: int, offset: int,
+                        on_bytes: Callable, retries: int = 3, digest: Optional[StreamDigest] = None):
+        """
+        Fetch bytes ``offset``-``end`` (inclusive) of segment ``index`` into ``stream``,
+        feeding them to ``digest`` as they arrive.
+        
+        A connection dropped mid-segment is retried from the last received byte,
+        rotating the proxy the same way a failed request does.
+        """
+        for attempt in range(retries):
+            response = self._request_media(url, self._media_headers(f'bytes={offset}-{end}'))
+            if response.status_code != 206:
+                raise Exception(f"Server ignored range request for bytes {offset}-{end}")
+            
+            current_proxy = self._active_proxy
+            started, start_offset = time.monotonic(), offset
+            with span('segment', index=index, start=offset, end=end, attempt=attempt + 1,
+                      proxy=proxy_label(current_proxy)) as segment_span:
+                try:
+                    for chunk in iter_response_chunks(response, CHUNK_SIZE):
+                        if not chunk:
+                            continue
+                        chunk = chunk[:end + 1 - offset]
+                        stream.write(chunk)
+                        if digest:
+                            digest.update(chunk)
+                        offset += len(chunk)
+                        on_bytes(index, offset, len(chunk))
+                        if offset > end:
+                            return
+                except requests.exceptions.RequestException as e:
+                    if attempt == retries - 1:
+                        raise
+                    RETRIES.inc(endpoint='segment', proxy=proxy_label(current_proxy), reason=e.__class__.__name__)
+                    if self.proxy_manager:
+                        self._warn(f"Segment {start}-{end} interrupted ({e.__class__.__name__}). "
+                                   "Retrying with new proxy...", newline=True)
+                        if current_proxy:
+                            self.proxy_manager.record_failure(current_proxy, e)
+                        self._rotate_proxy()
+                finally:
+                    self._record_transfer(current_proxy, offset - start_offset, started)
+                    segment_span.set_attribute('bytes', offset - start_offset)
+        
+        raise Exception(f"Segment {start}-{end} incomplete after {retries} attempts")
 
 
 class PlaylistDownloader:
-    def __init__(self, playlist_url: str, proxy_manager: Optional[ProxyManager] = None, concurrency: int = 3):
+    def __init__(self, playlist_url: str, proxy_manager: Optional[ProxyManager] = None, concurrency: int = 3,
+                 cache: Optional[PlayerResponseCache] = None, transport: Optional[HttpTransport] = None,
+                 prefetch: Optional[int] = None, pacer: Optional[RequestPacer] = None,
+                 adaptive: bool = False, bandwidth: Optional[BandwidthScheduler] = None,
+                 fsync: str = 'checkpoint', archive: Optional[DownloadArchive] = None,
+                 checksum: Optional[str] = DEFAULT_ALGORITHM, progress: Optional[Progress] = None,
+                 queue: Optional[JobQueue] = None, stop: Optional[threading.Event] = None):
         """
         Initialize PlaylistDownloader.
         
@@ -272,19 +941,62 @@ class PlaylistDownloader:
             playlist_url: URL of the YouTube playlist
             proxy_manager: Optional ProxyManager for proxy support
             concurrency: Number of parallel downloads (default: 3)
+            cache: Player response cache shared by all videos (default: in-memory)
+            transport: Connection pool shared by all videos. When omitted, one
+                sized for ``concurrency`` is created and closed after ``download``.
+            prefetch: How many videos ahead of the media workers to fetch player
+                responses for (default: 2 x concurrency, grown automatically
+                whenever a worker has to wait for metadata; 0 disables)
+            pacer: Token buckets every browse, player and media request of the
+                playlist goes through (no pacing if None)
+            adaptive: Adjust the number of parallel downloads between 1 and
+                ``concurrency`` from measured throughput, 429s and errors
+            bandwidth: Byte-rate cap shared fairly by the videos in flight
+            fsync: Disk writer fsync policy for every video
+                ('always', 'checkpoint', 'close' or 'never')
+            archive: Record of finished downloads; archived videos are
+                skipped without a player call or a file-system check
+            checksum: Digest algorithm for every video ('sha256', 'xxh64'
+                with the xxhash package, ...; None disables hashing)
+            progress: Where the run reports its aggregated progress, messages
+                and summary (default: one status line on the terminal;
+                ``Progress()`` without reporters is quiet)
+            queue: Durable record of the run's videos and their state; a
+                later ``download`` into the same directory resumes from it
+                instead of listing the playlist and checking every file again
+            stop: Event that, once set, stops the run the way Ctrl+C does
+                (``download`` then raises DownloadInterrupted)
         """
         self.playlist_url = playlist_url
         self.playlist_id = self._extract_playlist_id(playlist_url)
         self.proxy_manager = proxy_manager
         self.concurrency = concurrency
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': '*/*',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Origin': 'https://www.youtube.com',
-            'Referer': 'https://www.youtube.com/'
-        })
+        self.prefetch = 2 * concurrency if prefetch is None else prefetch
+        self.cache = cache if cache is not None else PlayerResponseCache()
+        self._owns_transport = transport is None
+        self.transport = transport if transport is not None else HttpTransport(pool_size=concurrency)
+        self.session = self.transport.session
+        self.pacer = pacer
+        self.controller = AIMDController(max_limit=concurrency, initial=min(2, concurrency)) if adaptive else None
+        self.bandwidth = bandwidth
+        self.fsync = fsync
+        self.archive = archive
+        if checksum:
+            validate_algorithm(checksum)
+        self.checksum = checksum
+        self._owns_progress = progress is None
+        self.progress = progress if progress is not None else Progress([TerminalReporter()])
+        self.queue = queue
+        self._queue_run = None  # type: Optional[QueueRun]
+        # Set on Ctrl+C (or by the owner of ``stop``): workers stop at their
+        # next chunk and checkpoint
+        self._owns_stop = stop is None
+        self._stop = stop if stop is not None else threading.Event()
+        self._interrupted_videos = 0
+        self._active_proxy = None  # type: Optional[ProxyConfig]
+        self._proxies = None
+        self._proxy_auth = None
+        self._browse_client = ANDROID_CLIENT
         
         # Configure proxy for session if proxy manager is provided
         if self.proxy_manager:
@@ -302,149 +1014,131 @@ class PlaylistDownloader:
             self._apply_proxy(proxy)
     
     def _apply_proxy(self, proxy: ProxyConfig):
-        """Apply a proxy configuration to the session."""
-        proxy_dict = proxy.to_dict()
-        
-        # Handle SOCKS proxies using requests[socks]
-        if proxy.scheme in ('socks4', 'socks5'):
-            socks_version = 'socks4' if proxy.scheme == 'socks4' else 'socks5'
-            auth = (
-                f"{proxy.username}:{proxy.password}@"
-                if (proxy.username and proxy.password)
-                else (f"{proxy.username}@" if proxy.username else "")
-            )
-            proxy_url = f"{socks_version}://{auth}{proxy.host}:{proxy.port}"
-            proxy_dict = {
-                'http': proxy_url,
-                'https': proxy_url
-            }
-        elif proxy.username and proxy.password:
-            from requests.auth import HTTPProxyAuth
-            self.session.auth = HTTPProxyAuth(proxy.username, proxy.password)
-        
-        self.session.proxies = proxy_dict
+        """Use a proxy for playlist requests (the session is shared)."""
+        self._active_proxy = proxy
+        self._proxies, self._proxy_auth = proxy_request_settings(proxy)
     
     def _extract_playlist_id(self, url: str) -> str:
         """Extract playlist ID from URL."""
-        patterns = [
-            r'list=([a-zA-Z0-9_-]+)',
-            r'/playlist\?list=([a-zA-Z0-9_-]+)',
-            r'^([a-zA-Z0-9_-]+)$'  # Direct ID
-        ]
-        
-        for pattern in patterns:
-            match = re.search(pattern, url)
-            if match:
-                return match.group(1)
-        
-        raise ValueError("Invalid YouTube playlist URL")
+        return extract_playlist_id(url)
+    
+    def _browse(self, payload: Dict):
+        """POST a browse request through the pacer and the active proxy."""
+        if self.pacer:
+            self.pacer.wait('browse', self._active_proxy)
+        proxy, started = self._active_proxy, time.monotonic()
+        client = payload['context']['client']['clientName']
+        with span('browse', playlist_id=self.playlist_id, client=client,
+                  proxy=proxy_label(proxy)) as browse_span:
+            response = self.session.post(BROWSE_API_URL, json=payload, timeout=30,
+                                         proxies=self._proxies, auth=self._proxy_auth)
+            browse_span.set_attribute('http.status_code', response.status_code)
+        BROWSE_SECONDS.observe(time.monotonic() - started, proxy=proxy_label(proxy), client=client)
+        if response.status_code == 429:
+            RATE_LIMITED.inc(endpoint='browse', proxy=proxy_label(proxy))
+        return response
     
     def _get_playlist_info(self) -> Dict:
         """Fetch playlist metadata from YouTube API."""
-        api_url = "https://www.youtube.com/youtubei/v1/browse"
-        
         payload = {
-            "context": {
-                "client": {
-                    "clientName": "ANDROID",
-                    "clientVersion": "19.09.37",
-                    "androidSdkVersion": 30,
-                    "hl": "en",
-                    "gl": "US"
-                }
-            },
+            "context": {"client": dict(ANDROID_CLIENT)},
             "browseId": f"VL{self.playlist_id}"
         }
         
-        try:
-            response = self.session.post(api_url, json=payload, timeout=30)
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            # Try alternative endpoint
-            return self._get_playlist_info_alternative()
+        with span('playlist_info', playlist_id=self.playlist_id):
+            try:
+                response = self._browse(payload)
+                response.raise_for_status()
+                self._browse_client = ANDROID_CLIENT
+                return response.json()
+            except requests.exceptions.RequestException as e:
+                # Try alternative endpoint
+                return self._get_playlist_info_alternative()
     
     def _get_playlist_info_alternative(self) -> Dict:
         """Alternative method to get playlist info."""
-        api_url = "https://www.youtube.com/youtubei/v1/browse"
-        
         # Try with different browseId format
         payload = {
-            "context": {
-                "client": {
-                    "clientName": "WEB",
-                    "clientVersion": "2.0",
-                    "hl": "en",
-                    "gl": "US"
-                }
-            },
+            "context": {"client": dict(WEB_CLIENT)},
             "browseId": f"VL{self.playlist_id}"
         }
         
         try:
-            response = self.session.post(api_url, json=payload, timeout=30)
+            response = self._browse(payload)
             response.raise_for_status()
+            self._browse_client = WEB_CLIENT
             return response.json()
         except Exception as e:
             raise Exception(f"Failed to fetch playlist info: {e}")
     
+    def _get_playlist_continuation(self, token: str) -> Dict:
+        """Fetch the next page of the playlist with the client that served the first page."""
+        payload = {
+            "context": {"client": dict(self._browse_client)},
+            "continuation": token
+        }
+        
+        try:
+            response = self._browse(payload)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            raise Exception(f"Failed to fetch playlist continuation: {e}")
+    
     def _extract_videos_from_playlist_info(self, data: Dict) -> List[Dict]:
         """Extract video list from playlist response."""
-        videos = []
-        
-        # Navigate through the response structure
-        contents = data.get('contents', {})
-        two_column_browser_renderer = contents.get('twoColumnBrowseResultsRenderer', {})
-        tabs = two_column_browser_renderer.get('tabs', [])
-        
-        for tab in tabs:
-            tab_renderer = tab.get('tabRenderer', {})
-            content = tab_renderer.get('content', {})
-            section_list_renderer = content.get('sectionListRenderer', {})
-            items = section_list_renderer.get('contents', [])
-            
-            for item in items:
-                item_section = item.get('itemSectionRenderer', {})
-                playlist_video_list = item_section.get('contents', [])
-                
-                for playlist_video in playlist_video_list:
-                    renderer = playlist_video.get('playlistVideoRenderer')
-                    if renderer:
-                        video_id = renderer.get('videoId')
-                        title = renderer.get('title', {}).get('runs', [{}])[0].get('text', 'Unknown')
-                        
-                        if video_id:
-                            videos.append({
-                                'video_id': video_id,
-                                'title': title,
-                                'url': f"https://www.youtube.com/watch?v={video_id}"
-                            })
-        
-        return videos
+        return extract_playlist_videos(data)
     
-    def get_videos(self) -> List[Dict]:
+    def iter_videos(self) -> Iterator[Dict]:
         """
-        Fetch all videos from the playlist.
+        Lazily yield the videos of the playlist, page by page.
         
-        Returns:
-            List of video dictionaries with video_id, title, and url
+        Continuation pages are only requested once the previous page has been
+        consumed, so downloads can start after the first browse response.
         """
-        if self.videos:
-            return self.videos
-        
-        print(f"Fetching playlist information...")
+        self.progress.message("Fetching playlist information...")
         data = self._get_playlist_info()
-        self.videos = self._extract_videos_from_playlist_info(data)
+        videos = self._extract_videos_from_playlist_info(data)
+        token = extract_playlist_continuation(data)
         
-        if not self.videos:
+        if not videos and not token:
             raise Exception("No videos found in playlist or playlist is private/unavailable")
         
-        print(f"Found {len(self.videos)} videos in playlist")
+        count = 0
+        while True:
+            for video in videos:
+                count += 1
+                yield video
+            if not token:
+                break
+            data = self._get_playlist_continuation(token)
+            videos = self._extract_videos_from_playlist_info(data)
+            token = extract_playlist_continuation(data)
+        
+        self.progress.message(f"Found {count} videos in playlist")
+    
+    def get_videos(self, lazy: bool = False) -> Union[List[Dict], Iterator[Dict]]:
+        """
+        Fetch all videos from the playlist, following continuation pages.
+        
+        Args:
+            lazy: Return a generator that fetches pages on demand instead of a list
+        
+        Returns:
+            List (or iterator) of video dictionaries with video_id, title, and url
+        """
+        if self.videos:
+            return iter(self.videos) if lazy else self.videos
+        if lazy:
+            return self.iter_videos()
+        
+        self.videos = list(self.iter_videos())
         return self.videos
     
     def download(self, output_dir: str = "./downloads", quality: Optional[str] = None, itag: Optional[int] = None, 
                  on_video_start: Optional[Callable] = None, on_video_complete: Optional[Callable] = None,
-                 on_error: Optional[Callable] = None):
+                 on_error: Optional[Callable] = None, segments: int = 1,
+                 format_spec: Optional[str] = None):
         """
         Download all videos from the playlist.
         
@@ -455,110 +1149,303 @@ class PlaylistDownloader:
             on_video_start: Optional callback when video download starts
             on_video_complete: Optional callback when video download completes
             on_error: Optional callback when video download fails
+            segments: Parallel byte-range connections per video (default: 1)
+            format_spec: Format selector expression (see ``selector``), e.g.
+                ``'best[height<=720]/smallest'``; overrides quality and itag
             
         Returns:
             Dict with download statistics
+        
+        Raises:
+            KeyboardInterrupt: After a Ctrl+C, once the downloads in flight
+                have stopped and checkpointed their .part files (and, with a
+                queue, gone back to pending)
+            DownloadInterrupted: The same, when the ``stop`` event was set
         """
         import os
         
+        if format_spec:
+            # Reject a malformed expression before any download starts
+            compile_selector(format_spec)
+        
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
         
-        # Get playlist videos
-        videos = self.get_videos()
-        
-        if not videos:
-            print("No videos to download")
-            return {
-                'total': 0,
-                'successful': 0,
-                'failed': 0,
-                'failed_videos': []
-            }
+        if self._owns_stop:
+            self._stop.clear()
+        self._interrupted_videos = 0
+        # Videos are enumerated lazily, page by page, while downloads run
+        # (with a queue, the videos an earlier run left come first)
+        if self.queue is not None:
+            self._queue_run = self.queue.run(self.queue_source, os.path.abspath(output_dir))
+            videos = self._queued_videos(self._queue_run)
+        else:
+            videos = self.get_videos(lazy=True)
+        interrupted = keyboard_interrupt = False
         
         # Download statistics
         stats = {
-            'total': len(videos),
+            'total': 0,
             'successful': 0,
             'failed': 0,
             'failed_videos': []
         }
         
         # Download videos in parallel
-        print(f"\nDownloading {len(videos)} videos with concurrency={self.concurrency}...\n")
-        
-        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
-            # Submit all download tasks
-            future_to_video = {
-                executor.submit(self._download_single_video, video, output_dir, quality, itag, 
-                               on_video_start, on_video_complete): video
-                for video in videos
-            }
-            
-            # Create overall progress bar
-            with tqdm(total=len(videos), desc="Overall Progress", unit="video") as overall_bar:
-                # Process completed downloads
-                for future in as_completed(future_to_video):
-                    video = future_to_video[future]
-                    try:
-                        result = future.result()
-                        if result:
-                            stats['successful'] += 1
-                        else:
-                            stats['failed'] += 1
-                            stats['failed_videos'].append(video)
-                            if on_error:
-                                on_error(video, None)
-                    except Exception as e:
-                        stats['failed'] += 1
-                        stats['failed_videos'].append(video)
-                        if on_error:
-                            on_error(video, e)
+        if self.controller:
+            self.progress.message(f"Downloading videos with adaptive concurrency (max {self.concurrency})...")
+        else:
+            self.progress.message(f"Downloading videos with concurrency={self.concurrency}...")
+        
+        # Every worker may hold a connection; segmented downloads hold one per segment
+        if self._owns_transport:
+            self.transport.resize(self.concurrency * segments)
+        
+        # Player calls for upcoming videos run in their own small pool so the
+        # media workers find the metadata already cached
+        prefetch_workers = max(1, min(self.prefetch, self.concurrency))
+        lookahead = self.prefetch
+        max_lookahead = 8 * self.concurrency
+        
+        with span('playlist', playlist_id=self.playlist_id, concurrency=self.concurrency) as run_span:
+            try:
+                with ThreadPoolExecutor(max_workers=self.concurrency) as executor, \
+                        ThreadPoolExecutor(max_workers=prefetch_workers) as prefetcher:
+                    future_to_video = {}
+                    upcoming = deque()  # (video, prefetch future) not yet handed to a worker
+                    
+                    def collect(return_when, timeout=None):
+                        done, _ = wait(future_to_video, timeout=timeout, return_when=return_when)
+                        for future in done:
+                            self._record_result(future, future_to_video.pop(future), stats, on_error)
+                    
+                    def dispatch():
+                        nonlocal lookahead
+                        video, metadata = upcoming.popleft()
+                        while len(future_to_video) >= self._concurrency_limit():
+                            # Wake up periodically so a raised adaptive limit takes effect
+                            collect(FIRST_COMPLETED, timeout=self.controller.window if self.controller else None)
+                        # A worker that would wait on metadata means the lookahead is too short
+                        if metadata is not None and not metadata.done():
+                            lookahead = min(lookahead + 1, max_lookahead)
+                        future = executor.submit(propagate(self._download_after_prefetch), metadata, video,
+                                                 output_dir, quality, itag, on_video_start, on_video_complete,
+                                                 segments, format_spec)
+                        future_to_video[future] = video
                     
-                    overall_bar.update(1)
-        
-        # Print summary
-        print(f"\n{'='*60}")
-        print(f"Download Summary:")
-        print(f"  Total videos: {stats['total']}")
-        print(f"  Successful: {stats['successful']}")
-        print(f"  Failed: {stats['failed']}")
-        print(f"  Saved to: {output_dir}")
-        if stats['failed_videos']:
-            print(f"\n  Failed videos:")
-            for video in stats['failed_videos']:
-                print(f"    - {video.get('title', 'Unknown')}")
-        print(f"{'='*60}\n")
+                    try:
+                        for video in videos:
+                            if self._stop.is_set():
+                                interrupted = True
+                                break
+                            stats['total'] += 1
+                            self.progress.queued(video)
+                            
+                            metadata = None
+                            if self.prefetch:
+                                metadata = prefetcher.submit(propagate(self._prefetch_metadata), video, output_dir)
+                            upcoming.append((video, metadata))
+                            
+                            while len(upcoming) > lookahead:
+                                dispatch()
+                        
+                        while upcoming and not self._stop.is_set():
+                            dispatch()
+                        while future_to_video:
+                            collect(FIRST_COMPLETED)
+                    except KeyboardInterrupt:
+                        keyboard_interrupt = True
+                        self._stop.set()
+                    if self._stop.is_set():
+                        # Checkpoint instead of waiting for every download in flight:
+                        # workers stop at their next chunk, keeping their .part files
+                        interrupted = interrupted or keyboard_interrupt or bool(upcoming)
+                        for _, metadata in upcoming:
+                            if metadata is not None:
+                                metadata.cancel()
+                        upcoming.clear()
+                        while future_to_video:
+                            collect(FIRST_COMPLETED)
+                        interrupted = interrupted or self._interrupted_videos > 0
+            finally:
+                if self._owns_transport:
+                    self.transport.close()
+                run_span.set_attribute('videos', stats['total'])
+                run_span.set_attribute('failed', stats['failed'])
+        
+        if interrupted:
+            self.progress.message("Interrupted; downloads in flight were checkpointed and resume on the next run",
+                                  level='warning')
+        elif stats['total'] == 0:
+            self.progress.message("No videos to download")
+        else:
+            extra = {'output_dir': output_dir}
+            if self.controller:
+                extra.update(rate_limit_hits=self.controller.rate_limit_hits,
+                             final_concurrency=self.controller.limit)
+            self.progress.summary(stats, **extra)
+        if self._owns_progress:
+            self.progress.close()
+        self._queue_run = None
+        if keyboard_interrupt:
+            raise KeyboardInterrupt
+        if interrupted:
+            raise DownloadInterrupted(f"Stopped with {self._interrupted_videos} downloads in flight")
         
         return stats
     
-    def _download_single_video(self, video: Dict, output_dir: str, quality: Optional[str], 
-                               itag: Optional[int], on_video_start: Optional[Callable],
-                               on_video_complete: Optional[Callable]) -> bool:
-        """Download a single video from the playlist."""
-        if on_video_start:
-            on_video_start(video)
+    @property
+    def queue_source(self) -> str:
+        """What a queued run of this downloader is keyed by, with the output directory."""
+        return self.playlist_id
+    
+    def _queued_videos(self, run: QueueRun) -> Iterator[Dict]:
+        """
+        Yield the videos of a queued run that are still to download.
         
-        # Create downloader for this video
-        downloader = YouTubeDownloader(video['url'], proxy_manager=self.proxy_manager)
+        Videos left by an earlier run come first, in playlist order. The
+        playlist is then listed (again, if an earlier run stopped before
+        the last page) and only videos new to the queue are yielded; once it
+        has been listed to the end, it is not browsed again.
+        """
+        counts = run.counts()
+        pending = run.resumable()
+        if any(counts.values()):
+            self.progress.message(
+                f"Resuming from queue: {counts['done']} done, {len(pending)} to download"
+                + (f" ({run.recovered} interrupted)" if run.recovered else "")
+            )
+        yield from pending
+        if run.enumerated:
+            return
+        for video in self.get_videos(lazy=True):
+            if run.add(video):
+                yield video
+        run.mark_enumerated()
+    
+    def _concurrency_limit(self) -> int:
+        """Downloads allowed in flight (adaptive limit or the fixed concurrency)."""
+        return self.controller.limit if self.controller else self.concurrency
+    
+    def _existing_download(self, video: Dict, output_dir: str) -> Optional[str]:
+        """
+        Path of an earlier download of ``video``, or None.
         
-        # Generate safe filename from title with video_id to prevent collisions
-        safe_title = "".join(c for c in video.get('title', 'video') if c.isalnum() or c in (' ', '-', '_')).strip()
-        safe_title = safe_title.replace(' ', '_')[:80]  # Leave room for video_id
-        video_id = video.get('video_id', 'unknown')
-        output_file = os.path.join(output_dir, f"{safe_title}_{video_id}.mp4")
+        Archived videos are found by ID alone. Otherwise the output path is
+        checked; a file found there is added to the archive so later runs
+        skip the check.
+        """
+        if self.archive is not None and video['video_id'] in self.archive:
+            entry = self.archive.get(video['video_id'])
+            return entry.path if entry else None
         
-        # Skip if file already exists (resume support)
-        if os.path.exists(output_file):
-            print(f"✓ Skipping {video.get('title', 'video')} (already exists)")
+        # Downloads are written to a .part file first, so the final name
+        # only exists once complete
+        output_file = playlist_output_path(output_dir, video)
+        if not os.path.exists(output_file):
+            return None
+        if self.archive is not None:
+            self.archive.add(video['video_id'], output_file, size=os.path.getsize(output_file))
+        return output_file
+    
+    def _prefetch_metadata(self, video: Dict, output_dir: str):
+        """Warm the player cache for a video that is about to be downloaded."""
+        if self._existing_download(video, output_dir):
+            return
+        try:
+            downloader = YouTubeDownloader(video['url'], proxy_manager=self.proxy_manager, cache=self.cache,
+                                           transport=self.transport, pacer=self.pacer, controller=self.controller,
+                                           progress=self.progress)
+            downloader.get_formats()
+        except Exception:
+            # The media worker retries and reports the error itself
+            pass
+    
+    def _download_after_prefetch(self, metadata, video: Dict, *args) -> bool:
+        """Wait for a pending prefetch (so the player call is not duplicated), then download."""
+        if metadata is not None:
+            with span('wait_metadata', video_id=video['video_id']):
+                wait([metadata])
+        return self._download_single_video(video, *args)
+    
+    def _record_result(self, future, video: Dict, stats: Dict, on_error: Optional[Callable]):
+        """Fold a finished download into the run statistics (and the queue)."""
+        try:
+            result = future.result()
+            if self.controller:
+                self.controller.record_result(bool(result))
+            if result:
+                stats['successful'] += 1
+            else:
+                stats['failed'] += 1
+                stats['failed_videos'].append(video)
+                if self._queue_run is not None:
+                    self._queue_run.failed(video['video_id'], None, self.progress.received(video['video_id']))
+                self.progress.failed(video)
+                if on_error:
+                    on_error(video, None)
+        except DownloadInterrupted:
+            # Stopped on request, not failed: the next run continues it
+            self._interrupted_videos += 1
+            if self._queue_run is not None:
+                self._queue_run.release(video['video_id'], self.progress.received(video['video_id']))
+        except Exception as e:
+            if self.controller:
+                self.controller.record_result(False)
+            stats['failed'] += 1
+            stats['failed_videos'].append(video)
+            if self._queue_run is not None:
+                self._queue_run.failed(video['video_id'], f"{e.__class__.__name__}: {e}",
+                                       self.progress.received(video['video_id']))
+            self.progress.failed(video, e)
+            if on_error:
+                on_error(video, e)
+    
+    def _download_single_video(self, video: Dict, output_dir: str, quality: Optional[str], 
+                               itag: Optional[int], on_video_start: Optional[Callable],
+                               on_video_complete: Optional[Callable], segments: int = 1,
+                               format_spec: Optional[str] = None) -> bool:
+        """Download a single video from the playlist."""
+        if self._stop.is_set():
+            raise DownloadInterrupted(f"Download of {video['video_id']} not started")
+        with span('video', video_id=video['video_id'], title=video.get('title')) as video_span:
+            if on_video_start:
+                on_video_start(video)
+            self.progress.start(video)
+            if self._queue_run is not None:
+                self._queue_run.start(video['video_id'])
+            
+            # Skip finished videos (resume support) before any network call
+            existing = self._existing_download(video, output_dir)
+            if existing:
+                video_span.set_attribute('skipped', True)
+                if self._queue_run is not None:
+                    self._queue_run.done(video['video_id'], existing)
+                self.progress.done(video, existing, skipped=True)
+                if on_video_complete:
+                    on_video_complete(video, existing)
+                return True
+            
+            # Create downloader for this video on the shared connection pool
+            downloader = YouTubeDownloader(video['url'], proxy_manager=self.proxy_manager, cache=self.cache,
+                                           transport=self.transport, pacer=self.pacer, controller=self.controller,
+                                           bandwidth=self.bandwidth, fsync=self.fsync, checksum=self.checksum,
+                                           progress=self.progress, stop=self._stop)
+            
+            output_file = playlist_output_path(output_dir, video)
+            
+            # Download the video; a length mismatch raises and counts as a failure
+            result = downloader.download(output_file, quality=quality, itag=itag, segments=segments,
+                                         format_spec=format_spec)
+            
+            if self.archive is not None:
+                self.archive.add(video['video_id'], result.path, itag=result.itag, size=result.size,
+                                 checksum=result.checksum)
+            if self._queue_run is not None:
+                self._queue_run.done(video['video_id'], result.path, result.size)
+            
+            self.progress.done(video, result)
             if on_video_complete:
-                on_video_complete(video, output_file)
-            return True
-        
-        # Download the video
-        downloader.download(output_file, quality=quality, itag=itag)
-        
-        if on_video_complete:
-            on_video_complete(video, output_file)
-        
-        return True
\ No newline at end of file
+                on_video_complete(video, result)
+            
+            return True
\ No newline at end of file
@@ -0,0 +1,170 @@
+"""
+Download verification for YouTube Downloader
+
+Digests are computed incrementally on the chunks as they are received,
+while they are still in memory, so verifying a download never means
+reading a multi-GB file back from disk (only the already-written prefix of
+a resumed download is read once). Results are returned as a
+DownloadResult: the output path as a ``str``, plus the size, the expected
+size and the digests.
+
+SHA-256 comes from hashlib; the xxHash family (much faster, not
+cryptographic) is available when the optional ``xxhash`` package is
+installed.
+"""
+
+import re
+import hashlib
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover - optional dependency
+    xxhash = None
+
+DEFAULT_ALGORITHM = 'sha256'
+XXHASH_ALGORITHMS = ('xxh32', 'xxh64', 'xxh3_64', 'xxh3_128', 'xxh128')
+# Extendable-output functions: hexdigest() needs a length, so no checksum string
+VARIABLE_LENGTH_ALGORITHMS = ('shake_128', 'shake_256')
+
+_READ_SIZE = 1024 * 1024
+
+
+def available_algorithms() -> List[str]:
+    """Digest names accepted by ``StreamDigest``."""
+    names = sorted(name for name in hashlib.algorithms_guaranteed if name not in VARIABLE_LENGTH_ALGORITHMS)
+    if xxhash is not None:
+        names += [name for name in XXHASH_ALGORITHMS if hasattr(xxhash, name)]
+    return names
+
+
+def validate_algorithm(algorithm: str):
+    """
+    Check that ``StreamDigest`` accepts ``algorithm``, without creating a digest.
+
+    Raises:
+        ValueError: If ``algorithm`` is not one of ``available_algorithms()``
+            (with a hint for xxHash algorithms without the ``xxhash`` package)
+    """
+    if algorithm in XXHASH_ALGORITHMS and xxhash is None:
+        raise ValueError(f"{algorithm} requires the xxhash package (pip install xxhash)")
+    if algorithm in VARIABLE_LENGTH_ALGORITHMS:
+        raise ValueError(f"{algorithm} has no fixed digest length; use a fixed-length algorithm")
+    if algorithm not in available_algorithms():
+        raise ValueError(f"Unknown checksum algorithm: {algorithm} "
+                         f"(available: {', '.join(available_algorithms())})")
+
+
+class StreamDigest:
+    """A digest fed chunk by chunk, counting the bytes it has seen."""
+
+    def __init__(self, algorithm: str = DEFAULT_ALGORITHM):
+        """
+        Initialize StreamDigest.
+
+        Raises:
+            ValueError: If ``algorithm`` is not one of ``available_algorithms()``
+        """
+        validate_algorithm(algorithm)
+        if algorithm in XXHASH_ALGORITHMS:
+            self._hash = getattr(xxhash, algorithm)()
+        else:
+            self._hash = hashlib.new(algorithm)
+        self.algorithm = algorithm
+        self.nbytes = 0
+
+    def update(self, data):
+        self._hash.update(data)
+        self.nbytes += len(data)
+
+    def update_from_file(self, path: str, start: int, end: int):
+        """Feed bytes ``start``-``end`` (exclusive) of ``path``, e.g. a resumed prefix."""
+        with open(path, 'rb') as f:
+            f.seek(start)
+            remaining = end - start
+            while remaining > 0:
+                data = f.read(min(remaining, _READ_SIZE))
+                if not data:
+                    break
+                self.update(data)
+                remaining -= len(data)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    @property
+    def checksum(self) -> str:
+        """``'<algorithm>:<hex digest>'``"""
+        return f"{self.algorithm}:{self.hexdigest()}"
+
+
+def content_range(headers) -> Optional[Tuple[int, int, Optional[int]]]:
+    """
+    Parse a ``Content-Range`` header.
+
+    Returns:
+        ``(first, last, total)`` with ``total`` None for ``*``, or None when
+        the header is missing or malformed
+    """
+    value = headers.get('content-range') or headers.get('Content-Range')
+    match = re.fullmatch(r'\s*bytes\s+(\d+)-(\d+)/(\d+|\*)\s*', value or '')
+    if not match:
+        return None
+    total = match.group(3)
+    return int(match.group(1)), int(match.group(2)), None if total == '*' else int(total)
+
+
+def unsatisfied_length(headers) -> Optional[int]:
+    """
+    Total length from the ``Content-Range: bytes */<length>`` of a 416 response.
+
+    Returns:
+        The length, or None when the header is missing or malformed
+    """
+    value = headers.get('content-range') or headers.get('Content-Range')
+    match = re.fullmatch(r'\s*bytes\s+\*/(\d+)\s*', value or '')
+    return int(match.group(1)) if match else None
+
+
+class DownloadResult(str):
+    """
+    The path of a finished download, with what is known about its bytes.
+
+    It is a ``str`` so code that used the returned path keeps working.
+
+    Attributes:
+        itag: Format downloaded (``'137+140'`` for merged formats)
+        size: Bytes in the file
+        expected_size: Length announced by YouTube, or None if it never was
+        checksum: ``'<algorithm>:<hex>'`` of the whole file, or None (segmented
+            downloads, or checksums disabled)
+        segment_checksums: ``(start, end, checksum)`` per byte range of a
+            segmented download (``end`` inclusive)
+        parts: Results of the streams a merged download was built from
+    """
+
+    def __new__(cls, path: str, itag=None, size: int = 0, expected_size: Optional[int] = None,
+                checksum: Optional[str] = None,
+                segment_checksums: Sequence[Tuple[int, int, str]] = (),
+                parts: Sequence['DownloadResult'] = ()):
+        result = super().__new__(cls, path)
+        result.itag = str(itag) if itag is not None else None
+        result.size = size
+        result.expected_size = expected_size
+        result.checksum = checksum
+        result.segment_checksums = list(segment_checksums)
+        result.parts = list(parts)
+        return result
+
+    @property
+    def path(self) -> str:
+        return str(self)
+
+    @property
+    def verified(self) -> bool:
+        """Whether the size was checked against a length announced by YouTube."""
+        return self.expected_size is not None and self.size == self.expected_size
+
+    def __reduce__(self):
+        return (DownloadResult, (str(self), self.itag, self.size, self.expected_size, self.checksum,
+                                 self.segment_checksums, self.parts))
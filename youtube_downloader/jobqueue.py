@@ -0,0 +1,250 @@
+"""
+Persistent job queue for YouTube Downloader
+
+A SQLite record of every video of a playlist (or batch) run and where it
+stands: pending, in-flight, done or failed, with the number of attempts
+and the bytes on disk when it was last checkpointed. A run is keyed by its
+source (playlist ID) and output directory, so running the same command
+again picks up where the last one stopped:
+
+- done videos are skipped without a player call or a file-system check
+- in-flight videos of a run that crashed go back to pending, and continue
+  from their .part files
+- failed videos are retried until they have used ``max_attempts``
+- once the whole playlist has been listed, it is not browsed again
+
+Every state change is committed immediately, so a killed process loses at
+most the bytes since the last .part checkpoint.
+"""
+
+import time
+import sqlite3
+import logging
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = 'pending'
+IN_FLIGHT = 'in_flight'
+DONE = 'done'
+FAILED = 'failed'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    output_dir TEXT NOT NULL,
+    enumerated INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    UNIQUE (source, output_dir)
+);
+CREATE TABLE IF NOT EXISTS items (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    position INTEGER NOT NULL,
+    video_id TEXT NOT NULL,
+    title TEXT,
+    url TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    byte_offset INTEGER NOT NULL DEFAULT 0,
+    path TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, video_id)
+);
+CREATE INDEX IF NOT EXISTS items_by_state ON items (run_id, state, position);
+"""
+
+_ITEM_COLUMNS = "video_id, title, url, state, attempts, byte_offset, path, error, updated_at"
+
+
+@dataclass
+class QueueItem:
+    """One video of a queued run."""
+    video_id: str
+    title: Optional[str]
+    url: str
+    state: str
+    attempts: int
+    byte_offset: int
+    path: Optional[str]
+    error: Optional[str]
+    updated_at: float
+
+    def to_video(self) -> Dict:
+        """The video dict PlaylistDownloader works with."""
+        video = {'video_id': self.video_id, 'url': self.url}
+        if self.title is not None:
+            video['title'] = self.title
+        return video
+
+
+class JobQueue:
+    """
+    Durable per-run download state, safe to share between threads.
+
+    Open a run with ``run(source, output_dir)``; the returned QueueRun
+    records its videos' state changes.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 3):
+        """
+        Initialize JobQueue.
+
+        Args:
+            path: SQLite database file (created if missing)
+            max_attempts: Attempts after which a failed video is no longer
+                retried by later runs
+        """
+        self.path = path
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+        self._db.commit()
+
+    def run(self, source: str, output_dir: str) -> 'QueueRun':
+        """
+        Open (or create) the run of ``source`` into ``output_dir``.
+
+        Videos left in flight by a process that died are put back to
+        pending.
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR IGNORE INTO runs (source, output_dir, created_at) VALUES (?, ?, ?)",
+                (source, output_dir, time.time())
+            )
+            run_id = self._db.execute(
+                "SELECT id FROM runs WHERE source = ? AND output_dir = ?", (source, output_dir)
+            ).fetchone()[0]
+            recovered = self._db.execute(
+                "UPDATE items SET state = ?, updated_at = ? WHERE run_id = ? AND state = ?",
+                (PENDING, time.time(), run_id, IN_FLIGHT)
+            ).rowcount
+            self._db.commit()
+        if recovered:
+            logger.info(f"Recovered {recovered} interrupted downloads of {source}")
+        return QueueRun(self, run_id, recovered)
+
+    def _execute(self, sql: str, params=()) -> int:
+        """Run and commit one statement, returning the number of rows changed."""
+        with self._lock:
+            count = self._db.execute(sql, params).rowcount
+            self._db.commit()
+        return count
+
+    def _query(self, sql: str, params=()) -> list:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class QueueRun:
+    """The queued videos of one run, in playlist order."""
+
+    def __init__(self, queue: JobQueue, run_id: int, recovered: int = 0):
+        self.queue = queue
+        self.run_id = run_id
+        # In-flight videos put back to pending when the run was opened
+        self.recovered = recovered
+
+    @property
+    def enumerated(self) -> bool:
+        """Whether every video of the source has been added."""
+        return bool(self.queue._query("SELECT enumerated FROM runs WHERE id = ?", (self.run_id,))[0][0])
+
+    def mark_enumerated(self):
+        """Record that the source has been listed to the end."""
+        self.queue._execute("UPDATE runs SET enumerated = 1 WHERE id = ?", (self.run_id,))
+
+    def add(self, video: Dict) -> bool:
+        """
+        Add a video as pending at the end of the run.
+
+        Returns:
+            False if the run already has the video (in whatever state)
+        """
+        return self.queue._execute(
+            "INSERT OR IGNORE INTO items (run_id, position, video_id, title, url, state, updated_at) "
+            "SELECT ?, COALESCE(MAX(position), 0) + 1, ?, ?, ?, ?, ? FROM items WHERE run_id = ?",
+            (self.run_id, video['video_id'], video.get('title'), video['url'], PENDING, time.time(),
+             self.run_id)
+        ) > 0
+
+    def resumable(self) -> List[Dict]:
+        """Videos still to download: pending ones, and failed ones with attempts left."""
+        rows = self.queue._query(
+            f"SELECT {_ITEM_COLUMNS} FROM items WHERE run_id = ? "
+            "AND (state = ? OR (state = ? AND attempts < ?)) ORDER BY position",
+            (self.run_id, PENDING, FAILED, self.queue.max_attempts)
+        )
+        return [QueueItem(*row).to_video() for row in rows]
+
+    def start(self, video_id: str):
+        """A worker took the video: in flight, one more attempt."""
+        self._update(video_id, "state = ?, attempts = attempts + 1, error = NULL", (IN_FLIGHT,))
+
+    def done(self, video_id: str, path: Optional[str] = None, size: Optional[int] = None):
+        """The video is finished (downloaded, or found already on disk)."""
+        self._update(video_id, "state = ?, path = ?, byte_offset = COALESCE(?, byte_offset), error = NULL",
+                     (DONE, path, size))
+
+    def failed(self, video_id: str, error: Optional[str] = None, byte_offset: Optional[int] = None):
+        """The attempt failed; bytes on disk are kept for the next attempt."""
+        self._update(video_id, "state = ?, error = ?, byte_offset = COALESCE(?, byte_offset)",
+                     (FAILED, error, byte_offset))
+
+    def release(self, video_id: str, byte_offset: Optional[int] = None):
+        """
+        Put an interrupted video back to pending.
+
+        The attempt it was on does not count against ``max_attempts``. A
+        video that was stopped before ``start`` is left as it was.
+        """
+        self._update(video_id, "state = ?, attempts = MAX(attempts - 1, 0), "
+                               "byte_offset = COALESCE(?, byte_offset)", (PENDING, byte_offset),
+                     state=IN_FLIGHT)
+
+    def _update(self, video_id: str, assignments: str, params: tuple, state: Optional[str] = None):
+        sql = f"UPDATE items SET {assignments}, updated_at = ? WHERE run_id = ? AND video_id = ?"
+        params += (time.time(), self.run_id, video_id)
+        if state is not None:
+            sql += " AND state = ?"
+            params += (state,)
+        self.queue._execute(sql, params)
+
+    def items(self, state: Optional[str] = None) -> List[QueueItem]:
+        """Every video of the run (or those in ``state``), in order."""
+        sql = f"SELECT {_ITEM_COLUMNS} FROM items WHERE run_id = ?"
+        params = (self.run_id,)
+        if state is not None:
+            sql += " AND state = ?"
+            params += (state,)
+        return [QueueItem(*row) for row in self.queue._query(sql + " ORDER BY position", params)]
+
+    def get(self, video_id: str) -> Optional[QueueItem]:
+        rows = self.queue._query(
+            f"SELECT {_ITEM_COLUMNS} FROM items WHERE run_id = ? AND video_id = ?", (self.run_id, video_id)
+        )
+        return QueueItem(*rows[0]) if rows else None
+
+    def counts(self) -> Dict[str, int]:
+        """Number of videos in each state."""
+        counts = {PENDING: 0, IN_FLIGHT: 0, DONE: 0, FAILED: 0}
+        rows = self.queue._query("SELECT state, COUNT(*) FROM items WHERE run_id = ? GROUP BY state",
+                                 (self.run_id,))
+        counts.update(dict(rows))
+        return counts
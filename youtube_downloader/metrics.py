@@ -0,0 +1,274 @@
+"""
+Metrics for YouTube Downloader
+
+A small Prometheus-style registry of counters, gauges and histograms. The
+downloaders and the proxy manager record into the process-wide ``REGISTRY``
+at their request sites (once per request or transfer, never per chunk), so
+collecting is always on and cheap. The current values can be rendered in
+the Prometheus text format, written to a file with ``dump`` or served at
+``/metrics`` by a ``MetricsServer``.
+"""
+
+import logging
+import threading
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds, for request latencies
+LATENCY_BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Bytes per second, for transfer rates
+RATE_BUCKETS = tuple(2 ** n * 1024 for n in range(6, 19, 2))  # 64 KiB/s - 256 MiB/s
+
+DIRECT = 'direct'
+
+
+def proxy_label(proxy) -> str:
+    """``host:port`` of a proxy (never its credentials), or ``'direct'``."""
+    if proxy is None:
+        return DIRECT
+    return f"{proxy.host}:{proxy.port}"
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """
+    A named family of values, one per combination of label values.
+
+    Labels are passed as keyword arguments and must match ``labelnames``.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        try:
+            return tuple(str(labels[name]) for name in self.labelnames)
+        except KeyError as e:
+            raise ValueError(f"{self.name} has no value for label {e}")
+
+    def _label_text(self, key: Tuple[str, ...], extra: str = '') -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return '{' + ','.join(pairs) + '}' if pairs else ''
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{self._label_text(key)} {_format_value(value)}" for key, value in items]
+
+    def value(self, **labels) -> float:
+        """Current value for ``labels`` (0 if never recorded)."""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        return '\n'.join(lines + self._samples())
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that is set to its current level."""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Observations counted into cumulative ``le`` buckets, with their sum and count."""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def value(self, **labels) -> float:
+        """Number of observations for ``labels``."""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{self._label_text(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._label_text(key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{self._label_text(key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """A set of metrics rendered together; asking for an existing name returns it."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, cls, name: str, *args, **kwargs) -> Metric:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"{name} is already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, help, labelnames, buckets=buckets)
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+PLAYER_SECONDS = REGISTRY.histogram(
+    'ytsnap_player_request_seconds', 'Player API response time', ('proxy', 'client'))
+BROWSE_SECONDS = REGISTRY.histogram(
+    'ytsnap_browse_request_seconds', 'Browse API response time', ('proxy', 'client'))
+MEDIA_TTFB_SECONDS = REGISTRY.histogram(
+    'ytsnap_media_ttfb_seconds', 'Time from media request to response headers', ('proxy',))
+TRANSFER_RATE = REGISTRY.histogram(
+    'ytsnap_transfer_bytes_per_second', 'Throughput of each media transfer', ('proxy',),
+    buckets=RATE_BUCKETS)
+MEDIA_BYTES = REGISTRY.counter(
+    'ytsnap_media_bytes_total', 'Media bytes received', ('proxy',))
+RATE_LIMITED = REGISTRY.counter(
+    'ytsnap_rate_limited_total', '429 Too Many Requests responses', ('endpoint', 'proxy'))
+RETRIES = REGISTRY.counter(
+    'ytsnap_retries_total', 'Requests retried', ('endpoint', 'proxy', 'reason'))
+PROXY_REQUESTS = REGISTRY.counter(
+    'ytsnap_proxy_requests_total', 'Requests through each proxy by outcome', ('proxy', 'outcome'))
+PROXY_HEALTHY = REGISTRY.gauge(
+    'ytsnap_proxy_healthy', 'Whether each proxy is currently considered healthy', ('proxy',))
+PROXY_HEALTH_CHECKS = REGISTRY.counter(
+    'ytsnap_proxy_health_checks_total', 'Proxy health checks by result', ('result',))
+
+JOBS = REGISTRY.counter(
+    'ytsnap_jobs_total', 'Daemon jobs finished by kind and status', ('kind', 'status'))
+JOB_SECONDS = REGISTRY.histogram(
+    'ytsnap_job_seconds', 'Daemon job time from submission to completion', ('kind',),
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0, 3600.0))
+
+
+def dump(path: str, registry: MetricsRegistry = REGISTRY):
+    """Write the current metrics to ``path`` in the text format."""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+
+
+class MetricsServer:
+    """
+    Serves ``registry`` at ``http://<host>:<port>/metrics`` from a background thread.
+
+    Binds to localhost by default; ``port=0`` picks a free port (see ``port``).
+    """
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = '127.0.0.1', port: int = 9464):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics', daemon=True)
+        self._thread.start()
+        logger.info(f"Serving metrics at http://{host}:{self.port}/metrics")
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
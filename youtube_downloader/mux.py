@@ -0,0 +1,418 @@
+"""
+MP4 remuxing for YouTube Downloader
+
+YouTube serves its high resolutions as separate video-only and audio-only
+DASH formats, each a fragmented MP4 (``ftyp``, ``moov``, then ``moof`` +
+``mdat`` pairs). This module merges one of each into a single fragmented
+MP4 without re-encoding and without ffmpeg:
+
+- the video file's ``moov`` gets the audio ``trak`` and ``trex`` appended,
+  with track IDs renumbered to 1 (video) and 2 (audio)
+- fragments from both inputs are interleaved by decode time; each ``moof``
+  is rewritten in place (sequence number, track ID, absolute data offsets)
+  and its ``mdat`` is copied through unchanged
+
+Only the small ``moov`` and ``moof`` boxes are held in memory; media data is
+streamed from the inputs to the output.
+"""
+
+import os
+import heapq
+import struct
+import logging
+from dataclasses import dataclass, field
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Boxes whose payload is a sequence of child boxes
+CONTAINERS = {'moov', 'trak', 'mdia', 'minf', 'stbl', 'mvex', 'edts', 'dinf', 'moof', 'traf'}
+
+# Format selector for the merged mode: MP4 video plus AAC audio, else the best muxed format
+MERGE_FORMAT = 'best-video[ext=mp4]+best-audio[ext=m4a]/best'
+
+# MIME types of the formats mux() can merge: video/mp4 (any codec) plus audio/mp4 (m4a)
+MERGEABLE_MIME_TYPES = ('video/mp4', 'audio/mp4')
+
+# tfhd flags
+_BASE_DATA_OFFSET = 0x000001
+_DEFAULT_SAMPLE_DURATION = 0x000008
+# trun flags
+_TRUN_DATA_OFFSET = 0x000001
+_TRUN_FIRST_SAMPLE_FLAGS = 0x000004
+_TRUN_SAMPLE_DURATION = 0x000100
+_TRUN_SAMPLE_SIZE = 0x000200
+_TRUN_SAMPLE_FLAGS = 0x000400
+_TRUN_SAMPLE_CTO = 0x000800
+
+
+class MuxError(Exception):
+    """An input cannot be remuxed (not a fragmented MP4, or malformed)."""
+
+
+@dataclass
+class Box:
+    """An MP4 box held in memory: raw payload for leaves, children for containers."""
+    type: str
+    payload: bytearray = field(default_factory=bytearray)
+    children: Optional[List['Box']] = None
+
+    @classmethod
+    def parse(cls, box_type: str, payload: bytes) -> 'Box':
+        if box_type not in CONTAINERS:
+            return cls(box_type, bytearray(payload))
+        children = []
+        pos = 0
+        while pos < len(payload):
+            child_type, header, size = _parse_header(payload[pos:pos + 16], len(payload) - pos)
+            children.append(cls.parse(child_type, payload[pos + header:pos + size]))
+            pos += size
+        return cls(box_type, children=children)
+
+    def find(self, box_type: str) -> Optional['Box']:
+        return next((c for c in self.children or () if c.type == box_type), None)
+
+    def find_all(self, box_type: str) -> List['Box']:
+        return [c for c in self.children or () if c.type == box_type]
+
+    def path(self, *types: str) -> Optional['Box']:
+        box = self
+        for box_type in types:
+            box = box.find(box_type) if box else None
+        return box
+
+    def serialize(self) -> bytes:
+        if self.children is None:
+            body = bytes(self.payload)
+        else:
+            body = b''.join(c.serialize() for c in self.children)
+        size = 8 + len(body)
+        if size > 0xFFFFFFFF:
+            return struct.pack('>I4sQ', 1, self.type.encode('latin-1'), size + 8) + body
+        return struct.pack('>I4s', size, self.type.encode('latin-1')) + body
+
+    # Full boxes start with a version byte and 24 bits of flags
+    @property
+    def version(self) -> int:
+        return self.payload[0]
+
+    @property
+    def flags(self) -> int:
+        return int.from_bytes(self.payload[1:4], 'big')
+
+
+def _parse_header(data: bytes, available: int) -> Tuple[str, int, int]:
+    """Return ``(type, header_size, box_size)`` for the box header at the start of ``data``."""
+    if len(data) < 8:
+        raise MuxError("Truncated box header")
+    size, raw_type = struct.unpack('>I4s', data[:8])
+    header = 8
+    if size == 1:
+        if len(data) < 16:
+            raise MuxError("Truncated box header")
+        size = struct.unpack('>Q', data[8:16])[0]
+        header = 16
+    elif size == 0:
+        size = available
+    if size < header or size > available:
+        raise MuxError(f"Invalid size for box {raw_type!r}")
+    return raw_type.decode('latin-1'), header, size
+
+
+def iter_boxes(f: BinaryIO, end: Optional[int] = None) -> Iterator[Tuple[str, int, int, int]]:
+    """
+    Walk the top-level boxes of ``f`` without reading their payloads.
+
+    Yields:
+        ``(type, offset, header_size, size)`` per box
+    """
+    if end is None:
+        end = os.fstat(f.fileno()).st_size
+    offset = 0
+    while offset < end:
+        f.seek(offset)
+        box_type, header, size = _parse_header(f.read(16), end - offset)
+        yield box_type, offset, header, size
+        offset += size
+
+
+def _read_box(f: BinaryIO, box_type: str, offset: int, header: int, size: int) -> Box:
+    f.seek(offset + header)
+    return Box.parse(box_type, f.read(size - header))
+
+
+def _track_id_offset(tkhd: Box) -> int:
+    # creation and modification times are 32 or 64 bits wide
+    return 12 if tkhd.version == 0 else 20
+
+
+def _set_u32(box: Box, offset: int, value: int):
+    struct.pack_into('>I', box.payload, offset, value)
+
+
+def _get_u32(box: Box, offset: int) -> int:
+    return struct.unpack_from('>I', box.payload, offset)[0]
+
+
+@dataclass
+class Fragment:
+    """One ``moof`` and the ``mdat`` box(es) after it."""
+    moof: Box
+    moof_offset: int
+    moof_size: int
+    data: List[Tuple[int, int]]  # (offset, size) of each following mdat
+    decode_time: float  # seconds
+
+
+class MP4Input:
+    """A fragmented MP4 file opened for remuxing."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.f = open(path, 'rb')
+        self.ftyp: Optional[Box] = None
+        self.moov: Optional[Box] = None
+        # (offset, header size, size, following mdats) per moof
+        self._fragments: List[Tuple[int, int, int, List[Tuple[int, int]]]] = []
+        try:
+            self._scan()
+        except Exception:
+            self.f.close()
+            raise
+
+    def _scan(self):
+        current = None
+        for box_type, offset, header, size in iter_boxes(self.f):
+            if box_type == 'ftyp':
+                self.ftyp = _read_box(self.f, box_type, offset, header, size)
+            elif box_type == 'moov':
+                self.moov = _read_box(self.f, box_type, offset, header, size)
+            elif box_type == 'moof':
+                current = (offset, header, size, [])
+                self._fragments.append(current)
+            elif box_type == 'mdat' and current is not None:
+                current[3].append((offset, size))
+            # sidx, styp, emsg, free, mfra: index and padding boxes that
+            # describe the single-track input, not needed in the output
+
+        if self.moov is None:
+            raise MuxError(f"{self.path}: no moov box (not an MP4 file?)")
+        traks = self.moov.find_all('trak')
+        if len(traks) != 1:
+            raise MuxError(f"{self.path}: expected exactly one track, found {len(traks)}")
+        if self.moov.find('mvex') is None or not self._fragments:
+            raise MuxError(f"{self.path}: not a fragmented MP4")
+
+    @property
+    def trak(self) -> Box:
+        return self.moov.find('trak')
+
+    @property
+    def trex(self) -> Optional[Box]:
+        return self.moov.path('mvex', 'trex')
+
+    @property
+    def timescale(self) -> int:
+        mdhd = self.trak.path('mdia', 'mdhd')
+        if mdhd is None:
+            raise MuxError(f"{self.path}: no mdhd box")
+        return _get_u32(mdhd, 12 if mdhd.version == 0 else 20)
+
+    def _default_duration(self, tfhd: Box) -> int:
+        if tfhd.flags & _DEFAULT_SAMPLE_DURATION:
+            pos = 8 + (8 if tfhd.flags & _BASE_DATA_OFFSET else 0) + (4 if tfhd.flags & 0x2 else 0)
+            return _get_u32(tfhd, pos)
+        # trex: version/flags, track_ID, sample description index, then duration
+        return _get_u32(self.trex, 12) if self.trex else 0
+
+    def _traf_duration(self, traf: Box) -> int:
+        """Sum of sample durations in a track fragment (for inputs without tfdt)."""
+        default = self._default_duration(traf.find('tfhd'))
+        total = 0
+        for trun in traf.find_all('trun'):
+            count = _get_u32(trun, 4)
+            if not trun.flags & _TRUN_SAMPLE_DURATION:
+                total += count * default
+                continue
+            pos = 8
+            pos += 4 if trun.flags & _TRUN_DATA_OFFSET else 0
+            pos += 4 if trun.flags & _TRUN_FIRST_SAMPLE_FLAGS else 0
+            stride = 4 * sum(1 for flag in (_TRUN_SAMPLE_DURATION, _TRUN_SAMPLE_SIZE,
+                                             _TRUN_SAMPLE_FLAGS, _TRUN_SAMPLE_CTO) if trun.flags & flag)
+            for i in range(count):
+                total += _get_u32(trun, pos + i * stride)
+        return total
+
+    def fragments(self) -> Iterator[Fragment]:
+        """The input's fragments in file order, with decode times in seconds."""
+        timescale = self.timescale
+        elapsed = 0
+        for offset, header, size, data in self._fragments:
+            moof = _read_box(self.f, 'moof', offset, header, size)
+            traf = moof.find('traf')
+            if traf is None or traf.find('tfhd') is None:
+                raise MuxError(f"{self.path}: moof without a track fragment")
+            tfdt = traf.find('tfdt')
+            if tfdt is not None:
+                if tfdt.version == 1:
+                    elapsed = struct.unpack_from('>Q', tfdt.payload, 4)[0]
+                else:
+                    elapsed = _get_u32(tfdt, 4)
+            yield Fragment(moof, offset, size, data, elapsed / timescale)
+            # Used only if the next fragment has no tfdt of its own
+            elapsed += self._traf_duration(traf)
+
+    def close(self):
+        self.f.close()
+
+
+def _build_moov(video: MP4Input, audio: MP4Input) -> Box:
+    """The video moov with the audio track added as track 2."""
+    moov = video.moov
+    mvhd = moov.find('mvhd')
+    if mvhd is None:
+        raise MuxError(f"{video.path}: no mvhd box")
+    # next_track_ID is the last field of mvhd
+    _set_u32(mvhd, len(mvhd.payload) - 4, 3)
+
+    for source, track_id in ((video, 1), (audio, 2)):
+        tkhd = source.trak.find('tkhd')
+        trex = source.trex
+        if tkhd is None or trex is None:
+            raise MuxError(f"{source.path}: missing tkhd or trex box")
+        _set_u32(tkhd, _track_id_offset(tkhd), track_id)
+        _set_u32(trex, 4, track_id)
+
+    # Declare the longer of the two movie durations
+    audio_mvhd = audio.moov.find('mvhd')
+    if audio_mvhd is not None and mvhd.version == audio_mvhd.version:
+        video_scale = _get_u32(mvhd, 12 if mvhd.version == 0 else 20)
+        audio_scale = _get_u32(audio_mvhd, 12 if audio_mvhd.version == 0 else 20)
+        fmt, pos = ('>I', 16) if mvhd.version == 0 else ('>Q', 24)
+        video_duration = struct.unpack_from(fmt, mvhd.payload, pos)[0]
+        audio_duration = struct.unpack_from(fmt, audio_mvhd.payload, pos)[0]
+        if audio_scale and audio_duration * video_scale // audio_scale > video_duration:
+            struct.pack_into(fmt, mvhd.payload, pos, audio_duration * video_scale // audio_scale)
+
+    others = [c for c in moov.children if c.type not in ('mvhd', 'trak', 'mvex')]
+    mvex = moov.find('mvex')
+    mvex.children = [c for c in mvex.children if c.type != 'trex'] + [video.trex, audio.trex]
+    moov.children = [mvhd, video.trak, audio.trak, mvex] + others
+    return moov
+
+
+def _rewrite_moof(fragment: Fragment, sequence: int, track_id: int, new_offset: int) -> bytes:
+    """Renumber a moof for its position in the output; its size does not change."""
+    moof = fragment.moof
+    mfhd = moof.find('mfhd')
+    if mfhd is not None:
+        _set_u32(mfhd, 4, sequence)
+    for traf in moof.find_all('traf'):
+        tfhd = traf.find('tfhd')
+        _set_u32(tfhd, 4, track_id)
+        if tfhd.flags & _BASE_DATA_OFFSET:
+            # Absolute file offsets move with the moof
+            base = struct.unpack_from('>Q', tfhd.payload, 8)[0]
+            struct.pack_into('>Q', tfhd.payload, 8, base - fragment.moof_offset + new_offset)
+    data = moof.serialize()
+    if len(data) != fragment.moof_size:
+        # A 64-bit header in the input would shift trun data offsets
+        raise MuxError("moof size changed while rewriting")
+    return data
+
+
+def _timeline(source: MP4Input, track_id: int) -> Iterator[Tuple[float, int, int, MP4Input, Fragment]]:
+    for index, fragment in enumerate(source.fragments()):
+        # index keeps the tuples comparable without comparing fragments
+        yield (fragment.decode_time, track_id, index, source, fragment)
+
+
+def _write(dst: BinaryIO, data: bytes, digest=None):
+    dst.write(data)
+    if digest is not None:
+        digest.update(data)
+
+
+def _copy_range(src: BinaryIO, dst: BinaryIO, offset: int, size: int, digest=None):
+    src.seek(offset)
+    remaining = size
+    while remaining:
+        chunk = src.read(min(remaining, 1024 * 1024))
+        if not chunk:
+            raise MuxError("Input ended inside an mdat box")
+        _write(dst, chunk, digest)
+        remaining -= len(chunk)
+
+
+def check_mergeable(video: Dict, audio: Dict):
+    """
+    Check that two selected formats can be merged, before downloading them.
+
+    Args:
+        video: Format dict of the video-only stream
+        audio: Format dict of the audio-only stream
+
+    Raises:
+        MuxError: If either is not an MP4 stream (e.g. WebM with VP9 or Opus)
+    """
+    for fmt, expected in zip((video, audio), MERGEABLE_MIME_TYPES):
+        mime = fmt.get('mime') or 'unknown type'
+        if mime != expected:
+            raise MuxError(
+                f"Cannot merge format {fmt.get('itag')} ({mime}): only MP4 video and M4A audio can be merged, "
+                "e.g. 'best-video[ext=mp4]+best-audio[ext=m4a]'"
+            )
+
+
+def mux(video_path: str, audio_path: str, output_path: str, digest=None) -> int:
+    """
+    Merge a video-only and an audio-only fragmented MP4 into ``output_path``.
+
+    The output is written to ``<output_path>.tmp`` and renamed into place
+    once complete.
+
+    Args:
+        video_path: Fragmented MP4 with a single video track
+        audio_path: Fragmented MP4 (m4a) with a single audio track
+        output_path: Destination path
+        digest: Optional ``integrity.StreamDigest`` fed the output bytes as
+            they are written
+
+    Returns:
+        Size of the merged file in bytes
+
+    Raises:
+        MuxError: If either input is not a single-track fragmented MP4
+    """
+    video = MP4Input(video_path)
+    try:
+        audio = MP4Input(audio_path)
+    except Exception:
+        video.close()
+        raise
+
+    temp_path = output_path + '.tmp'
+    try:
+        with open(temp_path, 'wb') as out:
+            if video.ftyp is not None:
+                _write(out, video.ftyp.serialize(), digest)
+            _write(out, _build_moov(video, audio).serialize(), digest)
+
+            # Video first among fragments starting at the same time
+            merged = heapq.merge(_timeline(video, 1), _timeline(audio, 2))
+            for sequence, (_, track_id, _, source, fragment) in enumerate(merged, 1):
+                _write(out, _rewrite_moof(fragment, sequence, track_id, out.tell()), digest)
+                for offset, size in fragment.data:
+                    _copy_range(source.f, out, offset, size, digest)
+            size = out.tell()
+        os.replace(temp_path, output_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    finally:
+        video.close()
+        audio.close()
+
+    logger.debug(f"Muxed {video_path} + {audio_path} into {output_path}")
+    return size
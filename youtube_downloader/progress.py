@@ -0,0 +1,376 @@
+"""
+Progress reporting for YouTube Downloader
+
+One aggregated progress model for a whole run: every download reports the
+bytes it receives to a shared ``Progress``, which keeps the totals across
+all videos in flight and estimates the ETA from bytes, with videos whose
+size is not known yet counted at the average size of those that are.
+
+Changes are published as events (plain, JSON-serializable dicts) to any
+number of reporters. Byte counts are published at most once per
+``interval`` seconds however many workers are receiving; videos starting,
+finishing or failing, and messages, are published as they happen. A
+``Progress`` without reporters is silent.
+
+Events (each has ``event`` and ``time``, a Unix timestamp):
+
+- ``queued``: ``video_id``, ``title``
+- ``start``: ``video_id``, ``title``
+- ``progress``: ``bytes``, ``total_bytes`` (estimated), ``rate`` (bytes/s),
+  ``eta`` (seconds or None), ``videos``, ``done``, ``failed``, ``active``
+- ``done``: ``video_id``, ``title``, ``path``, ``size``, ``checksum``, ``skipped``
+- ``failed``: ``video_id``, ``title``, ``error``
+- ``message``: ``level`` (``'info'`` or ``'warning'``), ``text``
+- ``summary``: ``total``, ``successful``, ``failed``, ``failed_videos``
+  (titles), ``bytes``, ``elapsed`` and whatever the downloader adds
+"""
+
+import sys
+import json
+import time
+import queue
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+DEFAULT_INTERVAL = 0.5
+# Rate smoothing, as in tqdm: weight of the newest interval
+SMOOTHING = 0.3
+
+_UNITS = ('B', 'KiB', 'MiB', 'GiB', 'TiB')
+
+
+def format_bytes(n: float) -> str:
+    """``1536`` -> ``'1.5 KiB'``"""
+    for unit in _UNITS:
+        if abs(n) < 1024 or unit == _UNITS[-1]:
+            return f"{n:.0f} {unit}" if unit == 'B' else f"{n:.1f} {unit}"
+        n /= 1024
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """``3725`` -> ``'1:02:05'``, ``None`` -> ``'?'``"""
+    if seconds is None:
+        return '?'
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02}:{secs:02}" if hours else f"{minutes:02}:{secs:02}"
+
+
+class Reporter(ABC):
+    """Receives progress events. Subclass to render them elsewhere."""
+
+    @abstractmethod
+    def handle(self, event: Dict):
+        """Render one event."""
+
+    def close(self):
+        pass
+
+
+class Progress:
+    """
+    Aggregated, thread-safe progress of a run of downloads.
+
+    Downloads call ``expect`` once they know a stream's length and
+    ``advance`` per chunk; whoever schedules the videos (a playlist, or the
+    CLI for a single video) calls ``queued``, ``start``, ``done`` and
+    ``failed``.
+    """
+
+    def __init__(self, reporters: Iterable[Reporter] = (), interval: float = DEFAULT_INTERVAL):
+        """
+        Initialize Progress.
+
+        Args:
+            reporters: Where events are sent (none: quiet)
+            interval: Minimum seconds between two ``progress`` events
+        """
+        self.reporters: List[Reporter] = list(reporters)
+        self.interval = interval
+        self._lock = threading.Lock()
+        # Events are handed to the reporters one at a time, in order
+        self._emit_lock = threading.Lock()
+        self.started = time.monotonic()
+        self.videos = 0
+        self.videos_done = 0
+        self.videos_failed = 0
+        self.bytes = 0
+        # video_id -> [expected bytes, received bytes] of the videos in flight
+        self._active: Dict[str, List[int]] = {}
+        self._sized_videos = 0
+        self._sized_bytes = 0
+        self._transferred = 0
+        self._rate = 0.0
+        self._rate_mark = (self.started, 0)
+        self._next_emit = 0.0
+
+    @property
+    def quiet(self) -> bool:
+        return not self.reporters
+
+    def add_reporter(self, reporter: Reporter):
+        with self._emit_lock:
+            self.reporters.append(reporter)
+
+    def remove_reporter(self, reporter: Reporter):
+        with self._emit_lock:
+            if reporter in self.reporters:
+                self.reporters.remove(reporter)
+
+    def events(self) -> 'EventIterator':
+        """Iterate over the events from now on, until ``close``."""
+        iterator = EventIterator()
+        self.add_reporter(iterator)
+        return iterator
+
+    def _emit(self, kind: str, **fields):
+        if not self.reporters:
+            return
+        event = {'event': kind, 'time': time.time(), **fields}
+        with self._emit_lock:
+            for reporter in self.reporters:
+                reporter.handle(event)
+
+    def queued(self, video: Dict):
+        with self._lock:
+            self.videos += 1
+        self._emit('queued', video_id=video.get('video_id'), title=video.get('title'))
+
+    def start(self, video: Dict):
+        with self._lock:
+            self._active.setdefault(video['video_id'], [0, 0])
+        self._emit('start', video_id=video['video_id'], title=video.get('title'))
+
+    def expect(self, video_id: str, size: int, received: int = 0):
+        """
+        Announce a stream of ``size`` bytes (``received`` of them already on
+        disk from an earlier run). Called once per stream, so twice for a
+        merged video.
+        """
+        with self._lock:
+            entry = self._active.setdefault(video_id, [0, 0])
+            if size:
+                if not entry[0]:
+                    self._sized_videos += 1
+                entry[0] += size
+                self._sized_bytes += size
+            entry[1] += received
+            self.bytes += received
+
+    def advance(self, video_id: str, nbytes: int):
+        """Count ``nbytes`` received for ``video_id``; cheap enough to call per chunk."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._active.get(video_id)
+            if entry is not None:
+                entry[1] += nbytes
+            self.bytes += nbytes
+            self._transferred += nbytes
+            if now < self._next_emit or not self.reporters:
+                return
+            self._next_emit = now + self.interval
+            snapshot = self._snapshot(now)
+        self._emit('progress', **snapshot)
+
+    def received(self, video_id: str) -> int:
+        """Bytes of ``video_id`` received so far, resumed ones included (0 if not in progress)."""
+        with self._lock:
+            entry = self._active.get(video_id)
+            return entry[1] if entry else 0
+
+    def done(self, video: Dict, result=None, skipped: bool = False):
+        """A video finished (``result`` is its DownloadResult or path) or was already downloaded."""
+        with self._lock:
+            self.videos_done += 1
+            self._active.pop(video['video_id'], None)
+        self._emit('done', video_id=video['video_id'], title=video.get('title'),
+                   path=str(result) if result is not None else None,
+                   size=getattr(result, 'size', None), checksum=getattr(result, 'checksum', None),
+                   skipped=skipped)
+
+    def failed(self, video: Dict, error: Optional[BaseException] = None):
+        with self._lock:
+            self.videos_failed += 1
+            entry = self._active.pop(video['video_id'], None)
+            if entry and entry[0]:
+                # Its bytes will not come; keep them out of the ETA
+                self._sized_videos -= 1
+                self._sized_bytes -= entry[0]
+        self._emit('failed', video_id=video['video_id'], title=video.get('title'),
+                   error=f"{error.__class__.__name__}: {error}" if error else None)
+
+    def message(self, text: str, level: str = 'info'):
+        self._emit('message', level=level, text=text)
+
+    def error(self, error: BaseException):
+        """The run itself failed (rather than one of its videos)."""
+        self._emit('error', error=f"{error.__class__.__name__}: {error}")
+
+    def summary(self, stats: Dict, **extra):
+        """Publish the final statistics of a run (as returned by ``download``)."""
+        self._emit('summary', total=stats['total'], successful=stats['successful'], failed=stats['failed'],
+                   failed_videos=[video.get('title') or video.get('video_id') for video in stats['failed_videos']],
+                   bytes=self.bytes, elapsed=time.monotonic() - self.started, **extra)
+
+    def snapshot(self) -> Dict:
+        """The fields of a ``progress`` event, as of now."""
+        with self._lock:
+            return self._snapshot(time.monotonic())
+
+    def _snapshot(self, now: float) -> Dict:
+        # Smoothed transfer rate; bytes resumed from disk do not count
+        mark_time, mark_bytes = self._rate_mark
+        if now > mark_time:
+            instant = (self._transferred - mark_bytes) / (now - mark_time)
+            self._rate = instant if not self._rate else SMOOTHING * instant + (1 - SMOOTHING) * self._rate
+            self._rate_mark = (now, self._transferred)
+
+        remaining = sum(max(expected - received, 0) for expected, received in self._active.values() if expected)
+        # Videos not finished whose size is unknown are counted at the average size
+        unsized = self.videos - self.videos_done - self.videos_failed - sum(1 for expected, _ in self._active.values() if expected)
+        if unsized > 0 and self._sized_videos:
+            remaining += unsized * self._sized_bytes // self._sized_videos
+        return {
+            'bytes': self.bytes,
+            'total_bytes': self.bytes + remaining,
+            'rate': self._rate,
+            'eta': remaining / self._rate if self._rate > 0 else None,
+            'videos': self.videos,
+            'done': self.videos_done,
+            'failed': self.videos_failed,
+            'active': len(self._active),
+        }
+
+    def close(self):
+        with self._emit_lock:
+            for reporter in self.reporters:
+                reporter.close()
+
+
+class TerminalReporter(Reporter):
+    """
+    Renders a run as one status line that is redrawn in place.
+
+    When the stream is not a terminal (logs, CI), the status is written as a
+    plain line at most every ``log_interval`` seconds instead, so headless
+    runs stay small.
+    """
+
+    def __init__(self, stream=None, log_interval: float = 30.0):
+        self.stream = stream if stream is not None else sys.stdout
+        self.tty = hasattr(self.stream, 'isatty') and self.stream.isatty()
+        self.log_interval = log_interval
+        self._status_width = 0
+        self._next_log = 0.0
+
+    def _clear(self):
+        if self._status_width:
+            self.stream.write('\r' + ' ' * self._status_width + '\r')
+            self._status_width = 0
+
+    def _line(self, text: str):
+        self._clear()
+        self.stream.write(text + '\n')
+        self.stream.flush()
+
+    @staticmethod
+    def status(event: Dict) -> str:
+        total = event['total_bytes']
+        percent = f" {100 * event['bytes'] / total:3.0f}%" if total else ''
+        failed = f", {event['failed']} failed" if event['failed'] else ''
+        return (f"[{event['done']}/{event['videos']} videos{failed}] "
+                f"{format_bytes(event['bytes'])}/{format_bytes(total)}{percent} "
+                f"{format_bytes(event['rate'])}/s ETA {format_duration(event['eta'])}")
+
+    def handle(self, event: Dict):
+        kind = event['event']
+        if kind == 'progress':
+            text = self.status(event)
+            if self.tty:
+                self.stream.write('\r' + text.ljust(self._status_width))
+                self.stream.flush()
+                self._status_width = len(text)
+            elif time.monotonic() >= self._next_log:
+                self._next_log = time.monotonic() + self.log_interval
+                self._line(text)
+        elif kind == 'message':
+            self._line(f"⚠ {event['text']}" if event['level'] == 'warning' else event['text'])
+        elif kind == 'done':
+            name = event['title'] or event['video_id']
+            self._line(f"✓ Skipping {name} (already exists)" if event['skipped'] else f"✔ {name}")
+        elif kind == 'failed':
+            self._line(f"✗ {event['title'] or event['video_id']}: {event['error']}")
+        elif kind == 'summary':
+            self._summary(event)
+
+    def _summary(self, event: Dict):
+        lines = [
+            '=' * 60,
+            'Download Summary:',
+            f"  Total videos: {event['total']}",
+            f"  Successful: {event['successful']}",
+            f"  Failed: {event['failed']}",
+            f"  Downloaded: {format_bytes(event['bytes'])} in {format_duration(event['elapsed'])}",
+        ]
+        if event.get('output_dir'):
+            lines.append(f"  Saved to: {event['output_dir']}")
+        if event.get('rate_limit_hits') is not None:
+            lines.append(f"  Rate limited: {event['rate_limit_hits']} times, "
+                         f"final concurrency {event['final_concurrency']}")
+        if event['failed_videos']:
+            lines.append('')
+            lines.append('  Failed videos:')
+            lines.extend(f"    - {title}" for title in event['failed_videos'])
+        lines.append('=' * 60)
+        self._line('\n' + '\n'.join(lines) + '\n')
+
+    def close(self):
+        self._clear()
+        self.stream.flush()
+
+
+class JsonLinesReporter(Reporter):
+    """Writes each event as one JSON object per line, for machines and log pipelines."""
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+
+    def handle(self, event: Dict):
+        self.stream.write(json.dumps(event, separators=(',', ':'), default=str) + '\n')
+        self.stream.flush()
+
+
+class CallbackReporter(Reporter):
+    """Calls ``callback(event)`` for each event, on the thread that produced it."""
+
+    def __init__(self, callback: Callable[[Dict], None]):
+        self.callback = callback
+
+    def handle(self, event: Dict):
+        self.callback(event)
+
+
+class EventIterator(Reporter):
+    """
+    Buffers events for another thread to iterate over; iteration ends once
+    the Progress is closed. See ``Progress.events``.
+    """
+
+    _CLOSED = object()
+
+    def __init__(self):
+        self._queue: 'queue.Queue' = queue.Queue()
+
+    def handle(self, event: Dict):
+        self._queue.put(event)
+
+    def close(self):
+        self._queue.put(self._CLOSED)
+
+    def __iter__(self) -> Iterator[Dict]:
+        while True:
+            event = self._queue.get()
+            if event is self._CLOSED:
+                return
+            yield event
@@ -9,12 +9,28 @@ import time
 import random
 import logging
 import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeoutError
 from typing import Optional, List, Dict
 from dataclasses import dataclass
 import requests
+from .metrics import PROXY_REQUESTS, PROXY_HEALTHY, PROXY_HEALTH_CHECKS, proxy_label
 
 logger = logging.getLogger(__name__)
 
+# Weight of the newest sample in the EWMA proxy scores
+EWMA_ALPHA = 0.3
+# Transfer size a proxy's score is measured against (expected time to fetch it)
+SCORE_REFERENCE_BYTES = 8 * 1024 * 1024
+# Lowest error factor, so a failing proxy is still retried now and then
+MIN_SUCCESS_FACTOR = 0.05
+
+
+def _ewma(previous: Optional[float], sample: float, alpha: float = EWMA_ALPHA) -> float:
+    """Fold ``sample`` into an exponentially weighted moving average."""
+    if previous is None:
+        return sample
+    return alpha * sample + (1 - alpha) * previous
+
 
 @dataclass
 class ProxyConfig:
@@ -27,6 +43,9 @@ class ProxyConfig:
     last_used: float = 0.0
     failure_count: int = 0
     is_healthy: bool = True
+    ttfb: Optional[float] = None  # EWMA seconds to response headers
+    throughput: Optional[float] = None  # EWMA bytes per second
+    error_rate: float = 0.0  # EWMA of failed requests (0-1)
     
     def __repr__(self):
         auth = f"{self.username}:***@" if self.username else ""
@@ -52,7 +71,7 @@ class ProxyManager:
     Manages proxies with rotation, health checking, and failover.
     
     Features:
-    - Automatic rotation
+    - Automatic rotation, weighted by measured latency and throughput
     - Health checking
     - Failure tracking and backoff
     - Support for all proxy types (HTTP, HTTPS, SOCKS4, SOCKS5)
@@ -66,27 +85,50 @@ class ProxyManager:
         max_failures: int = 3,
         health_check_url: str = "https://www.google.com",
         health_check_timeout: int = 5,
-        enable_health_check: bool = True
+        enable_health_check: bool = True,
+        health_check_workers: int = 32,
+        health_check_deadline: Optional[float] = None,
+        min_healthy: Optional[int] = None,
+        strategy: str = 'weighted',
+        exploration: float = 0.1
     ):
         """
         Initialize ProxyManager.
         
         Args:
             proxies: List of proxy configurations
-            rotation_interval: Seconds before rotating to next proxy
+            rotation_interval: Seconds a selected proxy is kept before choosing again
             max_failures: Max failures before marking proxy as unhealthy
             health_check_url: URL to test proxy health
             health_check_timeout: Timeout for health checks
             enable_health_check: Whether to perform health checks
+            health_check_workers: Proxies checked in parallel
+            health_check_deadline: Seconds after which the initial health check
+                stops waiting (None waits for every proxy)
+            min_healthy: Stop the initial health check as soon as this many
+                proxies are healthy (None checks every proxy)
+            strategy: 'weighted' picks proxies in proportion to their score
+                (EWMA of time-to-first-byte, throughput and error rate);
+                'round_robin' cycles through healthy proxies in order
+            exploration: Chance of picking a uniformly random proxy instead
+                of a weighted one, so slow proxies get re-measured
         """
+        if strategy not in ('weighted', 'round_robin'):
+            raise ValueError(f"Unknown proxy strategy: {strategy}")
         self.proxies: List[ProxyConfig] = proxies or []
         self.rotation_interval = rotation_interval
         self.max_failures = max_failures
         self.health_check_url = health_check_url
         self.health_check_timeout = health_check_timeout
         self.enable_health_check = enable_health_check
+        self.health_check_workers = health_check_workers
+        self.health_check_deadline = health_check_deadline
+        self.min_healthy = min_healthy
+        self.strategy = strategy
+        self.exploration = exploration
         
         self.current_proxy_index = 0
+        self._current_proxy: Optional[ProxyConfig] = None
         self.start_time = time.time()
         self._lock = threading.RLock()  # Thread safety lock
         
@@ -217,20 +259,66 @@ class ProxyManager:
             if not healthy_proxies:
                 return None
             
-            # Check if we need to rotate (time-based or round-robin)
             current_time = time.time()
             time_since_start = current_time - self.start_time
             
-            if time_since_start >= self.rotation_interval:
-                self.current_proxy_index = (self.current_proxy_index + 1) % len(healthy_proxies)
-                self.start_time = current_time
+            if self.strategy == 'round_robin':
+                if time_since_start >= self.rotation_interval:
+                    self.current_proxy_index = (self.current_proxy_index + 1) % len(healthy_proxies)
+                    self.start_time = current_time
+                selected = healthy_proxies[self.current_proxy_index % len(healthy_proxies)]
+            else:
+                selected = self._current_proxy
+                if (selected is None or not selected.is_healthy
+                        or time_since_start >= self.rotation_interval):
+                    selected = self._choose_weighted(healthy_proxies)
+                    self._current_proxy = selected
+                    self.start_time = current_time
             
-            # Get the selected proxy
-            selected = healthy_proxies[self.current_proxy_index % len(healthy_proxies)]
             selected.last_used = current_time
             
             return selected
     
+    def _choose_weighted(self, candidates: List[ProxyConfig]) -> ProxyConfig:
+        """Pick a proxy with probability proportional to its score."""
+        if len(candidates) == 1:
+            return candidates[0]
+        if random.random() < self.exploration:
+            return random.choice(candidates)
+        weights = self._scores(candidates)
+        return random.choices(candidates, weights=weights)[0]
+    
+    def _scores(self, candidates: List[ProxyConfig]) -> List[float]:
+        """
+        Score proxies as success rate over the expected time to fetch
+        ``SCORE_REFERENCE_BYTES``.
+        
+        Proxies without measurements are scored with the best values seen so
+        far, so new proxies are tried instead of starved.
+        """
+        ttfbs = [p.ttfb for p in candidates if p.ttfb is not None]
+        throughputs = [p.throughput for p in candidates if p.throughput]
+        best_ttfb = min(ttfbs) if ttfbs else 0.0
+        best_throughput = max(throughputs) if throughputs else None
+        
+        scores = []
+        for proxy in candidates:
+            ttfb = proxy.ttfb if proxy.ttfb is not None else best_ttfb
+            throughput = proxy.throughput or best_throughput
+            cost = ttfb + (SCORE_REFERENCE_BYTES / throughput if throughput else 0.0)
+            success = max(1.0 - proxy.error_rate, MIN_SUCCESS_FACTOR)
+            scores.append(success / max(cost, 0.001))
+        return scores
+    
+    def score(self, proxy: ProxyConfig) -> float:
+        """Current selection score of ``proxy`` relative to the healthy pool."""
+        with self._lock:
+            healthy_proxies = [p for p in self.proxies if p.is_healthy] or self.proxies
+            if not any(p is proxy for p in healthy_proxies):
+                healthy_proxies = healthy_proxies + [proxy]
+            scores = self._scores(healthy_proxies)
+            return next(score for p, score in zip(healthy_proxies, scores) if p is proxy)
+    
     def get_random_proxy(self) -> Optional[ProxyConfig]:
         """Get a random healthy proxy."""
         healthy_proxies = [p for p in self.proxies if p.is_healthy]
@@ -253,6 +341,34 @@ class ProxyManager:
         with self._lock:
             proxy.failure_count = 0
             proxy.is_healthy = True
+            proxy.error_rate = _ewma(proxy.error_rate, 0.0)
+        PROXY_REQUESTS.inc(proxy=proxy_label(proxy), outcome='success')
+        PROXY_HEALTHY.set(1, proxy=proxy_label(proxy))
+    
+    def record_timing(self, proxy: ProxyConfig, ttfb: float):
+        """
+        Record how long a request took to return its response headers.
+        
+        Args:
+            proxy: The proxy the request went through
+            ttfb: Seconds from sending the request to the first response byte
+        """
+        with self._lock:
+            proxy.ttfb = _ewma(proxy.ttfb, ttfb)
+    
+    def record_throughput(self, proxy: ProxyConfig, nbytes: int, seconds: float):
+        """
+        Record a completed (or interrupted) transfer through this proxy.
+        
+        Args:
+            proxy: The proxy the transfer went through
+            nbytes: Bytes received
+            seconds: Time spent receiving them
+        """
+        if nbytes <= 0 or seconds <= 0:
+            return
+        with self._lock:
+            proxy.throughput = _ewma(proxy.throughput, nbytes / seconds)
     
     def record_failure(self, proxy: ProxyConfig, error: Optional[Exception] = None):
         """
@@ -262,11 +378,14 @@ class ProxyManager:
             proxy: The proxy that failed
             error: The exception that occurred
         """
+        PROXY_REQUESTS.inc(proxy=proxy_label(proxy), outcome='failure')
         with self._lock:
             proxy.failure_count += 1
+            proxy.error_rate = _ewma(proxy.error_rate, 1.0)
             
             if proxy.failure_count >= self.max_failures:
                 proxy.is_healthy = False
+                PROXY_HEALTHY.set(0, proxy=proxy_label(proxy))
                 if hasattr(error, 'response') and error.response is not None:
                     status_code = error.response.status_code
                     if status_code == 429:
@@ -307,22 +426,51 @@ class ProxyManager:
             )
             
             proxy.is_healthy = response.status_code == 200
-            return proxy.is_healthy
             
         except Exception as e:
             proxy.is_healthy = False
-            return False
+        
+        PROXY_HEALTH_CHECKS.inc(result='healthy' if proxy.is_healthy else 'unhealthy')
+        PROXY_HEALTHY.set(int(proxy.is_healthy), proxy=proxy_label(proxy))
+        return proxy.is_healthy
     
     def _health_check_all(self):
-        """Check health of all proxies."""
-        if not self.enable_health_check:
+        """
+        Check health of all proxies in parallel.
+        
+        Returns early when ``health_check_deadline`` passes or ``min_healthy``
+        proxies have passed. Proxies whose check has not finished by then keep
+        their current state and are judged by ``record_failure`` as they are used.
+        """
+        if not self.enable_health_check or not self.proxies:
             return
         
         logger.info("Checking proxy health...")
-        for proxy in self.proxies:
-            is_healthy = self._health_check(proxy)
-            status = "✓" if is_healthy else "✗"
-            logger.info(f"{status} {proxy}")
+        workers = max(1, min(self.health_check_workers, len(self.proxies)))
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = {executor.submit(self._health_check, proxy): proxy for proxy in self.proxies}
+        healthy = 0
+        
+        try:
+            for future in as_completed(futures, timeout=self.health_check_deadline):
+                proxy = futures[future]
+                is_healthy = future.result()
+                status = "✓" if is_healthy else "✗"
+                logger.info(f"{status} {proxy}")
+                
+                if is_healthy:
+                    healthy += 1
+                    if self.min_healthy and healthy >= self.min_healthy:
+                        logger.info(f"Found {healthy} healthy proxies, skipping remaining checks")
+                        break
+        except FuturesTimeoutError:
+            unfinished = sum(1 for future in futures if not future.done())
+            logger.warning(f"Proxy health check deadline reached with {unfinished} proxies unchecked")
+        finally:
+            for future in futures:
+                future.cancel()
+            # Checks already running finish in the background
+            executor.shutdown(wait=False)
     
     def add_proxy(self, config: ProxyConfig):
         """Add a new proxy to the pool."""
@@ -0,0 +1,171 @@
+"""
+Request pacing for YouTube Downloader
+
+Token buckets that keep player, browse and media requests under a fixed
+rate, both for the whole process and for each proxy, so requests are spread
+out before YouTube starts answering with 429s instead of after.
+"""
+
+import time
+import threading
+from typing import Optional, Dict, Tuple
+
+# Request kinds that can be paced
+KINDS = ('player', 'browse', 'media')
+
+
+class TokenBucket:
+    """
+    A thread-safe token bucket refilled at ``rate`` tokens per second.
+
+    ``reserve`` always succeeds: it takes the tokens immediately (the balance
+    may go negative) and returns how long the caller has to wait before
+    using them. Callers are therefore served in the order they asked.
+    """
+
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        """
+        Initialize TokenBucket.
+
+        Args:
+            rate: Tokens added per second
+            burst: Bucket capacity (default: one second worth of tokens, at least 1)
+        """
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, tokens: float = 1.0) -> float:
+        """Take ``tokens`` and return the seconds to wait before using them."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Take ``tokens`` only if they are available right now."""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens < tokens:
+                return False
+            self._tokens -= tokens
+            return True
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Block until ``tokens`` are available.
+
+        Returns:
+            Seconds spent waiting
+        """
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+class RequestPacer:
+    """
+    Process-wide and per-proxy token buckets for each kind of request.
+
+    Rates are requests per second keyed by kind (``'player'``, ``'browse'``,
+    ``'media'``). A kind without a rate is not paced at that level.
+    Per-proxy buckets are created the first time a proxy is used.
+    """
+
+    def __init__(self, rates: Optional[Dict[str, float]] = None,
+                 per_proxy_rates: Optional[Dict[str, float]] = None,
+                 burst: Optional[float] = None):
+        """
+        Initialize RequestPacer.
+
+        Args:
+            rates: Requests per second for the whole process, by kind
+            per_proxy_rates: Requests per second through any single proxy, by kind
+                (requests without a proxy count as one more "proxy")
+            burst: Bucket capacity for every bucket (default: one second of requests)
+        """
+        for kind in list(rates or {}) + list(per_proxy_rates or {}):
+            if kind not in KINDS:
+                raise ValueError(f"Unknown request kind: {kind}")
+        self.rates = dict(rates or {})
+        self.per_proxy_rates = dict(per_proxy_rates or {})
+        self.burst = burst
+        self._global: Dict[str, TokenBucket] = {
+            kind: TokenBucket(rate, burst) for kind, rate in self.rates.items()
+        }
+        self._per_proxy: Dict[Tuple[str, str], TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def _proxy_bucket(self, kind: str, proxy) -> Optional[TokenBucket]:
+        rate = self.per_proxy_rates.get(kind)
+        if not rate:
+            return None
+        key = (kind, repr(proxy) if proxy is not None else 'direct')
+        with self._lock:
+            bucket = self._per_proxy.get(key)
+            if bucket is None:
+                bucket = self._per_proxy[key] = TokenBucket(rate, self.burst)
+            return bucket
+
+    def reserve(self, kind: str, proxy=None) -> float:
+        """
+        Reserve one request of ``kind`` through ``proxy``.
+
+        Returns:
+            Seconds to wait before sending it (for callers that sleep themselves,
+            e.g. with ``asyncio.sleep``)
+        """
+        delay = 0.0
+        bucket = self._global.get(kind)
+        if bucket:
+            delay = bucket.reserve()
+        bucket = self._proxy_bucket(kind, proxy)
+        if bucket:
+            delay = max(delay, bucket.reserve())
+        return delay
+
+    def wait(self, kind: str, proxy=None) -> float:
+        """
+        Block until a request of ``kind`` through ``proxy`` may be sent.
+
+        Returns:
+            Seconds spent waiting
+        """
+        delay = self.reserve(kind, proxy)
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+def parse_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse a rate specification such as ``'player=5,browse=2,media=20'``.
+
+    Raises:
+        ValueError: If a kind is unknown or a rate is not a positive number
+    """
+    rates = {}
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        kind, _, value = item.partition('=')
+        kind = kind.strip()
+        if kind not in KINDS:
+            raise ValueError(f"Unknown request kind: {kind}")
+        rate = float(value)
+        if rate <= 0:
+            raise ValueError(f"Rate for {kind} must be positive")
+        rates[kind] = rate
+    return rates
@@ -0,0 +1,85 @@
+"""
+Zero-copy receive path for YouTube Downloader
+
+``iter_content`` allocates a fresh bytes object for every chunk (plus
+urllib3's own intermediate copies), which at dozens of parallel downloads
+turns into steady allocator churn. For plain media bodies this module reads
+with ``readinto`` straight from the underlying ``http.client`` response
+into one reusable buffer and hands out memoryviews of it instead.
+"""
+
+import http.client
+from typing import Iterator, Optional, Union
+
+import requests
+from urllib3.response import HTTPResponse as Urllib3Response
+
+
+def _readinto_source(response) -> Optional[http.client.HTTPResponse]:
+    """
+    The http.client response behind ``response`` if it can be read directly.
+
+    Only plain bodies qualify: with a Content-Encoding, urllib3 has to
+    decompress, so those responses keep using ``iter_content``.
+    """
+    raw = getattr(response, 'raw', None)
+    if not isinstance(raw, Urllib3Response):
+        return None
+    encoding = response.headers.get('content-encoding', 'identity')
+    if encoding.strip().lower() != 'identity':
+        return None
+    fp = getattr(raw, '_fp', None)
+    if not isinstance(fp, http.client.HTTPResponse):
+        return None
+    return fp
+
+
+def iter_response_chunks(response, chunk_size: int,
+                         buffer: Optional[bytearray] = None) -> Iterator[Union[bytes, memoryview]]:
+    """
+    Yield the body of a streaming response in chunks of up to ``chunk_size`` bytes.
+
+    On the readinto path every chunk is a memoryview of the same buffer, valid
+    only until the next chunk is requested: write it out before iterating on.
+    Network errors and truncated bodies are raised as the same ``requests``
+    exceptions ``iter_content`` raises, so callers retry them unchanged.
+
+    Args:
+        response: A ``requests`` response opened with ``stream=True``
+        chunk_size: Maximum bytes per chunk
+        buffer: Buffer to receive into (default: one allocated per response)
+    """
+    fp = _readinto_source(response)
+    if fp is None:
+        yield from response.iter_content(chunk_size=chunk_size)
+        return
+
+    if buffer is None or len(buffer) < chunk_size:
+        buffer = bytearray(chunk_size)
+    view = memoryview(buffer)[:chunk_size]
+
+    while True:
+        filled = 0
+        try:
+            while filled < chunk_size:
+                count = fp.readinto(view[filled:])
+                if not count:
+                    break
+                filled += count
+        except (OSError, http.client.HTTPException) as e:
+            raise requests.exceptions.ConnectionError(e)
+
+        if filled:
+            yield view[:filled]
+        if filled < chunk_size:
+            break
+
+    # http.client's readinto reports a truncated body as a plain EOF
+    if fp.length:
+        raise requests.exceptions.ChunkedEncodingError(
+            http.client.IncompleteRead(b'', fp.length)
+        )
+
+    # Body fully read: hand the connection back to the pool like urllib3 does
+    if fp.isclosed():
+        response.raw.release_conn()
@@ -0,0 +1,156 @@
+"""
+Crash-safe partial downloads for YouTube Downloader
+
+Downloads are written to ``<output>.part`` next to a small JSON sidecar
+(``<output>.part.json``) that records the itag, the expected length and how
+many bytes have been committed. An interrupted download can then continue
+with a ``Range`` request instead of starting over, and the final file name
+only appears once the length checks out.
+"""
+
+import os
+import json
+import threading
+from typing import Optional, List, Dict
+from .writer import preallocate
+
+# Bytes written between sidecar checkpoints
+CHECKPOINT_INTERVAL = 16 * 1024 * 1024
+
+
+class IncompleteDownloadError(Exception):
+    """Raised when a download ends before its expected length was written."""
+
+
+class DownloadInterrupted(Exception):
+    """Raised when a download is stopped on request; its .part file is kept for resuming."""
+
+
+class PartFile:
+    """
+    A download in progress.
+
+    The sidecar never claims more bytes than have reached the disk: callers
+    write through a DiskWriter, count bytes with ``checkpoint_due`` and, when
+    it fires, ``save`` the sidecar from a writer barrier, which runs once the
+    bytes before it are written (and fsynced, under the default policy).
+    """
+
+    def __init__(self, output_file: str, itag, content_length: int = 0):
+        """
+        Initialize PartFile.
+
+        Args:
+            output_file: Final destination path
+            itag: Format being downloaded; a sidecar for another itag is discarded
+            content_length: Expected size in bytes, or 0 if unknown
+        """
+        self.output_file = output_file
+        self.path = output_file + '.part'
+        self.state_path = self.path + '.json'
+        self.itag = itag
+        self.content_length = content_length
+        self._lock = threading.Lock()
+        self._unsaved = 0
+
+    def _load_state(self) -> Optional[Dict]:
+        """Return the sidecar if it belongs to this format and the .part file exists."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if state.get('itag') != self.itag:
+            return None
+        if self.content_length and state.get('content_length') != self.content_length:
+            return None
+        return state
+
+    def resume_offset(self) -> int:
+        """Bytes already committed for a single-stream download (0 if none)."""
+        state = self._load_state()
+        if not state or 'committed' not in state:
+            return 0
+        committed = int(state['committed'])
+        # Never trust the sidecar beyond what is actually on disk
+        return min(committed, os.path.getsize(self.path))
+
+    def resume_segments(self) -> Optional[List[List[int]]]:
+        """
+        Saved ``[start, end, next_offset]`` triples for a segmented download.
+
+        Returns None when there is nothing to resume.
+        """
+        state = self._load_state()
+        if not state or 'segments' not in state:
+            return None
+        return [list(map(int, segment)) for segment in state['segments']]
+
+    def open(self, offset: int = 0):
+        """
+        Open the .part file for unbuffered writing at ``offset``.
+
+        An offset of 0 truncates any previous data.
+        """
+        if offset and os.path.exists(self.path):
+            f = open(self.path, 'r+b', buffering=0)
+            f.seek(offset)
+            f.truncate()
+            return f
+        return open(self.path, 'wb', buffering=0)
+
+    def preallocate(self, size: int):
+        """Create (or reset) the .part file at its final size."""
+        with open(self.path, 'wb') as f:
+            preallocate(f.fileno(), size)
+
+    def save(self, committed: Optional[int] = None, segments: Optional[List[List[int]]] = None):
+        """Atomically replace the sidecar with the current progress."""
+        state = {'itag': self.itag, 'content_length': self.content_length}
+        if segments is not None:
+            state['segments'] = segments
+        else:
+            state['committed'] = committed or 0
+
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def checkpoint_due(self, written: int) -> bool:
+        """
+        Count ``written`` bytes and tell whether a checkpoint is due.
+        
+        Every ``CHECKPOINT_INTERVAL`` bytes; the caller then saves the sidecar
+        from a DiskWriter barrier once those bytes are on disk.
+        """
+        with self._lock:
+            self._unsaved += written
+            if self._unsaved < CHECKPOINT_INTERVAL:
+                return False
+            self._unsaved = 0
+            return True
+    
+    def finalize(self, size: int):
+        """
+        Verify the length and move the .part file into place.
+
+        Args:
+            size: Bytes actually written
+
+        Raises:
+            IncompleteDownloadError: If ``size`` does not match the expected length.
+                The .part file and sidecar are kept so the next run can resume.
+        """
+        if self.content_length and size != self.content_length:
+            raise IncompleteDownloadError(
+                f"Incomplete download: got {size} of {self.content_length} bytes"
+            )
+        os.replace(self.path, self.output_file)
+        try:
+            os.remove(self.state_path)
+        except FileNotFoundError:
+            pass
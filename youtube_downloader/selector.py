@@ -0,0 +1,343 @@
+"""
+Format selection for YouTube Downloader
+
+Selection expressions are compiled once into a FormatSelector and evaluated
+against a FormatTable: the format dicts from ``get_formats`` plus typed
+columns (height, fps, bitrate, size, codecs, ...) and indexes by itag and by
+kind. Among formats of equal quality the one delivering the most pixels per
+byte wins, so a webm at half the size beats the equivalent mp4.
+
+Syntax::
+
+    expression  := alternative ('/' alternative)*
+    alternative := format ['+' format]
+    format      := base ['-' kind] filter*
+    base        := best | worst | smallest | efficient
+    kind        := muxed | video | audio | any
+    filter      := '[' field op ['?'] value ']'
+    op          := = | != | < | <= | > | >= | ^= | $= | *=
+
+Alternatives are tried left to right and the first one matching any format
+is used, e.g. ``best[height<=720][filesize<300M]/smallest-audio``. An
+alternative of two formats joined by ``+`` (``best-video+best-audio``)
+matches only if both do, and selects both for downloading and merging.
+
+- ``best``: highest resolution and frame rate (bitrate for audio), then most
+  pixels per byte, then fewest bytes
+- ``worst``: lowest resolution, then most pixels per byte, then fewest bytes
+- ``smallest``: fewest bytes
+- ``efficient``: most pixels per byte
+
+Without a kind, bases choose among formats with both video and audio.
+``-video`` and ``-audio`` choose among video-only and audio-only formats.
+Numeric values accept binary K/M/G suffixes (300M = 300 MiB). A ``?`` after
+the operator also accepts formats where the field is unknown.
+"""
+
+import re
+import operator
+import functools
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+BASES = ('best', 'worst', 'smallest', 'efficient')
+KINDS = ('muxed', 'video', 'audio', 'any')
+
+NUMERIC_FIELDS = ('itag', 'height', 'width', 'fps', 'bitrate', 'filesize',
+                  'audio_sample_rate', 'audio_channels', 'duration')
+STRING_FIELDS = ('ext', 'vcodec', 'acodec', 'codecs', 'mime', 'quality')
+
+_SIZE_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+_NUMERIC_OPS = {
+    '=': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge,
+}
+_STRING_OPS = {
+    '=': operator.eq, '!=': operator.ne,
+    '^=': str.startswith, '$=': str.endswith,
+    '*=': operator.contains,
+}
+
+_FORMAT_RE = re.compile(r'\s*([a-z]+)(?:-([a-z]+))?\s*')
+_FILTER_RE = re.compile(r'\[\s*([a-z_]+)\s*(!=|<=|>=|\^=|\$=|\*=|=|<|>)(\?)?\s*([^\]]*?)\s*\]')
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(value) if value not in (None, '') else None
+    except (TypeError, ValueError):
+        return None
+
+
+def mime_details(mime_type: str) -> Dict[str, Any]:
+    """
+    Split a player ``mimeType`` such as ``'video/webm; codecs="vp9, opus"'``.
+
+    Returns:
+        Dict with ``ext``, ``codecs``, ``vcodec`` and ``acodec`` (None when absent)
+    """
+    base, _, params = mime_type.partition(';')
+    major, _, subtype = base.strip().partition('/')
+    match = re.search(r'codecs="([^"]*)"', params)
+    codecs = [c.strip() for c in match.group(1).split(',') if c.strip()] if match else []
+    ext = 'm4a' if (major, subtype) == ('audio', 'mp4') else subtype or None
+
+    vcodec = acodec = None
+    if major == 'video':
+        vcodec = codecs[0] if codecs else None
+        acodec = codecs[1] if len(codecs) > 1 else None
+    elif major == 'audio':
+        acodec = codecs[0] if codecs else None
+    return {'ext': ext, 'codecs': ', '.join(codecs) or None, 'vcodec': vcodec, 'acodec': acodec}
+
+
+@dataclass
+class FormatRow:
+    """Typed view of one format dict; unknown values are None."""
+    fmt: Dict
+    itag: Optional[int]
+    has_video: bool
+    has_audio: bool
+    height: Optional[int]
+    width: Optional[int]
+    fps: Optional[int]
+    bitrate: Optional[int]
+    filesize: Optional[int]
+    audio_sample_rate: Optional[int]
+    audio_channels: Optional[int]
+    duration: Optional[float]
+    ext: Optional[str]
+    vcodec: Optional[str]
+    acodec: Optional[str]
+    codecs: Optional[str]
+    mime: Optional[str]
+    quality: Optional[str]
+
+    @classmethod
+    def from_format(cls, fmt: Dict) -> 'FormatRow':
+        """Build a row from a format dict, deriving what older dicts lack."""
+        label = str(fmt.get('quality') or '')
+        match = re.match(r'(\d+)p(\d+)?', label)
+        height = _to_int(fmt.get('height'))
+        fps = _to_int(fmt.get('fps'))
+        if match:
+            height = height or int(match.group(1))
+            fps = fps or _to_int(match.group(2))
+        details = mime_details(fmt.get('mime') or '')
+        return cls(
+            fmt=fmt,
+            itag=_to_int(fmt.get('itag')),
+            has_video=bool(fmt.get('has_video')),
+            has_audio=bool(fmt.get('has_audio')),
+            height=height,
+            width=_to_int(fmt.get('width')),
+            fps=fps,
+            bitrate=_to_int(fmt.get('bitrate')),
+            filesize=_to_int(fmt.get('filesize')) or None,
+            audio_sample_rate=_to_int(fmt.get('audio_sample_rate')),
+            audio_channels=_to_int(fmt.get('audio_channels')),
+            duration=fmt.get('duration'),
+            ext=fmt.get('ext') or details['ext'],
+            vcodec=fmt.get('vcodec') or details['vcodec'],
+            acodec=fmt.get('acodec') or details['acodec'],
+            codecs=fmt.get('codecs') or details['codecs'],
+            mime=fmt.get('mime'),
+            quality=label or None,
+        )
+
+    @property
+    def kind(self) -> str:
+        if self.has_video and self.has_audio:
+            return 'muxed'
+        return 'video' if self.has_video else 'audio'
+
+    @property
+    def size(self) -> Optional[float]:
+        """Bytes to download: the exact size, else estimated from bitrate and duration."""
+        if self.filesize:
+            return self.filesize
+        if self.bitrate and self.duration:
+            return self.bitrate * self.duration / 8
+        return None
+
+    @property
+    def byte_rate(self) -> Optional[float]:
+        """Bytes per second of media."""
+        if self.bitrate:
+            return self.bitrate / 8
+        if self.filesize and self.duration:
+            return self.filesize / self.duration
+        return None
+
+    @property
+    def pixels_per_byte(self) -> float:
+        """Pixels delivered per byte received (0 for audio or when unknown)."""
+        if not self.has_video or not self.height or not self.byte_rate:
+            return 0.0
+        # Without a width assume 16:9, which only matters between formats of equal height
+        width = self.width or self.height * 16 // 9
+        return width * self.height * (self.fps or 30) / self.byte_rate
+
+    @property
+    def quality_rank(self) -> Tuple[int, int]:
+        if self.has_video:
+            return (self.height or 0, self.fps or 0)
+        return (self.bitrate or 0, self.audio_sample_rate or 0)
+
+
+class FormatTable(list):
+    """
+    The format dicts of one video plus typed rows and indexes.
+
+    It is still a list of the original dicts, so code that iterates over
+    ``get_formats()`` keeps working; selectors use ``rows`` and the indexes.
+    """
+
+    def __init__(self, formats=()):
+        super().__init__(formats)
+        self.rows: List[FormatRow] = [FormatRow.from_format(f) for f in self]
+        self.by_itag: Dict[int, FormatRow] = {}
+        self.by_kind: Dict[str, List[FormatRow]] = {kind: [] for kind in KINDS}
+        for row in self.rows:
+            self.by_itag.setdefault(row.itag, row)
+            self.by_kind[row.kind].append(row)
+            self.by_kind['any'].append(row)
+
+
+def _parse_number(text: str) -> float:
+    match = re.fullmatch(r'([0-9]*\.?[0-9]+)\s*([KMG]?)i?B?', text, re.IGNORECASE)
+    if not match:
+        raise ValueError(f"Invalid number: {text!r}")
+    return float(match.group(1)) * _SIZE_UNITS[match.group(2).upper()]
+
+
+def _compile_filter(field: str, op: str, optional: bool, text: str) -> Callable[[FormatRow], bool]:
+    if field in NUMERIC_FIELDS:
+        if op not in _NUMERIC_OPS:
+            raise ValueError(f"Operator {op} does not apply to numeric field {field}")
+        compare, value = _NUMERIC_OPS[op], _parse_number(text)
+    elif field in STRING_FIELDS:
+        if op not in _STRING_OPS:
+            raise ValueError(f"Operator {op} does not apply to text field {field}")
+        compare, value = _STRING_OPS[op], text.strip('\'"')
+    else:
+        raise ValueError(f"Unknown format field: {field}")
+
+    def check(row: FormatRow) -> bool:
+        actual = getattr(row, field)
+        if actual is None:
+            return optional
+        return compare(actual, value)
+    return check
+
+
+def _rank_key(base: str) -> Callable[[FormatRow], tuple]:
+    """Sort key for ``base``; the smallest key is selected."""
+    inf = float('inf')
+    if base == 'best':
+        return lambda r: (tuple(-q for q in r.quality_rank), -r.pixels_per_byte, r.size or inf)
+    if base == 'worst':
+        return lambda r: (r.quality_rank, -r.pixels_per_byte, r.size or inf)
+    if base == 'smallest':
+        return lambda r: (r.size or inf, tuple(-q for q in r.quality_rank))
+    return lambda r: (-r.pixels_per_byte, r.size or inf, tuple(-q for q in r.quality_rank))
+
+
+class _FormatPattern:
+    def __init__(self, text: str, base: str, kind: str, filters: List[Callable[[FormatRow], bool]]):
+        self.text = text
+        self.kind = kind
+        self.filters = filters
+        self.key = _rank_key(base)
+
+    def pick(self, table: FormatTable) -> Optional[FormatRow]:
+        candidates = [r for r in table.by_kind[self.kind] if all(f(r) for f in self.filters)]
+        return min(candidates, key=self.key) if candidates else None
+
+
+class FormatSelector:
+    """A compiled selection expression (see the module docstring for the syntax)."""
+
+    def __init__(self, spec: str):
+        """
+        Compile ``spec``.
+
+        Raises:
+            ValueError: If the expression is malformed
+        """
+        self.spec = spec
+        self.alternatives: List[List[_FormatPattern]] = []
+        for alternative in spec.split('/'):
+            parts = [self._compile_format(part) for part in alternative.split('+')]
+            if len(parts) > 2:
+                raise ValueError(f"At most two formats can be merged: {alternative!r}")
+            self.alternatives.append(parts)
+
+    @property
+    def merges(self) -> bool:
+        """Whether any alternative selects two formats."""
+        return any(len(parts) > 1 for parts in self.alternatives)
+
+    @staticmethod
+    def _compile_format(text: str) -> _FormatPattern:
+        match = _FORMAT_RE.match(text)
+        if not match:
+            raise ValueError(f"Invalid format selector: {text!r}")
+        base, kind = match.group(1), match.group(2) or 'muxed'
+        if base not in BASES:
+            raise ValueError(f"Unknown selector {base!r} (expected one of: {', '.join(BASES)})")
+        if kind not in KINDS:
+            raise ValueError(f"Unknown format kind {kind!r} (expected one of: {', '.join(KINDS)})")
+
+        filters = []
+        pos = match.end()
+        while pos < len(text.rstrip()):
+            found = _FILTER_RE.match(text, pos)
+            if not found:
+                raise ValueError(f"Invalid filter in format selector: {text[pos:]!r}")
+            field, op, optional, value = found.groups()
+            filters.append(_compile_filter(field, op, bool(optional), value))
+            pos = found.end()
+        return _FormatPattern(text.strip(), base, kind, filters)
+
+    def select_all(self, formats) -> List[Dict]:
+        """
+        Return the format dicts chosen by the first matching alternative
+        (two for a ``+`` alternative, otherwise one).
+
+        Args:
+            formats: A FormatTable, or a plain list of format dicts
+
+        Raises:
+            Exception: If no alternative matches
+        """
+        table = formats if isinstance(formats, FormatTable) else FormatTable(formats)
+        for parts in self.alternatives:
+            rows = [part.pick(table) for part in parts]
+            if all(row is not None for row in rows):
+                return [row.fmt for row in rows]
+        raise Exception(f"No format matches {self.spec!r}")
+
+    def select(self, formats) -> Dict:
+        """
+        Return the single format dict chosen by the first matching alternative.
+
+        Raises:
+            ValueError: If that alternative selects two formats to merge
+            Exception: If no alternative matches
+        """
+        selected = self.select_all(formats)
+        if len(selected) > 1:
+            raise ValueError(f"{self.spec!r} selects formats to merge; use select_all")
+        return selected[0]
+
+    def __repr__(self):
+        return f"FormatSelector({self.spec!r})"
+
+
+@functools.lru_cache(maxsize=64)
+def compile_selector(spec: str) -> FormatSelector:
+    """Compile ``spec``, reusing the compiled selector for repeated expressions."""
+    return FormatSelector(spec)
@@ -0,0 +1,260 @@
+"""
+Tracing for YouTube Downloader
+
+Span-based timing of each phase of a download (browse and player calls,
+format selection, media requests, proxy rotation, the transfer, disk
+flushes), with attributes such as video_id, itag, proxy, bytes and attempt.
+Finished spans go to a pluggable exporter; ``JsonFileExporter`` writes them
+as OpenTelemetry (OTLP/JSON) lines that trace viewers and the OpenTelemetry
+collector can load into a timeline of a whole run.
+
+Tracing is off until an exporter is set, and ``span`` then returns a shared
+no-op span, so the instrumented code pays next to nothing for it.
+"""
+
+import json
+import time
+import random
+import logging
+import threading
+import contextvars
+from abc import ABC, abstractmethod
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'ytsnap'
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current = contextvars.ContextVar('ytsnap_span', default=None)
+
+
+class Span:
+    """One timed operation; use it as a context manager to end it."""
+
+    def __init__(self, tracer: 'Tracer', name: str, parent: Optional['Span'], attributes: Dict):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = parent.trace_id if parent else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent.span_id if parent else None
+        self.attributes = {key: value for key, value in attributes.items() if value is not None}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end (or to now while still open)."""
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e9
+
+    def end(self):
+        if self.end_ns is None:
+            self.end_ns = time.time_ns()
+            self.tracer._export(self)
+
+    def __enter__(self) -> 'Span':
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        _current.reset(self._token)
+        self.end()
+
+    def to_otlp(self) -> Dict:
+        """This span in the OTLP/JSON encoding."""
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,  # SPAN_KIND_INTERNAL
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns or self.start_ns),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in self.attributes.items()],
+            'status': {'code': STATUS_ERROR, 'message': self.error} if self.error else {'code': STATUS_OK},
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class _NoopSpan:
+    """Stands in for a span while tracing is off."""
+
+    def set_attribute(self, key: str, value):
+        pass
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+class SpanExporter(ABC):
+    """Receives finished spans. Subclass to send them elsewhere."""
+
+    @abstractmethod
+    def export(self, spans: List[Span]):
+        """Handle a batch of finished spans."""
+
+    def shutdown(self):
+        pass
+
+
+class InMemoryExporter(SpanExporter):
+    """Keeps finished spans in ``spans``."""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self.spans.extend(spans)
+
+
+class JsonFileExporter(SpanExporter):
+    """
+    Appends spans to a file as OTLP/JSON, one ``ExportTraceServiceRequest`` per line.
+
+    Spans are buffered and written ``batch_size`` at a time, and on ``shutdown``.
+    """
+
+    def __init__(self, path: str, batch_size: int = 512, service_name: str = SERVICE_NAME):
+        self.path = path
+        self.batch_size = batch_size
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        self._buffer: List[Span] = []
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self._buffer.extend(spans)
+            if len(self._buffer) >= self.batch_size:
+                self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        request = {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+            'scopeSpans': [{
+                'scope': {'name': 'youtube_downloader'},
+                'spans': [span.to_otlp() for span in self._buffer],
+            }],
+        }]}
+        self._file.write(json.dumps(request, separators=(',', ':')) + '\n')
+        self._file.flush()
+        self._buffer = []
+
+    def shutdown(self):
+        with self._lock:
+            if not self._file.closed:
+                self._flush()
+                self._file.close()
+
+
+class Tracer:
+    """Creates spans and hands the finished ones to ``exporter`` (None disables tracing)."""
+
+    def __init__(self, exporter: Optional[SpanExporter] = None):
+        self.exporter = exporter
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def span(self, name: str, parent: Optional[Span] = None, **attributes):
+        """
+        Start a span, a child of ``parent`` or of the current span.
+
+        Returns:
+            The span (a no-op one while tracing is off); ending it is up to
+            the ``with`` block or an explicit ``end()``
+        """
+        if self.exporter is None:
+            return NOOP_SPAN
+        return Span(self, name, parent or _current.get(), attributes)
+
+    def _export(self, span: Span):
+        exporter = self.exporter
+        if exporter is None:
+            return
+        try:
+            exporter.export([span])
+        except Exception as e:
+            logger.warning(f"Dropping span {span.name}: {e}")
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+TRACER = Tracer()
+
+
+def set_exporter(exporter: Optional[SpanExporter]):
+    """Send spans of the process-wide tracer to ``exporter`` (None turns tracing off)."""
+    TRACER.exporter = exporter
+
+
+def span(name: str, parent: Optional[Span] = None, **attributes):
+    """Start a span on the process-wide tracer (see ``Tracer.span``)."""
+    if TRACER.exporter is None:
+        return NOOP_SPAN
+    return TRACER.span(name, parent, **attributes)
+
+
+def current_span():
+    """The innermost open span of this thread, or the no-op span."""
+    return _current.get() or NOOP_SPAN
+
+
+def propagate(fn: Callable) -> Callable:
+    """
+    Bind ``fn`` to the current span, for running it on another thread.
+
+    Spans started by ``fn`` in a worker thread then nest under the span that
+    was open where the work was submitted.
+    """
+    parent = _current.get()
+    if parent is None:
+        return fn
+
+    @wraps(fn)
+    def run(*args, **kwargs):
+        token = _current.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+
+    return run
@@ -0,0 +1,71 @@
+"""
+Pooled HTTP transport for YouTube Downloader
+
+One HttpTransport wraps a single requests.Session whose connection pools are
+sized for the number of parallel workers. Sharing it between downloaders
+keeps TLS connections to youtube.com and googlevideo alive across videos
+instead of handshaking again for every item.
+
+Proxies are never set on the shared session; each downloader passes its
+active proxy per request.
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+    'Accept': '*/*',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Origin': 'https://www.youtube.com',
+    'Referer': 'https://www.youtube.com/'
+}
+
+# Distinct hosts whose pools are kept: youtube.com plus googlevideo edge nodes and proxies
+DEFAULT_POOL_CONNECTIONS = 16
+
+
+class HttpTransport:
+    """A requests.Session with connection pools sized for ``pool_size`` workers."""
+
+    def __init__(self, pool_size: int = 10, pool_connections: int = DEFAULT_POOL_CONNECTIONS):
+        """
+        Initialize HttpTransport.
+
+        Args:
+            pool_size: Connections kept per host (match the number of parallel requests)
+            pool_connections: Number of per-host pools kept
+        """
+        self.pool_size = pool_size
+        self.pool_connections = pool_connections
+        self.session = requests.Session()
+        self.session.headers.update(BROWSER_HEADERS)
+        self._lock = threading.Lock()
+        self._mount()
+
+    def _mount(self):
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def resize(self, pool_size: int):
+        """Grow the per-host pools to at least ``pool_size`` connections."""
+        with self._lock:
+            if pool_size <= self.pool_size:
+                return
+            self.pool_size = pool_size
+            old_adapters = list(self.session.adapters.values())
+            self._mount()
+            for adapter in old_adapters:
+                adapter.close()
+
+    def close(self):
+        """Close every pooled connection."""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
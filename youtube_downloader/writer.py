@@ -0,0 +1,246 @@
+"""
+Disk writer stage for YouTube Downloader
+
+Network readers hand their chunks to a DiskWriter instead of calling
+``f.write`` themselves. Each reader copies into large block-aligned buffers
+from a bounded pool; full blocks are queued to one writer thread per file
+that issues positional writes and fsyncs according to a policy. A slow disk
+then only stalls the network once the pool is exhausted, and the socket
+never waits for an individual write.
+"""
+
+import os
+import queue
+import logging
+import threading
+from typing import Callable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Coalesced write size; blocks start on multiples of this within the file
+BLOCK_SIZE = 2 * 1024 * 1024
+# Full blocks allowed to wait for the writer thread before readers block
+QUEUE_BLOCKS = 3
+FSYNC_POLICIES = ('always', 'checkpoint', 'close', 'never')
+
+
+def preallocate(fd: int, size: int):
+    """
+    Reserve ``size`` bytes for the file behind ``fd``.
+
+    Uses ``posix_fallocate`` so the blocks are actually allocated (no
+    fragmentation, ENOSPC up front); falls back to extending the file where
+    that is unavailable or unsupported by the filesystem.
+    """
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError as e:
+            logger.debug(f"posix_fallocate unavailable ({e}), extending file instead")
+    if os.fstat(fd).st_size < size:
+        os.ftruncate(fd, size)
+
+
+class BufferPool:
+    """A bounded set of reusable ``bytearray`` blocks."""
+
+    def __init__(self, block_size: int = BLOCK_SIZE, capacity: int = QUEUE_BLOCKS):
+        self.block_size = block_size
+        self.capacity = capacity
+        self._free: List[bytearray] = []
+        self._created = 0
+        self._cond = threading.Condition()
+
+    def acquire(self) -> bytearray:
+        """Take a block, waiting for one to be released if all are in use."""
+        with self._cond:
+            while not self._free and self._created >= self.capacity:
+                self._cond.wait()
+            if self._free:
+                return self._free.pop()
+            self._created += 1
+        return bytearray(self.block_size)
+
+    def release(self, block: bytearray):
+        with self._cond:
+            self._free.append(block)
+            self._cond.notify()
+
+    def grow(self, count: int = 1):
+        """Allow ``count`` more blocks (one per stream that holds a block while filling it)."""
+        with self._cond:
+            self.capacity += count
+            self._cond.notify_all()
+
+
+class WriterStream:
+    """
+    Sequential writes starting at a file offset, coalesced into blocks.
+
+    Use one stream per reader (e.g. per segment). ``written`` is the offset up
+    to which this stream's bytes have been handed to the operating system.
+    """
+
+    def __init__(self, writer: 'DiskWriter', offset: int):
+        self.writer = writer
+        self.offset = offset
+        self.written = offset
+        self._block: Optional[bytearray] = None
+        self._block_offset = offset
+        self._fill = 0
+        self._limit = 0
+
+    def write(self, data) -> int:
+        """Copy ``data`` into the current block, queuing blocks as they fill up."""
+        self.writer.raise_error()
+        view = memoryview(data).cast('B')
+        total = len(view)
+        while view:
+            if self._block is None:
+                self._block = self.writer.pool.acquire()
+                self._block_offset = self.offset
+                self._fill = 0
+                # The first block ends on a block boundary so later ones are aligned
+                self._limit = len(self._block) - self.offset % len(self._block)
+            count = min(len(view), self._limit - self._fill)
+            self._block[self._fill:self._fill + count] = view[:count]
+            self._fill += count
+            self.offset += count
+            view = view[count:]
+            if self._fill == self._limit:
+                self.flush()
+        return total
+
+    def flush(self):
+        """Queue the partially filled block, if any."""
+        if self._block is not None:
+            self.writer._submit_block(self, self._block, self._block_offset, self._fill)
+            self._block = None
+
+    def barrier(self, callback: Callable[[], None]):
+        """
+        Run ``callback`` on the writer thread once everything written so far
+        has reached the OS (and disk, under the 'checkpoint' fsync policy).
+        """
+        self.flush()
+        self.writer._submit(('barrier', callback))
+
+
+class DiskWriter:
+    """
+    One writer thread for one open file.
+
+    The file handle stays owned by the caller; ``close`` flushes every
+    stream, waits for the queue to drain and fsyncs according to ``fsync``:
+
+    - ``'always'``: after every block
+    - ``'checkpoint'``: before every barrier callback and on close (default)
+    - ``'close'``: on close only
+    - ``'never'``: leave it to the operating system
+    """
+
+    def __init__(self, f, size: Optional[int] = None, fsync: str = 'checkpoint',
+                 block_size: int = BLOCK_SIZE, queue_blocks: int = QUEUE_BLOCKS):
+        """
+        Initialize DiskWriter.
+
+        Args:
+            f: Open binary file (only its descriptor is used)
+            size: Final file size to preallocate, if known
+            fsync: Fsync policy (see class docstring)
+            block_size: Coalesced write size
+            queue_blocks: Full blocks that may be queued before readers wait
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}")
+        self.fd = f.fileno()
+        self.fsync = fsync
+        self.pool = BufferPool(block_size, queue_blocks)
+        self._streams: List[WriterStream] = []
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._error: Optional[BaseException] = None
+        self._closed = False
+
+        if size:
+            preallocate(self.fd, size)
+
+        self._thread = threading.Thread(target=self._run, name='ytsnap-writer', daemon=True)
+        self._thread.start()
+
+    def stream(self, offset: int) -> WriterStream:
+        """Start a sequential stream of writes at ``offset``."""
+        stream = WriterStream(self, offset)
+        self._streams.append(stream)
+        # Each stream may hold one block while filling it
+        self.pool.grow()
+        return stream
+
+    def raise_error(self):
+        """Re-raise a write error from the writer thread in the caller."""
+        if self._error is not None:
+            raise self._error
+
+    def _submit(self, item):
+        self.raise_error()
+        self._queue.put(item)
+
+    def _submit_block(self, stream: WriterStream, block: bytearray, offset: int, length: int):
+        self._queue.put(('write', stream, block, offset, length))
+
+    def _pwrite(self, data: memoryview, offset: int):
+        while data:
+            if hasattr(os, 'pwrite'):
+                count = os.pwrite(self.fd, data, offset)
+            else:
+                os.lseek(self.fd, offset, os.SEEK_SET)
+                count = os.write(self.fd, data)
+            data = data[count:]
+            offset += count
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            kind = item[0]
+            if kind == 'stop':
+                return
+            try:
+                if kind == 'write':
+                    _, stream, block, offset, length = item
+                    try:
+                        if self._error is None:
+                            self._pwrite(memoryview(block)[:length], offset)
+                            stream.written = offset + length
+                            if self.fsync == 'always':
+                                os.fsync(self.fd)
+                    finally:
+                        self.pool.release(block)
+                elif kind == 'barrier' and self._error is None:
+                    if self.fsync == 'checkpoint':
+                        os.fsync(self.fd)
+                    item[1]()
+            except BaseException as e:
+                # Keep draining so readers blocked on the pool are released
+                self._error = e
+
+    def close(self):
+        """Write out everything queued, stop the thread and fsync per policy."""
+        if self._closed:
+            return
+        self._closed = True
+        for stream in self._streams:
+            stream.flush()
+        self._queue.put(('stop',))
+        self._thread.join()
+        if self._error is None and self.fsync != 'never':
+            try:
+                os.fsync(self.fd)
+            except OSError as e:
+                self._error = e
+        self.raise_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()